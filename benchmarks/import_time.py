@@ -0,0 +1,76 @@
+"""Benchmark the time to import the plugin, in a fresh interpreter for each run.
+
+Run with ``nox -s benchmark`` (or ``python benchmarks/import_time.py``). The time for the modules ``mkdocs``
+loads anyway (``mkdocs.plugins``, ``mkdocs.config`` and ``markdown``) is excluded, so this is the cost the
+plugin adds to every ``mkdocs build`` and ``mkdocs serve``, including when it is disabled. It also fails if any
+of the ``LAZY_MODULES`` are imported, as they should only be imported once a changelog is fetched or rendered.
+
+The results can be written to JSON with ``--output``, and compared with a previous run with ``--baseline``,
+in the same way as ``run.py``.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+from pathlib import Path
+import subprocess  # nosec B404
+import sys
+
+from run import compare
+
+LAZY_MODULES = ('ghapi', 'fastcore', 'dateutil', 'setuptools_scm')
+
+PRELOAD = 'import mkdocs.plugins, mkdocs.config.config_options, markdown'
+
+SCRIPT = """
+import json, sys, time
+{preload}
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps({{'seconds': seconds, 'lazy_imported': [m for m in {lazy!r} if m in sys.modules]}}))
+"""
+
+MODULES = ('mkdocs_github_changelog', 'mkdocs_github_changelog.plugin', 'mkdocs_github_changelog.extension')
+
+
+def measure(module: str, repeat: int) -> dict:
+    """Measure the best import time for a module, in a fresh interpreter each time."""
+    results = []
+    for _ in range(repeat):
+        script = SCRIPT.format(preload=PRELOAD, module=module, lazy=LAZY_MODULES)
+        output = subprocess.run([sys.executable, '-c', script], check=True, capture_output=True, text=True).stdout  # nosec B603
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    best = min(results, key=lambda result: result['seconds'])
+    return {'seconds': best['seconds'], 'lazy_imported': best['lazy_imported']}
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per module (the fastest is reported).')
+    parser.add_argument('--output', type=Path, help='Write the results to this JSON file.')
+    parser.add_argument('--baseline', type=Path, help='Compare the results to this JSON file.')
+    parser.add_argument('--max-regression', type=float, default=1.25, help='Maximum slowdown relative to the baseline.')
+    args = parser.parse_args(argv)
+    results = {}
+    failures = []
+    for module in MODULES:
+        result = measure(module, args.repeat)
+        results[f'import {module}'] = {'import': result}
+        lazy = ', '.join(result['lazy_imported']) or '-'
+        print(f'{module:>36}: {result["seconds"]*1000:8.1f} ms  (lazy modules imported: {lazy})')
+        if result['lazy_imported']:
+            failures.append(f'Importing {module} imports {lazy}')
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(results, indent=2))
+    if args.baseline:
+        failures += compare(results, json.loads(args.baseline.read_text()), args.max_regression)
+    if failures:
+        print('\n'.join(failures))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,263 @@
+"""Benchmark the changelog processing against a synthetic release corpus.
+
+Run with ``nox -s benchmark`` (or ``python benchmarks/run.py``). Each benchmark is run for each corpus size,
+and reports the wall time, throughput (releases per second) and peak memory (from ``tracemalloc``).
+
+The ``network_*`` benchmarks build against the local stand-in for the github API
+(``mkdocs_github_changelog.testing.server``): ``cold`` with an empty release cache, ``warm`` with the cache
+kept from a previous build (as under ``mkdocs serve``), and ``degraded`` with high latency and small pages.
+
+The ``decode_pages*`` benchmarks decode the pages (of 100 releases, with assets) of a list releases response,
+as ghapi does (the whole page at once) and streamed (``mkdocs_github_changelog.streaming``, keeping only the
+fields the default template uses), to compare their time and peak memory.
+
+The results can be written to JSON with ``--output``, and compared with a previous run with ``--baseline``,
+failing if any benchmark is slower than ``--max-regression`` times the baseline.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+from pathlib import Path
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable
+from unittest.mock import patch
+
+from click.testing import CliRunner
+from fastcore.xtras import dict2obj
+from markdown import Markdown
+from mkdocs.__main__ import build_command
+from mkdocs.config.defaults import MkDocsConfig
+
+from mkdocs_github_changelog import get_releases
+from mkdocs_github_changelog.extension import GithubReleaseChangelogExtension
+from mkdocs_github_changelog.get_releases import (
+    _process_releases,
+    autoprocess_github_links,
+    JINJA_ENVIRONMENT_FACTORY,
+    RELEASE_TEMPLATE,
+)
+from mkdocs_github_changelog.streaming import iter_json_array, REQUIRED_FIELDS
+from mkdocs_github_changelog.testing.corpus import generate_releases
+from mkdocs_github_changelog.testing.server import GithubStandInServer
+
+DEFAULT_SIZES = (10, 1000, 10000, 50000)
+# The markdown conversion dominates these, so they are skipped for larger corpora unless --all-sizes is set
+MAX_SIZES = {name: 10000 for name in ('processor_run', 'mkdocs_build', 'network_cold', 'network_warm', 'network_degraded')}
+
+MKDOCS_YML = """
+site_name: benchmark
+docs_dir: ./source
+site_dir: ./html
+plugins:
+  - mkdocs_github_changelog
+"""
+
+
+def _releases(payload: list[dict[str, Any]]) -> list:
+    """Convert the decoded JSON to the objects returned by ghapi."""
+    return [dict2obj(release) for release in payload]
+
+
+def bench_process_releases(payload: list[dict[str, Any]]) -> Callable[[], Any]:
+    releases = _releases(payload)
+    return lambda: _process_releases(releases, autoprocess=False, include_prereleases=True)
+
+
+def bench_autoprocess(payload: list[dict[str, Any]]) -> Callable[[], Any]:
+    releases = _releases(payload)
+    return lambda: [autoprocess_github_links(release) for release in releases]
+
+
+def bench_render(payload: list[dict[str, Any]]) -> Callable[[], Any]:
+    releases = _process_releases(_releases(payload), autoprocess=False, include_prereleases=True)
+    template = JINJA_ENVIRONMENT_FACTORY.environment.from_string(RELEASE_TEMPLATE)
+    return lambda: [template.render(release=release) for release in releases]
+
+
+def bench_processor_run(payload: list[dict[str, Any]]) -> Callable[[], Any]:
+    def run():
+        md = Markdown(extensions=[GithubReleaseChangelogExtension({})])
+        with patch.object(get_releases, 'fetch_releases', lambda *args, **kwargs: _releases(payload)):
+            return md.convert('## ::github-release-changelog example-org/example-repo\n')
+    return run
+
+
+def _encoded_pages(payload: list[dict[str, Any]], per_page: int = 100, assets_per_release: int = 5) -> list[bytes]:
+    """Encode the releases (with assets) as the pages of a list releases response."""
+    releases = generate_releases(len(payload), assets_per_release=assets_per_release)
+    return [json.dumps(releases[i:i+per_page]).encode() for i in range(0, len(releases), per_page)]
+
+
+def bench_decode_pages(payload: list[dict[str, Any]]) -> Callable[[], Any]:
+    pages = _encoded_pages(payload)
+
+    def run():
+        releases = []
+        for page in pages:
+            releases += [dict2obj(release) for release in json.loads(page)]
+        return releases
+    return run
+
+
+def bench_decode_pages_streaming(payload: list[dict[str, Any]], chunk_size: int = 65536) -> Callable[[], Any]:
+    pages = _encoded_pages(payload)
+
+    def run():
+        releases = []
+        for page in pages:
+            chunks = (page[i:i+chunk_size] for i in range(0, len(page), chunk_size))
+            releases += [dict2obj(release) for release in iter_json_array(chunks, REQUIRED_FIELDS)]
+        return releases
+    return run
+
+
+def _mkdocs_build(tmp: str, mkdocs_yml: str = MKDOCS_YML) -> None:
+    """Build a site with a single changelog page in a directory."""
+    Path(tmp, 'mkdocs.yml').write_text(mkdocs_yml)
+    Path(tmp, 'source').mkdir(exist_ok=True)
+    Path(tmp, 'source', 'index.md').write_text('# Changelog\n\n## ::github-release-changelog example-org/example-repo\n')
+    result = CliRunner().invoke(build_command, ['-f', str(Path(tmp, 'mkdocs.yml'))], catch_exceptions=False)
+    if result.exit_code:
+        raise RuntimeError(result.output)
+
+
+def bench_mkdocs_build(payload: list[dict[str, Any]]) -> Callable[[], Any]:
+    def run():
+        # mkdocs keeps plugins with startup hooks (and so their release cache) between builds in a process
+        MkDocsConfig.plugins.plugin_cache.clear()
+        with tempfile.TemporaryDirectory() as tmp:
+            with patch.object(get_releases, 'fetch_releases', lambda *args, **kwargs: _releases(payload)):
+                _mkdocs_build(tmp)
+    return run
+
+
+def _network_build(payload: list[dict[str, Any]], warm: bool = False, **server_kwargs) -> Callable[[], Any]:
+    """Build against the local stand-in server, rather than patching the fetch."""
+    server = GithubStandInServer(**server_kwargs).start()
+    server.add_repository('example-org', 'example-repo', payload)
+    mkdocs_yml = MKDOCS_YML.replace('- mkdocs_github_changelog', f'- mkdocs_github_changelog:\n      github_api_url: {server.url}')
+    MkDocsConfig.plugins.plugin_cache.clear()
+    if warm:
+        # Fill the (persistent) plugin's release cache before timing
+        with tempfile.TemporaryDirectory() as tmp:
+            _mkdocs_build(tmp, mkdocs_yml)
+
+    def run():
+        try:
+            with tempfile.TemporaryDirectory() as tmp:
+                _mkdocs_build(tmp, mkdocs_yml)
+        finally:
+            server.stop()
+    return run
+
+
+def bench_network_cold(payload: list[dict[str, Any]]) -> Callable[[], Any]:
+    return _network_build(payload, latency=0.02)
+
+
+def bench_network_warm(payload: list[dict[str, Any]]) -> Callable[[], Any]:
+    return _network_build(payload, warm=True, latency=0.02)
+
+
+def bench_network_degraded(payload: list[dict[str, Any]]) -> Callable[[], Any]:
+    return _network_build(payload, latency=0.25, max_per_page=30)
+
+
+BENCHMARKS: dict[str, Callable[[list[dict[str, Any]]], Callable[[], Any]]] = {
+    'process_releases': bench_process_releases,
+    'autoprocess_github_links': bench_autoprocess,
+    'render': bench_render,
+    'decode_pages': bench_decode_pages,
+    'decode_pages_streaming': bench_decode_pages_streaming,
+    'processor_run': bench_processor_run,
+    'mkdocs_build': bench_mkdocs_build,
+    'network_cold': bench_network_cold,
+    'network_warm': bench_network_warm,
+    'network_degraded': bench_network_degraded,
+}
+
+
+def measure(setup: Callable[[list[dict[str, Any]]], Callable[[], Any]], payload: list[dict[str, Any]], repeat: int) -> dict[str, float]:
+    """Measure the best wall time, and peak memory of a benchmark.
+
+    The benchmark is set up again for each run (outside of the timing), as some modify their input.
+    """
+    timings = []
+    for _ in range(repeat):
+        func = setup(payload)
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    func = setup(payload)
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    best = min(timings)
+    return {
+        'seconds': best,
+        'releases_per_second': len(payload) / best if best else float('inf'),
+        'peak_memory_mb': peak / 1024 / 1024,
+    }
+
+
+def run(sizes: list[int], benchmarks: list[str], repeat: int, all_sizes: bool = False) -> dict[str, dict[str, dict[str, float]]]:
+    """Run the benchmarks for each corpus size."""
+    results: dict[str, dict[str, dict[str, float]]] = {}
+    for size in sizes:
+        payload = generate_releases(size)
+        for name in benchmarks:
+            if not all_sizes and size > MAX_SIZES.get(name, size):
+                print(f'{name:>26} {size:>6} releases: skipped (use --all-sizes to run)')
+                continue
+            result = measure(BENCHMARKS[name], payload, repeat)
+            results.setdefault(name, {})[str(size)] = result
+            print(f'{name:>26} {size:>6} releases: {result["seconds"]:9.4f} s  {result["releases_per_second"]:12.0f} releases/s  {result["peak_memory_mb"]:9.1f} MB peak')
+    return results
+
+
+def compare(results: dict, baseline: dict, max_regression: float) -> list[str]:
+    """Compare the results to a baseline, returning the regressions."""
+    regressions = []
+    for name, sizes in results.items():
+        for size, result in sizes.items():
+            previous = baseline.get(name, {}).get(size, None)
+            if previous is None:
+                continue
+            ratio = result['seconds'] / previous['seconds'] if previous['seconds'] else 1
+            print(f'{name:>26} {size:>6} releases: {ratio:6.2f}x baseline time')
+            if ratio > max_regression:
+                regressions.append(f'{name} ({size} releases) is {ratio:.2f}x slower than the baseline')
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES), help='Numbers of releases in the corpus.')
+    parser.add_argument('--benchmarks', nargs='+', choices=list(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument('--all-sizes', action='store_true', help='Run the markdown benchmarks for every size.')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per benchmark (the fastest is reported).')
+    parser.add_argument('--output', type=Path, help='Write the results to this JSON file.')
+    parser.add_argument('--baseline', type=Path, help='Compare the results to this JSON file.')
+    parser.add_argument('--max-regression', type=float, default=1.25, help='Maximum slowdown relative to the baseline.')
+    args = parser.parse_args(argv)
+    results = run(args.sizes, args.benchmarks, args.repeat, args.all_sizes)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(results, indent=2))
+    if args.baseline:
+        regressions = compare(results, json.loads(args.baseline.read_text()), args.max_regression)
+        if regressions:
+            print('\n'.join(regressions))
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -99,6 +99,15 @@ def test(session):
             *args)
 
 
+@nox.session(reuse_venv=True, tags=['benchmark'])
+def benchmark(session):
+    Path('reports').mkdir(exist_ok=True)
+    session.install('.[dev,dev-test]')
+    # Extra args are passed to the benchmark script, e.g. nox -s benchmark -- --sizes 10 1000 --baseline reports/benchmarks.json
+    session.run('python', 'benchmarks/run.py', '--output', 'reports/benchmarks.json', *session.posargs)
+    session.run('python', 'benchmarks/import_time.py', '--output', 'reports/import_time.json')
+
+
 @nox.session(reuse_venv=True, tags=['docs'])
 def docs(session):
     session.install('.[dev,dev-docs]')
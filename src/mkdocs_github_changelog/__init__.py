@@ -48,7 +48,13 @@ def __get_version() -> str:
     return version
 
 
-__version__ = __get_version()
+def __getattr__(name: str) -> Any:
+    """Get the version on first use, as ``setuptools_scm`` is slow to import and run in development installs."""
+    if name == '__version__':
+        version = __get_version()
+        globals()['__version__'] = version
+        return version
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
 
 class _PluginLogger(logging.LoggerAdapter):
@@ -0,0 +1,153 @@
+"""Fetch the first page of releases for many repositories in batched GraphQL queries.
+
+Fetching a repository's releases with the REST API takes at least one request, so for a site with small
+changelogs for many repositories, most of the time is spent waiting on round trips. With ``batch_size`` set,
+the [`prefetch`][mkdocs_github_changelog.prefetch.prefetch] gathers the repositories referenced by every
+changelog, and fetches the first ``PER_PAGE`` releases of up to ``batch_size`` of them in a single GraphQL
+query (each as an aliased ``repository`` field). Only the repositories with more releases than that get follow
+up queries for their next pages, which are batched in the same way.
+
+Each release field is aliased to its REST name (see ``FIELDS``), and the releases are in the same order
+(newest created first), so they are the same as those from the REST API. Only the changelogs whose fields all
+have a GraphQL equivalent can be batched (those of the default template do), and GraphQL requests need a token,
+so other repositories are fetched with the REST API as before.
+"""
+from __future__ import annotations
+
+import json
+import time
+from typing import Any, Collection, Mapping, TYPE_CHECKING
+
+from mkdocs_github_changelog import logger
+from mkdocs_github_changelog.failures import DeadlineExceeded
+from mkdocs_github_changelog.graphql import graphql_request
+
+if TYPE_CHECKING:
+    from mkdocs_github_changelog.clients import HostClient
+    from mkdocs_github_changelog.failures import Deadline
+    from mkdocs_github_changelog.metrics import DirectiveMetrics
+
+# The GraphQL field of a release for each REST field that can be batched
+FIELDS = {
+    'id': 'databaseId',
+    'name': 'name',
+    'tag_name': 'tagName',
+    'html_url': 'url',
+    'created_at': 'createdAt',
+    'published_at': 'publishedAt',
+    'draft': 'isDraft',
+    'prerelease': 'isPrerelease',
+    'body': 'description',
+    'body_html': 'descriptionHTML',
+}
+PER_PAGE = 100
+"""Releases of each repository fetched in each query (the most GraphQL allows)."""
+BATCH_SIZE = 20
+"""Repositories fetched in each query."""
+
+QUERY = '''query {{
+{repositories}
+}}'''
+REPOSITORY = (
+    '  {alias}: repository(owner: {owner}, name: {name}) {{ '
+    'releases(first: {first}{after}, orderBy: {{field: CREATED_AT, direction: DESC}}) {{ '
+    'pageInfo {{ hasNextPage endCursor }} nodes {{ {nodes} }} }} }}'
+)
+
+
+class BatchError(Exception):
+    """A repository's releases could not be fetched in a batched query."""
+
+
+def batchable(fields: Collection[str] | None) -> bool:
+    """Whether releases with the ``fields`` can be fetched with GraphQL (all of the fields can't be)."""
+    return fields is not None and all(field in FIELDS for field in fields)
+
+
+def releases_query(repositories: list[tuple[str, str, str | None, Collection[str]]], first: int = PER_PAGE) -> str:
+    """Get the GraphQL query for a page of the releases of each repository, aliased ``r0``, ``r1`` etc.
+
+    Each repository is an ``(owner, name, cursor, fields)`` tuple, with the cursor of the page before (None for the
+    first page), and the (REST) fields of the releases.
+    """
+    fields = []
+    for i, (owner, name, cursor, release_fields) in enumerate(repositories):
+        fields.append(REPOSITORY.format(
+            alias=f'r{i}',
+            owner=json.dumps(owner),
+            name=json.dumps(name),
+            first=first,
+            after='' if cursor is None else f', after: {json.dumps(cursor)}',
+            nodes=' '.join(f'{field}: {FIELDS[field]}' for field in release_fields),
+        ))
+    return QUERY.format(repositories='\n'.join(fields))
+
+
+def _errors(result: Mapping[str, Any], alias: str | None = None) -> str:
+    """Get the messages of the errors in a GraphQL result (for an alias, if it is set)."""
+    errors = result.get('errors', None) or []
+    return '; '.join(error.get('message', '') for error in errors if alias is None or (error.get('path', None) or [None])[0] == alias)
+
+
+def fetch_releases_batched(
+    keys: list[tuple[str, str, str]],
+    client: HostClient,
+    fields: Mapping[tuple[str, str, str], Collection[str]],
+    batch_size: int = BATCH_SIZE,
+    metrics: Mapping[tuple[str, str, str], DirectiveMetrics] | None = None,
+    deadline: Deadline | None = None,
+) -> dict[tuple[str, str, str], list | Exception]:
+    """Fetch all of the releases (with their ``fields``) for repositories on the client's host, in batches.
+
+    The first page of releases of each repository is fetched before any of the next pages, so repositories with
+    a single page of releases only take part in a single query. Returns the releases for each repository, or the
+    error fetching them (for all of those in a query that fails), rather than raising it.
+    """
+    from fastcore.xtras import dict2obj
+    # The cursor for the next page of releases of each repository still to fetch, in order
+    pending: dict[tuple[str, str, str], str | None] = dict.fromkeys(keys)
+    releases: dict[tuple[str, str, str], list | Exception] = {key: [] for key in keys}
+    while pending:
+        batch = list(pending)[:batch_size]
+        cursors = [pending.pop(key) for key in batch]
+        try:
+            if deadline is not None:
+                deadline.check(f'fetching the releases for {len(batch)} repositories')
+            start = time.perf_counter()
+            logger.debug(f'Fetching the releases for {len(batch)} repositories in a GraphQL query')
+            query = releases_query([(key[1], key[2], cursor, fields[key]) for key, cursor in zip(batch, cursors)])
+            result, received = graphql_request(client, query)
+            elapsed = time.perf_counter() - start
+        except Exception as e:
+            if isinstance(e, DeadlineExceeded):
+                # None of the rest can be fetched either
+                batch += list(pending)
+                pending.clear()
+            for key in batch:
+                releases[key] = e
+            continue
+        data = result.get('data', None) or {}
+        if not data:
+            error = BatchError(_errors(result) or 'No data in the response')
+            for key in batch:
+                releases[key] = error
+            continue
+        for i, (key, cursor) in enumerate(zip(batch, cursors)):
+            repository = data.get(f'r{i}', None)
+            if metrics is not None:
+                metrics[key].add('fetch' if cursor is None else 'pagination', elapsed)
+                metrics[key].requests += 1
+                metrics[key].bytes_received += received // len(batch)
+            if repository is None:
+                releases[key] = BatchError(_errors(result, f'r{i}') or f'{key[1]}/{key[2]} is not in the response')
+                continue
+            page = repository['releases']
+            releases[key] += [dict2obj(node) for node in page['nodes']]
+            if page['pageInfo']['hasNextPage']:
+                # Fetched after the first pages of the other repositories
+                pending[key] = page['pageInfo']['endCursor']
+    if metrics is not None:
+        for key, fetched in releases.items():
+            if not isinstance(fetched, Exception):
+                metrics[key].releases_seen = len(fetched)
+    return releases
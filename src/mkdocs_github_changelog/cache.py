@@ -0,0 +1,508 @@
+"""Cache the releases fetched from github between builds.
+
+Under ``mkdocs serve`` the plugin instance survives rebuilds (mkdocs >= 1.4 keeps it when the plugin
+defines ``on_startup``), so the releases for each repository only need to be fetched once. A
+[`ReleaseRefresher`][mkdocs_github_changelog.cache.ReleaseRefresher] thread then refetches each repository
+when its TTL expires, and reports back only the repositories whose releases actually changed.
+
+Releases can also be fetched in the background (see
+[`ReleaseCache.get_releases_nowait`][mkdocs_github_changelog.cache.ReleaseCache.get_releases_nowait]), so the
+first build does not have to wait for github.
+
+If the cache has a [`DiskCache`][mkdocs_github_changelog.disk_cache.DiskCache], the fetched releases are also
+stored on disk, and releases stored there (by earlier builds, concurrent builds in other processes, or the
+``prefetch`` command) are used instead of fetching them while they are younger than the TTL. A
+[`ReleaseStore`][mkdocs_github_changelog.release_store.ReleaseStore] can be used instead, which also selects
+the releases to render with indexed queries.
+
+If fetching a repository fails, the last releases fetched for it are used (even if they have expired), and if
+it is not found or forbidden, the failure is remembered for the ``error_ttl`` rather than requesting it again
+for each changelog (see [`failures`][mkdocs_github_changelog.failures]).
+
+Each repository's releases are stored with the fields they were fetched with (all of them if None). If a
+changelog needs fields they don't have, they are fetched again with both sets of fields, so changelogs using
+different fields from the same repository don't keep refetching it.
+"""
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+import copy
+import hashlib
+import json
+import threading
+import time
+from typing import Any, Callable, Collection, Iterable, Mapping, TYPE_CHECKING
+
+from mkdocs_github_changelog import logger
+from mkdocs_github_changelog.failures import cacheable_failure
+from mkdocs_github_changelog.hooks import CACHE_HIT, CACHE_MISS, HOOKS
+
+if TYPE_CHECKING:
+    from mkdocs_github_changelog.disk_cache import DiskCache
+    from mkdocs_github_changelog.release_store import ReleaseStore
+
+DEFAULT_HOST = 'https://api.github.com'
+DEFAULT_ERROR_TTL = 300
+
+
+class ReleasesNotReady(Exception):
+    """The releases are being fetched in the background and are not available yet."""
+
+
+def cache_key(organisation_or_user: str, repository: str, github_api_url: str | None = None) -> tuple[str, str, str]:
+    """Get the key a repository's releases are stored under."""
+    return ((github_api_url or DEFAULT_HOST).rstrip('/'), organisation_or_user, repository)
+
+
+def body_digest(body: Any) -> str:
+    """Get a digest of a release's body, as its JSON."""
+    return hashlib.sha256(json.dumps(body, default=str).encode('utf-8')).hexdigest()
+
+
+def releases_digest(releases: Iterable[Any]) -> str:
+    """Get a digest of the releases to tell whether they have changed.
+
+    The bodies are included by their digests, so releases loaded from a ``ReleaseStore`` (which stores the digest
+    of each body) don't need their bodies loaded to be compared to the releases fetched.
+    """
+    digested = []
+    for release in releases:
+        if isinstance(release, Mapping):
+            digest = getattr(release, 'body_digest', None)
+            if digest is None:
+                try:
+                    digest = body_digest(release['body'])
+                except KeyError:
+                    pass
+            if digest is not None:
+                release = {**release, 'body': digest}
+        digested.append(release)
+    content = json.dumps(digested, sort_keys=True, default=str)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def covers_fields(fields: Collection[str] | None, needed: Collection[str] | None) -> bool:
+    """Whether releases with the ``fields`` have all of the ``needed`` fields (None is all of them)."""
+    return fields is None or (needed is not None and set(needed).issubset(fields))
+
+
+def merge_fields(first: Collection[str] | None, second: Collection[str] | None) -> tuple[str, ...] | None:
+    """Get the fields in either set of fields (None is all of them)."""
+    if first is None or second is None:
+        return None
+    return tuple(dict.fromkeys([*first, *second]))
+
+
+def copy_releases(releases: Iterable[Any]) -> list:
+    """Copy the releases so processing them does not modify the cached versions.
+
+    Only top level attributes (``body``, ``published_at`` and ``processed``) are changed when
+    processing a release, so a shallow copy is enough.
+    """
+    return [copy.copy(release) for release in releases]
+
+
+class CacheEntry():
+    """The releases for a single repository."""
+
+    def __init__(self, releases: list, fetched_at: float | None = None, fields: Collection[str] | None = None):
+        """Initialise the entry, for releases with only the ``fields`` (all of them if None)."""
+        self.releases = releases
+        self.fetched_at = time.monotonic() if fetched_at is None else fetched_at
+        self.fields = None if fields is None else tuple(fields)
+        self.digest = releases_digest(releases)
+
+    def expired(self, ttl: float | None) -> bool:
+        """Whether the entry is older than the TTL (a TTL of None or 0 never expires)."""
+        if not ttl:
+            return False
+        return time.monotonic() - self.fetched_at >= ttl
+
+
+class ReleaseCache():
+    """Thread-safe in-memory store of releases, keyed by github host, organisation/user and repository."""
+
+    def __init__(
+        self,
+        ttl: float | None = None,
+        on_fetched: Callable[[list[tuple[str, str, str]]], None] | None = None,
+        max_workers: int = 4,
+        disk_cache: DiskCache | ReleaseStore | None = None,
+        error_ttl: float | None = DEFAULT_ERROR_TTL,
+    ):
+        """Initialise the cache.
+
+        ``on_fetched`` is called with the key of each repository fetched in the background once it is available.
+        Each github host has its own ``max_workers`` background workers, so a slow host doesn't hold up the others.
+        Repositories that are not found (or forbidden) are not requested again for ``error_ttl`` seconds (None or
+        0 always requests them again).
+        """
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        # The failures remembered for each repository, with when they happened
+        self._failures: dict[tuple[str, str, str], tuple[Exception, float]] = {}
+        self.disk_cache = disk_cache
+        self.on_fetched = on_fetched
+        self._max_workers = max_workers
+        self._entries: dict[tuple[str, str, str], CacheEntry] = {}
+        # The fetcher and the fields it fetches, for refreshing
+        self._fetchers: dict[tuple[str, str, str], tuple[Callable[[], list], tuple[str, ...] | None]] = {}
+        self._pending: set[tuple[str, str, str]] = set()
+        self._executors: dict[str, ThreadPoolExecutor] = {}
+        self._lock = threading.RLock()
+
+    def __contains__(self, key: tuple[str, str, str]) -> bool:
+        """Check if a repository has been fetched."""
+        with self._lock:
+            return key in self._entries
+
+    def keys(self) -> list[tuple[str, str, str]]:
+        """Get the keys of the fetched repositories."""
+        with self._lock:
+            return list(self._entries)
+
+    def clear(self) -> None:
+        """Remove all of the fetched releases (but not the disk cache)."""
+        with self._lock:
+            self._entries.clear()
+
+    def get(self, key: tuple[str, str, str]) -> CacheEntry | None:
+        """Get the entry for a repository, or None if it has not been fetched."""
+        with self._lock:
+            return self._entries.get(key, None)
+
+    def set(self, key: tuple[str, str, str], releases: list, fields: Collection[str] | None = None) -> bool:
+        """Store the releases (with only the ``fields``) for a repository, returning whether they have changed."""
+        return self._store(key, CacheEntry(releases, fields=fields))
+
+    def cached(self, key: tuple[str, str, str], fields: Collection[str] | None = None) -> bool:
+        """Whether a repository's releases (with the ``fields``) have been fetched, or are in the disk cache (and have not expired)."""
+        fields = None if fields is None else tuple(fields)
+        entry = self.get(key)
+        if entry is not None and covers_fields(entry.fields, fields):
+            return True
+        return self._load(key, fields, store=True) is not None
+
+    def fields_to_fetch(self, key: tuple[str, str, str], needed: Collection[str] | None) -> tuple[str, ...] | None:
+        """Get the fields to fetch a repository's releases with, to have the ``needed`` fields and those it has now."""
+        with self._lock:
+            entry = self._entries.get(key, None)
+        if entry is None:
+            return merge_fields(needed, ())
+        return merge_fields(entry.fields, needed)
+
+    def _store(self, key: tuple[str, str, str], entry: CacheEntry) -> bool:
+        with self._lock:
+            previous = self._entries.get(key, None)
+            self._entries[key] = entry
+        return previous is None or previous.digest != entry.digest
+
+    def update(self, key: tuple[str, str, str], updater: Callable[[list, tuple[str, ...] | None], list]) -> bool:
+        """Update the stored releases for a repository in place (e.g. from a webhook), returning whether they changed.
+
+        The ``updater`` is called with the releases and their fields. The releases are only updated if they have
+        been fetched, and keep the time they were fetched, so they are still refreshed when the TTL expires.
+        """
+        with self._lock:
+            entry = self._entries.get(key, None)
+            if entry is None:
+                return False
+            releases = updater(list(entry.releases), entry.fields)
+            updated = CacheEntry(releases, fetched_at=entry.fetched_at, fields=entry.fields)
+            changed = self._store(key, updated)
+        if changed and self.disk_cache is not None:
+            with self.disk_cache.lock(key):
+                fetched_at = time.time() - max(time.monotonic() - updated.fetched_at, 0)
+                self.disk_cache.save(key, releases, fetched_at=fetched_at, fields=updated.fields)
+        return changed
+
+    def seed(self, key: tuple[str, str, str], updater: Callable[[list, tuple[str, ...] | None], list]) -> bool:
+        """Update the last releases fetched for a repository (however old), and store them as if they had just been fetched.
+
+        The ``updater`` is called with the releases (from memory, or else the disk cache) and their fields, as for
+        ``update``. Returns whether there were any releases to update, as those that haven't been fetched are
+        fetched in full when they are needed.
+        """
+        entry = self.get(key)
+        if entry is None and self.disk_cache is not None:
+            try:
+                fields = self.disk_cache.stored_fields(key)
+            except KeyError:
+                return False
+            entry = self._load(key, fields, stale=True)
+        if entry is None:
+            return False
+        releases = updater(list(entry.releases), entry.fields)
+        self._store(key, CacheEntry(releases, fields=entry.fields))
+        if self.disk_cache is not None:
+            with self.disk_cache.lock(key):
+                self.disk_cache.save(key, releases, fields=entry.fields)
+        return True
+
+    def get_releases(
+        self,
+        key: tuple[str, str, str],
+        fetcher: Callable[[], list],
+        fields: Collection[str] | None = None,
+        refresher: Callable[[], list] | None = None,
+    ) -> list:
+        """Get a copy of the releases for a repository, using the fetcher if they have not been fetched yet.
+
+        The releases are fetched again if they don't have the ``fields`` (all of them if None), which the
+        fetcher should fetch. The ``refresher`` (or else the fetcher) is kept so the releases can be refreshed
+        later on, so it shouldn't depend on the current build (e.g. its deadline).
+        """
+        fields = None if fields is None else tuple(fields)
+        with self._lock:
+            self._fetchers[key] = (refresher or fetcher, fields)
+            entry = self._entries.get(key, None)
+        if entry is None or not covers_fields(entry.fields, fields):
+            entry = self._load(key, fields, store=True)
+        if entry is None:
+            logger.debug(f'Cache miss for {key}')
+            if HOOKS.active:
+                HOOKS.emit(CACHE_MISS, key=key)
+            self._raise_failure(key)
+            self._fetch(key, fetcher, fields)
+            entry = self._entries[key]
+        else:
+            logger.debug(f'Cache hit for {key}')
+            if HOOKS.active:
+                HOOKS.emit(CACHE_HIT, key=key)
+        return copy_releases(entry.releases)
+
+    def get_releases_nowait(
+        self,
+        key: tuple[str, str, str],
+        fetcher: Callable[[], list],
+        fields: Collection[str] | None = None,
+        refresher: Callable[[], list] | None = None,
+    ) -> list:
+        """Get a copy of the releases for a repository without waiting for them to be fetched.
+
+        If they have not been fetched yet (with the ``fields``), they are fetched in the background and
+        [`ReleasesNotReady`][mkdocs_github_changelog.cache.ReleasesNotReady] is raised. The ``refresher`` is kept
+        as for ``get_releases``.
+        """
+        fields = None if fields is None else tuple(fields)
+        with self._lock:
+            self._fetchers[key] = (refresher or fetcher, fields)
+            entry = self._entries.get(key, None)
+            if entry is None or not covers_fields(entry.fields, fields):
+                entry = self._load(key, fields, store=True)
+            if entry is None:
+                if HOOKS.active:
+                    HOOKS.emit(CACHE_MISS, key=key)
+                self._raise_failure(key)
+                self._fetch_in_background(key, fetcher, fields)
+                raise ReleasesNotReady(key)
+        logger.debug(f'Cache hit for {key}')
+        if HOOKS.active:
+            HOOKS.emit(CACHE_HIT, key=key)
+        return copy_releases(entry.releases)
+
+    def refetch(self, key: tuple[str, str, str], fetcher: Callable[[], list], fields: Collection[str] | None = None) -> list:
+        """Fetch the releases for a repository again (e.g. if those stored can't be used), getting a copy of them."""
+        fields = None if fields is None else tuple(fields)
+        self._fetch(key, fetcher, fields)
+        return copy_releases(self._entries[key].releases)
+
+    def select(self, key: tuple[str, str, str], releases: list, match: str | None = None, include_prereleases: bool | None = False) -> list | None:
+        """Select the releases to render with a query of the disk cache, if it supports them.
+
+        Returns None if it doesn't (or no longer has the ``releases``), see
+        [`ReleaseStore.select`][mkdocs_github_changelog.release_store.ReleaseStore.select].
+        """
+        select = getattr(self.disk_cache, 'select', None)
+        if select is None:
+            return None
+        return select(key, releases, match=match, include_prereleases=include_prereleases)
+
+    def last_releases(self, key: tuple[str, str, str], fields: Collection[str] | None = None) -> list | None:
+        """Get a copy of the last releases fetched for a repository (with the ``fields``), however old, or None if there aren't any."""
+        fields = None if fields is None else tuple(fields)
+        entry = self.get(key)
+        if entry is None or not covers_fields(entry.fields, fields):
+            entry = self._load(key, fields, stale=True)
+        if entry is None:
+            return None
+        return copy_releases(entry.releases)
+
+    def failure(self, key: tuple[str, str, str]) -> Exception | None:
+        """Get the failure remembered for a repository (if it is younger than the ``error_ttl``)."""
+        with self._lock:
+            error, failed_at = self._failures.get(key, (None, 0.0))
+        if error is None or not self.error_ttl or time.monotonic() - failed_at >= self.error_ttl:
+            return None
+        return error
+
+    def _raise_failure(self, key: tuple[str, str, str]) -> None:
+        """Raise the failure remembered for a repository, if there is one."""
+        error = self.failure(key)
+        if error is not None:
+            logger.debug(f'Not fetching {key} again, it failed with {error}')
+            raise error
+
+    def _load(
+        self,
+        key: tuple[str, str, str],
+        fields: tuple[str, ...] | None = None,
+        store: bool = False,
+        stale: bool = False,
+    ) -> CacheEntry | None:
+        """Load the releases for a repository from the disk cache, if they are there (with the ``fields``) and have not expired (unless ``stale``)."""
+        if self.disk_cache is None:
+            return None
+        loaded = self.disk_cache.load(key, max_age=None if stale else self.ttl, fields=fields)
+        if loaded is None:
+            return None
+        releases, fetched_at = loaded
+        logger.debug(f'Loaded {key} from the disk cache')
+        # Keep the age, so it expires (and is refreshed) at the same time as on disk
+        entry = CacheEntry(releases, fetched_at=time.monotonic() - max(time.time() - fetched_at, 0), fields=fields)
+        if store:
+            self._store(key, entry)
+        return entry
+
+    def _fetch(self, key: tuple[str, str, str], fetcher: Callable[[], list], fields: tuple[str, ...] | None = None) -> bool:
+        """Fetch and store the releases (with the ``fields``) for a repository, returning whether they have changed.
+
+        If the fetch fails, the last releases fetched are used instead if there are any (and the failure is
+        remembered if the repository is not found or forbidden), or else the error is raised.
+        """
+        try:
+            changed = self._fetch_and_store(key, fetcher, fields)
+        except Exception as e:
+            if self.error_ttl and cacheable_failure(e):
+                with self._lock:
+                    self._failures[key] = (e, time.monotonic())
+            if not self._use_stale(key, fields, e):
+                raise
+            return False
+        with self._lock:
+            self._failures.pop(key, None)
+        return changed
+
+    def _use_stale(self, key: tuple[str, str, str], fields: tuple[str, ...] | None, error: Exception) -> bool:
+        """Keep (or load from the disk cache) the last releases fetched for a repository, returning whether there are any."""
+        entry = self.get(key)
+        if entry is None or not covers_fields(entry.fields, fields):
+            entry = self._load(key, fields, store=True, stale=True)
+        if entry is None:
+            return False
+        logger.warning(
+            f'Unable to fetch the releases for {key[1]}/{key[2]} ({error}), '
+            f'using those fetched {time.monotonic() - entry.fetched_at:.0f}s ago'
+        )
+        return True
+
+    def _fetch_and_store(self, key: tuple[str, str, str], fetcher: Callable[[], list], fields: tuple[str, ...] | None = None) -> bool:
+        """Fetch and store the releases (with the ``fields``) for a repository, returning whether they have changed.
+
+        With a disk cache, the repository is locked while it is fetched, so other processes sharing the cache
+        wait for (and then use) the releases rather than fetching them too.
+        """
+        if self.disk_cache is None:
+            return self.set(key, fetcher(), fields)
+        with self.disk_cache.lock(key):
+            # Another process may have fetched them while this one was waiting for the lock
+            current = self.get(key)
+            loaded = self._load(key, fields)
+            if loaded is not None and (current is None or loaded.fetched_at > current.fetched_at + 1):
+                logger.debug(f'Using the releases for {key} fetched by another process')
+                return self._store(key, loaded)
+            releases = fetcher()
+            self.disk_cache.save(key, releases, fields=fields)
+            return self.set(key, releases, fields)
+
+    def _fetch_in_background(self, key: tuple[str, str, str], fetcher: Callable[[], list], fields: tuple[str, ...] | None = None) -> None:
+        """Submit a fetch to the background workers (unless one is already pending)."""
+        if key in self._pending:
+            return
+        logger.debug(f'Fetching {key} in the background')
+        self._pending.add(key)
+        executor = self._executors.get(key[0], None)
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix='mkdocs_github_changelog-fetch')
+            self._executors[key[0]] = executor
+        executor.submit(self._background_fetch, key, fetcher, fields)
+
+    def _background_fetch(self, key: tuple[str, str, str], fetcher: Callable[[], list], fields: tuple[str, ...] | None = None) -> None:
+        """Fetch the releases and report them as available."""
+        try:
+            self._fetch(key, fetcher, fields)
+        except Exception as e:
+            # Leave it missing so the next build tries again
+            logger.warning(f'Unable to fetch releases for {key}: {e}')
+            return
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+        if self.on_fetched is not None:
+            self.on_fetched([key])
+
+    def shutdown(self) -> None:
+        """Stop the background workers."""
+        with self._lock:
+            executors, self._executors = list(self._executors.values()), {}
+        for executor in executors:
+            executor.shutdown(wait=False)
+
+    def refresh(self, key: tuple[str, str, str]) -> bool:
+        """Refetch the releases for a repository, returning whether they have changed."""
+        with self._lock:
+            fetcher, fields = self._fetchers.get(key, (None, None))
+        if fetcher is None:
+            return False
+        return self._fetch(key, fetcher, fields)
+
+    def expired(self) -> list[tuple[str, str, str]]:
+        """Get the keys of the repositories whose TTL has expired."""
+        with self._lock:
+            return [key for key, entry in self._entries.items() if key in self._fetchers and entry.expired(self.ttl)]
+
+
+class ReleaseRefresher(threading.Thread):
+    """Background thread to refresh expired repositories in a [`ReleaseCache`][mkdocs_github_changelog.cache.ReleaseCache].
+
+    ``on_change`` is called with the keys of the repositories whose releases have changed.
+    """
+
+    def __init__(
+        self,
+        cache: ReleaseCache,
+        on_change: Callable[[list[tuple[str, str, str]]], None],
+        interval: float | None = None,
+    ):
+        """Initialise the thread."""
+        super().__init__(name='mkdocs_github_changelog-refresher', daemon=True)
+        self.cache = cache
+        self.on_change = on_change
+        if interval is None:
+            interval = min(cache.ttl or 60, 60)
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def refresh_expired(self) -> list[tuple[str, str, str]]:
+        """Refresh the expired repositories, returning the keys of those that changed."""
+        changed = []
+        for key in self.cache.expired():
+            try:
+                if self.cache.refresh(key):
+                    changed.append(key)
+            except Exception as e:
+                # Keep the existing releases and try again on the next pass
+                logger.warning(f'Unable to refresh releases for {key}: {e}')
+        if changed:
+            logger.info(f'Releases changed for {changed}')
+            self.on_change(changed)
+        return changed
+
+    def run(self) -> None:
+        """Refresh the cache until stopped."""
+        while not self._stop_event.wait(self.interval):
+            self.refresh_expired()
+
+    def stop(self) -> None:
+        """Stop the thread."""
+        self._stop_event.set()
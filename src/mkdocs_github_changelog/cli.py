@@ -0,0 +1,179 @@
+"""Command line interface for working with the changelogs outside of ``mkdocs build``.
+
+```
+mkdocs-github-changelog plan -f mkdocs.yml
+mkdocs-github-changelog prefetch -f mkdocs.yml
+mkdocs-github-changelog render abc/def abc/mkdocs-* -o changelogs
+```
+"""
+from __future__ import annotations
+
+import sys
+from typing import TextIO, TYPE_CHECKING
+
+import click
+from mkdocs.config import load_config
+from mkdocs.exceptions import PluginError
+
+from mkdocs_github_changelog.clients import HostClients
+from mkdocs_github_changelog.directives import find_directives
+from mkdocs_github_changelog.planner import plan_requests, UsageHistory
+from mkdocs_github_changelog.plugin import MkdocsGithubChangelogPlugin
+from mkdocs_github_changelog.prefetch import prefetch as prefetch_releases
+from mkdocs_github_changelog.renderer import ChangelogRenderer, MAX_WORKERS
+from mkdocs_github_changelog.repositories import RepositoryIndex
+
+if TYPE_CHECKING:
+    from mkdocs.config.defaults import MkDocsConfig
+
+config_file_option = click.option(
+    '-f', '--config-file',
+    type=click.Path(exists=True, dir_okay=False),
+    default='mkdocs.yml',
+    show_default=True,
+    help='The mkdocs configuration file.'
+)
+
+
+def load_plugin(config_file: str) -> tuple[MkDocsConfig, MkdocsGithubChangelogPlugin]:
+    """Load the mkdocs configuration and get the (configured) plugin from it."""
+    config = load_config(config_file=config_file)
+    for plugin in config.plugins.values():
+        if isinstance(plugin, MkdocsGithubChangelogPlugin):
+            return config, plugin
+    raise click.ClickException(f'mkdocs_github_changelog is not configured as a plugin in {config_file}')
+
+
+@click.group()
+def main() -> None:
+    """Work with the github release changelogs for an mkdocs site."""
+
+
+@main.command()
+@config_file_option
+@click.option('--check/--no-check', default=True, show_default=True, help='Check the estimate against the remaining quota from github.')
+def plan(config_file: str, check: bool) -> None:
+    """Estimate the github API requests a build will make, without making them.
+
+    The estimate uses the pages of releases seen for each repository in previous builds, and the repositories
+    of the wildcard changelogs are listed (unless they were within the `discovery_ttl`). The command exits with a
+    non-zero code if the estimate exceeds the remaining quota.
+    """
+    config, plugin = load_plugin(config_file)
+    directives = find_directives(config.docs_dir)
+    history = UsageHistory(plugin.cache_path(config, 'usage.json'))
+    try:
+        clients = HostClients(plugin.config.hosts, tokens=plugin.tokens())
+    except ValueError as e:
+        raise click.ClickException(f'Invalid mkdocs_github_changelog hosts configuration: {e}')
+    try:
+        # Wildcards are expanded as the build would, reusing (and saving) the repositories it lists
+        index = RepositoryIndex(plugin.cache_path(config, 'repositories.json'), ttl=plugin.config.discovery_ttl)
+        request_plan = plan_requests(directives, plugin.config, history, clients=clients, index=index)
+    finally:
+        clients.close()
+    if check:
+        request_plan.check_rate_limits()
+    click.echo(request_plan.summary())
+    if not request_plan.fits:
+        sys.exit(1)
+
+
+@main.command()
+@config_file_option
+@click.option('-j', '--workers', type=click.IntRange(min=1), default=4, show_default=True, help='Repositories to fetch concurrently.')
+@click.option(
+    '-b', '--batch-size', type=click.IntRange(min=0), default=None,
+    help="Repositories to fetch in each batched GraphQL query, 0 to fetch each with the REST API (defaults to the plugin's batch_size).",
+)
+def prefetch(config_file: str, workers: int, batch_size: int | None) -> None:
+    """Fetch the releases for every repository referenced in the docs into the cache.
+
+    The next build uses the cached releases until the `cache_ttl` expires. The command exits with a non-zero
+    code if any repository could not be fetched.
+    """
+    config, plugin = load_plugin(config_file)
+    try:
+        plugin.load_hooks()
+    except PluginError as e:
+        raise click.ClickException(str(e))
+    directives = find_directives(config.docs_dir)
+    try:
+        clients = HostClients(plugin.config.hosts, max_concurrency=workers, tokens=plugin.tokens())
+    except ValueError as e:
+        raise click.ClickException(f'Invalid mkdocs_github_changelog hosts configuration: {e}')
+    try:
+        results = prefetch_releases(
+            directives, plugin.config, plugin.get_disk_cache(config), max_workers=workers, clients=clients,
+            batch_size=plugin.config.batch_size if batch_size is None else batch_size,
+            index=RepositoryIndex(plugin.cache_path(config, 'repositories.json'), ttl=plugin.config.discovery_ttl),
+        )
+    finally:
+        clients.close()
+    history = UsageHistory(plugin.cache_path(config, 'usage.json'))
+    for result in results:
+        if result.ok:
+            history.record(result.key, result.pages)
+        click.echo(str(result))
+    history.save()
+    failed = [result for result in results if not result.ok]
+    click.echo(f'Fetched {len(results) - len(failed)} of {len(results)} repositories into {plugin.cache_path(config)}')
+    if failed:
+        sys.exit(1)
+
+
+@main.command()
+@click.argument('repositories', nargs=-1, required=True)
+@click.option('-o', '--output-dir', type=click.Path(file_okay=False), default=None, help='Write each changelog to <output-dir>/<org>/<repo>.md, rather than to stdout.')
+@click.option('-t', '--release-template', type=click.File(), default=None, help='A file with the jinja2 template for each release.')
+@click.option('-m', '--match', default=None, help='Only render the releases whose names match this regex.')
+@click.option('--include-prereleases/--no-include-prereleases', default=False, show_default=True, help='Render the prereleases.')
+@click.option('--autoprocess/--no-autoprocess', default=True, show_default=True, help='Turn the issue and user references in the bodies into links.')
+@click.option('--body-html/--no-body-html', default=False, show_default=True, help="Insert github's rendered html for the bodies.")
+@click.option('--github-api-url', default=None, help='The github API url (defaults to https://api.github.com).')
+@click.option('--token', 'tokens', multiple=True, envvar='GITHUB_TOKEN', help='A github token (can be repeated, defaults to $GITHUB_TOKEN).')
+@click.option('--cache-dir', type=click.Path(file_okay=False), default=None, help='Store the releases in this directory, reusing them until the cache ttl expires.')
+@click.option('--cache-ttl', type=click.IntRange(min=0), default=600, show_default=True, help='Seconds to reuse the stored releases for.')
+@click.option('--feed/--no-feed', default=False, show_default=True, help="Fetch the latest releases from the repositories' Atom feeds where possible, rather than the API.")
+@click.option('-j', '--workers', type=click.IntRange(min=1), default=MAX_WORKERS, show_default=True, help='Repositories to render concurrently.')
+def render(
+    repositories: tuple[str, ...],
+    output_dir: str | None,
+    release_template: TextIO | None,
+    match: str | None,
+    include_prereleases: bool,
+    autoprocess: bool,
+    body_html: bool,
+    github_api_url: str | None,
+    tokens: tuple[str, ...],
+    cache_dir: str | None,
+    cache_ttl: int,
+    feed: bool,
+    workers: int,
+) -> None:
+    """Render the changelogs of repositories (<org>/<repo>, or wildcards like <org>/mkdocs-*) without mkdocs.
+
+    The changelogs are written one after another to stdout (each under a heading if there are several), or to
+    files in the output directory. The command exits with a non-zero code if any changelog could not be rendered.
+    """
+    template = release_template.read() if release_template is not None else None
+    try:
+        renderer = ChangelogRenderer(
+            tokens=tokens, github_api_url=github_api_url, cache_dir=cache_dir, cache_ttl=cache_ttl, release_feed=feed, max_workers=workers,
+            match=match, include_prereleases=include_prereleases, autoprocess=autoprocess, body_html=body_html,
+        )
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    with renderer:
+        try:
+            selected = renderer.repositories(repositories)
+        except Exception as e:
+            raise click.ClickException(f'Unable to list the repositories: {e}')
+        headings = output_dir is None and len(selected) > 1
+        # The releases (and the headings in their bodies) go under each repository's heading
+        results = renderer.render_many(selected, release_template=template, heading_offset=1 if headings else 0)
+        renderer.write(results, output_dir, headings=headings)
+    for result in results:
+        click.echo(str(result), err=True)
+    if not all(result.ok for result in results):
+        sys.exit(1)
@@ -0,0 +1,300 @@
+"""Github API clients for each host, created once and reused for every repository fetched from it.
+
+Changelogs can come from several hosts (github.com and GitHub Enterprise servers, set through
+``github_api_url``), which can have very different latencies and rate limits. Each host gets a
+[`HostClient`][mkdocs_github_changelog.clients.HostClient] with its own:
+
+* tokens (used unless a changelog sets its own), in a [`TokenPool`][mkdocs_github_changelog.clients.TokenPool],
+* connection pool, shared by all of its requests so connections are kept alive between them,
+* maximum number of concurrent fetches, so a slow host only holds up its own fetches.
+
+These are configured with the plugin's ``hosts`` option, keyed by the API url:
+
+```yaml
+hosts:
+  https://github.example.com/api/v3:
+    tokens:
+      - !ENV GHE_TOKEN
+      - !ENV GHE_TOKEN_2
+    max_concurrency: 2
+    max_connections: 4
+    timeout: 30
+```
+
+Building a ``GhApi`` is slow (it generates every endpoint from github's OpenAPI description), so each thread
+builds one per host the first time it is used and then reuses it. The connection pool is only available with
+ghapi 2.x, where the requests are made with ``httpx2``.
+
+With more than one token, each request uses the token with the most quota remaining (from the rate limit
+headers of its last response), and if a token's quota is exhausted, the request is retried with the next one
+until its quota resets.
+"""
+from __future__ import annotations
+
+from contextlib import contextmanager
+import importlib.util
+import os
+import threading
+import time
+from typing import Any, Iterable, Iterator, Mapping, TYPE_CHECKING
+
+from mkdocs_github_changelog import get_releases, logger
+from mkdocs_github_changelog.cache import DEFAULT_HOST
+
+if TYPE_CHECKING:
+    from ghapi.all import GhApi
+
+DEFAULT_MAX_CONCURRENCY = 4
+DEFAULT_TIMEOUT = 60.0
+HOST_OPTIONS = ('token', 'tokens', 'max_concurrency', 'max_connections', 'timeout')
+
+
+def accept_encoding() -> str:
+    """Get the content encodings to accept, brotli as well as gzip if it can be decoded."""
+    encodings = ['gzip', 'deflate']
+    if importlib.util.find_spec('brotli') is not None or importlib.util.find_spec('brotlicffi') is not None:
+        encodings.append('br')
+    return ', '.join(encodings)
+
+
+class TokenPool():
+    """Tokens for a host, tracking the remaining quota of each to choose which one a request uses."""
+
+    def __init__(self, tokens: Iterable[str | None] = ()):
+        """Initialise the pool (empty or duplicate tokens are ignored)."""
+        self.tokens = list(dict.fromkeys(token for token in tokens if token))
+        # Unknown until a response for the token has been seen
+        self._remaining: dict[str, int | None] = dict.fromkeys(self.tokens, None)
+        self._reset: dict[str, float] = dict.fromkeys(self.tokens, 0.0)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Get the number of tokens."""
+        return len(self.tokens)
+
+    def _available(self, token: str, now: float) -> bool:
+        return self._remaining[token] != 0 or self._reset[token] <= now
+
+    def choose(self) -> str | None:
+        """Get the token with the most remaining quota (or None if the pool is empty).
+
+        Tokens that have not been used yet are chosen first. If every token is exhausted, the one that
+        resets first is returned.
+        """
+        if not self.tokens:
+            return None
+        now = time.time()
+        with self._lock:
+            available = [token for token in self.tokens if self._available(token, now)]
+            if not available:
+                return min(self.tokens, key=lambda token: self._reset[token])
+            return max(available, key=lambda token: float('inf') if self._remaining[token] is None else self._remaining[token])
+
+    def available(self) -> bool:
+        """Whether any of the tokens have quota remaining."""
+        now = time.time()
+        with self._lock:
+            return any(self._available(token, now) for token in self.tokens)
+
+    def update(self, token: str | None, headers: Mapping[str, Any] | None) -> None:
+        """Update the remaining quota of a token from the rate limit headers of a response."""
+        if token not in self._remaining or not headers:
+            return
+        try:
+            remaining = int(headers.get('X-RateLimit-Remaining'))
+        except (TypeError, ValueError):
+            return
+        try:
+            reset = float(headers.get('X-RateLimit-Reset'))
+        except (TypeError, ValueError):
+            reset = 0.0
+        with self._lock:
+            self._remaining[token] = remaining
+            self._reset[token] = reset
+
+    def exhausted(self, token: str | None, reset: float) -> None:
+        """Record that a token's quota is exhausted until the (epoch) ``reset`` time."""
+        if token not in self._remaining:
+            return
+        logger.info(f'Github API quota exhausted for a token until {time.strftime("%H:%M:%S", time.localtime(reset))}')
+        with self._lock:
+            self._remaining[token] = 0
+            self._reset[token] = reset
+
+
+class HostClient():
+    """The github API client for a host."""
+
+    def __init__(
+        self,
+        github_api_url: str | None = None,
+        token: str | None = None,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        max_connections: int | None = None,
+        timeout: float = DEFAULT_TIMEOUT,
+        tokens: Iterable[str | None] = (),
+        semaphore: threading.BoundedSemaphore | None = None,
+    ):
+        """Initialise the client.
+
+        Requests use the ``token`` if it is set, or else are spread over the ``tokens``. ``max_connections``
+        defaults to ``max_concurrency``. The concurrent fetches are limited by the ``semaphore`` if it is
+        provided (e.g. shared by the clients for the host's other tokens), or else one for ``max_concurrency``.
+        """
+        self.github_api_url = github_api_url.rstrip('/') if github_api_url else None
+        self.tokens = TokenPool([token] if token else tokens)
+        self.token = self.tokens.tokens[0] if self.tokens else None
+        self.max_concurrency = max_concurrency
+        self.max_connections = max_connections or max_concurrency
+        self.timeout = timeout
+        self._semaphore = semaphore or threading.BoundedSemaphore(max_concurrency)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._http_client: Any = None
+
+    @property
+    def host(self) -> str:
+        """The API url of the host."""
+        return self.github_api_url or DEFAULT_HOST
+
+    def api(self) -> GhApi:
+        """Get the ``GhApi`` for the current thread, using the host's connection pool."""
+        api = getattr(self._local, 'api', None)
+        if api is None:
+            api = get_releases._make_api(self.token, self.github_api_url)
+            transport = getattr(api, 'transport', None)
+            if transport is not None and hasattr(transport, 'client'):
+                transport.client = self.http_client()
+            self._local.api = api
+        return api
+
+    @property
+    def streaming(self) -> bool:
+        """Whether the responses can be streamed (with ``httpx2``, which ghapi 2.x uses)."""
+        return importlib.util.find_spec('httpx2') is not None
+
+    def headers(self, token: str | None = None) -> dict[str, str]:
+        """Get the headers for a request made without ghapi, using a token (or the environment's, as ghapi does)."""
+        headers = {'Accept': 'application/vnd.github.v3+json', 'Accept-Encoding': accept_encoding()}
+        if token:
+            headers['Authorization'] = f'token {token}'
+        elif os.getenv('GITHUB_JWT_TOKEN', None):
+            headers['Authorization'] = f'Bearer {os.environ["GITHUB_JWT_TOKEN"]}'
+        elif os.getenv('GITHUB_TOKEN', None):
+            headers['Authorization'] = f'token {os.environ["GITHUB_TOKEN"]}'
+        return headers
+
+    def authorize(self, api: GhApi, token: str | None) -> None:
+        """Use a token (from the ``tokens``) for the next requests made with a ``GhApi`` from ``api()``."""
+        if token is not None:
+            # The headers are shared with (ghapi 2.x) or read by (ghapi 1.x) the transport for each request
+            api.headers['Authorization'] = f'token {token}'
+
+    def http_client(self) -> Any:
+        """Get the ``httpx2.Client`` holding the connection pool for the host."""
+        with self._lock:
+            if self._http_client is None:
+                import httpx2
+                self._http_client = httpx2.Client(
+                    headers={'Accept-Encoding': accept_encoding()},
+                    timeout=self.timeout,
+                    follow_redirects=True,
+                    limits=httpx2.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+                )
+            return self._http_client
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """Wait for one of the host's concurrent fetches to be available, and hold it."""
+        with self._semaphore:
+            yield
+
+    def close(self) -> None:
+        """Close the connection pool."""
+        with self._lock:
+            http_client, self._http_client = self._http_client, None
+        if http_client is not None:
+            http_client.close()
+
+
+class HostClients():
+    """The clients for each host (and token), created when first used.
+
+    The clients for a host share its ``max_concurrency``, whichever tokens they use.
+    """
+
+    def __init__(
+        self,
+        hosts: Mapping[str, Mapping[str, Any]] | None = None,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        tokens: Iterable[str | None] = (),
+        timeout: float = DEFAULT_TIMEOUT,
+    ):
+        """Initialise the clients from the configuration for each host (keyed by API url).
+
+        The ``tokens`` (and ``timeout``) are used for hosts without any tokens (or timeout) configured. Raises a
+        ``ValueError`` if a host's configuration is invalid.
+        """
+        self.hosts = dict(hosts or {})
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.tokens = [token for token in tokens if token]
+        self._hosts: dict[str, dict[str, Any]] = {}
+        for url, options in (hosts or {}).items():
+            options = dict(options or {})
+            unknown = set(options).difference(HOST_OPTIONS)
+            if unknown:
+                raise ValueError(f'Unknown options for host {url}: {", ".join(sorted(unknown))} (expected {", ".join(HOST_OPTIONS)})')
+            for name in ('max_concurrency', 'max_connections'):
+                if options.get(name, None) is not None and (not isinstance(options[name], int) or options[name] < 1):
+                    raise ValueError(f'{name} for host {url} must be a positive integer')
+            if not isinstance(options.get('tokens', None) or [], list):
+                raise ValueError(f'tokens for host {url} must be a list')
+            self._hosts[url.rstrip('/')] = options
+        self._clients: dict[tuple[str, tuple[str, ...]], HostClient] = {}
+        self._semaphores: dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    def options(self, github_api_url: str | None = None) -> dict[str, Any]:
+        """Get the configuration for a host."""
+        return self._hosts.get((github_api_url or DEFAULT_HOST).rstrip('/'), {})
+
+    def host_tokens(self, github_api_url: str | None = None) -> list[str]:
+        """Get the tokens configured for a host (``token`` then ``tokens``), or else the default ``tokens``."""
+        options = self.options(github_api_url)
+        tokens = [token for token in [options.get('token', None), *(options.get('tokens', None) or [])] if token]
+        return list(dict.fromkeys(tokens or self.tokens))
+
+    def token(self, github_api_url: str | None = None) -> str | None:
+        """Get the (first) token for a host, if there is one."""
+        tokens = self.host_tokens(github_api_url)
+        return tokens[0] if tokens else None
+
+    def get(self, github_api_url: str | None = None, token: str | None = None) -> HostClient:
+        """Get the client for a host, using a token (or else the host's tokens)."""
+        tokens = (token,) if token else tuple(self.host_tokens(github_api_url))
+        host = (github_api_url or DEFAULT_HOST).rstrip('/')
+        with self._lock:
+            client = self._clients.get((host, tokens), None)
+            if client is None:
+                options = self.options(github_api_url)
+                max_concurrency = options.get('max_concurrency', None) or self.max_concurrency
+                semaphore = self._semaphores.setdefault(host, threading.BoundedSemaphore(max_concurrency))
+                logger.debug(f'Creating the client for {host}')
+                client = HostClient(
+                    github_api_url,
+                    tokens=tokens,
+                    max_concurrency=max_concurrency,
+                    max_connections=options.get('max_connections', None),
+                    timeout=options.get('timeout', None) or self.timeout,
+                    semaphore=semaphore,
+                )
+                self._clients[(host, tokens)] = client
+            return client
+
+    def close(self) -> None:
+        """Close the connection pools."""
+        with self._lock:
+            clients, self._clients = list(self._clients.values()), {}
+        for client in clients:
+            client.close()
@@ -0,0 +1,82 @@
+"""Find the changelog directives in the docs without building them.
+
+This uses the same [`regex`][mkdocs_github_changelog.extension.GithubReleaseChangelogProcessor.regex] as the
+markdown extension, and loads the indented YAML configuration following each directive, so the repositories
+referenced by the docs can be planned for or fetched ahead of a build.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+import textwrap
+from typing import Any, Mapping
+
+from mkdocs.utils.yaml import get_yaml_loader, yaml_load
+
+from mkdocs_github_changelog.cache import cache_key
+from mkdocs_github_changelog.extension import GithubReleaseChangelogProcessor
+
+DEFAULTS = {
+    'token': None,
+    'github_api_url': None,
+    'release_template': None,
+    'match': None,
+    'autoprocess': True,
+    'include_prereleases': False,
+    'body_html': False,
+}
+
+
+class Directive():
+    """A ``::github-release-changelog`` directive and its configuration."""
+
+    def __init__(self, org: str, repo: str, options: Mapping[str, Any] | None = None, page: str | None = None):
+        """Initialise the directive."""
+        self.org = org
+        self.repo = repo
+        self.options = dict(options or {})
+        self.page = page
+
+    def __repr__(self) -> str:
+        """Represent the directive."""
+        return f'{type(self).__name__}({self.org!r}, {self.repo!r}, page={self.page!r})'
+
+    def option(self, name: str, plugin_config: Mapping[str, Any] | None = None) -> Any:
+        """Get an option, falling back to the plugin configuration, and then the default."""
+        if name in self.options:
+            return self.options[name]
+        if plugin_config is not None and plugin_config.get(name, None) is not None:
+            return plugin_config[name]
+        return DEFAULTS.get(name, None)
+
+    def key(self, plugin_config: Mapping[str, Any] | None = None) -> tuple[str, str, str]:
+        """Get the cache key for the repository."""
+        return cache_key(self.org, self.repo, self.option('github_api_url', plugin_config))
+
+
+def parse_directives(markdown: str, page: str | None = None) -> list[Directive]:
+    """Get the directives in a markdown string."""
+    directives = []
+    lines = markdown.splitlines()
+    for index, line in enumerate(lines):
+        match = GithubReleaseChangelogProcessor.regex.match(line)
+        if match is None:
+            continue
+        block = []
+        for following in lines[index+1:]:
+            if not following.strip() or not following.startswith(('    ', '\t')):
+                break
+            block.append(following)
+        options = yaml_load(textwrap.dedent('\n'.join(block)), loader=get_yaml_loader()) if block else {}
+        directives.append(Directive(match['org'], match['repo'], options or {}, page=page))
+    return directives
+
+
+def find_directives(docs_dir: str | Path) -> list[Directive]:
+    """Get the directives in all of the markdown files in the docs directory."""
+    docs_dir = Path(docs_dir)
+    directives = []
+    for path in sorted(docs_dir.rglob('*.md')):
+        markdown = path.read_text(encoding='utf-8-sig')
+        if '::github-release-changelog' in markdown:
+            directives += parse_directives(markdown, page=path.relative_to(docs_dir).as_posix())
+    return directives
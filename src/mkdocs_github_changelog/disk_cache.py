@@ -0,0 +1,378 @@
+"""Store the releases fetched from github on disk, so they can be reused by later builds.
+
+Each repository's releases are stored as a compressed file under ``{cache_dir}/releases/{host}/{org}/``, with
+zstd (``{repo}.json.zst``) if ``zstandard`` is installed, or else gzip (``{repo}.json.gz``). The first line is
+a JSON header with the time they were fetched (and the fields kept), followed by the JSON array of releases, so
+expired releases are found without decompressing them, and the releases are decompressed and decoded in chunks
+rather than all at once. They are written after each fetch (by a build, or by the ``prefetch``
+command), and read by a [`ReleaseCache`][mkdocs_github_changelog.cache.ReleaseCache] instead of fetching them
+again if they are younger than its TTL.
+
+The cache can be shared by builds running concurrently in separate processes (e.g. building several versions
+of the docs on the same CI runner):
+
+* Files are written atomically (to a temporary file that is then renamed), so a reader never sees a partial file.
+* Each repository has a lock file (a [`FileLock`][mkdocs_github_changelog.disk_cache.FileLock]), held while it is
+  fetched, so only one process fetches it while the others wait and then read the result.
+* If a ``max_size`` is set, the least recently used repositories are evicted once the cache is larger than it.
+"""
+from __future__ import annotations
+
+from contextlib import contextmanager
+from functools import partial
+import gzip
+import importlib.util
+import itertools
+import json
+import os
+from pathlib import Path
+import re
+import tempfile
+import time
+from typing import Any, BinaryIO, Iterable, Iterator
+
+from mkdocs_github_changelog import logger
+from mkdocs_github_changelog.streaming import iter_json_array
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    # Windows
+    fcntl = None  # type: ignore[assignment]
+    import msvcrt
+
+DEFAULT_LOCK_TIMEOUT = 300
+CHUNK_SIZE = 65536
+# The file suffix for each compression
+SUFFIXES = {'zstd': '.json.zst', 'gzip': '.json.gz', 'none': '.json'}
+
+
+def _slug(host: str) -> str:
+    """Get a directory name for a github host url."""
+    return re.sub(r'[^\w.-]+', '_', re.sub(r'^\w+://', '', host)).strip('_')
+
+
+def default_compression() -> str:
+    """Get the compression to use, zstd if ``zstandard`` is installed, or else gzip."""
+    return 'zstd' if importlib.util.find_spec('zstandard') is not None else 'gzip'
+
+
+@contextmanager
+def atomic_open(path: str | Path) -> Iterator[BinaryIO]:
+    """Open a (binary) file to write atomically, so it is either the old or new version for any concurrent readers."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            yield f
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_write_text(path: str | Path, text: str) -> None:
+    """Write a text file atomically, so it is either the old or new version for any concurrent readers."""
+    with atomic_open(path) as f:
+        f.write(text.encode('utf-8'))
+
+
+@contextmanager
+def _compressor(f: BinaryIO, compression: str) -> Iterator[BinaryIO]:
+    """Compress what is written to a file."""
+    if compression == 'zstd':
+        import zstandard
+        with zstandard.ZstdCompressor(level=3).stream_writer(f, closefd=False) as writer:
+            yield writer
+    elif compression == 'gzip':
+        # No modification time, so the same releases are always stored the same
+        with gzip.GzipFile(fileobj=f, mode='wb', compresslevel=6, mtime=0) as writer:
+            yield writer
+    else:
+        yield f
+
+
+def _decompressed(f: BinaryIO, compression: str) -> Iterator[bytes]:
+    """Get the decompressed contents of a file in chunks."""
+    if compression == 'zstd':
+        import zstandard
+        reader: Any = zstandard.ZstdDecompressor().stream_reader(f)
+    elif compression == 'gzip':
+        reader = gzip.GzipFile(fileobj=f, mode='rb')
+    else:
+        reader = f
+    yield from iter(partial(reader.read, CHUNK_SIZE), b'')
+
+
+def _encode(header: dict[str, Any], releases: Iterable[Any]) -> Iterator[bytes]:
+    """Encode the header line and the array of releases, a release at a time."""
+    from fastcore.xtras import obj2dict
+    yield json.dumps(header).encode('utf-8') + b'\n['
+    for index, release in enumerate(releases):
+        yield (b',' if index else b'') + json.dumps(obj2dict(release), default=str).encode('utf-8')
+    yield b']'
+
+
+def _split_header(chunks: Iterator[bytes]) -> tuple[dict[str, Any], bytes]:
+    """Decode the header line, returning it and the rest of the chunk it ended in."""
+    head = b''
+    for chunk in chunks:
+        head += chunk
+        if b'\n' in head:
+            line, rest = head.split(b'\n', 1)
+            return json.loads(line), rest
+    raise ValueError('No header line')
+
+
+class FileLock():
+    """An exclusive lock on a file, which is shared between processes (and threads in the same process)."""
+
+    def __init__(self, path: str | Path, timeout: float | None = DEFAULT_LOCK_TIMEOUT, poll_interval: float = 0.05):
+        """Initialise the lock.
+
+        ``acquire`` raises a ``TimeoutError`` if the lock isn't acquired in ``timeout`` seconds (None waits forever).
+        """
+        self.path = Path(path)
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self._fd: int | None = None
+
+    @property
+    def locked(self) -> bool:
+        """Whether the lock is held by this instance."""
+        return self._fd is not None
+
+    def acquire(self, blocking: bool = True) -> bool:
+        """Acquire the lock, returning whether it was acquired (if not ``blocking``)."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        start = time.monotonic()
+        while True:
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                else:  # pragma: no cover
+                    msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            except OSError:
+                if blocking and (self.timeout is None or time.monotonic() - start < self.timeout):
+                    time.sleep(self.poll_interval)
+                    continue
+                os.close(fd)
+                if blocking:
+                    raise TimeoutError(f'Timed out waiting for {self.path}')
+                return False
+            self._fd = fd
+            return True
+
+    def release(self) -> None:
+        """Release the lock."""
+        fd, self._fd = self._fd, None
+        if fd is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            else:  # pragma: no cover
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(fd)
+
+    def __enter__(self) -> FileLock:
+        """Acquire the lock."""
+        self.acquire()
+        return self
+
+    def __exit__(self, *args) -> None:  # noqa: U100
+        """Release the lock."""
+        self.release()
+
+
+class DiskCache():
+    """Releases stored as compressed JSON files under a directory, one for each repository."""
+
+    def __init__(
+        self,
+        directory: str | Path,
+        max_size: int | None = None,
+        lock_timeout: float | None = DEFAULT_LOCK_TIMEOUT,
+        compression: str | None = None,
+    ):
+        """Initialise the cache.
+
+        ``max_size`` is the size (in bytes) the stored releases are kept under, by evicting the least
+        recently used (None or 0 is unlimited). ``compression`` is one of ``zstd``, ``gzip`` or ``none``
+        (the default is from [`default_compression`][mkdocs_github_changelog.disk_cache.default_compression]).
+        """
+        if compression is None:
+            compression = default_compression()
+        if compression not in SUFFIXES:
+            raise ValueError(f'Unknown compression {compression!r}, expected one of {", ".join(SUFFIXES)}')
+        self.directory = Path(directory)
+        self.max_size = max_size
+        self.lock_timeout = lock_timeout
+        self.compression = compression
+        # The sizes of the releases saved, before and after compression
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+
+    @property
+    def bytes_saved(self) -> int:
+        """The bytes saved by compressing the releases saved."""
+        return self.raw_bytes - self.stored_bytes
+
+    def path(self, key: tuple[str, str, str]) -> Path:
+        """Get the path the releases for a repository are stored at."""
+        host, org, repo = key
+        return self.directory/'releases'/_slug(host)/org/f'{repo}{SUFFIXES[self.compression]}'
+
+    def stored_fields(self, key: tuple[str, str, str]) -> tuple[str, ...] | None:
+        """Get the fields the releases for a repository were stored with (None is all of them), raising a ``KeyError`` if they can't be read."""
+        try:
+            with self.path(key).open('rb') as f:
+                header, _ = _split_header(_decompressed(f, self.compression))
+        except Exception as e:
+            raise KeyError(key) from e
+        fields = header.get('fields', None)
+        return None if fields is None else tuple(fields)
+
+    @contextmanager
+    def lock(self, key: tuple[str, str, str]) -> Iterator[None]:
+        """Hold the lock for a repository (e.g. while fetching it).
+
+        If the lock can't be acquired before the ``lock_timeout``, this continues without it.
+        """
+        lock = FileLock(self.path(key).with_suffix('.lock'), timeout=self.lock_timeout)
+        try:
+            lock.acquire()
+        except TimeoutError:
+            logger.warning(f'Timed out waiting for another process to fetch {key}, continuing without the lock')
+        except OSError as e:
+            logger.warning(f'Unable to lock {lock.path}: {e}')
+        try:
+            yield
+        finally:
+            lock.release()
+
+    def load(
+        self,
+        key: tuple[str, str, str],
+        max_age: float | None = None,
+        fields: Iterable[str] | None = None,
+    ) -> tuple[list, float] | None:
+        """Get the releases for a repository and the (epoch) time they were fetched.
+
+        Returns None if they have not been stored, can't be read, are older than ``max_age`` seconds (a
+        ``max_age`` of None or 0 never expires), or were stored without some of the ``fields`` (None is all
+        of the fields).
+        """
+        path = self.path(key)
+        try:
+            with path.open('rb') as f:
+                chunks = _decompressed(f, self.compression)
+                header, rest = _split_header(chunks)
+                fetched_at = header['fetched_at']
+                stored_fields = header.get('fields', None)
+                if stored_fields is not None and (fields is None or not set(fields).issubset(stored_fields)):
+                    logger.debug(f'Cached releases for {key} do not have all of the fields needed')
+                    return None
+                if max_age and time.time() - fetched_at >= max_age:
+                    logger.debug(f'Cached releases for {key} have expired')
+                    return None
+                # Imported here, as it is slow to import and not needed unless there are releases
+                from fastcore.xtras import dict2obj
+                releases = [dict2obj(release) for release in iter_json_array(itertools.chain([rest], chunks))]
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            # Any error reading, decompressing or decoding the file means it can't be used
+            logger.warning(f'Unable to load the cached releases from {path}: {e}')
+            return None
+        try:
+            # The modification time records the last use, for evicting the least recently used
+            os.utime(path)
+        except OSError:
+            pass
+        return releases, fetched_at
+
+    def save(
+        self,
+        key: tuple[str, str, str],
+        releases: list,
+        fetched_at: float | None = None,
+        fields: Iterable[str] | None = None,
+    ) -> None:
+        """Store the releases for a repository, which only have the ``fields`` (if they are provided)."""
+        path = self.path(key)
+        header = {
+            'fetched_at': time.time() if fetched_at is None else fetched_at,
+            'fields': None if fields is None else list(fields),
+        }
+        raw_bytes = 0
+        try:
+            with atomic_open(path) as f, _compressor(f, self.compression) as writer:
+                for data in _encode(header, releases):
+                    writer.write(data)
+                    raw_bytes += len(data)
+            stored_bytes = path.stat().st_size
+        except OSError as e:
+            logger.warning(f'Unable to cache the releases at {path}: {e}')
+            return
+        self.raw_bytes += raw_bytes
+        self.stored_bytes += stored_bytes
+        logger.debug(f'Stored the releases for {key} in {stored_bytes/1024:.1f} kB ({raw_bytes/1024:.1f} kB uncompressed)')
+        if self.max_size:
+            self.evict(keep=path)
+
+    def size(self) -> int:
+        """Get the total size of the stored releases, in bytes."""
+        return sum(size for _, size, _ in self._files())
+
+    def _files(self) -> list[tuple[Path, int, float]]:
+        """Get the path, size and last use of the stored releases."""
+        files = []
+        for path in (self.directory/'releases').rglob('*.json*'):
+            if not path.name.endswith(tuple(SUFFIXES.values())):
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((path, stat.st_size, stat.st_mtime))
+        return files
+
+    def evict(self, keep: Path | None = None) -> list[Path]:
+        """Remove the least recently used releases until the cache is under the ``max_size``.
+
+        Releases that are locked (being fetched by another process) and the ``keep`` path are not removed.
+        """
+        if not self.max_size:
+            return []
+        files = sorted(self._files(), key=lambda file: file[2])
+        total = sum(size for _, size, _ in files)
+        evicted = []
+        for path, size, _ in files:
+            if total <= self.max_size:
+                break
+            if path == keep:
+                continue
+            lock = FileLock(path.with_suffix('.lock'))
+            try:
+                if not lock.acquire(blocking=False):
+                    continue
+            except OSError:
+                continue
+            try:
+                path.unlink()
+            except OSError as e:
+                logger.warning(f'Unable to evict {path}: {e}')
+                continue
+            finally:
+                lock.release()
+            total -= size
+            evicted.append(path)
+            logger.debug(f'Evicted {path} from the cache')
+        return evicted
@@ -19,13 +19,49 @@ The specifics can be configured with YAML configuration in the block, and includ
     # Set the github API url for e.g. self-hosted enterprise - optional (and not tested on those)
     github_api_url: https://api.github.com
 
+    # Don't look up the issue titles for this changelog, if the plugin's issue_titles is set - optional
+    issue_titles: false
+
+    # Insert the release bodies as github rendered them, rather than autoprocessing them and parsing them as markdown - optional
+    body_html: true
+
+    # Fetch the releases from the API rather than the releases feed, if the plugin's release_feed is set - optional
+    release_feed: false
+
+```
+
+The repository can also be an ``fnmatch`` pattern (e.g. ``<org_or_user>/*``) for a changelog of all of the matching
+repositories (see [`repositories`][mkdocs_github_changelog.repositories]), configured with:
+
+```yaml
+::github-release-changelog <org_or_user>/*
+    # Only include repositories matching any of these patterns, and not these ones - optional
+    include: ["mkdocs-*"]
+    exclude: ["*-archive"]
+
+    # Only include repositories with all of these topics - optional
+    topics: [docs]
+
+    # Include archived repositories and forks (left out by default) - optional
+    archived: true
+    forks: true
+
+    # Render the releases of all of the repositories together, newest first, rather than a section for each - optional
+    merge: true
+
+    # Fetch the releases of up to this many repositories at once (the plugin's wildcard_concurrency by default) - optional
+    max_concurrency: 8
 ```
 """
 
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 import re
-from typing import Any, MutableSequence, TYPE_CHECKING
+import threading
+import time
+from typing import Any, Mapping, MutableSequence, TYPE_CHECKING
 from xml.etree.ElementTree import Element  # nosec: B405
 
 from markdown.blockprocessors import BlockProcessor
@@ -33,12 +69,52 @@ from markdown.extensions import Extension
 from mkdocs.utils.yaml import get_yaml_loader, yaml_load
 
 from mkdocs_github_changelog import logger
-from mkdocs_github_changelog.get_releases import get_releases_as_markdown
+from mkdocs_github_changelog.cache import cache_key, ReleasesNotReady
+from mkdocs_github_changelog.clients import HostClient
+from mkdocs_github_changelog.failures import cacheable_failure, DeadlineExceeded
+from mkdocs_github_changelog.get_releases import (
+    _coerce_published_at,
+    get_releases_as_markdown,
+    HTML_HEADING_RE,
+    HTML_RELEASE_TEMPLATE,
+    render_releases,
+    select_releases,
+    template_projection,
+)
+from mkdocs_github_changelog.hooks import BLOCK_INSERTED, HOOKS
+from mkdocs_github_changelog.repositories import (
+    is_wildcard,
+    MAX_CONCURRENCY,
+    MERGED_HTML_RELEASE_TEMPLATE,
+    MERGED_RELEASE_TEMPLATE,
+    repository_filters,
+    REPOSITORY_HEADING,
+    RepositoryIndex,
+    select_repositories,
+    WILDCARD_OPTIONS,
+)
 
 if TYPE_CHECKING:
     from markdown import Markdown
     from markdown.blockparser import BlockParser
 
+    from mkdocs_github_changelog.cache import ReleaseCache
+    from mkdocs_github_changelog.clients import HostClients
+    from mkdocs_github_changelog.failures import Deadline
+    from mkdocs_github_changelog.feed import ReleaseFeed
+    from mkdocs_github_changelog.metrics import BuildReport, DirectiveMetrics
+    from mkdocs_github_changelog.titles import IssueTitles
+
+PLACEHOLDER = '*Fetching the releases for {org}/{repo} from github, the page will reload when they are available.*'
+UNAVAILABLE = '*The releases for {org}/{repo} could not be fetched from github within the build_timeout.*'
+
+
+def _merged_order(release: Any) -> float:
+    """Get the key to order a release by (newest first) in a merged changelog, when it was published."""
+    published_at = _coerce_published_at(release)
+    # The selected releases are all published, but a release without a date is put last rather than failing
+    return 0.0 if published_at is None else published_at.timestamp()
+
 
 class GithubReleaseChangelogProcessor(BlockProcessor):
     """Changelog Markdown block processor."""
@@ -49,10 +125,42 @@ class GithubReleaseChangelogProcessor(BlockProcessor):
         self,
         parser: BlockParser,
         config: dict,
+        cache: ReleaseCache | None = None,
+        non_blocking: bool = False,
+        report: BuildReport | None = None,
+        clients: HostClients | None = None,
+        issue_titles: IssueTitles | None = None,
+        deadline: Deadline | None = None,
+        repositories: RepositoryIndex | None = None,
+        feed: ReleaseFeed | None = None,
     ) -> None:
-        """Initialize the processor."""
+        """Initialize the processor.
+
+        If ``non_blocking`` is set (requires a ``cache``), a placeholder is rendered for releases that have
+        not been fetched yet, while they are fetched in the background. If a ``report`` is provided, the
+        metrics for each directive are recorded in it. If ``clients`` are provided, the releases are fetched
+        with the client for each host. If ``issue_titles`` are provided, the titles are added to the issue links.
+        If a ``deadline`` is provided, releases are not fetched once it has passed, and a notice is rendered for
+        any that haven't been fetched before. The ``repositories`` of the organisations of wildcard changelogs
+        are kept in a [`RepositoryIndex`][mkdocs_github_changelog.repositories.RepositoryIndex] (a new one if
+        it isn't provided). If a ``feed`` is provided, the releases are fetched from the releases feeds where possible
+        (see [`feed`][mkdocs_github_changelog.feed]).
+
+        With ``body_html`` set, the release bodies github rendered are stashed as raw HTML (see ``_raw_html``), so
+        they are inserted into the page as they are, rather than being autoprocessed and parsed as markdown.
+        """
         super().__init__(parser=parser)
         self._config = config
+        self._cache = cache
+        self._non_blocking = non_blocking and cache is not None
+        self._report = report
+        self._clients = clients
+        self._issue_titles = issue_titles
+        self._deadline = deadline
+        self._repositories = RepositoryIndex() if repositories is None else repositories
+        self._feed = feed
+        # The releases of wildcard changelogs are rendered in several threads
+        self._stash_lock = threading.Lock()
 
     def test(self, parent: Element, block: str) -> bool:  # noqa: U100
         """Match the extension instructions."""
@@ -90,7 +198,9 @@ class GithubReleaseChangelogProcessor(BlockProcessor):
             # insert it back into the blocks to be processed as markdown
             block = self._process_block(match.groupdict()['org'], match.groupdict()['repo'], block, heading_level)
             logger.debug('Block processed and releases generated')
-            blocks.insert(0, block)
+            # Split into blocks as markdown does for a document, rather than inserting it as a single block,
+            # which every block processor would otherwise rescan each time a heading is split off the front
+            blocks[0:0] = block.split('\n\n')
 
     def _process_block(
         self,
@@ -100,41 +210,244 @@ class GithubReleaseChangelogProcessor(BlockProcessor):
         heading_level: int = 0,
     ) -> str:
         """Process a block."""
+        started = time.perf_counter()
         config = yaml_load(yaml_block, loader=get_yaml_loader()) or {}
         if heading_level is None:
             heading_level = 0
         base_indent = config.get('base_indent', heading_level)
-        token = config.get('token', self._config.get('token', None))
+        metrics = None
+        if is_wildcard(repo):
+            block = self._process_wildcard(org, repo, config, base_indent)
+        else:
+            if self._report is not None:
+                metrics = self._report.directive(org, repo, config.get('github_api_url', self._config.get('github_api_url', None)))
+            block = self._changelog(org, repo, config, metrics, base_indent)
+        start = time.perf_counter()
+        # We need to decrease/increase the base indent level
+        if base_indent > 0:
+            block = block.replace('# ', ('#'*base_indent)+'# ')
+        if metrics is not None:
+            metrics.add('insert', time.perf_counter() - start)
+        if HOOKS.active:
+            github_api_url = config.get('github_api_url', self._config.get('github_api_url', None))
+            HOOKS.emit(BLOCK_INSERTED, key=cache_key(org, repo, github_api_url), length=len(block), elapsed=time.perf_counter() - started)
+        return block
+
+    def _raw_html(self, html: str | None, heading_offset: int = 0) -> str:
+        """Stash a fragment of HTML to insert into the page as it is, with its headings moved down by the ``heading_offset``.
+
+        The HTML is replaced with a placeholder, which python-markdown swaps back once the page is rendered, so it isn't
+        parsed as markdown.
+        """
+        if not html:
+            return ''
+        if heading_offset > 0:
+            html = HTML_HEADING_RE.sub(lambda match: f'<{match[1]}h{min(int(match[2]) + heading_offset, 6)}', html)
+        with self._stash_lock:
+            return self.parser.md.htmlStash.store(html)
+
+    def _changelog_kwargs(
+        self,
+        org: str,
+        repo: str,
+        config: dict,
+        metrics: DirectiveMetrics | None = None,
+        release_template: str | None = None,
+        heading_offset: int = 0,
+    ) -> dict[str, Any]:
+        """Get the arguments to get the releases for a repository with (the ``release_template`` is the default).
+
+        With ``body_html`` set, the default is the ``HTML_RELEASE_TEMPLATE``, the releases are not autoprocessed and
+        the templates get a ``raw_html`` function (moving the headings down by the ``heading_offset``).
+        """
         github_api_url = config.get('github_api_url', self._config.get('github_api_url', None))
-        release_template = config.get('release_template', self._config.get('release_template', None))
+        token = config.get('token', None)
+        client = None
+        if self._clients is not None:
+            # Without its own token, the client uses the host's tokens (or else the plugin's)
+            client = self._clients.get(github_api_url, token)
+            token = client.token
+        if token is None:
+            token = self._config.get('token', None)
+        body_html = config.get('body_html', self._config.get('body_html', False))
+        if body_html and release_template is None:
+            release_template = HTML_RELEASE_TEMPLATE
+        release_template = config.get('release_template', self._config.get('release_template', None)) or release_template
         match = config.get('match', self._config.get('match', None))
-        autoprocess = config.get('autoprocess', self._config.get('autoprocess', True))
+        # Github has already linked the issues and users in the body_html
+        autoprocess = config.get('autoprocess', self._config.get('autoprocess', True)) and not body_html
         include_prereleases = config.get('include_prereleases', self._config.get('include_prereleases', False))
         logger.info('Getting releases for {org}/{repo}')
         logger.debug('Config:: \nrelease_template: {release_template}\ngithub_api_url: {github_api_url}\nmatch: {match}\nautoprocess: {autoprocess}\ninclude_prereleases: {include_prereleases}')
-        block = '\n\n'.join(get_releases_as_markdown(
-            organisation_or_user=org,
-            repository=repo,
-            token=token,
-            release_template=release_template,
-            github_api_url=github_api_url,
-            match=match,
-            autoprocess=autoprocess,
-            include_prereleases=include_prereleases
-            ))
-        # We need to decrease/increase the base indent level
-        if base_indent > 0:
-            block = block.replace('# ', ('#'*base_indent)+'# ')
-        return block
+        kwargs: dict[str, Any] = {
+            'organisation_or_user': org,
+            'repository': repo,
+            'token': token,
+            'release_template': release_template,
+            'github_api_url': github_api_url,
+            'match': match,
+            'autoprocess': autoprocess,
+            'include_prereleases': include_prereleases,
+            'cache': self._cache,
+        }
+        if self._non_blocking:
+            kwargs['wait'] = False
+        if metrics is not None:
+            kwargs['metrics'] = metrics
+        if client is not None:
+            kwargs['client'] = client
+        # The fields the template uses (and the release_fields), which are streamed if release_fields is set
+        fields = template_projection(release_template, self._config.get('release_fields', None))
+        if fields is not None:
+            kwargs['fields'] = fields
+            kwargs['stream'] = self._config.get('release_fields', None) is not None
+        if self._issue_titles is not None and config.get('issue_titles', True):
+            kwargs['issue_titles'] = self._issue_titles
+        if self._deadline is not None:
+            kwargs['deadline'] = self._deadline
+        if self._feed is not None and config.get('release_feed', True):
+            kwargs['feed'] = self._feed
+        if body_html:
+            kwargs['raw_html'] = partial(self._raw_html, heading_offset=heading_offset)
+        return kwargs
+
+    def _changelog(self, org: str, repo: str, config: dict, metrics: DirectiveMetrics | None = None, heading_offset: int = 0) -> str:
+        """Get the changelog for a repository, or a placeholder (or notice) if its releases aren't available."""
+        try:
+            return '\n\n'.join(get_releases_as_markdown(**self._changelog_kwargs(org, repo, config, metrics, heading_offset=heading_offset)))
+        except ReleasesNotReady:
+            logger.info(f'Releases for {org}/{repo} are not available yet, rendering a placeholder')
+            return PLACEHOLDER.format(org=org, repo=repo)
+        except DeadlineExceeded as e:
+            logger.warning(f'Unable to fetch the releases for {org}/{repo}: {e}')
+            return UNAVAILABLE.format(org=org, repo=repo)
+        except Exception as e:
+            if not cacheable_failure(e):
+                raise
+            # Not found or forbidden, which is remembered for the error_ttl so other changelogs don't request it again
+            logger.warning(f'Unable to fetch the releases for {org}/{repo}: {e}')
+            return UNAVAILABLE.format(org=org, repo=repo)
+
+    def _process_wildcard(self, org: str, pattern: str, config: dict, heading_offset: int = 0) -> str:
+        """Get the changelogs for the repositories of an organisation matching a pattern (see [`repositories`][mkdocs_github_changelog.repositories]).
+
+        The releases for the repositories are fetched concurrently, by up to ``max_concurrency`` threads.
+        """
+        github_api_url = config.get('github_api_url', self._config.get('github_api_url', None))
+        token = config.get('token', None) or self._config.get('token', None)
+        client = HostClient(github_api_url, token) if self._clients is None else self._clients.get(github_api_url, config.get('token', None))
+        try:
+            repositories = self._repositories.get(org, client, deadline=self._deadline)
+        except DeadlineExceeded as e:
+            logger.warning(f'Unable to list the repositories of {org}: {e}')
+            return UNAVAILABLE.format(org=org, repo=pattern)
+        finally:
+            if self._clients is None:
+                client.close()
+        selected = select_repositories(repositories, pattern, *repository_filters(config))
+        logger.info(f'Getting releases for {len(selected)} repositories matching {org}/{pattern}')
+        repo_config = {name: value for name, value in config.items() if name not in WILDCARD_OPTIONS}
+        max_concurrency = config.get('max_concurrency', self._config.get('wildcard_concurrency', None) or MAX_CONCURRENCY)
+        # The metrics are created in order, as the report isn't shared between threads
+        metrics = {
+            repository['name']: self._report.directive(org, repository['name'], github_api_url) if self._report is not None else None
+            for repository in selected
+        }
+        with ThreadPoolExecutor(max_workers=max(min(max_concurrency, len(selected)), 1), thread_name_prefix='mkdocs_github_changelog-wildcard') as executor:
+            if config.get('merge', False):
+                return self._merged_changelog(org, pattern, selected, repo_config, metrics, executor, heading_offset)
+            # Each repository's headings are moved down under its own heading
+            changelogs = executor.map(
+                lambda repository: self._changelog(org, repository['name'], repo_config, metrics[repository['name']], heading_offset + 1),
+                selected,
+            )
+            sections = []
+            for repository, changelog in zip(selected, changelogs):
+                if not changelog:
+                    # No releases to show
+                    continue
+                heading = REPOSITORY_HEADING.format(name=repository['name'], html_url=repository['html_url'])
+                sections.append(heading + '\n\n' + changelog.replace('# ', '## '))
+        return '\n\n'.join(sections)
+
+    def _merged_changelog(
+        self,
+        org: str,
+        pattern: str,
+        selected: list[Mapping[str, Any]],
+        config: dict,
+        metrics: Mapping[str, DirectiveMetrics | None],
+        executor: ThreadPoolExecutor,
+        heading_offset: int = 0,
+    ) -> str:
+        """Render the releases of the repositories together, newest first."""
+        body_html = config.get('body_html', self._config.get('body_html', False))
+        default_template = MERGED_HTML_RELEASE_TEMPLATE if body_html else MERGED_RELEASE_TEMPLATE
+        kwargs = {
+            repository['name']: self._changelog_kwargs(org, repository['name'], config, metrics[repository['name']], default_template, heading_offset)
+            for repository in selected
+        }
+        # The raw_html function (with body_html) is for the template rather than select_releases
+        context = {}
+        for repository_kwargs in kwargs.values():
+            if 'raw_html' in repository_kwargs:
+                context['raw_html'] = repository_kwargs.pop('raw_html')
+        futures = {name: executor.submit(select_releases, **repository_kwargs) for name, repository_kwargs in kwargs.items()}
+        release_template = config.get('release_template', self._config.get('release_template', None)) or default_template
+        rendered = []
+        for name, future in futures.items():
+            try:
+                selected_releases = future.result()
+            except ReleasesNotReady:
+                logger.info(f'Releases for {org}/{name} are not available yet, rendering a placeholder')
+                return PLACEHOLDER.format(org=org, repo=pattern)
+            except DeadlineExceeded as e:
+                logger.warning(f'Unable to fetch the releases for {org}/{name}, leaving them out: {e}')
+                continue
+            except Exception as e:
+                if not cacheable_failure(e):
+                    raise
+                logger.warning(f'Unable to fetch the releases for {org}/{name}, leaving them out: {e}')
+                continue
+            # Each repository's releases are rendered together, so they are timed (and hooked) for it
+            key = cache_key(org, name, kwargs[name]['github_api_url'])
+            blocks = render_releases(
+                selected_releases, release_template, metrics[name], key=key, repository=f'{org}/{name}', **context
+            )
+            # Each block is kept with its own release's order, as the API lists them by when they were created
+            rendered += [(_merged_order(release), block) for release, block in zip(selected_releases, blocks)]
+        rendered.sort(key=lambda item: item[0], reverse=True)
+        return '\n\n'.join(block for _, block in rendered)
 
 
 class GithubReleaseChangelogExtension(Extension):
     """The Markdown extension."""
 
-    def __init__(self, config: dict, **kwargs: Any) -> None:
+    def __init__(
+        self,
+        config: dict,
+        cache: ReleaseCache | None = None,
+        non_blocking: bool = False,
+        report: BuildReport | None = None,
+        clients: HostClients | None = None,
+        issue_titles: IssueTitles | None = None,
+        deadline: Deadline | None = None,
+        repositories: RepositoryIndex | None = None,
+        feed: ReleaseFeed | None = None,
+        **kwargs: Any
+    ) -> None:
         """Initialize the object."""
         super().__init__(**kwargs)
         self._config = config
+        self._cache = cache
+        self._non_blocking = non_blocking
+        self._report = report
+        self._clients = clients
+        self._issue_titles = issue_titles
+        self._deadline = deadline
+        # Shared by the processor for each page
+        self._repositories = RepositoryIndex() if repositories is None else repositories
+        self._feed = feed
 
     def extendMarkdown(self, md: Markdown) -> None:
         """Register the extension.
@@ -143,7 +456,18 @@ class GithubReleaseChangelogExtension(Extension):
         to the Markdown parser.
         """
         md.parser.blockprocessors.register(
-            GithubReleaseChangelogProcessor(md.parser, self._config),
+            GithubReleaseChangelogProcessor(
+                md.parser,
+                self._config,
+                cache=self._cache,
+                non_blocking=self._non_blocking,
+                report=self._report,
+                clients=self._clients,
+                issue_titles=self._issue_titles,
+                deadline=self._deadline,
+                repositories=self._repositories,
+                feed=self._feed,
+            ),
             "github_release_changelog",
             priority=75,  # Right before markdown.blockprocessors.HashHeaderProcessor
         )
@@ -0,0 +1,77 @@
+"""Bound the time spent fetching releases, and tell which failures are worth remembering.
+
+Each request to github is limited by the ``request_timeout`` (or its host's ``timeout``), and with
+``build_timeout`` set, a build's fetches share a [`Deadline`][mkdocs_github_changelog.failures.Deadline]. Once it
+has passed, no more pages are requested and [`DeadlineExceeded`][mkdocs_github_changelog.failures.DeadlineExceeded]
+is raised, so a slow host can't hold up the build indefinitely.
+
+When a fetch fails (or runs out of time), the [`ReleaseCache`][mkdocs_github_changelog.cache.ReleaseCache]
+falls back to the last releases fetched for the repository (in memory, or in the disk cache however old they
+are). Repositories that are not found (404) or forbidden (403, other than for the rate limit) will keep failing,
+so those failures are remembered for the ``error_ttl`` (see
+[`cacheable_failure`][mkdocs_github_changelog.failures.cacheable_failure]), and a mistyped repository used by
+many changelogs is only requested once.
+"""
+from __future__ import annotations
+
+import time
+from typing import Any, Mapping
+
+# Statuses that are remembered, as they won't change by trying again straight away
+CACHEABLE_STATUSES = (403, 404)
+
+
+class DeadlineExceeded(TimeoutError):
+    """The time for fetching releases in the build has run out."""
+
+
+class Deadline():
+    """The time left to fetch releases in a build."""
+
+    def __init__(self, seconds: float | None = None):
+        """Initialise the deadline, ``seconds`` from now (None or 0 never passes)."""
+        self.seconds = seconds
+        self.start = time.monotonic()
+
+    def remaining(self) -> float | None:
+        """Get the seconds left before the deadline (or None if there isn't one)."""
+        if not self.seconds:
+            return None
+        return max(self.seconds - (time.monotonic() - self.start), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        """Whether the deadline has passed."""
+        return self.remaining() == 0
+
+    def check(self, what: str) -> None:
+        """Raise [`DeadlineExceeded`][mkdocs_github_changelog.failures.DeadlineExceeded] if the deadline has passed before doing ``what``."""
+        if self.expired:
+            raise DeadlineExceeded(f'The build_timeout of {self.seconds}s ran out before {what}')
+
+
+def http_status(error: Exception) -> int | None:
+    """Get the HTTP status of an error from a request to github, or None if it isn't an HTTP error."""
+    # fastcore's HTTPError (ghapi 1.x) has a code and hdrs, fasttransport's APIError (ghapi 2.x) a status_code
+    # and response, and httpx2's HTTPStatusError (when streaming) a response
+    response = getattr(error, 'response', None)
+    return getattr(error, 'status_code', None) or getattr(error, 'code', None) or getattr(response, 'status_code', None)
+
+
+def http_headers(error: Exception) -> Mapping[str, Any]:
+    """Get the response headers of an error from a request to github."""
+    return getattr(getattr(error, 'response', None), 'headers', None) or getattr(error, 'hdrs', None) or {}
+
+
+def rate_limited(error: Exception) -> bool:
+    """Whether an error is because the rate limit was exceeded."""
+    status = http_status(error)
+    if status == 429:
+        return True
+    headers = http_headers(error)
+    return status == 403 and (headers.get('X-RateLimit-Remaining', None) == '0' or headers.get('Retry-After', None) is not None)
+
+
+def cacheable_failure(error: Exception) -> bool:
+    """Whether a failure is a repository that is not found or forbidden (but not rate limited), so can be remembered."""
+    return http_status(error) in CACHEABLE_STATUSES and not rate_limited(error)
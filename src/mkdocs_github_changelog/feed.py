@@ -0,0 +1,241 @@
+"""Fetch the recent releases of public repositories from their Atom feed, without using the API rate limit."""
+from __future__ import annotations
+
+from contextlib import nullcontext
+import json
+from pathlib import Path
+import threading
+import time
+from typing import Any, Callable, Collection, Mapping, TYPE_CHECKING
+from urllib.error import HTTPError
+from urllib.parse import unquote
+import urllib.request
+from xml.etree import ElementTree
+
+from mkdocs_github_changelog import logger
+from mkdocs_github_changelog.cache import cache_key
+from mkdocs_github_changelog.disk_cache import atomic_write_text, FileLock
+from mkdocs_github_changelog.hooks import FETCH_END, FETCH_START, HOOKS, PAGE_RECEIVED
+
+if TYPE_CHECKING:
+    from mkdocs_github_changelog.clients import HostClient
+    from mkdocs_github_changelog.failures import Deadline
+    from mkdocs_github_changelog.metrics import DirectiveMetrics
+
+FEED_SIZE = 10
+"""The number of (the latest) releases in a releases feed."""
+FEED_FIELDS = ('name', 'tag_name', 'html_url', 'published_at', 'draft', 'body_html')
+"""The fields of a release the feed has (it doesn't say which releases are prereleases)."""
+ATOM = '{http://www.w3.org/2005/Atom}'
+
+
+def feed_url(organisation_or_user: str, repository: str, github_api_url: str | None = None) -> str:
+    """Get the url of a repository's releases feed, on the web host of the github API url."""
+    url = (github_api_url or 'https://api.github.com').rstrip('/')
+    if url == 'https://api.github.com':
+        url = 'https://github.com'
+    elif url.endswith('/api/v3'):
+        # GitHub Enterprise Server
+        url = url[:-len('/api/v3')]
+    return f'{url}/{organisation_or_user}/{repository}/releases.atom'
+
+
+def parse_feed(content: bytes | str) -> list[dict[str, Any]]:
+    """Get the releases (newest first, with the ``FEED_FIELDS``) from a releases feed, raising a ``ValueError`` if it can't be parsed.
+
+    The ``published_at`` of each release is when it was last updated, and its ``prerelease`` flag is None, as the
+    feed doesn't have either.
+    """
+    try:
+        root = ElementTree.fromstring(content)  # nosec B314
+    except ElementTree.ParseError as e:
+        raise ValueError(f'Unable to parse the releases feed: {e}')
+    releases = []
+    for entry in root.iter(f'{ATOM}entry'):
+        link = entry.find(f'{ATOM}link')
+        html_url = link.get('href', '') if link is not None else ''
+        if '/releases/tag/' not in html_url:
+            raise ValueError(f'Unexpected link for a release in the releases feed: {html_url!r}')
+        releases.append({
+            'name': entry.findtext(f'{ATOM}title', default=''),
+            'tag_name': unquote(html_url.rsplit('/releases/tag/', 1)[1]),
+            'html_url': html_url,
+            'published_at': entry.findtext(f'{ATOM}updated', default=None),
+            # Drafts aren't in the feed
+            'draft': False,
+            'prerelease': None,
+            'body_html': entry.findtext(f'{ATOM}content', default=''),
+        })
+    return releases
+
+
+def unknown_prereleases(releases: list) -> bool:
+    """Whether any of the releases are only known from the feed, so could be prereleases."""
+    return any(getattr(release, 'prerelease', False) is None for release in releases)
+
+
+def merge_releases(feed_releases: list, previous: list | None) -> list | None:
+    """Merge the releases from the feed with those fetched before (newest first), or None if there could be others between them.
+
+    The releases fetched before are kept for those in the feed (as they have all of the fields, including when they
+    were published and whether they are prereleases), and those older
+    than the oldest release in the feed are added after them. Those fetched before but no longer in the feed's
+    range have been deleted (or made drafts).
+    """
+    by_tag = {getattr(release, 'tag_name', None): release for release in previous or []}
+    if len(feed_releases) < FEED_SIZE:
+        # The feed has all of the releases
+        return [by_tag.get(release['tag_name'], release) for release in feed_releases]
+    if previous is None:
+        return None
+    oldest = feed_releases[-1]['tag_name']
+    tags = [getattr(release, 'tag_name', None) for release in previous]
+    if oldest not in tags:
+        # More releases than the feed has since the releases were fetched
+        return None
+    in_feed = {release['tag_name'] for release in feed_releases}
+    older = [release for release in previous[tags.index(oldest) + 1:] if getattr(release, 'tag_name', None) not in in_feed]
+    return [by_tag.get(release['tag_name'], release) for release in feed_releases] + older
+
+
+class ReleaseFeed():
+    """Fetch releases from the releases feed of each repository, with the validators of each feed stored as JSON."""
+
+    def __init__(self, path: str | Path | None = None):
+        """Initialise the feeds, loading the validators from the path if it exists."""
+        self.path = Path(path) if path is not None else None
+        self.requests = 0
+        self.not_modified = 0
+        self.fallbacks = 0
+        # feed url -> {'etag', 'last_modified'}
+        self._validators: dict[str, dict[str, str]] = {}
+        self._updated: dict[str, dict[str, str]] = {}
+        self._lock = threading.Lock()
+        if self.path is not None and self.path.exists():
+            try:
+                self._validators = json.loads(self.path.read_text()).get('feeds', {})
+            except (OSError, ValueError) as e:
+                logger.warning(f'Unable to load the feed validators from {self.path}: {e}')
+
+    @staticmethod
+    def usable(fields: Collection[str] | None, used: Collection[str] | None = None) -> bool:
+        """Whether releases with the ``fields``, for a template using the ``used`` fields, can be fetched from the feed (None could use any field)."""
+        if fields is None or used is None or 'prerelease' in used:
+            return False
+        # The prerelease flag is only used to select the releases
+        return set(fields).issubset((*FEED_FIELDS, 'prerelease'))
+
+    def fetch_releases(
+        self,
+        organisation_or_user: str,
+        repository: str,
+        fallback: Callable[[], list],
+        previous: Callable[[], list | None] | None = None,
+        client: HostClient | None = None,
+        github_api_url: str | None = None,
+        include_prereleases: bool | None = False,
+        metrics: DirectiveMetrics | None = None,
+        deadline: Deadline | None = None,
+    ) -> list:
+        """Fetch the releases for a repository from its feed, or else with the ``fallback`` (from the API).
+
+        The ``previous`` releases (however old) are used if the feed hasn't changed, and merged with those in it if
+        it has. Unless prereleases are included, the releases are fetched from the API if any are only known from
+        the feed (as they could be prereleases).
+
+        As for the API, the feed is requested within the ``client``'s concurrency limit, and before the ``deadline``,
+        with the time and size added to the ``metrics`` and the ``fetch_start``, ``page_received`` and ``fetch_end``
+        [`hooks`][mkdocs_github_changelog.hooks] called. It doesn't count as an API request.
+        """
+        url = feed_url(organisation_or_user, repository, client.github_api_url if client is not None else github_api_url)
+        with self._lock:
+            validators = dict(self._validators.get(url, None) or {})
+        previous_releases = previous() if previous is not None else None
+        if previous_releases is None:
+            # Nothing to use if it hasn't changed
+            validators = {}
+        if deadline is not None:
+            deadline.check(f'fetching the releases feed for {organisation_or_user}/{repository}')
+        key = None
+        if HOOKS.active:
+            key = cache_key(organisation_or_user, repository, github_api_url if client is None else client.host)
+            HOOKS.emit(FETCH_START, key=key)
+        start = time.perf_counter()
+        releases, error = None, None
+        try:
+            with nullcontext() if client is None else client.slot():
+                status, content, headers = self._get(url, validators, client)
+            if metrics is not None:
+                metrics.add('fetch', time.perf_counter() - start)
+                metrics.bytes_received += len(content)
+                metrics.bytes_decoded += len(content)
+            if status == 304:
+                logger.info(f'The releases feed for {organisation_or_user}/{repository} has not changed')
+                with self._lock:
+                    self.not_modified += 1
+                releases = previous_releases or []
+            else:
+                from fastcore.xtras import dict2obj
+                releases = merge_releases([dict2obj(release) for release in parse_feed(content)], previous_releases)
+            if key is not None:
+                HOOKS.emit(PAGE_RECEIVED, key=key, page=1, releases=len(releases or []), bytes_received=len(content), bytes_decoded=len(content), headers=headers)
+            if releases is not None and not include_prereleases and unknown_prereleases(releases):
+                logger.info(f'The releases feed for {organisation_or_user}/{repository} has releases that could be prereleases')
+                releases = None
+        except Exception as e:
+            logger.info(f'Unable to use the releases feed for {organisation_or_user}/{repository} ({e}), fetching them from the API')
+            releases, headers, error = None, {}, e
+        if key is not None:
+            HOOKS.emit(FETCH_END, key=key, releases=None if releases is None else len(releases), requests=1, elapsed=time.perf_counter() - start, error=error)
+        if releases is None:
+            with self._lock:
+                self.fallbacks += 1
+            releases = fallback()
+        self._remember(url, headers)
+        return releases
+
+    def _get(self, url: str, validators: Mapping[str, str], client: HostClient | None = None) -> tuple[int, bytes, Mapping[str, str]]:
+        """Request a feed (conditionally, if there are ``validators``), getting the status, content and headers."""
+        headers = {'Accept': 'application/atom+xml'}
+        if validators.get('etag', None):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified', None):
+            headers['If-Modified-Since'] = validators['last_modified']
+        with self._lock:
+            self.requests += 1
+        if client is not None and client.streaming:
+            response = client.http_client().get(url, headers=headers)
+            if response.status_code != 304:
+                response.raise_for_status()
+            return response.status_code, response.content, response.headers
+        request = urllib.request.Request(url, headers=headers)
+        try:
+            with urllib.request.urlopen(request, timeout=client.timeout if client is not None else 60) as response:  # nosec B310
+                return response.status, response.read(), response.headers
+        except HTTPError as e:
+            if e.code != 304:
+                raise
+            return 304, b'', e.headers
+
+    def _remember(self, url: str, headers: Mapping[str, str]) -> None:
+        """Keep the validators of the last response for a feed, to request it conditionally next time."""
+        validators = {
+            name: headers.get(header, None)
+            for name, header in (('etag', 'ETag'), ('last_modified', 'Last-Modified'))
+            if headers.get(header, None)
+        }
+        with self._lock:
+            if validators and self._validators.get(url, None) != validators:
+                self._validators[url] = validators
+                self._updated[url] = validators
+
+    def save(self) -> None:
+        """Save the validators, merged with any saved by other processes since they were loaded."""
+        if self.path is None or not self._updated:
+            return
+        with self._lock:
+            updated, self._updated = self._updated, {}
+        with FileLock(self.path.with_suffix('.lock')):
+            feeds = ReleaseFeed(self.path)._validators
+            feeds.update(updated)
+            atomic_write_text(self.path, json.dumps({'feeds': feeds}, sort_keys=True))
@@ -1,39 +1,91 @@
-"""Get releases from Github and convert to markdown."""
+"""Get releases from Github and convert to markdown.
+
+``ghapi`` (and ``fastcore``), ``jinja2`` and ``dateutil`` are imported when they are first needed rather than
+with this module, so importing the plugin stays fast, and builds served from the cache never import ``ghapi``.
+"""
 from __future__ import annotations
 
+from contextlib import nullcontext
 from datetime import datetime
+import functools
+from functools import partial
 import inspect
 import json
 import os
 import re
 import sys
+import time
+from typing import Callable, Iterable, Iterator, Mapping, TYPE_CHECKING
 
 if sys.version_info.major >= 3 and sys.version_info.minor >= 10:
     from importlib.metadata import entry_points
 else:
     from backports.entry_points_selectable import entry_points
 
-if sys.version_info.major >= 3 and sys.version_info.minor < 11:
-    from dateutil.parser import parse
+from mkdocs_github_changelog import logger
+from mkdocs_github_changelog.cache import cache_key
+from mkdocs_github_changelog.failures import http_headers, rate_limited
+from mkdocs_github_changelog.feed import unknown_prereleases
+from mkdocs_github_changelog.hooks import FETCH_END, FETCH_START, FILTER_DONE, HOOKS, PAGE_RECEIVED, RENDER_DONE
+from mkdocs_github_changelog.streaming import iter_json_array, project, projected_fields, SELECTION_FIELDS
+
+if TYPE_CHECKING:
+    from ghapi.all import GhApi, paged
+    from jinja2 import Environment, Template
+
+    from mkdocs_github_changelog.cache import ReleaseCache
+    from mkdocs_github_changelog.clients import HostClient
+    from mkdocs_github_changelog.failures import Deadline
+    from mkdocs_github_changelog.feed import ReleaseFeed
+    from mkdocs_github_changelog.metrics import DirectiveMetrics
+    from mkdocs_github_changelog.titles import IssueTitles
+
+
+def _import_ghapi() -> None:
+    """Import ghapi on first use, binding ``GhApi`` and ``paged`` in this module (unless they are already set)."""
+    if 'GhApi' in globals() and 'paged' in globals():
+        return
+    import ghapi.all
+    globals().setdefault('GhApi', ghapi.all.GhApi)
+    # On ghapi 2.x, paged() is an async generator even against a synchronous client,
+    # so iterating it raises "'async_generator' object is not iterable"; sync_paged()
+    # is its synchronous form. On 1.x, paged() is already synchronous and sync_paged
+    # does not exist. Bound to one name so the call site is version-agnostic.
+    globals().setdefault('paged', getattr(ghapi.all, 'sync_paged', ghapi.all.paged))
+
+
+def __getattr__(name: str):
+    """Import ghapi for ``GhApi`` and ``paged`` when they are first accessed."""
+    if name in ('GhApi', 'paged'):
+        _import_ghapi()
+        return globals()[name]
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
 
-import ghapi.all
-from ghapi.all import GhApi
-from jinja2 import Environment
+RELEASE_TEMPLATE = "# [{{release.name}}]({{release.html_url}})\n*Released at {{release.published_at.isoformat()}}*\n\n{{release.body}}"
+HTML_RELEASE_TEMPLATE = "# [{{release.name}}]({{release.html_url}})\n*Released at {{release.published_at.isoformat()}}*\n\n{{raw_html(release.body_html)}}"
+"""The default template with ``body_html``, inserting the body github rendered into the page as it is."""
+HTML_HEADING_RE = re.compile(r'<(/?)h([1-6])\b', flags=re.IGNORECASE)
+"""The opening and closing tags of the headings in github's rendered html, to move them down with the markdown headings."""
 
-from mkdocs_github_changelog import logger
+MEDIA_TYPE = 'application/vnd.github.v3+json'
+HTML_MEDIA_TYPE = 'application/vnd.github.html+json'
+FULL_MEDIA_TYPE = 'application/vnd.github.full+json'
 
-# On ghapi 2.x, paged() is an async generator even against a synchronous client,
-# so iterating it raises "'async_generator' object is not iterable"; sync_paged()
-# is its synchronous form. On 1.x, paged() is already synchronous and sync_paged
-# does not exist. Bound to one name so the call site is version-agnostic.
-paged = getattr(ghapi.all, 'sync_paged', ghapi.all.paged)
 
-RELEASE_TEMPLATE = "# [{{release.name}}]({{release.html_url}})\n*Released at {{release.published_at.isoformat()}}*\n\n{{release.body}}"
+def media_type(fields: Iterable[str] | None = None) -> str:
+    """Get the media type to request releases with, so they have the ``fields``.
+
+    Github only renders the ``body_html`` of the releases with the html (or full, also with the ``body``) media type.
+    """
+    if fields is None or 'body_html' not in fields:
+        return MEDIA_TYPE
+    return FULL_MEDIA_TYPE if 'body' in fields else HTML_MEDIA_TYPE
 
 
 def _supports_sync() -> bool:
     """Whether the installed ghapi accepts the ``sync`` constructor flag."""
+    _import_ghapi()
     return 'sync' in inspect.signature(GhApi.__init__).parameters
 
 
@@ -49,6 +101,7 @@ def _make_api(token: str | None, github_api_url: str | None) -> GhApi:
     arguments without necessarily ignoring them, so it is passed only when the
     installed signature declares it.
     """
+    _import_ghapi()
     kwargs = {'token': token, 'gh_host': github_api_url}
     if _supports_sync():
         kwargs['sync'] = True
@@ -95,20 +148,87 @@ class _EnvironmentFactory():
     @staticmethod
     def default_environment():
         """Get the default environment object."""
+        from jinja2 import Environment
         return Environment()  # nosec B701
 
 
 JINJA_ENVIRONMENT_FACTORY = _EnvironmentFactory()
 
 
-def autoprocess_github_links(release):
-    """We process the release to convert #xy and @abc links."""
+@functools.lru_cache(maxsize=64)
+def _template_fields(release_template: str, environment: Environment) -> frozenset[str] | None:
+    from jinja2 import meta, nodes, TemplateSyntaxError
+    try:
+        ast = environment.parse(release_template)
+    except TemplateSyntaxError:
+        # Left for rendering to report
+        return None
+    if 'release' not in meta.find_undeclared_variables(ast):
+        return frozenset()
+    fields = set()
+    accessed = set()
+    for node in ast.find_all((nodes.Getattr, nodes.Getitem)):
+        if not isinstance(node.node, nodes.Name) or node.node.name != 'release':
+            continue
+        if isinstance(node, nodes.Getattr):
+            fields.add(node.attr)
+        elif isinstance(node.arg, nodes.Const) and isinstance(node.arg.value, str):
+            fields.add(node.arg.value)
+        else:
+            # Indexed with a variable, so could be any field
+            return None
+        accessed.add(id(node.node))
+    if any(node.name == 'release' and id(node) not in accessed for node in ast.find_all(nodes.Name)):
+        # The release is used as a whole (e.g. passed to a filter or macro, or assigned), so needs every field
+        return None
+    return frozenset(fields)
+
+
+@functools.lru_cache(maxsize=64)
+def _compile_template(release_template: str, environment: Environment) -> Template:
+    return environment.from_string(release_template)
+
+
+def template_fields(release_template: str | None = None) -> frozenset[str] | None:
+    """Get the ``release`` fields a template uses (from its syntax tree), or None if it could use any of them.
+
+    Each template is only analysed once. A template that only accesses the release's fields by name (e.g.
+    ``release.name`` or ``release['name']``) uses just those fields, but one that uses the release as a whole
+    could use any of them.
+    """
+    return _template_fields(release_template or RELEASE_TEMPLATE, JINJA_ENVIRONMENT_FACTORY.environment)
+
+
+def template_projection(release_template: str | None = None, release_fields: Iterable[str] | None = None) -> tuple[str, ...] | None:
+    """Get the fields to fetch and keep for a template (with the ``release_fields``), or None for all of them.
+
+    These are the fields the template uses and those needed to select the releases, or if the template could
+    use any field, the ``release_fields`` configured (with the ``REQUIRED_FIELDS``).
+    """
+    used = template_fields(release_template)
+    if used is None:
+        return projected_fields(release_fields)
+    return projected_fields([*sorted(used), *(release_fields or [])], required=SELECTION_FIELDS)
+
+
+ISSUE_RE = r'#[\d]+'
+
+
+def issue_numbers(release) -> set[int]:
+    """Get the numbers of the issues (and pull requests) linked from a release by autoprocessing."""
+    return {int(match[1:]) for match in re.findall(ISSUE_RE, getattr(release, 'body', None) or '')}
+
+
+def autoprocess_github_links(release, titles: Mapping[int, str] | None = None):
+    """We process the release to convert #xy and @abc links.
+
+    If ``titles`` are provided, they are added to the links to the issues (as hover text).
+    """
     if not getattr(release, 'processed', False):
         base_url = release.html_url.split('releases')[0]
         # We also want to parse this to get the
         root_url = '/'.join(base_url.split('/')[:-3])
         user_re = r'@[a-zA-Z\d-]+'
-        issue_re = r'#[\d]+'
 
         def github_user_link(match_obj):
             user_name = match_obj.string[match_obj.start(): match_obj.end()]
@@ -118,10 +238,15 @@ def autoprocess_github_links(release):
         def github_issue_link(match_obj):
             issue_key = match_obj.string[match_obj.start(): match_obj.end()]
             issue_link = issue_key.replace('#', base_url+'issues/')
+            title = (titles or {}).get(int(issue_key[1:]), None)
+            if title:
+                # A backslash would escape the character after it (e.g. the closing quote)
+                title = ' '.join(title.split()).replace('\\', '\\\\').replace('"', '&quot;')
+                return f'[{issue_key}]({issue_link} "{title}")'
             return f'[{issue_key}]({issue_link})'
 
         release.body = re.sub(user_re, github_user_link, release.body)
-        release.body = re.sub(issue_re, github_issue_link, release.body)
+        release.body = re.sub(ISSUE_RE, github_issue_link, release.body)
         release.processed = True
     return release
 
@@ -143,17 +268,35 @@ def _coerce_published_at(release) -> datetime | None:
         return value
     if isinstance(value, str) and value:
         if sys.version_info.major >= 3 and sys.version_info.minor < 11:
+            from dateutil.parser import parse
             return parse(value)
         return datetime.fromisoformat(value)
     return None
 
 
+def _published_at(release) -> datetime | str | None:
+    """Return a release's ``published_at`` without parsing it, or None if it has none."""
+    value = getattr(release, 'published_at', None)
+    if isinstance(value, (datetime, str)) and value:
+        return value
+    return None
+
+
 def _process_releases(
     releases,
     match: str | None = None,
     autoprocess: bool = True,
     include_prereleases: bool = False,
+    metrics: DirectiveMetrics | None = None,
+    titles: Callable[[set[int]], Mapping[int, str]] | None = None,
+    coerce_dates: bool = True,
 ):
+    """Select the releases to render, and autoprocess their links.
+
+    If ``titles`` is provided, it is called once with the issue numbers referenced by all of the selected
+    releases, to get the titles to add to their links. Without ``coerce_dates`` (when the template doesn't
+    use them), the ``published_at`` dates are only checked, rather than parsed.
+    """
     selected_releases = []
     for release in releases:
         # Drafts are unpublished, so they have no published_at and an empty
@@ -168,47 +311,437 @@ def _process_releases(
         if not include_prereleases and getattr(release, 'prerelease', False):
             logger.debug(f'Skipping prerelease {release.html_url}')
             continue
-        published_at = _coerce_published_at(release)
+        published_at = _coerce_published_at(release) if coerce_dates else _published_at(release)
         if published_at is None:
             # Defensive: a published release should always carry a timestamp, so
             # warn rather than fail the build if one somehow does not.
             logger.warning(f'Skipping release with no published_at: {release.html_url}')
             continue
         release.published_at = published_at
-        if autoprocess is None or autoprocess:
-            autoprocess_github_links(release)
         if (match and re.match(match, release.name) is not None) or not match:
             selected_releases.append(release)
+    if autoprocess is None or autoprocess:
+        # Only the selected releases are rendered, so only their links are processed
+        with metrics.time('autoprocess') if metrics is not None else nullcontext():
+            issue_titles = None
+            if titles is not None:
+                numbers = set().union(*(issue_numbers(release) for release in selected_releases))
+                issue_titles = titles(numbers) if numbers else {}
+            for release in selected_releases:
+                autoprocess_github_links(release, issue_titles)
     return selected_releases
 
 
-def get_releases_as_markdown(
+def _response_sizes(headers: Mapping[str, str] | None, page: list) -> tuple[int, int]:
+    """Get the size of a response as it was received, and once it was decompressed.
+
+    The sizes are from the headers if possible, or else the page's JSON encoding.
+    """
+    try:
+        received = int(headers.get('Content-Length'))
+    except (AttributeError, TypeError, ValueError):
+        received = None
+    if received is not None and not headers.get('Content-Encoding', None):
+        return received, received
+    decoded = len(json.dumps(page, default=str))
+    return decoded if received is None else received, decoded
+
+
+def _rate_limit_remaining(headers: Mapping[str, str] | None, default: int | None = None) -> int | None:
+    """Get the remaining rate limit from the headers of a response."""
+    try:
+        return int(headers.get('X-RateLimit-Remaining'))
+    except (AttributeError, TypeError, ValueError):
+        return default
+
+
+def _rate_limit_reset(error: Exception) -> float | None:
+    """Get the (epoch) time the quota resets if an error is because it is exhausted, or else None."""
+    if not rate_limited(error):
+        # Forbidden for another reason
+        return None
+    headers = http_headers(error)
+    try:
+        return float(headers.get('X-RateLimit-Reset'))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return time.time() + float(headers.get('Retry-After', None))
+    except (TypeError, ValueError):
+        return time.time() + 60
+
+
+def _media_type_kwargs(fields: tuple[str, ...] | None) -> dict[str, dict[str, str]]:
+    """Get the keyword arguments for ghapi to request releases with the media type for the ``fields`` (if it isn't the default)."""
+    accept = media_type(fields)
+    if accept == MEDIA_TYPE:
+        return {}
+    # ghapi 2.x takes the headers to add to a request as headers_
+    return {'headers_' if _supports_sync() else 'headers': {'Accept': accept}}
+
+
+def _project_release(release, fields: tuple[str, ...]):
+    """Keep only the ``fields`` of a release from ghapi (releases that aren't dicts are kept whole)."""
+    if not isinstance(release, dict):
+        return release
+    return type(release)(project(release, fields))
+
+
+def _api_page(
+    api: GhApi,
+    client: HostClient,
+    organisation_or_user: str,
+    repository: str,
+    page: int,
+    token: str | None,
+    fields: tuple[str, ...] | None = None,
+) -> tuple[list, Mapping[str, str], int, int]:
+    """Fetch a page of releases with ghapi, using a token."""
+    client.authorize(api, token)
+    releases = api.repos.list_releases(organisation_or_user, repository, per_page=100, page=page, **_media_type_kwargs(fields))
+    sizes = _response_sizes(api.recv_hdrs, releases)
+    if fields is not None:
+        releases = [_project_release(release, fields) for release in releases]
+    return releases, api.recv_hdrs, *sizes
+
+
+def _stream_page(
+    client: HostClient,
+    organisation_or_user: str,
+    repository: str,
+    page: int,
+    token: str | None,
+    fields: tuple[str, ...] | None = None,
+) -> tuple[list, Mapping[str, str], int, int]:
+    """Fetch a page of releases, decoding each one as it is received and keeping only the ``fields``."""
+    from fastcore.xtras import dict2obj
+    url = f'{client.host}/repos/{organisation_or_user}/{repository}/releases'
+    params = {'per_page': 100, 'page': page}
+    decoded = 0
+
+    def chunks() -> Iterator[bytes]:
+        # Decompressed as they are received
+        nonlocal decoded
+        for chunk in response.iter_bytes():
+            decoded += len(chunk)
+            yield chunk
+
+    headers = {**client.headers(token), 'Accept': media_type(fields)}
+    with client.http_client().stream('GET', url, params=params, headers=headers) as response:
+        if response.is_error:
+            response.read()
+            response.raise_for_status()
+        releases = [dict2obj(release) for release in iter_json_array(chunks(), fields)]
+        return releases, response.headers, response.num_bytes_downloaded, decoded
+
+
+def _pages(
     organisation_or_user: str,
     repository: str,
     token: str | None = None,
-    release_template: str | None = RELEASE_TEMPLATE,
     github_api_url: str | None = None,
-    match: str | None = None,
-    autoprocess: bool | None = True,
-    include_prereleases: bool | None = False
-):
-    """Get the releases from github as a list of rendered markdown strings."""
+    client: HostClient | None = None,
+    fields: tuple[str, ...] | None = None,
+    stream: bool = True,
+) -> Iterator[tuple[list, Mapping[str, str] | None, int, int]]:
+    """Get the pages of releases for a repository, with the headers and sizes (received and decompressed) of each response.
+
+    With a client, the pages are streamed if only some ``fields`` are needed (and ``stream`` is set and ``httpx2``
+    is available), and if it has several tokens, each page is fetched with the token with the most remaining
+    quota, and is retried with the next token if its quota is exhausted. Releases are requested with the
+    [`media_type`][mkdocs_github_changelog.get_releases.media_type] for the ``fields``.
+    """
+    if client is not None and fields is not None and stream and client.streaming:
+        fetch_page = partial(_stream_page, client, organisation_or_user, repository, fields=fields)
+    else:
+        api = _make_api(token, github_api_url) if client is None else client.api()
+        if client is None or len(client.tokens) < 2:
+            for releases in paged(api.repos.list_releases, organisation_or_user, repository, per_page=100, **_media_type_kwargs(fields)):
+                sizes = _response_sizes(api.recv_hdrs, releases)
+                if fields is not None:
+                    releases = [_project_release(release, fields) for release in releases]
+                yield releases, api.recv_hdrs, *sizes
+            return
+        fetch_page = partial(_api_page, api, client, organisation_or_user, repository, fields=fields)
+    page = 1
+    while True:
+        token = client.tokens.choose()
+        try:
+            releases, headers, received, decoded = fetch_page(page, token)
+        except Exception as e:
+            reset = _rate_limit_reset(e)
+            if reset is None:
+                raise
+            client.tokens.exhausted(token, reset)
+            if not client.tokens.available():
+                raise
+            logger.info(f'Retrying page {page} of the releases for {organisation_or_user}/{repository} with another token')
+            continue
+        client.tokens.update(token, headers)
+        # Paging stops on an empty page, as with ghapi's paged
+        if not releases:
+            return
+        yield releases, headers, received, decoded
+        page += 1
+
+
+def fetch_releases(
+    organisation_or_user: str,
+    repository: str,
+    token: str | None = None,
+    github_api_url: str | None = None,
+    metrics: DirectiveMetrics | None = None,
+    client: HostClient | None = None,
+    fields: tuple[str, ...] | None = None,
+    stream: bool = True,
+    deadline: Deadline | None = None,
+) -> list:
+    """Fetch all of the releases for a repository from github.
+
+    If a [`HostClient`][mkdocs_github_changelog.clients.HostClient] is provided, its API client, connection
+    pool and tokens are used (rather than the ``token`` and ``github_api_url``), within its concurrency limit.
+    If ``fields`` are provided, only those fields of each release are kept, and with ``stream`` set the
+    releases are decoded as they are received (see [`streaming`][mkdocs_github_changelog.streaming]).
+
+    If a ``deadline`` is provided, [`DeadlineExceeded`][mkdocs_github_changelog.failures.DeadlineExceeded] is
+    raised rather than requesting a page once it has passed.
+
+    The ``fetch_start``, ``page_received`` and ``fetch_end`` [`hooks`][mkdocs_github_changelog.hooks] are called
+    if there are any.
+    """
     if github_api_url is not None:
         github_api_url = github_api_url.rstrip('/')
     logger.info('Getting releases from github')
-    api = _make_api(token, github_api_url)
-    releases = []
-    for page in paged(api.repos.list_releases, organisation_or_user, repository, per_page=100):
-        releases += page
+    if deadline is not None:
+        deadline.check(f'fetching {organisation_or_user}/{repository}')
+    key = None
+    if HOOKS.active:
+        key = cache_key(organisation_or_user, repository, github_api_url if client is None else client.host)
+        HOOKS.emit(FETCH_START, key=key)
+        fetch_start = time.perf_counter()
+    requests = 0
+    try:
+        with nullcontext() if client is None else client.slot():
+            start = time.perf_counter()
+            stage = 'fetch'
+            releases = []
+            for page, headers, received, decoded in _pages(organisation_or_user, repository, token, github_api_url, client, fields, stream):
+                requests += 1
+                if metrics is not None:
+                    now = time.perf_counter()
+                    metrics.add(stage, now - start)
+                    start, stage = now, 'pagination'
+                    metrics.requests += 1
+                    metrics.bytes_received += received
+                    metrics.bytes_decoded += decoded
+                    metrics.rate_limit_remaining = _rate_limit_remaining(headers, metrics.rate_limit_remaining)
+                if key is not None:
+                    HOOKS.emit(PAGE_RECEIVED, key=key, page=requests, releases=len(page), bytes_received=received, bytes_decoded=decoded, headers=headers)
+                releases += page
+                if deadline is not None:
+                    deadline.check(f'fetching the next page of {organisation_or_user}/{repository}')
+    except Exception as e:
+        if key is not None:
+            HOOKS.emit(FETCH_END, key=key, releases=None, requests=requests, elapsed=time.perf_counter() - fetch_start, error=e)
+        raise
+    if metrics is not None:
+        # Paging stops on an empty page, which is one more request
+        metrics.add(stage, time.perf_counter() - start)
+        metrics.requests += 1
+    if key is not None:
+        HOOKS.emit(FETCH_END, key=key, releases=len(releases), requests=requests + 1, elapsed=time.perf_counter() - fetch_start, error=None)
+    return releases
+
+
+def _lookup_titles(
+    issue_titles: IssueTitles,
+    key: tuple[str, str, str],
+    numbers: set[int],
+    client: HostClient | None = None,
+    token: str | None = None,
+) -> Mapping[int, str]:
+    """Get the titles of the issues of a repository, with the client for its host (or a new one)."""
+    if client is not None:
+        return issue_titles.get(key, numbers, client)
+    from mkdocs_github_changelog.clients import HostClient
+    client = HostClient(key[0], token)
+    try:
+        return issue_titles.get(key, numbers, client)
+    finally:
+        client.close()
+
+
+def select_releases(
+    organisation_or_user: str,
+    repository: str,
+    token: str | None = None,
+    release_template: str | None = RELEASE_TEMPLATE,
+    github_api_url: str | None = None,
+    match: str | None = None,
+    autoprocess: bool | None = True,
+    include_prereleases: bool | None = False,
+    cache: ReleaseCache | None = None,
+    wait: bool = True,
+    metrics: DirectiveMetrics | None = None,
+    client: HostClient | None = None,
+    fields: tuple[str, ...] | None = None,
+    issue_titles: IssueTitles | None = None,
+    stream: bool = True,
+    deadline: Deadline | None = None,
+    feed: ReleaseFeed | None = None,
+) -> list:
+    """Get the releases from github that a changelog renders, selected and autoprocessed.
+
+    See [`get_releases_as_markdown`][mkdocs_github_changelog.get_releases.get_releases_as_markdown] for the arguments.
+    """
+    if release_template is None:
+        release_template = RELEASE_TEMPLATE
+    key = cache_key(organisation_or_user, repository, github_api_url)
+    if cache is not None:
+        # Also keeping the fields the releases already have, for the other changelogs using them
+        fields = cache.fields_to_fetch(key, fields)
+    refresher = partial(
+        fetch_releases,
+        organisation_or_user,
+        repository,
+        token=token,
+        github_api_url=github_api_url,
+        client=client,
+        fields=fields,
+        stream=stream,
+    )
+    fetcher = api_fetcher = partial(refresher, metrics=metrics, deadline=deadline)
+    used = template_fields(release_template)
+    if feed is not None and feed.usable(fields, used):
+        # Falling back to the API if the feed can't be used
+        from_feed = partial(
+            feed.fetch_releases,
+            organisation_or_user,
+            repository,
+            previous=partial(cache.last_releases, key, fields) if cache is not None else None,
+            client=client,
+            github_api_url=github_api_url,
+            include_prereleases=include_prereleases,
+        )
+        fetcher = partial(from_feed, fetcher, metrics=metrics, deadline=deadline)
+        refresher = partial(from_feed, refresher)
+    if cache is None:
+        releases = fetcher()
+    elif wait:
+        # Refreshed between builds (under mkdocs serve), so without this build's metrics and deadline
+        releases = cache.get_releases(key, fetcher, fields, refresher=refresher)
+    else:
+        releases = cache.get_releases_nowait(key, fetcher, fields, refresher=refresher)
+    if not include_prereleases and unknown_prereleases(releases):
+        # Fetched from the releases feed for a changelog with prereleases, so some could be prereleases
+        releases = cache.refetch(key, api_fetcher, fields) if cache is not None else api_fetcher()
     logger.info(f'Processing releases from github, {len(releases)} found')
-    jinja_environment = JINJA_ENVIRONMENT_FACTORY.environment
+    start = time.perf_counter()
+    autoprocess_time = metrics.timings['autoprocess'] if metrics is not None else 0.0
+    titles = None
+    if issue_titles is not None:
+        titles = partial(_lookup_titles, issue_titles, key, client=client, token=token)
+    # Selected by an indexed query if the releases were loaded from a ReleaseStore
+    candidates = cache.select(key, releases, match=match, include_prereleases=include_prereleases) if cache is not None else None
     selected_releases = _process_releases(
-        releases,
+        releases if candidates is None else candidates,
         match=match,
-        autoprocess=autoprocess,
+        autoprocess=(autoprocess is None or autoprocess) and (used is None or 'body' in used),
         include_prereleases=include_prereleases,
+        metrics=metrics,
+        titles=titles,
+        coerce_dates=used is None or 'published_at' in used,
     )
+    if metrics is not None:
+        # The autoprocessing is timed separately within _process_releases
+        metrics.add('filter', time.perf_counter() - start - (metrics.timings['autoprocess'] - autoprocess_time))
+        metrics.releases_seen += len(releases)
+        metrics.releases_selected += len(selected_releases)
+    if HOOKS.active:
+        HOOKS.emit(FILTER_DONE, key=key, releases_seen=len(releases), releases_selected=len(selected_releases), elapsed=time.perf_counter() - start)
+    return selected_releases
+
+
+def render_releases(
+    releases: list,
+    release_template: str | None = RELEASE_TEMPLATE,
+    metrics: DirectiveMetrics | None = None,
+    key: tuple[str, str, str] | None = None,
+    **context,
+) -> list[str]:
+    """Render the selected releases (of the repository with the ``key``) with the ``release_template`` (and any other ``context`` for it)."""
     if release_template is None:
         release_template = RELEASE_TEMPLATE
     logger.info(f'Rendering releases from github, {len(releases)} selected')
-    return [jinja_environment.from_string(release_template).render(release=release) for release in selected_releases]
+    start = time.perf_counter()
+    # Each template is only compiled once, however many repositories are rendered with it
+    template = _compile_template(release_template, JINJA_ENVIRONMENT_FACTORY.environment)
+    rendered = [template.render(release=release, **context) for release in releases]
+    if metrics is not None:
+        metrics.add('render', time.perf_counter() - start)
+    if HOOKS.active:
+        HOOKS.emit(RENDER_DONE, key=key, releases=len(releases), elapsed=time.perf_counter() - start)
+    return rendered
+
+
+def get_releases_as_markdown(
+    organisation_or_user: str,
+    repository: str,
+    token: str | None = None,
+    release_template: str | None = RELEASE_TEMPLATE,
+    github_api_url: str | None = None,
+    match: str | None = None,
+    autoprocess: bool | None = True,
+    include_prereleases: bool | None = False,
+    cache: ReleaseCache | None = None,
+    wait: bool = True,
+    metrics: DirectiveMetrics | None = None,
+    client: HostClient | None = None,
+    fields: tuple[str, ...] | None = None,
+    issue_titles: IssueTitles | None = None,
+    stream: bool = True,
+    deadline: Deadline | None = None,
+    feed: ReleaseFeed | None = None,
+    **context,
+):
+    """Get the releases from github as a list of rendered markdown strings.
+
+    If a [`ReleaseCache`][mkdocs_github_changelog.cache.ReleaseCache] is provided, the releases are only
+    fetched from github if they are not already in it. If ``wait`` is False, missing releases are fetched in
+    the background and [`ReleasesNotReady`][mkdocs_github_changelog.cache.ReleasesNotReady] is raised.
+
+    If ``metrics`` are provided, the timings and sizes are recorded in them, and if a ``client`` is provided it
+    is used to fetch the releases (keeping only the ``fields``, if they are provided, and streaming them if
+    ``stream`` is set), and fetching stops once the ``deadline`` (if provided) has passed.
+
+    If ``issue_titles`` are provided (and ``autoprocess`` is set), the titles of the issues linked from the selected
+    releases are looked up (in batches) and added to the links.
+
+    The ``release_template`` is analysed to find the fields it uses, and the links are only autoprocessed if it
+    uses the ``body``, and the dates only parsed if it uses the ``published_at``. Any other ``context`` (e.g. the
+    ``raw_html`` function the ``HTML_RELEASE_TEMPLATE`` uses) is passed to the template.
+
+    If a [`ReleaseFeed`][mkdocs_github_changelog.feed.ReleaseFeed] is provided (and the template only uses fields the
+    feed has), the releases are fetched from the repository's releases feed where possible, rather than the API.
+    """
+    selected_releases = select_releases(
+        organisation_or_user=organisation_or_user,
+        repository=repository,
+        token=token,
+        release_template=release_template,
+        github_api_url=github_api_url,
+        match=match,
+        autoprocess=autoprocess,
+        include_prereleases=include_prereleases,
+        cache=cache,
+        wait=wait,
+        metrics=metrics,
+        client=client,
+        fields=fields,
+        issue_titles=issue_titles,
+        stream=stream,
+        deadline=deadline,
+        feed=feed,
+    )
+    key = cache_key(organisation_or_user, repository, github_api_url)
+    return render_releases(selected_releases, release_template, metrics, key=key, **context)
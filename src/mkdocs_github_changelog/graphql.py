@@ -0,0 +1,43 @@
+"""Make requests to github's GraphQL API with a host's client.
+
+Several things (the [`IssueTitles`][mkdocs_github_changelog.titles.IssueTitles] and the
+[`batch`][mkdocs_github_changelog.batch] fetching of releases) look up many things in a single GraphQL query
+rather than one REST request for each. The queries are made with the host's ``httpx2`` connection pool if it is
+available, or else with ``urllib``, using the host's tokens.
+"""
+from __future__ import annotations
+
+import json
+from typing import Any, TYPE_CHECKING
+import urllib.request
+
+if TYPE_CHECKING:
+    from mkdocs_github_changelog.clients import HostClient
+
+
+def graphql_url(github_api_url: str | None = None) -> str:
+    """Get the GraphQL endpoint for a github host (``/api/graphql`` on GitHub Enterprise Server)."""
+    url = (github_api_url or 'https://api.github.com').rstrip('/')
+    if url.endswith('/api/v3'):
+        return url[:-len('/v3')] + '/graphql'
+    return url + '/graphql'
+
+
+def graphql_request(client: HostClient, query: str) -> tuple[dict[str, Any], int]:
+    """Make a GraphQL query with a host's client, getting the result (with any ``errors``) and the bytes received.
+
+    Raises the HTTP error if the request fails.
+    """
+    body = json.dumps({'query': query}).encode()
+    url = graphql_url(client.github_api_url)
+    headers = {**client.headers(client.tokens.choose()), 'Content-Type': 'application/json'}
+    with client.slot():
+        if client.streaming:
+            response = client.http_client().post(url, content=body, headers=headers)
+            response.raise_for_status()
+            return response.json(), response.num_bytes_downloaded
+        headers.pop('Accept-Encoding', None)
+        request = urllib.request.Request(url, data=body, headers=headers, method='POST')
+        with urllib.request.urlopen(request, timeout=client.timeout) as response:  # nosec B310
+            content = response.read()
+        return json.loads(content), len(content)
@@ -0,0 +1,114 @@
+"""Call instrumentation hooks (e.g. for external profilers or tracing) as releases are fetched and rendered.
+
+A hook is a callable taking the name of an event and a dict of its data, e.g.:
+
+```python
+def trace(event, data):
+    print(event, data['key'])
+```
+
+It is registered either with an entry point in the ``mkdocs_github_changelog.hooks`` group (loaded when the plugin is
+configured), or by adding its import path (``module:attribute``) to the plugin's ``hooks`` option, or by calling
+``HOOKS.register``. The events (with their data, along with the ``key`` of the repository, as ``(host, org, repo)``) are:
+
+* ``fetch_start``: fetching a repository's releases from github (or its releases feed) starts.
+* ``fetch_end``: it has finished (``releases``, ``requests`` and ``elapsed`` seconds, or the ``error`` if it failed).
+* ``page_received``: a page of releases was received (its ``page`` number, ``releases``, ``bytes_received``,
+  ``bytes_decoded`` and the response ``headers``).
+* ``cache_hit`` and ``cache_miss``: the releases were (or weren't) in the release cache (memory or disk).
+* ``filter_done``: the releases to render were selected (``releases_seen``, ``releases_selected`` and ``elapsed``).
+* ``render_done``: the selected releases were rendered (``releases`` and ``elapsed``).
+* ``block_inserted``: a changelog was inserted into a page (the ``length`` of its markdown and ``elapsed`` seconds
+  for the whole directive), with the pattern as the repository of the ``key`` for a wildcard changelog.
+
+Hooks can be called from several threads at once. An exception in a hook is logged, rather than failing the build.
+Each event is only built if there are any hooks (checked with ``HOOKS.active``), so they cost almost nothing otherwise.
+"""
+from __future__ import annotations
+
+import sys
+import threading
+from typing import Any, Callable, Iterable, Mapping
+
+if sys.version_info.major >= 3 and sys.version_info.minor >= 10:
+    from importlib.metadata import entry_points, EntryPoint
+else:
+    from backports.entry_points_selectable import entry_points, EntryPoint
+
+from mkdocs_github_changelog import logger
+
+ENTRY_POINT_GROUP = 'mkdocs_github_changelog.hooks'
+
+FETCH_START = 'fetch_start'
+FETCH_END = 'fetch_end'
+PAGE_RECEIVED = 'page_received'
+CACHE_HIT = 'cache_hit'
+CACHE_MISS = 'cache_miss'
+FILTER_DONE = 'filter_done'
+RENDER_DONE = 'render_done'
+BLOCK_INSERTED = 'block_inserted'
+EVENTS = (FETCH_START, FETCH_END, PAGE_RECEIVED, CACHE_HIT, CACHE_MISS, FILTER_DONE, RENDER_DONE, BLOCK_INSERTED)
+
+Hook = Callable[[str, Mapping[str, Any]], Any]
+
+
+def load_hook(path: str) -> Hook:
+    """Load a hook from its import path (``module:attribute``, as for an entry point)."""
+    return EntryPoint(name=path, value=path, group=ENTRY_POINT_GROUP).load()
+
+
+class Hooks():
+    """The registered hooks, called with each event."""
+
+    def __init__(self):
+        """Initialise the hooks, without any registered."""
+        self._hooks: tuple[Hook, ...] = ()
+        self._entry_points_loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def active(self) -> bool:
+        """Whether any hooks are registered (so the events need to be emitted)."""
+        return bool(self._hooks)
+
+    def register(self, hook: Hook) -> Hook:
+        """Register a hook (once), returning it so this can be used as a decorator."""
+        with self._lock:
+            if hook not in self._hooks:
+                # Replaced rather than changed, so emitting doesn't need the lock
+                self._hooks = (*self._hooks, hook)
+        return hook
+
+    def unregister(self, hook: Hook) -> None:
+        """Unregister a hook (if it is registered)."""
+        with self._lock:
+            self._hooks = tuple(registered for registered in self._hooks if registered is not hook)
+
+    def clear(self) -> None:
+        """Unregister all of the hooks (the entry points are loaded again by ``load``)."""
+        with self._lock:
+            self._hooks = ()
+            self._entry_points_loaded = False
+
+    def load(self, paths: Iterable[str] = ()) -> None:
+        """Register the hooks from the ``mkdocs_github_changelog.hooks`` entry points (once) and the import ``paths``."""
+        if not self._entry_points_loaded:
+            self._entry_points_loaded = True
+            for ep in entry_points().select(group=ENTRY_POINT_GROUP):
+                try:
+                    self.register(ep.load())
+                except Exception as e:
+                    logger.warning(f'Unable to load the hook {ep.name} ({ep.value}): {e}')
+        for path in paths:
+            self.register(load_hook(path))
+
+    def emit(self, event: str, **data: Any) -> None:
+        """Call each hook with an event (check ``active`` first, to avoid building the data without any hooks)."""
+        for hook in self._hooks:
+            try:
+                hook(event, data)
+            except Exception as e:
+                logger.warning(f'Hook {hook!r} failed for {event}: {e}')
+
+
+HOOKS = Hooks()
@@ -0,0 +1,166 @@
+"""Collect timings and sizes for each changelog directive in a build.
+
+A [`BuildReport`][mkdocs_github_changelog.metrics.BuildReport] holds a
+[`DirectiveMetrics`][mkdocs_github_changelog.metrics.DirectiveMetrics] for each
+``::github-release-changelog`` directive processed, which records the wall time of each stage:
+
+* ``fetch``: creating the client and getting the first page of releases.
+* ``pagination``: getting the remaining pages.
+* ``filter``: selecting the releases in ``_process_releases`` (excluding the autoprocessing).
+* ``autoprocess``: converting the issue and user links.
+* ``render``: rendering the release template.
+* ``insert``: adjusting the headings and inserting the markdown into the page.
+
+along with the number of requests, bytes received (and once decompressed), releases seen and selected, and
+the rate limit remaining after the last request.
+"""
+from __future__ import annotations
+
+from contextlib import contextmanager
+import json
+from pathlib import Path
+import time
+from typing import Any, Iterator
+
+from mkdocs_github_changelog import logger
+
+STAGES = ('fetch', 'pagination', 'filter', 'autoprocess', 'render', 'insert')
+
+
+class DirectiveMetrics():
+    """Metrics for a single changelog directive."""
+
+    def __init__(self, org: str, repo: str, page: str | None = None, github_api_url: str | None = None):
+        """Initialise the metrics."""
+        self.org = org
+        self.repo = repo
+        self.page = page
+        self.github_api_url = github_api_url
+        self.timings = dict.fromkeys(STAGES, 0.0)
+        self.requests = 0
+        self.bytes_received = 0
+        self.bytes_decoded = 0
+        self.releases_seen = 0
+        self.releases_selected = 0
+        self.rate_limit_remaining: int | None = None
+
+    @property
+    def total(self) -> float:
+        """Total wall time for the directive."""
+        return sum(self.timings.values())
+
+    def add(self, stage: str, seconds: float) -> None:
+        """Add time to a stage."""
+        self.timings[stage] += seconds
+
+    @contextmanager
+    def time(self, stage: str) -> Iterator[None]:
+        """Time the wrapped code as part of a stage."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Get the metrics as a JSON serialisable dictionary."""
+        return {
+            'page': self.page,
+            'directive': f'{self.org}/{self.repo}',
+            'timings': dict(self.timings),
+            'total': self.total,
+            'requests': self.requests,
+            'bytes_received': self.bytes_received,
+            'bytes_decoded': self.bytes_decoded,
+            'releases_seen': self.releases_seen,
+            'releases_selected': self.releases_selected,
+            'rate_limit_remaining': self.rate_limit_remaining,
+        }
+
+
+class BuildReport():
+    """Metrics for all of the changelog directives in a build."""
+
+    def __init__(self):
+        """Initialise the report."""
+        self.directives: list[DirectiveMetrics] = []
+        self.page: str | None = None
+
+    def directive(self, org: str, repo: str, github_api_url: str | None = None) -> DirectiveMetrics:
+        """Start the metrics for a directive on the current page."""
+        metrics = DirectiveMetrics(org, repo, page=self.page, github_api_url=github_api_url)
+        self.directives.append(metrics)
+        return metrics
+
+    def totals(self) -> dict[str, Any]:
+        """Get the totals across all the directives."""
+        return {
+            'directives': len(self.directives),
+            'timings': {stage: sum(d.timings[stage] for d in self.directives) for stage in STAGES},
+            'total': sum(d.total for d in self.directives),
+            'requests': sum(d.requests for d in self.directives),
+            'bytes_received': sum(d.bytes_received for d in self.directives),
+            'bytes_decoded': sum(d.bytes_decoded for d in self.directives),
+            'releases_seen': sum(d.releases_seen for d in self.directives),
+            'releases_selected': sum(d.releases_selected for d in self.directives),
+        }
+
+    def as_dict(self) -> dict[str, Any]:
+        """Get the report as a JSON serialisable dictionary."""
+        return {'directives': [d.as_dict() for d in self.directives], 'totals': self.totals()}
+
+    def summary(self) -> str:
+        """Get a summary table of the report."""
+        header = ['page', 'directive', *STAGES, 'total', 'requests', 'kB', 'seen', 'selected']
+        rows = [header]
+        for d in self.directives:
+            rows.append([
+                d.page or '',
+                f'{d.org}/{d.repo}',
+                *[f'{d.timings[stage]:.3f}' for stage in STAGES],
+                f'{d.total:.3f}',
+                str(d.requests),
+                f'{d.bytes_received/1024:.1f}',
+                str(d.releases_seen),
+                str(d.releases_selected),
+            ])
+        totals = self.totals()
+        rows.append([
+            'total',
+            str(totals['directives']),
+            *[f"{totals['timings'][stage]:.3f}" for stage in STAGES],
+            f"{totals['total']:.3f}",
+            str(totals['requests']),
+            f"{totals['bytes_received']/1024:.1f}",
+            str(totals['releases_seen']),
+            str(totals['releases_selected']),
+        ])
+        widths = [max(len(row[i]) for row in rows) for i in range(len(header))]
+        return '\n'.join('  '.join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip() for row in rows)
+
+    def log_quota(self) -> None:
+        """Log the API quota used by each directive that made requests."""
+        for d in self.directives:
+            if d.requests:
+                remaining = '' if d.rate_limit_remaining is None else f', {d.rate_limit_remaining} remaining'
+                logger.info(f'{d.org}/{d.repo} ({d.page}) used {d.requests} API requests{remaining}')
+
+    def log_transfer(self) -> None:
+        """Log the bytes received from github, and saved by compressing the responses."""
+        totals = self.totals()
+        if not totals['bytes_received']:
+            return
+        received, decoded = totals['bytes_received'], totals['bytes_decoded']
+        saved = f', saved {(decoded - received)/1024:.1f} kB by compression' if decoded > received else ''
+        logger.info(f'Received {received/1024:.1f} kB from github for {decoded/1024:.1f} kB of releases{saved}')
+
+    def log_summary(self) -> None:
+        """Log the summary table."""
+        logger.info('Changelog build report (times in seconds):\n' + self.summary())
+
+    def write_json(self, path: str | Path) -> None:
+        """Write the report to a JSON file."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.as_dict(), indent=2))
+        logger.info(f'Changelog build report written to {path}')
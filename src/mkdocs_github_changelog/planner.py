@@ -0,0 +1,217 @@
+"""Account for and plan the github API requests a build makes.
+
+The number of pages of releases for each repository is recorded in a
+[`UsageHistory`][mkdocs_github_changelog.planner.UsageHistory] after each build, which is then used to
+estimate the requests a future build will make (see [`plan_requests`][mkdocs_github_changelog.planner.plan_requests]),
+and compare them to the remaining quota from github's ``/rate_limit`` endpoint (which does not count against the
+quota itself). Wildcard changelogs are expanded by listing the repositories of their organisations, which is
+counted too.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timezone
+import json
+from pathlib import Path
+from typing import Any, Iterable, Mapping
+
+from mkdocs_github_changelog import logger
+from mkdocs_github_changelog.clients import HostClients
+from mkdocs_github_changelog.disk_cache import atomic_write_text, FileLock
+from mkdocs_github_changelog.get_releases import _make_api
+from mkdocs_github_changelog.repositories import expand_directives, is_wildcard, RepositoryIndex
+
+UNKNOWN_PAGES = 1
+"""Pages assumed for a repository that has not been fetched before."""
+
+
+def _key_str(key: tuple[str, str, str]) -> str:
+    return '/'.join(key)
+
+
+class UsageHistory():
+    """The number of pages of releases seen for each repository in previous builds, stored as JSON."""
+
+    def __init__(self, path: str | Path | None = None):
+        """Initialise the history, loading it from the path if it exists."""
+        self.path = Path(path) if path is not None else None
+        self._pages: dict[str, int] = {}
+        self._recorded: dict[str, int] = {}
+        if self.path is not None and self.path.exists():
+            try:
+                self._pages = json.loads(self.path.read_text()).get('pages', {})
+            except (OSError, ValueError) as e:
+                logger.warning(f'Unable to load the usage history from {self.path}: {e}')
+
+    def pages(self, key: tuple[str, str, str]) -> int | None:
+        """Get the number of pages seen for a repository, or None if it has not been fetched before."""
+        return self._pages.get(_key_str(key), None)
+
+    def record(self, key: tuple[str, str, str], pages: int) -> None:
+        """Record the number of pages seen for a repository."""
+        self._pages[_key_str(key)] = pages
+        self._recorded[_key_str(key)] = pages
+
+    def save(self) -> None:
+        """Save the history, merged with any recorded by other processes since it was loaded."""
+        if self.path is None:
+            return
+        with FileLock(self.path.with_suffix('.lock')):
+            pages = UsageHistory(self.path)._pages
+            pages.update(self._recorded)
+            atomic_write_text(self.path, json.dumps({'pages': pages}, indent=2, sort_keys=True))
+        self._pages = pages
+
+
+class RepositoryPlan():
+    """The estimated requests for a repository."""
+
+    def __init__(self, key: tuple[str, str, str], tokens: tuple[str, ...], directives: int, pages: int | None):
+        """Initialise the plan (``tokens`` are the pool of tokens its requests are spread over)."""
+        self.key = key
+        self.tokens = tokens
+        self.directives = directives
+        self.known = pages is not None
+        self.pages = UNKNOWN_PAGES if pages is None else pages
+
+    @property
+    def requests(self) -> int:
+        """Estimated requests, as paging stops on an (extra) empty page."""
+        return self.pages + 1
+
+
+class ListingPlan():
+    """The requests to list the repositories of an organisation, for its wildcard changelogs."""
+
+    def __init__(self, host: str, org: str, tokens: tuple[str, ...], requests: int):
+        """Initialise the plan."""
+        self.key = (host, org)
+        self.tokens = tokens
+        self.requests = requests
+
+
+class RequestPlan():
+    """The estimated requests for a build, and the quota available for them."""
+
+    def __init__(
+        self,
+        repositories: list[RepositoryPlan],
+        listings: list[ListingPlan] | None = None,
+        unestimated: list[str] | None = None,
+    ):
+        """Initialise the plan (``unestimated`` are the wildcard changelogs whose repositories weren't listed)."""
+        self.repositories = repositories
+        self.listings = listings or []
+        self.unestimated = unestimated or []
+        # (host, tokens) -> rate limit (remaining, limit, reset) of the pool of tokens
+        self.rate_limits: dict[tuple[str, tuple[str, ...]], dict[str, Any]] = {}
+
+    def requests(self, host: str | None = None, tokens: tuple[str, ...] | None = None) -> int:
+        """Get the estimated requests, optionally for just one host (and pool of tokens)."""
+        return sum(
+            r.requests for r in [*self.repositories, *self.listings]
+            if (host is None or r.key[0] == host) and (tokens is None or r.tokens == tokens)
+        )
+
+    def check_rate_limits(self) -> None:
+        """Get the remaining quota for each host and pool of tokens from github, summed over the tokens in the pool."""
+        for host, tokens in sorted({(r.key[0], r.tokens) for r in [*self.repositories, *self.listings]}):
+            try:
+                limits = [get_rate_limit(token, host) for token in tokens or (None,)]
+            except Exception as e:
+                logger.warning(f'Unable to get the rate limit for {host}: {e}')
+                continue
+            self.rate_limits[(host, tokens)] = {
+                'remaining': sum(limit['remaining'] for limit in limits),
+                'limit': sum(limit['limit'] for limit in limits),
+                'reset': min(limit['reset'] for limit in limits),
+            }
+
+    @property
+    def fits(self) -> bool:
+        """Whether the estimated requests fit in the remaining quota (if known)."""
+        return all(
+            self.requests(host, tokens) <= rate_limit['remaining']
+            for (host, tokens), rate_limit in self.rate_limits.items()
+        )
+
+    def summary(self) -> str:
+        """Get a summary of the plan."""
+        lines = ['Estimated github API requests:']
+        for r in self.repositories:
+            pages = str(r.pages) if r.known else f'{r.pages} (not fetched before)'
+            lines.append(f'  {_key_str(r.key)}: {r.requests} requests ({r.directives} directives, {pages} pages)')
+        for listing in self.listings:
+            lines.append(f'  {_key_str(listing.key)}/*: {listing.requests} requests (listing the repositories)')
+        for wildcard in self.unestimated:
+            lines.append(f'  {wildcard}: not estimated (the repositories were not listed)')
+        lines.append(f'  total: {self.requests()} requests')
+        for (host, tokens), rate_limit in self.rate_limits.items():
+            expected = self.requests(host, tokens)
+            reset = datetime.fromtimestamp(rate_limit['reset'], tz=timezone.utc).isoformat()
+            status = 'fits' if expected <= rate_limit['remaining'] else 'EXCEEDS'
+            auth = 'unauthenticated' if not tokens else 'authenticated' if len(tokens) == 1 else f'{len(tokens)} tokens'
+            lines.append(
+                f'Quota for {host} ({auth}): {expected} of {rate_limit["remaining"]}/{rate_limit["limit"]} remaining '
+                f'({status}, resets at {reset})'
+            )
+        return '\n'.join(lines)
+
+
+def get_rate_limit(token: str | None = None, github_api_url: str | None = None) -> dict[str, Any]:
+    """Get the core rate limit (remaining, limit and reset) from github."""
+    if github_api_url is not None:
+        github_api_url = github_api_url.rstrip('/')
+    api = _make_api(token, github_api_url)
+    core = api.rate_limit.get().resources.core
+    return {'remaining': int(core.remaining), 'limit': int(core.limit), 'reset': int(core.reset)}
+
+
+def _pool(directive: Any, plugin_config: Mapping[str, Any], clients: HostClients) -> tuple[str, ...]:
+    """Get the tokens a directive's requests are spread over, as in the build."""
+    token = directive.options.get('token', None)
+    return (token,) if token else tuple(clients.host_tokens(directive.option('github_api_url', plugin_config)))
+
+
+def plan_requests(
+    directives: Iterable[Any],
+    plugin_config: Mapping[str, Any],
+    history: UsageHistory,
+    clients: HostClients | None = None,
+    index: RepositoryIndex | None = None,
+) -> RequestPlan:
+    """Estimate the requests a build of the directives will make.
+
+    Each repository is only fetched once per build however many directives reference it. Wildcard directives are
+    expanded by listing the repositories with the ``clients`` (from the ``index`` if they were listed within its
+    ``ttl``), counting the requests that took, or without ``clients`` are left out as not estimated.
+
+    The requests are spread over the same pool of tokens for each host as in the build (a changelog's own
+    ``token``, or else the host's ``tokens``, or the plugin's ``token`` and ``tokens``).
+    """
+    if index is None:
+        index = RepositoryIndex()
+    pools = clients
+    if pools is None:
+        pools = HostClients(plugin_config.get('hosts', None), tokens=[plugin_config.get('token', None), *(plugin_config.get('tokens', None) or [])])
+    counts: dict[tuple[str, str, str], int] = {}
+    tokens: dict[tuple[str, str, str], tuple[str, ...]] = {}
+    listings = []
+    unestimated = []
+    for directive in directives:
+        expanded = [directive]
+        if is_wildcard(directive.repo):
+            if clients is None:
+                unestimated.append(f'{directive.org}/{directive.repo}')
+                continue
+            listed = index.requests
+            expanded = expand_directives([directive], plugin_config, clients, index)
+            if index.requests > listed:
+                # Paging stops on an (extra) empty page
+                requests = index.requests - listed + 1
+                listings.append(ListingPlan(directive.key(plugin_config)[0], directive.org, _pool(directive, plugin_config, pools), requests))
+        for repository_directive in expanded:
+            key = repository_directive.key(plugin_config)
+            counts[key] = counts.get(key, 0) + 1
+            tokens.setdefault(key, _pool(repository_directive, plugin_config, pools))
+    repositories = [RepositoryPlan(key, tokens[key], count, history.pages(key)) for key, count in counts.items()]
+    return RequestPlan(repositories, listings, unestimated)
@@ -2,26 +2,55 @@
 
 It creates a Markdown extension ([`GithubReleaseChangelogExtension`][mkdocs_github_changelog.extension.GithubReleaseChangelogExtension]),
 and adds it to `mkdocs` during the [`on_config` event hook](https://www.mkdocs.org/user-guide/plugins/#on_config).
+
+The fetched releases are kept in a [`ReleaseCache`][mkdocs_github_changelog.cache.ReleaseCache] on the plugin instance,
+which persists across rebuilds under `mkdocs serve`, and the build's timings and sizes are collected in a
+[`BuildReport`][mkdocs_github_changelog.metrics.BuildReport] that is output during the
+[`on_post_build` event hook](https://www.mkdocs.org/user-guide/plugins/#on_post_build).
 """
 
 from __future__ import annotations
 
-from typing import TYPE_CHECKING
+import os
+from pathlib import Path
+from typing import Literal, TYPE_CHECKING
 
 from mkdocs.config import Config
 from mkdocs.config import config_options as opt
+from mkdocs.exceptions import PluginError
 from mkdocs.plugins import BasePlugin
 
-from mkdocs_github_changelog.extension import GithubReleaseChangelogExtension
+from mkdocs_github_changelog import logger
+from mkdocs_github_changelog.cache import cache_key, ReleaseCache, ReleaseRefresher
+from mkdocs_github_changelog.clients import HostClients
+from mkdocs_github_changelog.directives import find_directives
+from mkdocs_github_changelog.disk_cache import DiskCache
+from mkdocs_github_changelog.extension import GithubReleaseChangelogExtension, GithubReleaseChangelogProcessor
+from mkdocs_github_changelog.failures import Deadline
+from mkdocs_github_changelog.feed import ReleaseFeed
+from mkdocs_github_changelog.hooks import HOOKS
+from mkdocs_github_changelog.metrics import BuildReport
+from mkdocs_github_changelog.planner import UsageHistory
+from mkdocs_github_changelog.prefetch import prefetch, PrefetchResult
+from mkdocs_github_changelog.release_store import ReleaseStore
+from mkdocs_github_changelog.repositories import is_wildcard, matches, RepositoryIndex
+from mkdocs_github_changelog.titles import IssueTitles
 
 if TYPE_CHECKING:
     from mkdocs.config.defaults import MkDocsConfig
+    from mkdocs.livereload import LiveReloadServer
+    from mkdocs.structure.files import Files
+    from mkdocs.structure.pages import Page
+
+    from mkdocs_github_changelog.webhooks import WebhookReceiver
 
 
 class PluginConfig(Config):
     """Configuration options for `mkdocs_github_changelog` in `mkdocs.yml`."""
     token = opt.Optional(opt.Type(str))
     """Github token (needs repo scope for private repos, and may be worth setting for public repos due to rate limiting)."""
+    tokens = opt.ListOfItems(opt.Optional(opt.Type(str)), default=[])
+    """Github tokens to spread the requests over (using the one with the most quota remaining), along with the `token`."""
     github_api_url = opt.Optional(opt.URL())
     """URL for github api endpoint if not standard github.com (This is not tested on github enterprise server)."""
     release_template = opt.Optional(opt.Type(str))
@@ -32,16 +61,311 @@ class PluginConfig(Config):
     """Autoprocess the release bodies for issue and username links."""
     include_prereleases = opt.Type(bool, default=False)
     """Include prereleases in the changelog."""
+    body_html = opt.Type(bool, default=False)
+    """Insert the release bodies as rendered by github (`body_html`), rather than autoprocessing them and parsing them as markdown."""
     enabled = opt.Type(bool, default=True)
     """Enable or disable the plugin."""
+    cache_ttl = opt.Type(int, default=600)
+    """Seconds before the releases are refreshed in the background under `mkdocs serve` (0 disables refreshing)."""
+    non_blocking = opt.Type(bool, default=False)
+    """Render a placeholder under `mkdocs serve` for releases that are still being fetched in the background."""
+    report = opt.Type(bool, default=False)
+    """Log a summary table of the timings and sizes for each changelog directive after the build."""
+    report_file = opt.Optional(opt.Type(str))
+    """Path (relative to the `mkdocs.yml` file) to write a JSON report of the timings and sizes to after the build."""
+    cache_dir = opt.Type(str, default='.cache/mkdocs_github_changelog')
+    """Directory (relative to the `mkdocs.yml` file) to store data between builds in."""
+    disk_cache = opt.Type(bool, default=True)
+    """Store the fetched releases in the `cache_dir`, and reuse them in later builds until the `cache_ttl` expires."""
+    cache_backend = opt.Choice(('files', 'sqlite'), default='files')
+    """How the `disk_cache` stores the releases, as compressed JSON `files`, or in an indexed `sqlite` database (loading each body only when it is rendered)."""
+    release_fields = opt.Optional(opt.ListOfItems(opt.Type(str)))
+    """Fields of each release (beyond those the default template uses) to keep when they are fetched (all if unset)."""
+    hosts = opt.Type(dict, default={})
+    """Configuration for each github host (keyed by API url): `token`, `max_concurrency`, `max_connections` and `timeout`."""
+    cache_max_size = opt.Type(int, default=500)
+    """Maximum size (in MB) of the releases stored in the `cache_dir`, the least recently used are evicted beyond it (0 is unlimited)."""
+    issue_titles = opt.Type(bool, default=False)
+    """Add the titles of the issues and pull requests linked by `autoprocess` to the links (looked up in batches, and kept in the `cache_dir`)."""
+    webhook_port = opt.Optional(opt.Type(int))
+    """Port on localhost to receive github `release` webhooks on under `mkdocs serve` (not started if unset)."""
+    webhook_secret = opt.Optional(opt.Type(str))
+    """Secret the github webhooks are signed with (unsigned webhooks are accepted if unset)."""
+    request_timeout = opt.Type(int, default=60)
+    """Seconds to wait for each request to github (a host's `timeout` overrides it)."""
+    build_timeout = opt.Type(int, default=0)
+    """Seconds each build can spend fetching releases, after which the last releases fetched (or a notice) are rendered instead (0 is unlimited)."""
+    error_ttl = opt.Type(int, default=300)
+    """Seconds to remember that a repository was not found (or forbidden), rather than requesting it again for each changelog (0 disables it)."""
+    discovery_ttl = opt.Type(int, default=3600)
+    """Seconds to keep the repositories of an organisation listed for a wildcard changelog (e.g. `org/*`) in the `cache_dir`."""
+    wildcard_concurrency = opt.Type(int, default=4)
+    """Repositories of a wildcard changelog to fetch the releases for concurrently."""
+    batch_size = opt.Type(int, default=0)
+    """Repositories to fetch the releases for in each batched GraphQL query before the build (0 fetches each with the REST API as its changelog is rendered)."""
+    hooks = opt.ListOfItems(opt.Type(str), default=[])
+    """Import paths (`module:attribute`) of instrumentation hooks to call with each event, along with those from the `mkdocs_github_changelog.hooks` entry points."""
+    release_feed = opt.Type(bool, default=False)
+    """Fetch the latest releases of public repositories from their Atom feeds (which don't count against the API rate limit) where possible, rather than the API."""
+    seed_from_event = opt.Type(bool, default=False)
+    """Add the release in the `release` event payload at `GITHUB_EVENT_PATH` (in github actions) to the cached releases of its repository before the build."""
 
 
 class MkdocsGithubChangelogPlugin(BasePlugin[PluginConfig]):
     """`mkdocs` plugin to provide the changelog from github releases."""
 
+    def __init__(self):
+        """Initialise the plugin."""
+        super().__init__()
+        self._cache = ReleaseCache()
+        self._refresher: ReleaseRefresher | None = None
+        self._is_serve = False
+        self._report: BuildReport | None = None
+        self._clients: HostClients | None = None
+        self._webhooks: WebhookReceiver | None = None
+        self._issue_titles: IssueTitles | None = None
+        self._feed: ReleaseFeed | None = None
+        self._event_seeded = False
+        self._repositories: RepositoryIndex | None = None
+        self._deadline: Deadline | None = None
+        self._prefetched: list[PrefetchResult] = []
+        # (org, repo) -> source paths of the pages with a changelog for it
+        self._pages: dict[tuple[str, str], set[str]] = {}
+
+    def on_startup(self, *, command: Literal['build', 'gh-deploy', 'serve'], dirty: bool) -> None:  # noqa: U100
+        """Record the command being run.
+
+        Defining this hook also tells `mkdocs` to keep the plugin instance (and so the cache) across rebuilds.
+        """
+        self._is_serve = command == 'serve'
+        if self._is_serve:
+            self._cache.on_fetched = self._invalidate
+
     def on_config(self, config: MkDocsConfig) -> MkDocsConfig | None:
         """Initialises the extension if the plugin is enabled."""
         if self.config.enabled:
-            github_release_changelog_extension = GithubReleaseChangelogExtension(self.config)
+            self.load_hooks()
+            self._cache.ttl = self.config.cache_ttl
+            self._cache.error_ttl = self.config.error_ttl
+            if self.config.disk_cache:
+                self._cache.disk_cache = self.get_disk_cache(config)
+            else:
+                self.close_disk_cache()
+                self._cache.disk_cache = None
+            if self.config.seed_from_event and not self._event_seeded:
+                # Once, rather than for each rebuild under mkdocs serve
+                from mkdocs_github_changelog.webhooks import seed_from_event
+                self._event_seeded = True
+                seed_from_event(self._cache)
+            self._report = BuildReport()
+            tokens = self.tokens()
+            if (
+                self._clients is None
+                or self._clients.hosts != self.config.hosts
+                or self._clients.tokens != tokens
+                or self._clients.timeout != self.config.request_timeout
+            ):
+                # Kept across rebuilds under mkdocs serve, unless the configuration changes
+                if self._clients is not None:
+                    self._clients.close()
+                try:
+                    self._clients = HostClients(self.config.hosts, tokens=tokens, timeout=self.config.request_timeout)
+                except ValueError as e:
+                    raise PluginError(f'Invalid mkdocs_github_changelog hosts configuration: {e}')
+            self._issue_titles = None
+            if self.config.issue_titles:
+                self._issue_titles = IssueTitles(self.cache_path(config, 'issue_titles.json'))
+            self._repositories = RepositoryIndex(self.cache_path(config, 'repositories.json'), ttl=self.config.discovery_ttl)
+            self._feed = ReleaseFeed(self.cache_path(config, 'feeds.json')) if self.config.release_feed else None
+            # Each build (or rebuild under mkdocs serve) has its own time to fetch the releases in
+            self._deadline = Deadline(self.config.build_timeout) if self.config.build_timeout else None
+            github_release_changelog_extension = GithubReleaseChangelogExtension(
+                self.config,
+                cache=self._cache,
+                non_blocking=self._is_serve and self.config.non_blocking,
+                report=self._report,
+                clients=self._clients,
+                issue_titles=self._issue_titles,
+                deadline=self._deadline,
+                repositories=self._repositories,
+                feed=self._feed,
+            )
             config.markdown_extensions.append(github_release_changelog_extension)  # type: ignore[arg-type]
         return config
+
+    def load_hooks(self) -> None:
+        """Register the instrumentation [`hooks`][mkdocs_github_changelog.hooks] from the entry points and the `hooks` option."""
+        try:
+            HOOKS.load(self.config.hooks)
+        except Exception as e:
+            raise PluginError(f'Unable to load the mkdocs_github_changelog hooks: {e}')
+
+    def on_pre_build(self, *, config: MkDocsConfig) -> None:
+        """Fetch the releases for every changelog in the docs in batched GraphQL queries, if `batch_size` is set."""
+        self._prefetched = []
+        if not self.config.enabled or not self.config.batch_size or self._clients is None:
+            return
+        directives = find_directives(config.docs_dir)
+        # Those that can't be batched (or fail) are fetched by their changelogs as usual
+        self._prefetched = prefetch(
+            directives, self.config, self._cache.disk_cache, clients=self._clients, batch_size=self.config.batch_size,
+            cache=self._cache, fallback=False, deadline=self._deadline, index=self._repositories,
+        )
+        fetched = [result for result in self._prefetched if result.ok]
+        if fetched:
+            logger.info(f'Fetched the releases for {len(fetched)} repositories in batched GraphQL queries')
+
+    def on_page_markdown(self, markdown: str, /, *, page: Page, config: MkDocsConfig, files: Files) -> str | None:  # noqa: U100
+        """Record which pages have changelogs for which repositories."""
+        if self._report is not None:
+            self._report.page = page.file.src_uri
+        if self.config.enabled and page.file.abs_src_path:
+            for match in GithubReleaseChangelogProcessor.regex.finditer(markdown):
+                self._pages.setdefault((match['org'], match['repo']), set()).add(page.file.abs_src_path)
+        return markdown
+
+    def on_post_build(self, *, config: MkDocsConfig) -> None:
+        """Record the API usage and output the report of the timings and sizes for each changelog directive."""
+        if self._report is None:
+            return
+        self._report.log_quota()
+        self._report.log_transfer()
+        disk_cache = self._cache.disk_cache
+        if disk_cache is not None and disk_cache.raw_bytes:
+            logger.info(
+                f'Stored {disk_cache.raw_bytes/1024:.1f} kB of releases in the cache as {disk_cache.stored_bytes/1024:.1f} kB '
+                f'({disk_cache.compression}), saved {disk_cache.bytes_saved/1024:.1f} kB'
+            )
+        if self._issue_titles is not None:
+            if self._issue_titles.requests:
+                logger.info(f'Looked up issue titles with {self._issue_titles.requests} GraphQL requests')
+            self._issue_titles.save()
+        if self._feed is not None:
+            if self._feed.requests:
+                logger.info(
+                    f'Requested {self._feed.requests} release feeds ({self._feed.not_modified} not modified), '
+                    f'fetching {self._feed.fallbacks} repositories from the API instead'
+                )
+            self._feed.save()
+        fetched = [d for d in self._report.directives if d.requests]
+        prefetched = [result for result in self._prefetched if result.ok]
+        if fetched or prefetched:
+            history = UsageHistory(self.cache_path(config, 'usage.json'))
+            for result in prefetched:
+                history.record(result.key, result.pages)
+            for d in fetched:
+                # Paging stops on an (extra) empty page
+                history.record(cache_key(d.org, d.repo, d.github_api_url), d.requests - 1)
+            history.save()
+        if self.config.report:
+            self._report.log_summary()
+        if self.config.report_file:
+            self._report.write_json(self._resolve_path(config, self.config.report_file))
+
+    def cache_path(self, config: MkDocsConfig, *parts: str) -> Path:
+        """Get a path in the `cache_dir`."""
+        return self._resolve_path(config, self.config.cache_dir).joinpath(*parts)
+
+    def tokens(self) -> list[str]:
+        """Get the configured tokens: the `token` and then the `tokens`, ignoring any unset environment variables."""
+        return [token for token in [self.config.token, *self.config.tokens] if token]
+
+    def get_disk_cache(self, config: MkDocsConfig) -> DiskCache | ReleaseStore:
+        """Get the disk cache in the `cache_dir` (for the `cache_backend`).
+
+        The `ReleaseStore` is kept across rebuilds (under `mkdocs serve`) while its path and size are unchanged.
+        """
+        max_size = self.config.cache_max_size*1024*1024
+        if self.config.cache_backend == 'sqlite':
+            path = self.cache_path(config, 'releases.sqlite3')
+            store = self._cache.disk_cache
+            if isinstance(store, ReleaseStore) and store.path == path and store.max_size == max_size:
+                # Only report the releases saved in this build
+                store.raw_bytes = store.stored_bytes = 0
+                return store
+            self.close_disk_cache()
+            return ReleaseStore(path, max_size=max_size)
+        self.close_disk_cache()
+        return DiskCache(self.cache_path(config), max_size=max_size)
+
+    def close_disk_cache(self) -> None:
+        """Close the connections of the `ReleaseStore` (if the disk cache is one)."""
+        if isinstance(self._cache.disk_cache, ReleaseStore):
+            self._cache.disk_cache.close()
+
+    @staticmethod
+    def _resolve_path(config: MkDocsConfig, path: str) -> Path:
+        """Resolve a path relative to the `mkdocs.yml` file."""
+        resolved = Path(path)
+        if not resolved.is_absolute() and config.config_file_path:
+            resolved = Path(config.config_file_path).parent/resolved
+        return resolved
+
+    def on_serve(self, server: LiveReloadServer, /, *, config: MkDocsConfig, builder: object) -> LiveReloadServer | None:  # noqa: U100
+        """Start refreshing the releases in the background, and receiving webhooks if `webhook_port` is set."""
+        if self.config.enabled and self._is_serve and self.config.cache_ttl and self._refresher is None:
+            self._refresher = ReleaseRefresher(self._cache, self._invalidate)
+            self._refresher.start()
+        if self.config.enabled and self._is_serve and self.config.webhook_port is not None and self._webhooks is None:
+            # Imported here, as the http server is only needed under mkdocs serve
+            from mkdocs_github_changelog.webhooks import WebhookReceiver
+            try:
+                self._webhooks = WebhookReceiver(
+                    self._on_release_event, port=self.config.webhook_port, secret=self.config.webhook_secret
+                ).start()
+            except OSError as e:
+                logger.warning(f'Unable to receive webhooks on port {self.config.webhook_port}: {e}')
+        return server
+
+    def on_shutdown(self) -> None:
+        """Stop refreshing and fetching the releases, and receiving webhooks, and close the connections."""
+        self._cache.shutdown()
+        self.close_disk_cache()
+        if self._clients is not None:
+            self._clients.close()
+            self._clients = None
+        if self._refresher is not None:
+            self._refresher.stop()
+            self._refresher = None
+        if self._webhooks is not None:
+            self._webhooks.stop()
+            self._webhooks = None
+
+    def _on_release_event(self, key: tuple[str, str, str], payload: dict) -> None:
+        """Update the releases for a repository from a `release` webhook, and reload its pages if they changed.
+
+        The releases are refetched instead if the payload doesn't have the fields github renders (e.g. ``body_html``).
+        """
+        from mkdocs_github_changelog.webhooks import apply_release_event, event_covers_fields
+        entry = self._cache.get(key)
+        if entry is not None and not event_covers_fields(payload, entry.fields):
+            logger.info(f'Refetching the releases for {key[1]}/{key[2]}, as the webhook does not have the rendered release body')
+            try:
+                changed = self._cache.refresh(key)
+            except Exception as e:
+                # Keep the existing releases, which are refreshed when the TTL expires
+                logger.warning(f'Unable to refresh releases for {key}: {e}')
+                return
+        else:
+            changed = self._cache.update(key, lambda releases, fields: apply_release_event(releases, payload, fields))
+        if changed:
+            self._invalidate([key])
+
+    def _invalidate(self, keys: list[tuple[str, str, str]]) -> None:
+        """Trigger a reload of the pages with changelogs for the given repositories.
+
+        Touching the source files is picked up by the `mkdocs serve` file watcher, and also marks just those
+        pages as modified for `mkdocs serve --dirty`.
+        """
+        for _, org, repo in keys:
+            # Including the pages with wildcard changelogs matching the repository
+            paths = set().union(*(
+                paths for (page_org, pattern), paths in self._pages.items()
+                if page_org == org and (pattern == repo or (is_wildcard(pattern) and matches(repo, pattern)))
+            ))
+            for path in paths:
+                logger.info(f'Reloading {path} for updated releases from {org}/{repo}')
+                try:
+                    os.utime(path)
+                except OSError as e:
+                    logger.warning(f'Unable to reload {path}: {e}')
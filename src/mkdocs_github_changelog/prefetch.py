@@ -0,0 +1,213 @@
+"""Fetch the releases for every repository referenced in the docs ahead of a build.
+
+The releases are stored in the plugin's [`DiskCache`][mkdocs_github_changelog.disk_cache.DiskCache], where the
+next build finds them (while they are younger than the `cache_ttl`), so they can be fetched as a separate step
+that can be retried or scheduled, e.g. in CI:
+
+```
+mkdocs-github-changelog prefetch -f mkdocs.yml
+mkdocs build
+```
+
+With ``batch_size`` set, the repositories whose changelogs only use fields GraphQL has are fetched in
+batched GraphQL queries instead (see [`batch`][mkdocs_github_changelog.batch]), falling back to the REST API
+for any that fail.
+"""
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, nullcontext
+from typing import Any, Iterable, Mapping, TYPE_CHECKING
+
+from mkdocs_github_changelog import get_releases, logger
+from mkdocs_github_changelog.batch import batchable, fetch_releases_batched
+from mkdocs_github_changelog.cache import merge_fields
+from mkdocs_github_changelog.clients import HostClient, HostClients
+from mkdocs_github_changelog.metrics import DirectiveMetrics
+from mkdocs_github_changelog.repositories import expand_directives
+
+if TYPE_CHECKING:
+    from mkdocs_github_changelog.cache import ReleaseCache
+    from mkdocs_github_changelog.disk_cache import DiskCache
+    from mkdocs_github_changelog.failures import Deadline
+    from mkdocs_github_changelog.release_store import ReleaseStore
+    from mkdocs_github_changelog.repositories import RepositoryIndex
+
+
+class PrefetchResult():
+    """The result of fetching the releases for a repository."""
+
+    def __init__(self, key: tuple[str, str, str], metrics: DirectiveMetrics, error: Exception | None = None, pages: int | None = None):
+        """Initialise the result, with the pages of releases fetched (if they weren't fetched with the REST API)."""
+        self.key = key
+        self.metrics = metrics
+        self.error = error
+        # Paging with the REST API stops on an (extra) empty page
+        self.pages = metrics.requests - 1 if pages is None else pages
+
+    @property
+    def ok(self) -> bool:
+        """Whether the releases were fetched."""
+        return self.error is None
+
+    def __str__(self) -> str:
+        """Summarise the result."""
+        host, org, repo = self.key
+        if not self.ok:
+            return f'FAILED  {host}/{org}/{repo}: {type(self.error).__name__}: {self.error}'
+        m = self.metrics
+        return f'ok      {host}/{org}/{repo}: {m.releases_seen} releases, {m.requests} requests, {m.total:.2f}s'
+
+
+def _save(
+    key: tuple[str, str, str],
+    releases: list,
+    fields: tuple[str, ...] | None,
+    disk_cache: DiskCache | ReleaseStore | None = None,
+    cache: ReleaseCache | None = None,
+) -> None:
+    if disk_cache is not None:
+        disk_cache.save(key, releases, fields=fields)
+    if cache is not None:
+        cache.set(key, releases, fields)
+
+
+def _prefetch_repository(
+    key: tuple[str, str, str],
+    client: HostClient,
+    disk_cache: DiskCache | ReleaseStore | None,
+    fields: tuple[str, ...] | None = None,
+    stream: bool = True,
+    cache: ReleaseCache | None = None,
+) -> PrefetchResult:
+    _, org, repo = key
+    github_api_url = client.github_api_url
+    metrics = DirectiveMetrics(org, repo, github_api_url=github_api_url)
+    # Builds sharing the cache wait for the releases rather than fetching them too
+    with nullcontext() if disk_cache is None else disk_cache.lock(key):
+        try:
+            releases = get_releases.fetch_releases(
+                org, repo, token=client.token, github_api_url=github_api_url, metrics=metrics, client=client, fields=fields,
+                stream=stream,
+            )
+        except Exception as e:
+            logger.warning(f'Unable to fetch the releases for {org}/{repo}: {e}')
+            return PrefetchResult(key, metrics, e)
+        metrics.releases_seen = len(releases)
+        _save(key, releases, fields, disk_cache, cache)
+    return PrefetchResult(key, metrics)
+
+
+def _prefetch_batch(
+    keys: list[tuple[str, str, str]],
+    client: HostClient,
+    disk_cache: DiskCache | ReleaseStore | None,
+    fields: Mapping[tuple[str, str, str], tuple[str, ...]],
+    batch_size: int,
+    stream: bool = True,
+    cache: ReleaseCache | None = None,
+    fallback: bool = True,
+    deadline: Deadline | None = None,
+) -> list[PrefetchResult]:
+    metrics = {key: DirectiveMetrics(key[1], key[2], github_api_url=client.github_api_url) for key in keys}
+    with ExitStack() as stack:
+        if disk_cache is not None:
+            # In the same order in every process, so builds sharing the cache can't deadlock
+            for key in sorted(keys):
+                stack.enter_context(disk_cache.lock(key))
+        fetched = fetch_releases_batched(keys, client, fields, batch_size=batch_size, metrics=metrics, deadline=deadline)
+        for key, releases in fetched.items():
+            if not isinstance(releases, Exception):
+                _save(key, releases, fields[key], disk_cache, cache)
+    results = []
+    for key in keys:
+        error = fetched[key]
+        if not isinstance(error, Exception):
+            results.append(PrefetchResult(key, metrics[key], pages=metrics[key].requests))
+        elif fallback:
+            logger.info(f'Unable to fetch the releases for {key[1]}/{key[2]} in a batch ({error}), fetching them with the REST API')
+            results.append(_prefetch_repository(key, client, disk_cache, fields[key], stream, cache))
+        else:
+            results.append(PrefetchResult(key, metrics[key], error))
+    return results
+
+
+def prefetch(
+    directives: Iterable[Any],
+    plugin_config: Mapping[str, Any],
+    disk_cache: DiskCache | ReleaseStore | None,
+    max_workers: int = 4,
+    clients: HostClients | None = None,
+    batch_size: int = 0,
+    cache: ReleaseCache | None = None,
+    fallback: bool = True,
+    deadline: Deadline | None = None,
+    index: RepositoryIndex | None = None,
+) -> list[PrefetchResult]:
+    """Fetch the releases for each repository referenced by the directives concurrently, and store them.
+
+    Each repository is only fetched once, however many directives reference it, with the fields all of
+    their templates use. Each host is fetched from
+    by up to ``max_workers`` threads (or its ``max_concurrency`` in the ``clients``), so a slow host doesn't
+    hold up the others.
+
+    With a ``batch_size``, the repositories that can be are fetched in batched GraphQL queries of up to that many
+    repositories, and any that fail are fetched with the REST API. If ``fallback`` is False, the repositories
+    that can't be batched (or fail) are left for the changelogs to fetch instead. With a
+    [`ReleaseCache`][mkdocs_github_changelog.cache.ReleaseCache], the repositories it already has (or that
+    failed recently) are skipped, and the releases are stored in it as well as the ``disk_cache``.
+
+    Wildcard directives are replaced by the repositories they match, listed with the ``index`` (a new one if it isn't provided).
+    """
+    if clients is None:
+        tokens = [plugin_config.get('token', None), *(plugin_config.get('tokens', None) or [])]
+        clients = HostClients(plugin_config.get('hosts', None), max_concurrency=max_workers, tokens=tokens)
+    directives = expand_directives(directives, plugin_config, clients, index)
+    repositories: dict[tuple[str, str, str], HostClient] = {}
+    # The fields used by the templates of every directive for the repository
+    fields: dict[tuple[str, str, str], tuple[str, ...] | None] = {}
+    release_fields = plugin_config.get('release_fields', None)
+    for directive in directives:
+        key = directive.key(plugin_config)
+        release_template = directive.option('release_template', plugin_config)
+        if release_template is None and directive.option('body_html', plugin_config):
+            release_template = get_releases.HTML_RELEASE_TEMPLATE
+        directive_fields = get_releases.template_projection(release_template, release_fields)
+        fields[key] = merge_fields(fields[key], directive_fields) if key in fields else directive_fields
+        if key in repositories:
+            continue
+        github_api_url = directive.option('github_api_url', plugin_config)
+        # The directive's token, or else the host's tokens, or else the plugin's tokens
+        repositories[key] = clients.get(github_api_url, directive.options.get('token', None))
+    if cache is not None:
+        for key in list(repositories):
+            fields[key] = cache.fields_to_fetch(key, fields[key])
+            if cache.cached(key, fields[key]) or cache.failure(key) is not None:
+                del repositories[key]
+    if not repositories:
+        return []
+    hosts = {client.host for client in repositories.values()}
+    workers = max_workers*len(hosts)
+    stream = release_fields is not None
+    # The repositories to fetch in batches from each client (GraphQL needs a token)
+    batches: dict[HostClient, list[tuple[str, str, str]]] = {}
+    if batch_size:
+        for key, client in repositories.items():
+            if batchable(fields[key]) and len(client.tokens):
+                batches.setdefault(client, []).append(key)
+    batched = {key for keys in batches.values() for key in keys}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='mkdocs_github_changelog-prefetch') as executor:
+        batch_futures = [
+            executor.submit(_prefetch_batch, keys[start: start + batch_size], client, disk_cache, fields, batch_size, stream, cache, fallback, deadline)
+            for client, keys in batches.items()
+            for start in range(0, len(keys), batch_size)
+        ]
+        futures = [
+            executor.submit(_prefetch_repository, key, client, disk_cache, fields[key], stream, cache)
+            for key, client in repositories.items()
+            if key not in batched and fallback
+        ]
+    results = {result.key: result for future in batch_futures for result in future.result()}
+    results.update((result.key, result) for result in (future.result() for future in futures))
+    # In the order the directives reference them
+    return [results[key] for key in repositories if key in results]
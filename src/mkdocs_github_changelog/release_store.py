@@ -0,0 +1,508 @@
+"""Store the releases fetched from github in an indexed SQLite database, loading their bodies only when used.
+
+A [`DiskCache`][mkdocs_github_changelog.disk_cache.DiskCache] keeps each repository's releases as one JSON
+document, which is decoded in full (bodies included) whenever it is read. With ``cache_backend: sqlite``, a
+[`ReleaseStore`][mkdocs_github_changelog.release_store.ReleaseStore] keeps them in ``releases.sqlite3`` in the
+``cache_dir`` instead, with a row for each release, indexed by repository, ``published_at``, ``name`` and the
+``prerelease`` and ``draft`` flags, and the (compressed) body in its own column.
+
+Releases are loaded as [`StoredRelease`][mkdocs_github_changelog.release_store.StoredRelease] objects without
+their bodies, which are read from the database when they are first used, so only the bodies of the releases that
+are rendered are loaded. The releases to render are selected (with
+[`ReleaseStore.select`][mkdocs_github_changelog.release_store.ReleaseStore.select]) by a query on the indexed
+flags and names (with a regex check only for the part of a ``match`` pattern that isn't literal text), as long as
+the stored releases are still the ones loaded.
+
+The database can be shared by builds running concurrently in separate processes (or by the ``prefetch``
+command), using SQLite's write-ahead log so reads don't wait for writes, and the same per repository
+[`FileLock`][mkdocs_github_changelog.disk_cache.FileLock] as the ``DiskCache`` while a repository is fetched.
+"""
+from __future__ import annotations
+
+from contextlib import contextmanager
+from datetime import datetime
+from functools import partial
+import hashlib
+import json
+from pathlib import Path
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Iterable, Iterator
+import zlib
+
+from mkdocs_github_changelog import logger
+from mkdocs_github_changelog.disk_cache import _slug, DEFAULT_LOCK_TIMEOUT, FileLock
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS repositories (
+    host TEXT NOT NULL,
+    org TEXT NOT NULL,
+    repo TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    fields TEXT,
+    generation INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (host, org, repo)
+);
+CREATE TABLE IF NOT EXISTS releases (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    host TEXT NOT NULL,
+    org TEXT NOT NULL,
+    repo TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT,
+    tag_name TEXT,
+    published_at TEXT,
+    draft INTEGER NOT NULL,
+    prerelease INTEGER NOT NULL,
+    data BLOB NOT NULL,
+    has_body INTEGER NOT NULL,
+    body BLOB,
+    body_digest TEXT
+);
+CREATE INDEX IF NOT EXISTS releases_repository ON releases (host, org, repo, position);
+CREATE INDEX IF NOT EXISTS releases_flags ON releases (host, org, repo, draft, prerelease, published_at);
+CREATE INDEX IF NOT EXISTS releases_published_at ON releases (host, org, repo, published_at);
+CREATE INDEX IF NOT EXISTS releases_name ON releases (host, org, repo, name);
+'''
+COLUMNS = ('id', 'data', 'has_body', 'body_digest')
+MAX_IDLE_CONNECTIONS = 4
+"""Connections kept open for later, when they aren't in use."""
+
+
+def _field(release: Any, name: str) -> Any:
+    """Get a field of a release (loading it if it is a ``StoredRelease``), or None if it doesn't have it."""
+    try:
+        return release[name]
+    except (KeyError, TypeError):
+        return getattr(release, name, None)
+
+
+def _published_at(release: Any) -> str | None:
+    """Get the ``published_at`` of a release to index, or None if it has none."""
+    value = _field(release, 'published_at')
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, str) and value:
+        return value
+    return None
+
+
+def _matches(pattern: str, name: str | None) -> bool:
+    """Whether a release's name matches the ``match`` pattern (from its start, as ``re.match``)."""
+    return name is not None and re.match(pattern, name) is not None
+
+
+def _literal_prefix(pattern: str) -> tuple[str, bool]:
+    """Get the literal text a ``match`` pattern's matches start with, and whether the pattern is only that text.
+
+    The prefix stops at the first special character (or escape for a class of characters), without the character
+    before a quantifier, and is empty for patterns with alternatives.
+    """
+    if '|' in pattern:
+        return '', False
+    prefix = []
+    position = 0
+    while position < len(pattern):
+        char = pattern[position]
+        if char == '\\' and position + 1 < len(pattern) and not pattern[position + 1].isalnum():
+            char, step = pattern[position + 1], 2
+        elif char.isalnum() or char in ' -_/:@#%&=,;<>!~"\'':
+            step = 1
+        else:
+            break
+        if char in '*?[':
+            # Special in a GLOB
+            break
+        if pattern[position + step:position + step + 1] in ('*', '?', '+', '{'):
+            # Optional or repeated
+            return ''.join(prefix), False
+        prefix.append(char)
+        position += step
+    return ''.join(prefix), position == len(pattern)
+
+
+class StoredRelease(dict):
+    """A release loaded from a [`ReleaseStore`][mkdocs_github_changelog.release_store.ReleaseStore], with its body loaded when it is first used.
+
+    The fields are also available as attributes (as with ghapi's releases).
+    """
+
+    def __init__(
+        self,
+        data: dict[str, Any],
+        load_body: Callable[[], Any] | None = None,
+        generation: int | None = None,
+        body_digest: str | None = None,
+    ):
+        """Initialise the release from its fields (without the body), the function to load its body (if it has one) and the body's digest."""
+        super().__init__(data)
+        self.__dict__['_load_body'] = load_body
+        self.__dict__['_generation'] = generation
+        self.__dict__['_body_digest'] = body_digest
+
+    @property
+    def generation(self) -> int | None:
+        """The version of the repository's stored releases this was loaded from."""
+        return self.__dict__['_generation']
+
+    @property
+    def body_digest(self) -> str | None:
+        """The digest of the body that was stored (see ``releases_digest``), or None if it has been loaded (or wasn't stored)."""
+        if dict.__contains__(self, 'body') or self.__dict__['_load_body'] is None:
+            return None
+        return self.__dict__['_body_digest']
+
+    def __missing__(self, name: str) -> Any:
+        """Load the body the first time it is used."""
+        load_body = self.__dict__.get('_load_body', None)
+        if name != 'body' or load_body is None:
+            raise KeyError(name)
+        self['body'] = body = load_body()
+        return body
+
+    def __getattr__(self, name: str) -> Any:
+        """Get a field as an attribute."""
+        if name.startswith('_'):
+            raise AttributeError(name)
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        """Set a field as an attribute."""
+        self[name] = value
+
+    def __copy__(self) -> StoredRelease:
+        """Copy the release, sharing how its body is loaded (if it hasn't been)."""
+        return StoredRelease(self, self.__dict__['_load_body'], self.generation, self.__dict__['_body_digest'])
+
+
+class ReleaseStore():
+    """Releases stored as rows in an indexed SQLite database, with the same interface as a ``DiskCache``."""
+
+    compression = 'zlib'
+
+    def __init__(
+        self,
+        path: str | Path,
+        max_size: int | None = None,
+        lock_timeout: float | None = DEFAULT_LOCK_TIMEOUT,
+    ):
+        """Initialise the store, creating the database if it doesn't exist.
+
+        ``max_size`` is the size (in bytes) the stored releases are kept under, by evicting the least recently
+        used repositories (None or 0 is unlimited).
+        """
+        self.path = Path(path)
+        self.max_size = max_size
+        self.lock_timeout = lock_timeout
+        # The sizes of the releases saved, before and after compression
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+        # The connections not in use, which are used by any thread (one at a time)
+        self._idle: list[sqlite3.Connection] = []
+        self._idle_lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as connection, connection:
+            connection.executescript(SCHEMA)
+            if 'body_digest' not in {column[1] for column in connection.execute('PRAGMA table_info(releases)')}:
+                # Stored by an earlier version, the digests of these bodies are found by loading them
+                connection.execute('ALTER TABLE releases ADD COLUMN body_digest TEXT')
+
+    @property
+    def bytes_saved(self) -> int:
+        """The bytes saved by compressing the releases saved."""
+        return self.raw_bytes - self.stored_bytes
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Use a connection to the database that isn't in use (or a new one), keeping it for later if there are fewer than ``MAX_IDLE_CONNECTIONS``.
+
+        So the threads that only use the store for a while (e.g. fetching a build's repositories) don't keep a
+        connection open each.
+        """
+        with self._idle_lock:
+            connection = self._idle.pop() if self._idle else None
+        if connection is None:
+            # Used by whichever thread takes it next
+            connection = sqlite3.connect(self.path, timeout=self.lock_timeout or DEFAULT_LOCK_TIMEOUT, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.create_function('matches', 2, _matches, deterministic=True)
+        try:
+            yield connection
+        finally:
+            with self._idle_lock:
+                kept = len(self._idle) < MAX_IDLE_CONNECTIONS
+                if kept:
+                    self._idle.append(connection)
+            if not kept:
+                connection.close()
+
+    def close(self) -> None:
+        """Close the connections that aren't in use (those in use are kept for later, or closed, when they are finished with)."""
+        with self._idle_lock:
+            connections, self._idle = self._idle, []
+        for connection in connections:
+            connection.close()
+
+    def _lock_path(self, key: tuple[str, str, str]) -> Path:
+        host, org, repo = key
+        return self.path.parent/'locks'/_slug(host)/org/f'{repo}.lock'
+
+    @contextmanager
+    def lock(self, key: tuple[str, str, str]) -> Iterator[None]:
+        """Hold the lock for a repository (e.g. while fetching it).
+
+        If the lock can't be acquired before the ``lock_timeout``, this continues without it.
+        """
+        lock = FileLock(self._lock_path(key), timeout=self.lock_timeout)
+        try:
+            lock.acquire()
+        except TimeoutError:
+            logger.warning(f'Timed out waiting for another process to fetch {key}, continuing without the lock')
+        except OSError as e:
+            logger.warning(f'Unable to lock {lock.path}: {e}')
+        try:
+            yield
+        finally:
+            lock.release()
+
+    def _release(self, key: tuple[str, str, str], row: tuple[int, bytes, int, str | None], generation: int) -> StoredRelease:
+        """Get a release from its row, loading the body when it is used."""
+        from fastcore.xtras import dict2obj
+        release_id, data, has_body, digest = row
+        data = json.loads(zlib.decompress(data))
+        load_body = partial(self._body, key, release_id, data.get('tag_name', None)) if has_body else None
+        return StoredRelease(dict2obj(data), load_body, generation, digest)
+
+    def _body(self, key: tuple[str, str, str], release_id: int, tag_name: str | None) -> Any:
+        """Load the body of a release (by its tag if the releases have been stored again since it was loaded)."""
+        with self._connect() as connection:
+            row = connection.execute('SELECT body FROM releases WHERE id = ?', (release_id,)).fetchone()
+            if row is None and tag_name is not None:
+                row = connection.execute(
+                    'SELECT body FROM releases WHERE host = ? AND org = ? AND repo = ? AND tag_name = ?', (*key, tag_name)
+                ).fetchone()
+        if row is None or row[0] is None:
+            logger.debug(f'The body of release {tag_name} of {key} is no longer stored')
+            return None
+        return json.loads(zlib.decompress(row[0]))
+
+    def _repository(self, key: tuple[str, str, str]) -> tuple[float, list[str] | None, int] | None:
+        """Get the time a repository's releases were fetched, their fields and generation, or None if they aren't stored."""
+        with self._connect() as connection:
+            row = connection.execute(
+                'SELECT fetched_at, fields, generation FROM repositories WHERE host = ? AND org = ? AND repo = ?', key
+            ).fetchone()
+        if row is None:
+            return None
+        fetched_at, fields, generation = row
+        return fetched_at, None if fields is None else json.loads(fields), generation
+
+    def stored_fields(self, key: tuple[str, str, str]) -> tuple[str, ...] | None:
+        """Get the fields the releases for a repository were stored with (None is all of them), raising a ``KeyError`` if they aren't stored."""
+        repository = self._repository(key)
+        if repository is None:
+            raise KeyError(key)
+        fields = repository[1]
+        return None if fields is None else tuple(fields)
+
+    def load(
+        self,
+        key: tuple[str, str, str],
+        max_age: float | None = None,
+        fields: Iterable[str] | None = None,
+    ) -> tuple[list, float] | None:
+        """Get the releases for a repository (without their bodies until they are used) and the (epoch) time they were fetched.
+
+        Returns None if they have not been stored, can't be read, are older than ``max_age`` seconds (a
+        ``max_age`` of None or 0 never expires), or were stored without some of the ``fields`` (None is all
+        of the fields).
+        """
+        try:
+            repository = self._repository(key)
+            if repository is None:
+                return None
+            fetched_at, stored_fields, generation = repository
+            if stored_fields is not None and (fields is None or not set(fields).issubset(stored_fields)):
+                logger.debug(f'Stored releases for {key} do not have all of the fields needed')
+                return None
+            if max_age and time.time() - fetched_at >= max_age:
+                logger.debug(f'Stored releases for {key} have expired')
+                return None
+            with self._connect() as connection:
+                rows = connection.execute(
+                    f'SELECT {", ".join(COLUMNS)} FROM releases WHERE host = ? AND org = ? AND repo = ? ORDER BY position', key
+                ).fetchall()
+                releases = [self._release(key, row, generation) for row in rows]
+                with connection:
+                    connection.execute('UPDATE repositories SET last_used = ? WHERE host = ? AND org = ? AND repo = ?', (time.time(), *key))
+        except Exception as e:
+            # Any error reading or decoding the releases means they can't be used
+            logger.warning(f'Unable to load the stored releases for {key} from {self.path}: {e}')
+            return None
+        return releases, fetched_at
+
+    def select(
+        self,
+        key: tuple[str, str, str],
+        releases: list,
+        match: str | None = None,
+        include_prereleases: bool | None = False,
+    ) -> list | None:
+        """Select the published releases to render (as ``_process_releases`` would) with an indexed query.
+
+        The literal text the ``match`` pattern starts with is matched with a ``GLOB`` (using the index on the
+        names), and only patterns with more than that are then checked with ``re.match`` for each row left.
+        Returns None unless the ``releases`` were all loaded from the releases that are stored now.
+        """
+        generations = {release.generation if isinstance(release, StoredRelease) else None for release in releases}
+        if len(generations) != 1 or None in generations:
+            return None
+        try:
+            repository = self._repository(key)
+            if repository is None or repository[2] not in generations:
+                return None
+            query = (
+                f'SELECT {", ".join(COLUMNS)} FROM releases WHERE host = ? AND org = ? AND repo = ? AND draft = 0 '
+                'AND (? OR prerelease = 0) AND published_at IS NOT NULL'
+            )
+            parameters = [*key, bool(include_prereleases)]
+            if match:
+                prefix, literal = _literal_prefix(match)
+                if prefix:
+                    # Uses the index on the names
+                    query += ' AND name GLOB ?'
+                    parameters.append(f'{prefix}*')
+                if not literal:
+                    query += ' AND matches(?, name)'
+                    parameters.append(match)
+            with self._connect() as connection:
+                rows = connection.execute(f'{query} ORDER BY position', parameters).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f'Unable to select the stored releases for {key} from {self.path}: {e}')
+            return None
+        return [self._release(key, row, repository[2]) for row in rows]
+
+    def save(
+        self,
+        key: tuple[str, str, str],
+        releases: list,
+        fetched_at: float | None = None,
+        fields: Iterable[str] | None = None,
+    ) -> None:
+        """Store the releases for a repository, which only have the ``fields`` (if they are provided)."""
+        from fastcore.xtras import obj2dict
+        raw_bytes = stored_bytes = 0
+        rows = []
+        for position, release in enumerate(releases):
+            if isinstance(release, StoredRelease):
+                has_body = 'body' in release or release.__dict__['_load_body'] is not None
+            elif isinstance(release, dict):
+                has_body = 'body' in release
+            else:
+                has_body = hasattr(release, 'body')
+            # Loads the body of a StoredRelease that hasn't been used, before its row is replaced
+            body = json.dumps(_field(release, 'body'), default=str).encode('utf-8') if has_body else None
+            data = obj2dict(release)
+            data.pop('body', None)
+            encoded = json.dumps(data, default=str).encode('utf-8')
+            compressed = zlib.compress(encoded, 6)
+            compressed_body = None if body is None else zlib.compress(body, 6)
+            # The same as the body's cache.body_digest, so releases_digest doesn't need to load it
+            digest = None if body is None else hashlib.sha256(body).hexdigest()
+            raw_bytes += len(encoded) + len(body or b'')
+            stored_bytes += len(compressed) + len(compressed_body or b'')
+            rows.append((
+                *key,
+                position,
+                _field(release, 'name'),
+                _field(release, 'tag_name'),
+                _published_at(release),
+                bool(_field(release, 'draft')),
+                bool(_field(release, 'prerelease')),
+                compressed,
+                has_body,
+                compressed_body,
+                digest,
+            ))
+        try:
+            with self._connect() as connection, connection:
+                row = connection.execute('SELECT generation FROM repositories WHERE host = ? AND org = ? AND repo = ?', key).fetchone()
+                connection.execute('DELETE FROM releases WHERE host = ? AND org = ? AND repo = ?', key)
+                connection.executemany(
+                    'INSERT INTO releases (host, org, repo, position, name, tag_name, published_at, draft, prerelease, data, has_body, body, body_digest) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    rows,
+                )
+                connection.execute(
+                    'INSERT OR REPLACE INTO repositories (host, org, repo, fetched_at, fields, generation, last_used) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (
+                        *key,
+                        time.time() if fetched_at is None else fetched_at,
+                        None if fields is None else json.dumps(list(fields)),
+                        (row[0] if row is not None else 0) + 1,
+                        time.time(),
+                    ),
+                )
+        except sqlite3.Error as e:
+            logger.warning(f'Unable to store the releases for {key} in {self.path}: {e}')
+            return
+        self.raw_bytes += raw_bytes
+        self.stored_bytes += stored_bytes
+        logger.debug(f'Stored the releases for {key} in {stored_bytes/1024:.1f} kB ({raw_bytes/1024:.1f} kB uncompressed)')
+        if self.max_size:
+            self.evict(keep=key)
+
+    def _sizes(self) -> list[tuple[tuple[str, str, str], int]]:
+        """Get the key and size of each stored repository, least recently used first."""
+        with self._connect() as connection:
+            rows = connection.execute(
+                'SELECT r.host, r.org, r.repo, COALESCE(SUM(LENGTH(s.data) + COALESCE(LENGTH(s.body), 0)), 0) FROM repositories r '
+                'LEFT JOIN releases s ON s.host = r.host AND s.org = r.org AND s.repo = r.repo '
+                'GROUP BY r.host, r.org, r.repo ORDER BY r.last_used'
+            ).fetchall()
+        return [((host, org, repo), size) for host, org, repo, size in rows]
+
+    def size(self) -> int:
+        """Get the total size of the stored releases, in bytes."""
+        return sum(size for _, size in self._sizes())
+
+    def evict(self, keep: tuple[str, str, str] | None = None) -> list[tuple[str, str, str]]:
+        """Remove the least recently used repositories until the store is under the ``max_size``.
+
+        Repositories that are locked (being fetched by another process) and the ``keep`` repository are not removed.
+        """
+        if not self.max_size:
+            return []
+        sizes = self._sizes()
+        total = sum(size for _, size in sizes)
+        evicted = []
+        for key, size in sizes:
+            if total <= self.max_size:
+                break
+            if key == keep:
+                continue
+            lock = FileLock(self._lock_path(key))
+            try:
+                if not lock.acquire(blocking=False):
+                    continue
+            except OSError:
+                continue
+            try:
+                with self._connect() as connection, connection:
+                    connection.execute('DELETE FROM releases WHERE host = ? AND org = ? AND repo = ?', key)
+                    connection.execute('DELETE FROM repositories WHERE host = ? AND org = ? AND repo = ?', key)
+            except sqlite3.Error as e:
+                logger.warning(f'Unable to evict {key}: {e}')
+                continue
+            finally:
+                lock.release()
+            total -= size
+            evicted.append(key)
+            logger.debug(f'Evicted {key} from the store')
+        return evicted
@@ -0,0 +1,269 @@
+"""Render the changelogs for many repositories outside of mkdocs (e.g. for release emails or internal portals).
+
+A [`ChangelogRenderer`][mkdocs_github_changelog.renderer.ChangelogRenderer] owns the pooled connections to each
+github host, the release cache (and the ``cache_dir`` it is stored in), and the compiled templates, so rendering many
+changelogs reuses them all rather than starting again for each repository:
+
+```python
+from mkdocs_github_changelog.renderer import ChangelogRenderer
+
+with ChangelogRenderer(tokens=['...'], cache_dir='.changelogs') as renderer:
+    markdown = renderer.render('djpugh/mkdocs_github_changelog', match='v1.*')
+    for result in renderer.render_many(['abc/def', 'abc/mkdocs-*']):
+        print(result.repository, result.ok)
+```
+
+The changelogs have the same options (and templates) as the plugin, and repositories can be wildcards, as with the
+``::github-release-changelog`` directive. The ``render`` command does the same from the command line:
+
+```
+mkdocs-github-changelog render abc/def abc/mkdocs-* -o changelogs
+```
+"""
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+import sys
+from typing import Any, Iterable, Mapping, TextIO
+
+from mkdocs_github_changelog.cache import ReleaseCache
+from mkdocs_github_changelog.clients import DEFAULT_TIMEOUT, HostClients
+from mkdocs_github_changelog.disk_cache import DiskCache
+from mkdocs_github_changelog.feed import ReleaseFeed
+from mkdocs_github_changelog.get_releases import (
+    get_releases_as_markdown,
+    HTML_HEADING_RE,
+    HTML_RELEASE_TEMPLATE,
+    RELEASE_TEMPLATE,
+    template_projection,
+)
+from mkdocs_github_changelog.release_store import ReleaseStore
+from mkdocs_github_changelog.repositories import (
+    DISCOVERY_TTL,
+    is_wildcard,
+    RepositoryIndex,
+    select_repositories,
+)
+from mkdocs_github_changelog.titles import IssueTitles
+
+MAX_WORKERS = 4
+"""Repositories to render concurrently."""
+CACHE_BACKENDS = ('files', 'sqlite')
+RENDER_OPTIONS = ('release_template', 'match', 'autoprocess', 'include_prereleases', 'body_html', 'release_fields', 'heading_offset')
+DEFAULT_OPTIONS = {
+    'release_template': None,
+    'match': None,
+    'autoprocess': True,
+    'include_prereleases': False,
+    'body_html': False,
+    'release_fields': None,
+    'heading_offset': 0,
+}
+
+
+def _raw_html(html: str | None, heading_offset: int = 0) -> str:
+    """Insert github's rendered html as is (markdown passes html through), with its headings moved down by the ``heading_offset``."""
+    if html and heading_offset > 0:
+        html = HTML_HEADING_RE.sub(lambda match: f'<{match[1]}h{min(int(match[2]) + heading_offset, 6)}', html)
+    return html or ''
+
+
+def split_repository(repository: str) -> tuple[str, str]:
+    """Split an ``<org>/<repo>`` repository into the organisation (or user) and repository, raising a ``ValueError`` if it isn't one."""
+    org, _, repo = repository.strip().strip('/').partition('/')
+    if not org or not repo or '/' in repo:
+        raise ValueError(f'Expected a repository as <org>/<repo>, not {repository!r}')
+    return org, repo
+
+
+class RenderResult():
+    """The changelog rendered for a repository (or the error rendering it)."""
+
+    def __init__(self, repository: str, markdown: str | None = None, error: Exception | None = None):
+        """Initialise the result for the repository (``<org>/<repo>``)."""
+        self.repository = repository
+        self.markdown = markdown
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        """Whether the changelog was rendered."""
+        return self.error is None
+
+    def __str__(self) -> str:
+        """Summarise the result."""
+        if not self.ok:
+            return f'FAILED  {self.repository}: {type(self.error).__name__}: {self.error}'
+        return f'ok      {self.repository}: {len(self.markdown or "")} characters'
+
+
+class ChangelogRenderer():
+    """Render changelogs for many repositories, reusing the connections, caches and templates between them."""
+
+    def __init__(
+        self,
+        tokens: Iterable[str | None] = (),
+        github_api_url: str | None = None,
+        hosts: Mapping[str, Mapping[str, Any]] | None = None,
+        cache_dir: str | Path | None = None,
+        cache_backend: str = 'files',
+        cache_ttl: float | None = 600,
+        issue_titles: bool = False,
+        release_feed: bool = False,
+        discovery_ttl: float | None = DISCOVERY_TTL,
+        max_workers: int = MAX_WORKERS,
+        timeout: float = DEFAULT_TIMEOUT,
+        **options: Any,
+    ):
+        """Initialise the renderer, with the default ``options`` for each changelog (as for the plugin).
+
+        The releases (and repositories of each organisation, issue titles and feed validators) are stored in the
+        ``cache_dir`` (if it is set) and reused until the ``cache_ttl`` expires. With ``release_feed`` set, the
+        releases are fetched from the releases [`feed`][mkdocs_github_changelog.feed] where possible. Raises a ``ValueError`` for unknown options, an
+        unknown ``cache_backend`` (``files`` or ``sqlite``, as for the plugin) or an invalid ``hosts`` configuration.
+        """
+        self.options = self._options(DEFAULT_OPTIONS, options)
+        if cache_backend not in CACHE_BACKENDS:
+            raise ValueError(f'Unknown cache backend: {cache_backend!r} (expected {", ".join(CACHE_BACKENDS)})')
+        self.github_api_url = github_api_url
+        self.max_workers = max_workers
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        self.clients = HostClients(hosts, max_concurrency=max_workers, tokens=tokens, timeout=timeout)
+        disk_cache: DiskCache | ReleaseStore | None = None
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            if cache_backend == 'sqlite':
+                disk_cache = ReleaseStore(self.cache_dir/'releases.sqlite3')
+            else:
+                disk_cache = DiskCache(self.cache_dir)
+        self.cache = ReleaseCache(ttl=cache_ttl, max_workers=max_workers, disk_cache=disk_cache)
+        self.index = RepositoryIndex(self.cache_dir/'repositories.json' if self.cache_dir is not None else None, ttl=discovery_ttl)
+        self.issue_titles = None
+        if issue_titles:
+            self.issue_titles = IssueTitles(self.cache_dir/'issue_titles.json' if self.cache_dir is not None else None)
+        self.feed = None
+        if release_feed:
+            self.feed = ReleaseFeed(self.cache_dir/'feeds.json' if self.cache_dir is not None else None)
+
+    @staticmethod
+    def _options(defaults: Mapping[str, Any], options: Mapping[str, Any]) -> dict[str, Any]:
+        unknown = set(options).difference(RENDER_OPTIONS)
+        if unknown:
+            raise ValueError(f'Unknown changelog options: {", ".join(sorted(unknown))} (expected {", ".join(RENDER_OPTIONS)})')
+        return {**defaults, **options}
+
+    def __enter__(self) -> ChangelogRenderer:
+        """Use the renderer, closing it afterwards."""
+        return self
+
+    def __exit__(self, *args: Any) -> None:  # noqa: U100
+        """Close the renderer."""
+        self.close()
+
+    def close(self) -> None:
+        """Save the issue titles (and feed validators), and close the connection pools and background workers."""
+        if self.issue_titles is not None:
+            self.issue_titles.save()
+        if self.feed is not None:
+            self.feed.save()
+        self.cache.shutdown()
+        self.clients.close()
+
+    def repositories(self, repositories: Iterable[str]) -> list[str]:
+        """Get the repositories as ``<org>/<repo>``, replacing any wildcards with those they match, in order and once each."""
+        expanded = []
+        for repository in repositories:
+            org, repo = split_repository(repository)
+            if not is_wildcard(repo):
+                expanded.append(f'{org}/{repo}')
+                continue
+            listed = self.index.get(org, self.clients.get(self.github_api_url))
+            expanded += [f'{org}/{match["name"]}' for match in select_repositories(listed, repo)]
+        return list(dict.fromkeys(expanded))
+
+    def render(self, repository: str, **options: Any) -> str:
+        """Render the changelog of a repository (``<org>/<repo>``) as markdown, with any ``options`` overriding the defaults.
+
+        The ``heading_offset`` option moves the headings of the releases (and their bodies) down, as the plugin's
+        ``base_indent`` does.
+        """
+        options = self._options(self.options, options)
+        org, repo = split_repository(repository)
+        release_template = options['release_template']
+        context: dict[str, Any] = {}
+        autoprocess = options['autoprocess']
+        heading_offset = options['heading_offset']
+        if options['body_html']:
+            # The links in github's rendered bodies are already processed
+            release_template = release_template or HTML_RELEASE_TEMPLATE
+            autoprocess = False
+            context['raw_html'] = partial(_raw_html, heading_offset=heading_offset)
+        release_template = release_template or RELEASE_TEMPLATE
+        rendered = get_releases_as_markdown(
+            org,
+            repo,
+            release_template=release_template,
+            github_api_url=self.github_api_url,
+            match=options['match'],
+            autoprocess=autoprocess,
+            include_prereleases=options['include_prereleases'],
+            cache=self.cache,
+            client=self.clients.get(self.github_api_url),
+            fields=template_projection(release_template, options['release_fields']),
+            issue_titles=self.issue_titles if autoprocess else None,
+            feed=self.feed,
+            **context,
+        )
+        markdown = '\n\n'.join(rendered)
+        if heading_offset > 0:
+            markdown = markdown.replace('# ', ('#'*heading_offset)+'# ')
+        return markdown
+
+    def _render_result(self, repository: str, options: Mapping[str, Any]) -> RenderResult:
+        try:
+            return RenderResult(repository, self.render(repository, **options))
+        except Exception as e:
+            return RenderResult(repository, error=e)
+
+    def render_many(self, repositories: Iterable[str], **options: Any) -> list[RenderResult]:
+        """Render the changelogs of the repositories (expanding any wildcards) concurrently, in order.
+
+        A repository that fails has the error in its result, rather than stopping the others.
+        """
+        self._options(self.options, options)
+        repositories = self.repositories(repositories)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(lambda repository: self._render_result(repository, options), repositories))
+
+    @staticmethod
+    def write(
+        results: Iterable[RenderResult],
+        output_dir: str | Path | None = None,
+        stream: TextIO | None = None,
+        headings: bool = False,
+    ) -> list[Path]:
+        """Write the rendered changelogs to ``<output_dir>/<org>/<repo>.md``, or else one after another to the ``stream`` (stdout by default).
+
+        With ``headings`` set, each changelog written to the stream is under a ``# <org>/<repo>`` heading. Returns the
+        paths written (none for the stream). Failed results are left out.
+        """
+        written: list[Path] = []
+        results = [result for result in results if result.ok]
+        if output_dir is None:
+            stream = sys.stdout if stream is None else stream
+            sections = []
+            for result in results:
+                if headings:
+                    sections.append(f'# {result.repository}')
+                sections.append(result.markdown or '')
+            stream.write('\n\n'.join(sections) + '\n')
+            return written
+        for result in results:
+            org, repo = split_repository(result.repository)
+            path = Path(output_dir, org, f'{repo}.md')
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text((result.markdown or '') + '\n')
+            written.append(path)
+        return written
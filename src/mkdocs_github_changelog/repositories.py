@@ -0,0 +1,215 @@
+"""Find the repositories of an organisation (or user) for wildcard changelogs.
+
+A changelog for ``::github-release-changelog <org>/*`` (or any other ``fnmatch`` pattern, e.g. ``<org>/mkdocs-*``)
+covers every repository of the organisation matching the pattern, filtered with its ``include`` and ``exclude``
+patterns and ``topics`` (and leaving out archived repositories and forks unless ``archived`` or ``forks`` are set).
+Each repository gets its own section, or with ``merge`` set, their releases are rendered together, newest first,
+with the ``MERGED_RELEASE_TEMPLATE`` (or ``MERGED_HTML_RELEASE_TEMPLATE`` with ``body_html``), and the templates
+get the ``repository`` as well as the ``release``.
+
+The repositories of each organisation are listed with the REST API and kept in a
+[`RepositoryIndex`][mkdocs_github_changelog.repositories.RepositoryIndex] in the ``cache_dir`` for the
+``discovery_ttl``, so a wildcard doesn't list them again for every build. If listing them fails, those listed
+before are used (however old they are).
+"""
+from __future__ import annotations
+
+import fnmatch
+import json
+from pathlib import Path
+import threading
+import time
+from typing import Any, Iterable, Mapping, TYPE_CHECKING
+
+from mkdocs_github_changelog import get_releases, logger
+from mkdocs_github_changelog.disk_cache import atomic_write_text, FileLock
+from mkdocs_github_changelog.failures import http_status
+
+if TYPE_CHECKING:
+    from mkdocs_github_changelog.clients import HostClient, HostClients
+    from mkdocs_github_changelog.failures import Deadline
+
+DISCOVERY_TTL = 60*60
+"""Seconds before the repositories of an organisation are listed again."""
+MAX_CONCURRENCY = 4
+"""Repositories of a wildcard changelog to fetch the releases for concurrently."""
+MERGED_RELEASE_TEMPLATE = "# {{repository}} [{{release.name}}]({{release.html_url}})\n*Released at {{release.published_at.isoformat()}}*\n\n{{release.body}}"
+MERGED_HTML_RELEASE_TEMPLATE = "# {{repository}} [{{release.name}}]({{release.html_url}})\n*Released at {{release.published_at.isoformat()}}*\n\n{{raw_html(release.body_html)}}"
+REPOSITORY_HEADING = '# [{name}]({html_url})'
+# The options of a wildcard changelog that aren't used for each repository's releases
+WILDCARD_OPTIONS = ('include', 'exclude', 'topics', 'archived', 'forks', 'merge', 'max_concurrency')
+
+
+def is_wildcard(repo: str) -> bool:
+    """Whether a changelog's repository is a pattern for several repositories."""
+    return any(char in repo for char in '*?[')
+
+
+def matches(name: str, pattern: str) -> bool:
+    """Whether a repository name matches an ``fnmatch`` pattern (ignoring case, as github does)."""
+    return fnmatch.fnmatchcase(name.lower(), pattern.lower())
+
+
+def _patterns(value: str | Iterable[str] | None) -> list[str]:
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [value]
+    return list(value)
+
+
+def select_repositories(
+    repositories: Iterable[Mapping[str, Any]],
+    pattern: str = '*',
+    include: str | Iterable[str] | None = None,
+    exclude: str | Iterable[str] | None = None,
+    topics: str | Iterable[str] | None = None,
+    archived: bool = False,
+    forks: bool = False,
+) -> list[Mapping[str, Any]]:
+    """Get the repositories matching a wildcard changelog's pattern and filters, in order of their names.
+
+    Repositories must match the ``pattern`` and any of the ``include`` patterns (if there are any), not match any
+    of the ``exclude`` patterns, and have all of the ``topics``.
+    """
+    include = _patterns(include)
+    exclude = _patterns(exclude)
+    topics = {topic.lower() for topic in _patterns(topics)}
+    selected = []
+    for repository in repositories:
+        name = repository['name']
+        if not matches(name, pattern) or (include and not any(matches(name, p) for p in include)):
+            continue
+        if any(matches(name, p) for p in exclude):
+            continue
+        if not topics.issubset(topic.lower() for topic in repository.get('topics', None) or []):
+            continue
+        if (repository.get('archived', False) and not archived) or (repository.get('fork', False) and not forks):
+            continue
+        selected.append(repository)
+    return sorted(selected, key=lambda repository: repository['name'].lower())
+
+
+class RepositoryIndex():
+    """The repositories of each organisation (or user), kept for the ``ttl`` and stored as JSON."""
+
+    def __init__(self, path: str | Path | None = None, ttl: float | None = DISCOVERY_TTL):
+        """Initialise the index, loading it from the path if it exists (a ``ttl`` of None or 0 never expires)."""
+        self.path = Path(path) if path is not None else None
+        self.ttl = ttl
+        self.requests = 0
+        # host/org -> {'fetched_at', 'repositories'}
+        self._organisations: dict[str, dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        if self.path is not None and self.path.exists():
+            try:
+                self._organisations = json.loads(self.path.read_text()).get('organisations', {})
+            except (OSError, ValueError) as e:
+                logger.warning(f'Unable to load the repositories from {self.path}: {e}')
+
+    def get(self, org: str, client: HostClient, deadline: Deadline | None = None) -> list[dict[str, Any]]:
+        """Get the repositories of an organisation (or user), listing them if they haven't been for the ``ttl``."""
+        key = f'{client.host}/{org}'
+        now = time.time()
+        with self._lock:
+            entry = self._organisations.get(key, None)
+        if entry is not None and (not self.ttl or now - entry['fetched_at'] < self.ttl):
+            return entry['repositories']
+        try:
+            if deadline is not None:
+                deadline.check(f'listing the repositories of {org}')
+            repositories = self._fetch(org, client)
+        except Exception as e:
+            if entry is None:
+                raise
+            logger.warning(f'Unable to list the repositories of {org} ({e}), using those listed {now - entry["fetched_at"]:.0f}s ago')
+            return entry['repositories']
+        entry = {'fetched_at': now, 'repositories': repositories}
+        with self._lock:
+            self._organisations[key] = entry
+        self._save(key, entry)
+        return repositories
+
+    def _fetch(self, org: str, client: HostClient) -> list[dict[str, Any]]:
+        """List the repositories of an organisation, or else of a user."""
+        logger.info(f'Listing the repositories of {org}')
+        api = client.api()
+        repositories = []
+        with client.slot():
+            try:
+                pages = list(self._pages(api.repos.list_for_org, org))
+            except Exception as e:
+                if http_status(e) != 404:
+                    raise
+                # Not an organisation
+                pages = list(self._pages(api.repos.list_for_user, org))
+        for page in pages:
+            repositories += [
+                {
+                    'name': repository['name'],
+                    'html_url': repository.get('html_url', None),
+                    'topics': list(repository.get('topics', None) or []),
+                    'archived': bool(repository.get('archived', False)),
+                    'fork': bool(repository.get('fork', False)),
+                }
+                for repository in page
+            ]
+        return repositories
+
+    def _pages(self, operation: Any, org: str) -> Iterable[list]:
+        for page in get_releases.paged(operation, org, per_page=100):
+            with self._lock:
+                self.requests += 1
+            yield page
+
+    def _save(self, key: str, entry: dict[str, Any]) -> None:
+        """Save an organisation's repositories, along with any saved by other processes since they were loaded."""
+        if self.path is None:
+            return
+        with FileLock(self.path.with_suffix('.lock')):
+            organisations = RepositoryIndex(self.path)._organisations
+            organisations[key] = entry
+            atomic_write_text(self.path, json.dumps({'organisations': organisations}, sort_keys=True))
+
+
+def repository_filters(options: Mapping[str, Any]) -> tuple[Any, ...]:
+    """Get the filters of a wildcard changelog from its options, for ``select_repositories``."""
+    return (
+        options.get('include', None),
+        options.get('exclude', None),
+        options.get('topics', None),
+        options.get('archived', False),
+        options.get('forks', False),
+    )
+
+
+def expand_directives(
+    directives: Iterable[Any],
+    plugin_config: Mapping[str, Any],
+    clients: HostClients,
+    index: RepositoryIndex | None = None,
+) -> list[Any]:
+    """Replace each wildcard directive with a directive for each of the repositories it matches.
+
+    Wildcards whose repositories can't be listed are left out (with a warning).
+    """
+    from mkdocs_github_changelog.directives import Directive
+    if index is None:
+        index = RepositoryIndex()
+    expanded = []
+    for directive in directives:
+        if not is_wildcard(directive.repo):
+            expanded.append(directive)
+            continue
+        client = clients.get(directive.option('github_api_url', plugin_config), directive.options.get('token', None))
+        try:
+            repositories = index.get(directive.org, client)
+        except Exception as e:
+            logger.warning(f'Unable to list the repositories of {directive.org}: {e}')
+            continue
+        options = {name: value for name, value in directive.options.items() if name not in WILDCARD_OPTIONS}
+        if directive.options.get('merge', False) and directive.option('release_template', plugin_config) is None:
+            options['release_template'] = MERGED_HTML_RELEASE_TEMPLATE if directive.option('body_html', plugin_config) else MERGED_RELEASE_TEMPLATE
+        for repository in select_repositories(repositories, directive.repo, *repository_filters(directive.options)):
+            expanded.append(Directive(directive.org, repository['name'], options, page=directive.page))
+    return expanded
@@ -0,0 +1,101 @@
+"""Decode the JSON array of releases in a response incrementally, keeping only the fields that are needed.
+
+Decoding a whole page of releases (up to 100) at once holds the response text, and every field of every
+release (including the ``assets``, and the ``author`` and ``uploader`` of each) on the heap together. With
+[`iter_json_array`][mkdocs_github_changelog.streaming.iter_json_array] the response is read in chunks, each
+release is decoded (with the ``json`` module's C scanner) once it has been received, and only its projected
+fields are kept, so the peak memory is about one chunk and one release rather than the whole page.
+
+The fields a changelog needs are found from its ``release_template`` (see
+[`template_projection`][mkdocs_github_changelog.get_releases.template_projection]), along with the
+``SELECTION_FIELDS`` used to select the releases, or if the template could use any of them, are set with the
+plugin's ``release_fields`` option (along with the ``REQUIRED_FIELDS`` the changelog itself uses).
+"""
+from __future__ import annotations
+
+import codecs
+import itertools
+import json
+import re
+from typing import Any, Collection, Iterable, Iterator
+
+# The fields used to select the releases
+SELECTION_FIELDS = ('name', 'tag_name', 'html_url', 'published_at', 'draft', 'prerelease')
+# The fields used to select and render the releases with the default template
+REQUIRED_FIELDS = (*SELECTION_FIELDS, 'body')
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+def project(item: dict[str, Any], fields: Collection[str] | None = None) -> dict[str, Any]:
+    """Keep only the fields of a decoded object (or all of them if ``fields`` is None)."""
+    if fields is None:
+        return item
+    return {field: item[field] for field in fields if field in item}
+
+
+def projected_fields(fields: Iterable[str] | None = None, required: Iterable[str] = REQUIRED_FIELDS) -> tuple[str, ...] | None:
+    """Get the fields to keep (the ``required`` fields and ``fields``), or None to keep all of them."""
+    if fields is None:
+        return None
+    return tuple(dict.fromkeys([*required, *fields]))
+
+
+def iter_json_array(chunks: Iterable[bytes | str], fields: Collection[str] | None = None) -> Iterator[dict[str, Any]]:
+    """Decode the objects in a JSON array from chunks of its (UTF-8) encoding, as they are completed.
+
+    Each object is projected to the ``fields`` (all of them if None). Raises a ``ValueError`` if the JSON is
+    not an array of objects, or is incomplete.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    json_decoder = json.JSONDecoder()
+    buffer = ''
+    # The buffer size to try decoding an incomplete object at again, doubling each time so it is linear overall
+    retry_at = 0
+    started = finished = False
+    expect_item = True
+    # None marks the end of the chunks
+    for chunk in itertools.chain(chunks, [None]):
+        if chunk is None:
+            buffer += decoder.decode(b'', final=True)
+        else:
+            buffer += decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+            if len(buffer) < retry_at:
+                continue
+        position = 0
+        while True:
+            position = _WHITESPACE.match(buffer, position).end()
+            if position == len(buffer):
+                buffer = ''
+                break
+            char = buffer[position]
+            if finished:
+                raise ValueError('Unexpected data after the end of the JSON array')
+            if not started:
+                if char != '[':
+                    raise ValueError('Expected a JSON array of objects')
+                started = True
+                position += 1
+            elif char == ']':
+                finished = True
+                position += 1
+            elif char == ',' and not expect_item:
+                expect_item = True
+                position += 1
+            elif char == '{' and expect_item:
+                try:
+                    item, position = json_decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError as e:
+                    if chunk is None:
+                        raise ValueError(f'Incomplete or invalid JSON array: {e}')
+                    # Incomplete, so wait for more of it
+                    buffer = buffer[position:]
+                    retry_at = 2*len(buffer)
+                    break
+                retry_at = 0
+                expect_item = False
+                yield project(item, fields)
+            else:
+                raise ValueError('Expected a JSON array of objects')
+    if not finished:
+        raise ValueError('Incomplete JSON array')
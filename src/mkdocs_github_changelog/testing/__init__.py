@@ -0,0 +1 @@
+"""Utilities for testing and benchmarking the changelogs without github."""
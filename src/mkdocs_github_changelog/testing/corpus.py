@@ -0,0 +1,135 @@
+"""Generate a synthetic corpus of github releases.
+
+The releases have the same shape as the [list releases](https://docs.github.com/en/rest/releases/releases#list-releases)
+response (newest first), with bodies in the style of release drafter, full of issue (``#123``) and user (``@abc``)
+references. The generation is seeded, so a corpus is the same every time it is generated.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+import random
+from typing import Any
+
+SECTIONS = ('🚀 Features', '🐛 Bug Fixes', '🧰 Maintenance', '📝 Documentation', '⬆️ Dependencies')
+WORDS = (
+    'add', 'fix', 'update', 'remove', 'refactor', 'support', 'handle', 'improve', 'parser', 'config', 'cache',
+    'plugin', 'template', 'release', 'changelog', 'token', 'build', 'docs', 'tests', 'pipeline', 'error', 'option',
+)
+
+
+def _body(rng: random.Random, issues: int, users: int, max_issue: int) -> str:
+    """Generate a release body with the given number of issue references and users."""
+    user_names = [f'user-{rng.randrange(1000)}' for _ in range(max(users, 1))]
+    sections: dict[str, list[str]] = {}
+    for _ in range(issues):
+        title = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(3, 8))).capitalize()
+        line = f'- {title} (#{rng.randint(1, max_issue)}) @{rng.choice(user_names)}'
+        sections.setdefault(rng.choice(SECTIONS), []).append(line)
+    body = ["## What's Changed", '']
+    for section, lines in sections.items():
+        body += [f'## {section}', '', *lines, '']
+    body.append('**Contributors:** ' + ', '.join(f'@{name}' for name in user_names))
+    return '\n'.join(body)
+
+
+def _asset(rng: random.Random, org: str, repo: str, version: str, release_id: int, index: int) -> dict[str, Any]:
+    """Generate a release asset (a built package) with its uploader."""
+    name = f'{repo}-{version}-{index}.tar.gz'
+    uploader = f'user-{rng.randrange(1000)}'
+    return {
+        'url': f'https://api.github.com/repos/{org}/{repo}/releases/assets/{release_id * 100 + index}',
+        'id': release_id * 100 + index,
+        'name': name,
+        'label': '',
+        'uploader': {
+            'login': uploader,
+            'id': rng.randrange(100000),
+            'avatar_url': f'https://avatars.githubusercontent.com/u/{uploader}?v=4',
+            'html_url': f'https://github.com/{uploader}',
+            'type': 'User',
+            'site_admin': False,
+        },
+        'content_type': 'application/gzip',
+        'state': 'uploaded',
+        'size': rng.randrange(10000, 10000000),
+        'download_count': rng.randrange(10000),
+        'browser_download_url': f'https://github.com/{org}/{repo}/releases/download/{version}/{name}',
+    }
+
+
+def generate_release(
+    index: int,
+    count: int,
+    org: str = 'example-org',
+    repo: str = 'example-repo',
+    rng: random.Random | None = None,
+    issues_per_release: int = 20,
+    users_per_release: int = 5,
+    start: datetime | None = None,
+    assets_per_release: int = 0,
+) -> dict[str, Any]:
+    """Generate the release at ``index`` (0 is the newest) of ``count`` releases."""
+    if rng is None:
+        rng = random.Random(index)
+    if start is None:
+        start = datetime(2015, 1, 1, tzinfo=timezone.utc)
+    # Oldest first for the version numbers and dates
+    number = count - index
+    version = f'{number // 100}.{(number // 10) % 10}.{number % 10}'
+    published_at = start + timedelta(days=number, hours=rng.randrange(24), minutes=rng.randrange(60))
+    prerelease = rng.random() < 0.1
+    if prerelease:
+        version += f'rc{rng.randint(1, 3)}'
+    draft = index == 0 and rng.random() < 0.5
+    release_id = 1000000 + number
+    html_url = f'https://github.com/{org}/{repo}/releases/tag/{version}'
+    return {
+        'url': f'https://api.github.com/repos/{org}/{repo}/releases/{release_id}',
+        'html_url': html_url,
+        'id': release_id,
+        'author': {'login': f'user-{rng.randrange(1000)}', 'type': 'User'},
+        'tag_name': version,
+        'target_commitish': 'main',
+        'name': '' if draft else f'Release {version}',
+        'draft': draft,
+        'prerelease': prerelease,
+        'created_at': published_at.strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'published_at': None if draft else published_at.strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'assets': [_asset(rng, org, repo, version, release_id, i) for i in range(assets_per_release)],
+        'tarball_url': f'https://api.github.com/repos/{org}/{repo}/tarball/{version}',
+        'zipball_url': f'https://api.github.com/repos/{org}/{repo}/zipball/{version}',
+        'body': _body(rng, issues_per_release, users_per_release, max(count * 3, 10)),
+    }
+
+
+def generate_releases(
+    count: int,
+    org: str = 'example-org',
+    repo: str = 'example-repo',
+    seed: int = 0,
+    issues_per_release: int = 20,
+    users_per_release: int = 5,
+    assets_per_release: int = 0,
+) -> list[dict[str, Any]]:
+    """Generate ``count`` releases, newest first, as decoded JSON."""
+    rng = random.Random(seed)
+    return [
+        generate_release(
+            index,
+            count,
+            org=org,
+            repo=repo,
+            rng=rng,
+            issues_per_release=issues_per_release,
+            users_per_release=users_per_release,
+            assets_per_release=assets_per_release,
+        )
+        for index in range(count)
+    ]
+
+
+def named_releases(*names: str) -> list:
+    """Get minimal releases (as ghapi returns them) with the ``names`` (also their tags), newest first, for testing the caches."""
+    # Imported here, as it is slow to import and not needed to generate a corpus
+    from fastcore.xtras import dict2obj
+    return [dict2obj({'name': name, 'tag_name': name, 'body': f'Release {name}', 'assets': [{'name': 'a.whl'}]}) for name in names]
@@ -0,0 +1,441 @@
+"""A local stand-in for the github releases REST API, served from the synthetic corpus.
+
+The server runs in a background thread of the current process, so tests and benchmarks can point
+``github_api_url`` at it and exercise real HTTP requests without the network:
+
+```python
+from mkdocs_github_changelog.testing.server import GithubStandInServer
+
+with GithubStandInServer(latency=0.05) as server:
+    server.add_repository('example-org', 'example-repo', 1000)
+    releases = fetch_releases('example-org', 'example-repo', github_api_url=server.url)
+```
+
+It supports:
+
+* ``GET /repos/{org}/{repo}/releases`` (paged with ``per_page`` and ``page``, and a ``Link`` header),
+  ``GET /repos/{org}/{repo}/releases/latest`` and ``GET /rate_limit``. Releases requested with the html (or full)
+  media type have a ``body_html`` (rendered with python-markdown) instead of (or as well as) their ``body``.
+* ``GET /orgs/{org}/repos`` (and ``/users/{user}/repos``), paged in the same way, for the repositories added
+  (with any ``topics``, ``archived`` or ``fork`` set with ``describe_repository``).
+* ``POST /graphql`` (and ``/api/graphql``) for the ``issueOrPullRequest`` fields of a ``repository``, as
+  queried by [`IssueTitles`][mkdocs_github_changelog.titles.IssueTitles], answered from the issues added with
+  ``add_issues``, and for the ``releases`` of (aliased) ``repository`` fields, as queried by
+  [`fetch_releases_batched`][mkdocs_github_changelog.batch.fetch_releases_batched], answered from the
+  releases added with ``add_repository`` (paged with ``first`` and ``after``).
+* ``GET /{org}/{repo}/releases.atom``, the releases feed (which doesn't count against the rate limit), with the
+  latest releases added with ``add_repository``, or a fixture added with ``add_feed``.
+* ``ETag`` and ``If-None-Match`` (a ``304 Not Modified`` does not count against the rate limit, as on github).
+* gzip encoded responses if the client accepts them.
+* ``X-RateLimit-*`` headers, with a separate quota for each token, and a ``403`` once it is used up.
+* A fixed latency per response, a maximum page size, and injected errors, either on specific requests or
+  at random (seeded) for a fraction of them.
+"""
+from __future__ import annotations
+
+from functools import lru_cache
+import gzip
+import hashlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import random
+import re
+import threading
+import time
+from typing import Any, Mapping
+from urllib.parse import parse_qs, urlencode, urlsplit
+from xml.etree import ElementTree
+
+from mkdocs_github_changelog.testing.corpus import generate_releases
+
+GRAPHQL_REPOSITORY_RE = re.compile(r'repository\(owner: *"(?P<owner>[^"]*)", *name: *"(?P<name>[^"]*)"\)')
+GRAPHQL_ISSUE_RE = re.compile(r'(?P<alias>\w+): *issueOrPullRequest\(number: *(?P<number>\d+)\)')
+GRAPHQL_RELEASES_RE = re.compile(
+    r'(?P<alias>\w+): *repository\(owner: *"(?P<owner>[^"]*)", *name: *"(?P<name>[^"]*)"\) *\{ *'
+    r'releases\((?P<arguments>[^)]*)\) *\{.*?nodes *\{(?P<nodes>[^}]*)\}'
+)
+GRAPHQL_FIRST_RE = re.compile(r'first: *(?P<first>\d+)')
+GRAPHQL_AFTER_RE = re.compile(r'after: *"(?P<after>\d+)"')
+GRAPHQL_NODE_FIELD_RE = re.compile(r'(?:(?P<alias>\w+): *)?(?P<field>\w+)')
+# The corpus field for each GraphQL field of a release
+GRAPHQL_RELEASE_FIELDS = {
+    'databaseId': 'id',
+    'name': 'name',
+    'tagName': 'tag_name',
+    'url': 'html_url',
+    'createdAt': 'created_at',
+    'publishedAt': 'published_at',
+    'isDraft': 'draft',
+    'isPrerelease': 'prerelease',
+    'description': 'body',
+    'descriptionHTML': 'body_html',
+}
+DEFAULT_PER_PAGE = 30
+FEED_SIZE = 10
+MAX_PER_PAGE = 100
+
+
+@lru_cache(maxsize=None)
+def render_body(body: str | None) -> str:
+    """Render the body of a release to HTML, standing in for github's rendering."""
+    from markdown import markdown
+    return markdown(body or '')
+
+
+def media_release(release: dict[str, Any], accept: str | None = None) -> dict[str, Any]:
+    """Get a release as it is returned in the media type (from the ``Accept`` header)."""
+    accept = accept or ''
+    if 'html+json' not in accept and 'full+json' not in accept:
+        return release
+    release = {**release, 'body_html': render_body(release.get('body', None))}
+    if 'html+json' in accept:
+        release.pop('body', None)
+    return release
+
+
+class GithubStandInServer():
+    """An in-process stand-in for the github releases API."""
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        max_per_page: int = MAX_PER_PAGE,
+        rate_limit: int = 5000,
+        rate_limit_window: int = 3600,
+        compress: bool = True,
+        errors: Mapping[int, int] | None = None,
+        error_rate: float = 0.0,
+        error_status: int = 502,
+        seed: int = 0,
+        host: str = '127.0.0.1',
+        port: int = 0,
+    ):
+        """Initialise the server.
+
+        Args:
+            latency: seconds to wait before each response.
+            max_per_page: the largest page size returned, whatever ``per_page`` is requested.
+            rate_limit: requests allowed for each token (or unauthenticated) in the window.
+            rate_limit_window: seconds until the rate limit resets (from starting the server).
+            compress: whether to gzip responses for clients that accept it.
+            errors: status codes to respond with for specific requests (numbered from 1).
+            error_rate: fraction of the other requests to respond to with ``error_status``.
+            error_status: status code for the randomly injected errors.
+            seed: seed for the randomly injected errors.
+            host: address to listen on.
+            port: port to listen on (0 picks a free port).
+        """
+        self.latency = latency
+        self.max_per_page = max_per_page
+        self.rate_limit = rate_limit
+        self.rate_limit_window = rate_limit_window
+        self.compress = compress
+        self.errors = dict(errors or {})
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.repositories: dict[tuple[str, str], list[dict[str, Any]]] = {}
+        self.issues: dict[tuple[str, str], dict[int, dict[str, str]]] = {}
+        self.repository_info: dict[tuple[str, str], dict[str, Any]] = {}
+        self.feeds: dict[tuple[str, str], bytes] = {}
+        # (method, path, headers) for each request received
+        self.requests: list[tuple[str, str, dict[str, str]]] = []
+        self.bytes_sent = 0
+        self._random = random.Random(seed)
+        self._used: dict[str | None, int] = {}
+        self._reset_at = int(time.time()) + rate_limit_window
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._httpd.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        """The base url to use as ``github_api_url``."""
+        host, port = self._httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def add_repository(self, org: str, repo: str, releases: int | list[dict[str, Any]], **kwargs) -> list[dict[str, Any]]:
+        """Serve releases for a repository, either given or the number to generate (with ``kwargs`` for the corpus)."""
+        if isinstance(releases, int):
+            releases = generate_releases(releases, org=org, repo=repo, **kwargs)
+        self.repositories[(org, repo)] = releases
+        return releases
+
+    def describe_repository(self, org: str, repo: str, **info: Any) -> None:
+        """Set fields of a repository (e.g. ``topics``, ``archived`` or ``fork``) listed for its organisation."""
+        self.repository_info.setdefault((org, repo), {}).update(info)
+
+    def add_feed(self, org: str, repo: str, content: str | bytes) -> None:
+        """Serve a fixture as the releases feed for a repository (rather than one from its releases)."""
+        self.feeds[(org, repo)] = content.encode() if isinstance(content, str) else content
+
+    def release_feed(self, org: str, repo: str) -> bytes | None:
+        """Get the releases feed for a repository (its fixture, or else with its latest published releases), or None if it has neither."""
+        if (org, repo) in self.feeds:
+            return self.feeds[(org, repo)]
+        if (org, repo) not in self.repositories:
+            return None
+        ElementTree.register_namespace('', 'http://www.w3.org/2005/Atom')
+        feed = ElementTree.Element('{http://www.w3.org/2005/Atom}feed')
+        ElementTree.SubElement(feed, '{http://www.w3.org/2005/Atom}title').text = f'Release notes from {repo}'
+        published = [release for release in self.repositories[(org, repo)] if not release['draft']][:FEED_SIZE]
+        for release in published:
+            entry = ElementTree.SubElement(feed, '{http://www.w3.org/2005/Atom}entry')
+            ElementTree.SubElement(entry, '{http://www.w3.org/2005/Atom}id').text = f'tag:github.com,2008:Repository/1/{release["tag_name"]}'
+            ElementTree.SubElement(entry, '{http://www.w3.org/2005/Atom}updated').text = release['published_at'] or release['created_at']
+            ElementTree.SubElement(entry, '{http://www.w3.org/2005/Atom}link', rel='alternate', type='text/html', href=release['html_url'])
+            ElementTree.SubElement(entry, '{http://www.w3.org/2005/Atom}title').text = release['name']
+            ElementTree.SubElement(entry, '{http://www.w3.org/2005/Atom}content', type='html').text = render_body(release.get('body', None))
+        return ElementTree.tostring(feed, encoding='utf-8', xml_declaration=True)
+
+    def _feed_response(self, org: str, repo: str, if_none_match: str | None = None) -> tuple[int, bytes, dict[str, str], str]:
+        """Get the status, content, headers and content type to respond to a request for a releases feed with."""
+        content = self.release_feed(org, repo)
+        if content is None:
+            return 404, b'Not Found', {}, 'text/plain'
+        etag = f'W/"{hashlib.sha256(content).hexdigest()}"'
+        if if_none_match == etag:
+            return 304, b'', {'ETag': etag}, 'application/atom+xml; charset=utf-8'
+        return 200, content, {'ETag': etag}, 'application/atom+xml; charset=utf-8'
+
+    def add_issues(self, org: str, repo: str, titles: Mapping[int, str], state: str = 'CLOSED') -> None:
+        """Serve the titles of issues (by number) for a repository in GraphQL queries."""
+        self.issues.setdefault((org, repo), {}).update({number: {'title': title, 'state': state} for number, title in titles.items()})
+
+    def remaining(self, token: str | None = None) -> int:
+        """The requests remaining in the rate limit for a token."""
+        return max(self.rate_limit - self._used.get(token, 0), 0)
+
+    def start(self) -> GithubStandInServer:
+        """Start serving in a background thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._httpd.serve_forever, args=(0.05,), name='github-stand-in', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving."""
+        if self._thread is not None:
+            self._httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._httpd.server_close()
+
+    def __enter__(self) -> GithubStandInServer:
+        """Start the server."""
+        return self.start()
+
+    def __exit__(self, *args) -> None:  # noqa: U100
+        """Stop the server."""
+        self.stop()
+
+    def _record(self, method: str, path: str, headers: dict[str, str]) -> int | None:
+        """Record a request, returning the status of an error to inject if there is one."""
+        with self._lock:
+            self.requests.append((method, path, headers))
+            status = self.errors.get(len(self.requests), None)
+            if status is None and self.error_rate and self._random.random() < self.error_rate:
+                status = self.error_status
+            return status
+
+    def _use_quota(self, token: str | None) -> bool:
+        """Count a request against the rate limit, returning whether it is allowed."""
+        with self._lock:
+            if self._used.get(token, 0) >= self.rate_limit:
+                return False
+            self._used[token] = self._used.get(token, 0) + 1
+            return True
+
+    def _rate_limit_headers(self, token: str | None) -> dict[str, str]:
+        return {
+            'X-RateLimit-Limit': str(self.rate_limit),
+            'X-RateLimit-Remaining': str(self.remaining(token)),
+            'X-RateLimit-Reset': str(self._reset_at),
+            'X-RateLimit-Used': str(self._used.get(token, 0)),
+            'X-RateLimit-Resource': 'core',
+        }
+
+    def _rate_limit_body(self, token: str | None) -> dict[str, Any]:
+        core = {'limit': self.rate_limit, 'remaining': self.remaining(token), 'reset': self._reset_at, 'used': self._used.get(token, 0)}
+        return {'resources': {'core': core}, 'rate': core}
+
+    def _route(self, path: str, query: dict[str, list[str]], accept: str | None = None) -> tuple[int, Any, dict[str, str]]:
+        """Get the status, body and headers for a request (with the releases in the media type it accepts)."""
+        parts = [part for part in path.split('/') if part]
+        if len(parts) == 3 and parts[0] in ('orgs', 'users') and parts[2] == 'repos':
+            repositories = [self._repository(org, repo) for org, repo in self.repositories if org == parts[1]]
+            if repositories:
+                body, headers = self._page(repositories, query, path)
+                return 200, body, headers
+        if len(parts) in (4, 5) and parts[0] == 'repos' and parts[3] == 'releases' and (parts[1], parts[2]) in self.repositories:
+            if len(parts) == 4:
+                body, headers = self._releases_page(parts[1], parts[2], query, path)
+                return 200, [media_release(release, accept) for release in body], headers
+            if parts[4] == 'latest':
+                published = [r for r in self.repositories[(parts[1], parts[2])] if not r['draft'] and not r['prerelease']]
+                if published:
+                    return 200, media_release(published[0], accept), {}
+        return 404, {'message': 'Not Found', 'documentation_url': 'https://docs.github.com/rest'}, {}
+
+    def _graphql(self, query: str) -> dict[str, Any]:
+        """Answer a GraphQL query for the issues (or pull requests) of a repository, or the releases of repositories."""
+        if GRAPHQL_RELEASES_RE.search(query):
+            return self._graphql_releases(query)
+        repository = GRAPHQL_REPOSITORY_RE.search(query)
+        if repository is None:
+            return {'errors': [{'message': 'Only repository queries are supported'}]}
+        key = (json.loads(f'"{repository["owner"]}"'), json.loads(f'"{repository["name"]}"'))
+        if key not in self.repositories and key not in self.issues:
+            return {'data': {'repository': None}, 'errors': [{'type': 'NOT_FOUND', 'message': f'Could not resolve to a Repository with the name \'{key[0]}/{key[1]}\'.'}]}
+        issues = self.issues.get(key, {})
+        data: dict[str, Any] = {}
+        errors = []
+        for match in GRAPHQL_ISSUE_RE.finditer(query):
+            number = int(match['number'])
+            data[match['alias']] = issues.get(number, None)
+            if number not in issues:
+                errors.append({'type': 'NOT_FOUND', 'path': ['repository', match['alias']], 'message': f'Could not resolve to an issue or pull request with the number of {number}.'})
+        result: dict[str, Any] = {'data': {'repository': data}}
+        if errors:
+            result['errors'] = errors
+        return result
+
+    def _graphql_releases(self, query: str) -> dict[str, Any]:
+        """Answer a GraphQL query for a page of the releases of each (aliased) repository, with offsets as the cursors."""
+        data: dict[str, Any] = {}
+        errors = []
+        for match in GRAPHQL_RELEASES_RE.finditer(query):
+            key = (json.loads(f'"{match["owner"]}"'), json.loads(f'"{match["name"]}"'))
+            if key not in self.repositories:
+                data[match['alias']] = None
+                errors.append({'type': 'NOT_FOUND', 'path': [match['alias']], 'message': f'Could not resolve to a Repository with the name \'{key[0]}/{key[1]}\'.'})
+                continue
+            first = GRAPHQL_FIRST_RE.search(match['arguments'])
+            after = GRAPHQL_AFTER_RE.search(match['arguments'])
+            start = int(after['after']) if after else 0
+            end = start + min(int(first['first']) if first else MAX_PER_PAGE, MAX_PER_PAGE)
+            releases = self.repositories[key]
+            fields = [(field['alias'] or field['field'], GRAPHQL_RELEASE_FIELDS[field['field']]) for field in GRAPHQL_NODE_FIELD_RE.finditer(match['nodes'])]
+            data[match['alias']] = {'releases': {
+                'pageInfo': {'hasNextPage': end < len(releases), 'endCursor': str(min(end, len(releases)))},
+                'nodes': [
+                    {alias: render_body(release.get('body', None)) if field == 'body_html' else release[field] for alias, field in fields}
+                    for release in releases[start:end]
+                ],
+            }}
+        result: dict[str, Any] = {'data': data}
+        if errors:
+            result['errors'] = errors
+        return result
+
+    def _repository(self, org: str, repo: str) -> dict[str, Any]:
+        """Get a repository as it is listed for its organisation."""
+        repository = {
+            'name': repo,
+            'full_name': f'{org}/{repo}',
+            'html_url': f'https://github.com/{org}/{repo}',
+            'topics': [],
+            'archived': False,
+            'fork': False,
+        }
+        return {**repository, **self.repository_info.get((org, repo), {})}
+
+    def _releases_page(self, org: str, repo: str, query: dict[str, list[str]], path: str) -> tuple[list[dict[str, Any]], dict[str, str]]:
+        """Get a page of releases and its ``Link`` header."""
+        return self._page(self.repositories[(org, repo)], query, path)
+
+    def _page(self, items: list[dict[str, Any]], query: dict[str, list[str]], path: str) -> tuple[list[dict[str, Any]], dict[str, str]]:
+        """Get a page of a list and its ``Link`` header."""
+        per_page = min(int(query.get('per_page', [DEFAULT_PER_PAGE])[0]), self.max_per_page)
+        page = max(int(query.get('page', ['1'])[0]), 1)
+        last = max((len(items) + per_page - 1) // per_page, 1)
+        links = []
+        for rel, number in (('next', page + 1), ('last', last), ('first', 1), ('prev', page - 1)):
+            if (rel in ('next', 'last') and page < last) or (rel in ('first', 'prev') and page > 1):
+                links.append(f'<{self.url}{path}?{urlencode({"per_page": per_page, "page": number})}>; rel="{rel}"')
+        headers = {'Link': ', '.join(links)} if links else {}
+        return items[(page - 1) * per_page: page * per_page], headers
+
+
+def _make_handler(server: GithubStandInServer) -> type[BaseHTTPRequestHandler]:
+
+    class Handler(BaseHTTPRequestHandler):
+        """Handle the requests for the stand-in server."""
+
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format: str, *args: Any) -> None:  # noqa: U100
+            """Don't log each request to stderr."""
+
+        def do_GET(self) -> None:
+            """Respond to a GET request."""
+            split = urlsplit(self.path)
+            authorization = self.headers.get('Authorization', None)
+            token = authorization.split(' ', 1)[-1] if authorization else None
+            error = server._record('GET', self.path, dict(self.headers.items()))
+            if server.latency:
+                time.sleep(server.latency)
+            if error is not None:
+                return self._respond(error, json.dumps({'message': f'Injected error {error}'}).encode())
+            if split.path.rstrip('/') == '/rate_limit':
+                # Checking the rate limit doesn't count against it
+                body = json.dumps(server._rate_limit_body(token)).encode()
+                return self._respond(200, body, server._rate_limit_headers(token))
+            parts = [part for part in split.path.split('/') if part]
+            if len(parts) == 3 and parts[2] == 'releases.atom':
+                return self._feed(parts[0], parts[1])
+            status, body, headers = server._route(split.path, parse_qs(split.query), self.headers.get('Accept', None))
+            content = json.dumps(body).encode()
+            etag = f'W/"{hashlib.sha256(content).hexdigest()}"'
+            if status == 200 and self.headers.get('If-None-Match', None) == etag:
+                # Conditional requests that aren't modified don't count against the rate limit
+                return self._respond(304, b'', {'ETag': etag, **server._rate_limit_headers(token)})
+            if not server._use_quota(token):
+                body = {'message': 'API rate limit exceeded', 'documentation_url': 'https://docs.github.com/rest/overview/rate-limits-for-the-rest-api'}
+                return self._respond(403, json.dumps(body).encode(), server._rate_limit_headers(token))
+            if status == 200:
+                headers['ETag'] = etag
+            self._respond(status, content, {**headers, **server._rate_limit_headers(token)})
+
+        def do_POST(self) -> None:
+            """Respond to a (GraphQL) POST request."""
+            split = urlsplit(self.path)
+            authorization = self.headers.get('Authorization', None)
+            token = authorization.split(' ', 1)[-1] if authorization else None
+            body = self.rfile.read(int(self.headers.get('Content-Length', None) or 0))
+            error = server._record('POST', self.path, dict(self.headers.items()))
+            if server.latency:
+                time.sleep(server.latency)
+            if error is not None:
+                return self._respond(error, json.dumps({'message': f'Injected error {error}'}).encode())
+            if split.path.rstrip('/') not in ('/graphql', '/api/graphql'):
+                return self._respond(404, json.dumps({'message': 'Not Found'}).encode())
+            if not server._use_quota(token):
+                return self._respond(403, json.dumps({'message': 'API rate limit exceeded'}).encode(), server._rate_limit_headers(token))
+            try:
+                query = json.loads(body)['query']
+            except (ValueError, KeyError, TypeError):
+                return self._respond(400, json.dumps({'message': 'Problems parsing JSON'}).encode())
+            self._respond(200, json.dumps(server._graphql(query)).encode(), server._rate_limit_headers(token))
+
+        def _feed(self, org: str, repo: str) -> None:
+            """Respond with a releases feed, which (as on github) doesn't count against the rate limit."""
+            status, content, headers, content_type = server._feed_response(org, repo, self.headers.get('If-None-Match', None))
+            self._respond(status, content, headers, content_type=content_type)
+
+        def _respond(self, status: int, content: bytes, headers: dict[str, str] | None = None, content_type: str = 'application/json; charset=utf-8') -> None:
+            headers = dict(headers or {})
+            if content and server.compress and 'gzip' in self.headers.get('Accept-Encoding', ''):
+                content = gzip.compress(content)
+                headers['Content-Encoding'] = 'gzip'
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(content)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(content)
+            with server._lock:
+                server.bytes_sent += len(content)
+
+    return Handler
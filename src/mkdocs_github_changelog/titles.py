@@ -0,0 +1,130 @@
+"""Look up the titles of the issues and pull requests linked from the releases, to show as hover text.
+
+With ``issue_titles`` set, the ``#123`` links added by
+[`autoprocess_github_links`][mkdocs_github_changelog.get_releases.autoprocess_github_links] get the issue (or
+pull request) title as their link title. Every number referenced by a changelog's selected releases is collected
+first, and those not already known are looked up with github's GraphQL API, up to ``BATCH_SIZE`` in each request
+(as aliased ``issueOrPullRequest`` fields of the repository), rather than one REST request for each.
+
+The titles are kept in an [`IssueTitles`][mkdocs_github_changelog.titles.IssueTitles] store in the ``cache_dir``.
+Titles of closed issues and merged (or closed) pull requests rarely change, so they are kept indefinitely, while
+open ones are looked up again once they are older than ``OPEN_TTL``. Numbers that are not issues or pull requests
+are also kept (without a title), so they are not looked up again.
+"""
+from __future__ import annotations
+
+import json
+from pathlib import Path
+import threading
+import time
+from typing import Any, Iterable, Mapping, TYPE_CHECKING
+
+from mkdocs_github_changelog import logger
+from mkdocs_github_changelog.disk_cache import atomic_write_text, FileLock
+from mkdocs_github_changelog.graphql import graphql_request
+
+if TYPE_CHECKING:
+    from mkdocs_github_changelog.clients import HostClient
+
+BATCH_SIZE = 100
+"""Issues and pull requests looked up in each GraphQL request."""
+OPEN_TTL = 24*60*60
+"""Seconds before the title of an open issue or pull request is looked up again."""
+
+QUERY = '''query {{
+  repository(owner: {owner}, name: {name}) {{
+{fields}
+  }}
+}}'''
+FIELD = '    n{number}: issueOrPullRequest(number: {number}) {{ ... on Issue {{ title state }} ... on PullRequest {{ title state }} }}'
+
+
+def issues_query(owner: str, name: str, numbers: Iterable[int]) -> str:
+    """Get the GraphQL query for the titles of the issues (or pull requests) of a repository."""
+    fields = '\n'.join(FIELD.format(number=number) for number in numbers)
+    return QUERY.format(owner=json.dumps(owner), name=json.dumps(name), fields=fields)
+
+
+def _key_str(key: tuple[str, str, str]) -> str:
+    return '/'.join(key)
+
+
+class IssueTitles():
+    """The titles of the issues and pull requests of each repository, stored as JSON."""
+
+    def __init__(self, path: str | Path | None = None, batch_size: int = BATCH_SIZE, ttl: float = OPEN_TTL):
+        """Initialise the store, loading it from the path if it exists."""
+        self.path = Path(path) if path is not None else None
+        self.batch_size = batch_size
+        self.ttl = ttl
+        self.requests = 0
+        # repository -> number -> {'title', 'open', 'fetched_at'}
+        self._titles: dict[str, dict[str, dict[str, Any]]] = {}
+        self._updated: dict[str, dict[str, dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        if self.path is not None and self.path.exists():
+            try:
+                self._titles = json.loads(self.path.read_text()).get('titles', {})
+            except (OSError, ValueError) as e:
+                logger.warning(f'Unable to load the issue titles from {self.path}: {e}')
+
+    def _known(self, key: tuple[str, str, str], number: int, now: float) -> dict[str, Any] | None:
+        entry = self._titles.get(_key_str(key), {}).get(str(number), None)
+        if entry is None or (entry.get('open', False) and now - entry.get('fetched_at', 0) >= self.ttl):
+            return None
+        return entry
+
+    def get(self, key: tuple[str, str, str], numbers: Iterable[int], client: HostClient) -> dict[int, str]:
+        """Get the titles of the issues (or pull requests) of a repository, looking up any that aren't known.
+
+        Numbers that are not issues or pull requests (or can't be looked up) are left out.
+        """
+        now = time.time()
+        with self._lock:
+            missing = sorted({number for number in numbers if self._known(key, number, now) is None})
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start: start + self.batch_size]
+            try:
+                found = self._fetch(key, batch, client)
+            except Exception as e:
+                # The links are still rendered, just without titles
+                logger.warning(f'Unable to look up the issue titles for {key[1]}/{key[2]}: {e}')
+                break
+            with self._lock:
+                for number in batch:
+                    entry = {'title': None, 'open': False, 'fetched_at': now}
+                    if found.get(number, None):
+                        entry.update(title=found[number].get('title', None), open=found[number].get('state', None) == 'OPEN')
+                    self._titles.setdefault(_key_str(key), {})[str(number)] = entry
+                    self._updated.setdefault(_key_str(key), {})[str(number)] = entry
+        with self._lock:
+            entries = self._titles.get(_key_str(key), {})
+            return {number: entries[str(number)]['title'] for number in numbers if (entries.get(str(number), None) or {}).get('title', None)}
+
+    def _fetch(self, key: tuple[str, str, str], numbers: list[int], client: HostClient) -> dict[int, Mapping[str, Any]]:
+        """Look up a batch of issues (or pull requests) in a single GraphQL request."""
+        _, org, repo = key
+        logger.debug(f'Looking up {len(numbers)} issue titles for {org}/{repo}')
+        result, _ = graphql_request(client, issues_query(org, repo, numbers))
+        with self._lock:
+            self.requests += 1
+        repository = (result.get('data', None) or {}).get('repository', None)
+        if repository is None:
+            errors = '; '.join(error.get('message', '') for error in result.get('errors', None) or [])
+            raise ValueError(errors or 'No repository in the response')
+        return {int(alias[1:]): value for alias, value in repository.items() if value}
+
+    def save(self) -> None:
+        """Save the titles, merged with any saved by other processes since they were loaded."""
+        if self.path is None or not self._updated:
+            return
+        with self._lock:
+            updated, self._updated = self._updated, {}
+        with FileLock(self.path.with_suffix('.lock')):
+            titles = IssueTitles(self.path)._titles
+            for repository, entries in updated.items():
+                titles.setdefault(repository, {}).update(entries)
+            atomic_write_text(self.path, json.dumps({'titles': titles}, sort_keys=True))
+        with self._lock:
+            for repository, entries in titles.items():
+                self._titles.setdefault(repository, {}).update(entries)
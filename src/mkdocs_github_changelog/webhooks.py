@@ -0,0 +1,238 @@
+"""Receive github ``release`` webhooks under ``mkdocs serve``, and update the cached releases from them.
+
+The same payloads are also read from ``GITHUB_EVENT_PATH`` in github actions (with ``seed_from_event``).
+"""
+from __future__ import annotations
+
+import hashlib
+import hmac
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+from pathlib import Path
+import threading
+from typing import Any, Callable, Collection, Mapping, TYPE_CHECKING
+
+from mkdocs_github_changelog import logger
+from mkdocs_github_changelog.cache import cache_key
+from mkdocs_github_changelog.streaming import project
+
+if TYPE_CHECKING:
+    from mkdocs_github_changelog.cache import ReleaseCache
+
+# Actions that remove the release from the changelog, the rest add or replace it
+REMOVED_ACTIONS = ('deleted',)
+# Fields github only renders for the releases API (with its html media type), not in the webhook payloads
+RENDERED_FIELDS = ('body_html',)
+MAX_PAYLOAD_SIZE = 25*1024*1024
+
+
+def verify_signature(secret: str, body: bytes, signature: str | None) -> bool:
+    """Check the ``X-Hub-Signature-256`` header of a webhook delivery against the secret."""
+    if not signature:
+        return False
+    expected = 'sha256=' + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+def event_key(payload: Mapping[str, Any]) -> tuple[str, str, str]:
+    """Get the cache key for the repository of a webhook payload.
+
+    The host is from the repository's API url (e.g. ``https://api.github.com/repos/{org}/{repo}``).
+    Raises a ``KeyError`` if the payload has no repository.
+    """
+    repository = payload['repository']
+    org, repo = repository['full_name'].split('/', 1)
+    url = repository.get('url', None) or ''
+    github_api_url = url.rsplit('/repos/', 1)[0] if '/repos/' in url else None
+    return cache_key(org, repo, github_api_url)
+
+
+def _matches(release: Any, event_release: Mapping[str, Any], tag_names: Collection[str]) -> bool:
+    """Whether a cached release is the release in an event (by ``id``, or by ``tag_name`` if it wasn't kept)."""
+    if release.get('id', None) is not None and event_release.get('id', None) is not None:
+        return release['id'] == event_release['id']
+    return release.get('tag_name', None) in tag_names
+
+
+def event_covers_fields(payload: Mapping[str, Any], fields: Collection[str] | None) -> bool:
+    """Whether the release in a ``release`` webhook payload has the rendered fields (see ``RENDERED_FIELDS``) of releases with the ``fields``.
+
+    If it doesn't, the repository's releases are refetched rather than updated from the payload (a deleted release
+    has nothing to render).
+    """
+    if fields is None or payload.get('action', None) in REMOVED_ACTIONS:
+        return True
+    return all(field in payload['release'] for field in RENDERED_FIELDS if field in fields)
+
+
+def apply_release_event(releases: list, payload: Mapping[str, Any], fields: Collection[str] | None = None) -> list:
+    """Get the releases updated with the release in a ``release`` webhook payload.
+
+    A deleted release is removed, and any other action replaces the release (in place), or adds it as the
+    newest release if it isn't there. The release is projected to the ``fields`` (all of them if None).
+    """
+    # Imported here, as it is slow to import and not needed unless there are releases
+    from fastcore.xtras import dict2obj
+    event_release = payload['release']
+    tag_names = {event_release.get('tag_name', None)}
+    # An edit can rename the tag
+    tag_names.add(((payload.get('changes', None) or {}).get('tag_name', None) or {}).get('from', None))
+    tag_names.discard(None)
+    updated = []
+    replaced = False
+    for release in releases:
+        if not _matches(release, event_release, tag_names):
+            updated.append(release)
+        elif payload.get('action', None) not in REMOVED_ACTIONS and not replaced:
+            updated.append(dict2obj(project(dict(event_release), fields)))
+            replaced = True
+    if not replaced and payload.get('action', None) not in REMOVED_ACTIONS:
+        updated.insert(0, dict2obj(project(dict(event_release), fields)))
+    return updated
+
+
+def load_event(path: str | Path | None = None) -> dict[str, Any] | None:
+    """Load a ``release`` event payload from a file (by default, the ``GITHUB_EVENT_PATH`` of a github actions run).
+
+    Returns None if there is no file, or it isn't the payload of a ``release`` event.
+    """
+    if path is None:
+        path = os.environ.get('GITHUB_EVENT_PATH', None)
+        if not path:
+            return None
+    try:
+        payload = json.loads(Path(path).read_text(encoding='utf-8'))
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f'Unable to load the github event payload from {path}: {e}')
+        return None
+    if not isinstance(payload, dict) or not isinstance(payload.get('release', None), dict) or 'repository' not in payload:
+        logger.debug(f'The github event payload in {path} is not for a release')
+        return None
+    return payload
+
+
+def seed_from_event(cache: ReleaseCache, path: str | Path | None = None) -> tuple[str, str, str] | None:
+    """Add the release from a ``release`` event payload file (see ``load_event``) to the cached releases of its repository.
+
+    The releases fetched before (however old, e.g. from a ``cache_dir`` restored in CI) are updated with the release
+    and stored as if they had just been fetched, so they are used rather than fetched again. Returns the key of the
+    repository if its releases were updated, or None if there was no payload or no releases to update (or they have
+    fields the payload doesn't, see ``event_covers_fields``, so they are fetched when they are needed).
+    """
+    payload = load_event(path)
+    if payload is None:
+        return None
+    try:
+        key = event_key(payload)
+    except (KeyError, AttributeError, ValueError) as e:
+        logger.warning(f'Unable to get the repository of the github event payload: {e}')
+        return None
+    entry = cache.get(key)
+    if entry is None and cache.disk_cache is not None:
+        try:
+            entry_fields = cache.disk_cache.stored_fields(key)
+        except KeyError:
+            entry_fields = None
+    else:
+        entry_fields = None if entry is None else entry.fields
+    if not event_covers_fields(payload, entry_fields):
+        logger.info(f'The github event for {key[1]}/{key[2]} does not have the rendered release body, so its releases are fetched when needed')
+        return None
+    if not cache.seed(key, lambda releases, fields: apply_release_event(releases, payload, fields)):
+        logger.info(f'No cached releases for {key[1]}/{key[2]} to add the {payload.get("action", None)} release from the github event to')
+        return None
+    logger.info(f'Added the {payload.get("action", None)} release {payload["release"].get("tag_name", None)} from the github event to the cached releases for {key[1]}/{key[2]}')
+    return key
+
+
+class WebhookReceiver():
+    """A local HTTP server receiving github webhook deliveries in a background thread.
+
+    ``on_release`` is called with the cache key and payload of each ``release`` event, other events (e.g.
+    ``ping``) are acknowledged and ignored.
+    """
+
+    def __init__(
+        self,
+        on_release: Callable[[tuple[str, str, str], Mapping[str, Any]], None],
+        port: int = 0,
+        host: str = 'localhost',
+        secret: str | None = None,
+    ):
+        """Initialise the receiver, listening on the ``port`` (0 picks a free port)."""
+        self.on_release = on_release
+        self.secret = secret
+        self._httpd = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._httpd.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        """The url to deliver webhooks to."""
+        host, port = self._httpd.server_address[:2]
+        return f'http://{host}:{port}/'
+
+    def start(self) -> WebhookReceiver:
+        """Start receiving in a background thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._httpd.serve_forever, args=(0.1,), name='mkdocs_github_changelog-webhooks', daemon=True
+            )
+            self._thread.start()
+            logger.info(f'Receiving github release webhooks at {self.url}')
+        return self
+
+    def stop(self) -> None:
+        """Stop receiving."""
+        if self._thread is not None:
+            self._httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._httpd.server_close()
+
+    def receive(self, event: str | None, body: bytes, signature: str | None = None) -> int:
+        """Handle a webhook delivery, returning the HTTP status to respond with."""
+        if self.secret and not verify_signature(self.secret, body, signature):
+            logger.warning('Ignoring a webhook with an invalid signature')
+            return 401
+        if event != 'release':
+            return 204
+        try:
+            payload = json.loads(body)
+            key = event_key(payload)
+            if not isinstance(payload.get('release', None), dict):
+                raise KeyError('release')
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            logger.warning(f'Ignoring an invalid release webhook: {e}')
+            return 400
+        logger.info(f'Received a {payload.get("action", None)} release webhook for {key[1]}/{key[2]}')
+        try:
+            self.on_release(key, payload)
+        except Exception as e:
+            logger.warning(f'Unable to update the releases for {key[1]}/{key[2]} from a webhook: {e}')
+            return 500
+        return 204
+
+
+def _make_handler(receiver: WebhookReceiver) -> type[BaseHTTPRequestHandler]:
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def do_POST(self) -> None:
+            length = int(self.headers.get('Content-Length', None) or 0)
+            if length > MAX_PAYLOAD_SIZE:
+                self.send_response(413)
+                self.end_headers()
+                return
+            body = self.rfile.read(length)
+            status = receiver.receive(self.headers.get('X-GitHub-Event', None), body, self.headers.get('X-Hub-Signature-256', None))
+            self.send_response(status)
+            self.end_headers()
+
+        def log_message(self, format: str, *args: Any) -> None:
+            logger.debug(format % args)
+
+    return Handler
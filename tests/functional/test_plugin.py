@@ -10,6 +10,7 @@ from mkdocs.__main__ import build_command
 from nskit.common.contextmanagers import ChDir
 
 from mkdocs_github_changelog import get_releases
+from mkdocs_github_changelog.testing.server import GithubStandInServer
 
 # Offline test without github call
 
@@ -147,6 +148,45 @@ plugins:
 
 
 
+class StandInServerTest(unittest.TestCase):
+    """Build against the local stand-in for the github API, so the HTTP requests are made without the network."""
+
+    def setUp(self):
+        self.server = GithubStandInServer(max_per_page=10).start()
+        self.addCleanup(self.server.stop)
+        self.server.add_repository('abc', 'xyz', 25)
+
+    @property
+    def mkdocs_yml(self):
+        return f"""
+site_name: mkdocs_github_changelog_test_repo
+docs_dir: ./source
+site_dir: ./html
+nav:
+ - index.md
+
+plugins:
+  - mkdocs_github_changelog:
+      github_api_url: {self.server.url}
+      include_prereleases: true
+"""
+
+    def test_mkdocs(self):
+        with ChDir():
+            Path('mkdocs.yml').write_text(self.mkdocs_yml)
+            index = Path('source/index.md')
+            index.parent.mkdir(parents=True, exist_ok=True)
+            index.write_text('# Test\n\n## ::github-release-changelog abc/xyz\n')
+            resp = CliRunner().invoke(build_command, catch_exceptions=False)
+            self.assertEqual(resp.exit_code, 0, resp.output)
+            contents = Path('html', 'index.html').read_text(encoding='utf8')
+            releases = [r for r in self.server.repositories[('abc', 'xyz')] if not r['draft']]
+            for release in releases:
+                self.assertIn(f'<a href="{release["html_url"]}">{release["name"]}</a>', contents)
+            # 3 pages of 10, and the empty page that stops the paging
+            self.assertEqual(len(self.server.requests), 4)
+
+
 class OnlineTest(unittest.TestCase):
 
     @property
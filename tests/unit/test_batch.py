@@ -0,0 +1,93 @@
+import unittest
+
+from mkdocs_github_changelog.batch import batchable, BatchError, fetch_releases_batched, releases_query
+from mkdocs_github_changelog.clients import HostClient
+from mkdocs_github_changelog.failures import Deadline, DeadlineExceeded
+from mkdocs_github_changelog.get_releases import fetch_releases
+from mkdocs_github_changelog.metrics import DirectiveMetrics
+from mkdocs_github_changelog.streaming import REQUIRED_FIELDS, SELECTION_FIELDS
+from mkdocs_github_changelog.testing.server import GithubStandInServer
+
+
+class ReleasesQueryTestCase(unittest.TestCase):
+
+    def test_batchable(self):
+        self.assertTrue(batchable(REQUIRED_FIELDS))
+        self.assertTrue(batchable(('id', 'created_at')))
+        self.assertFalse(batchable((*REQUIRED_FIELDS, 'assets')))
+        self.assertTrue(batchable((*REQUIRED_FIELDS, 'body_html')))
+        # Could use any field
+        self.assertFalse(batchable(None))
+
+    def test_releases_query(self):
+        query = releases_query([('abc', 'd"ef', None, ('name', 'body')), ('abc', 'ghi', '100', ('tag_name',))])
+        self.assertIn('r0: repository(owner: "abc", name: "d\\"ef") { releases(first: 100, orderBy:', query)
+        self.assertIn('nodes { name: name body: description }', query)
+        self.assertIn('r1: repository(owner: "abc", name: "ghi") { releases(first: 100, after: "100", orderBy:', query)
+        self.assertIn('nodes { tag_name: tagName }', query)
+
+
+class FetchReleasesBatchedTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.server = GithubStandInServer().start()
+        self.addCleanup(self.server.stop)
+        self.client = HostClient(self.server.url, token='abc')
+        self.addCleanup(self.client.close)
+
+    def _keys(self, *repos):
+        return [(self.server.url, 'abc', repo) for repo in repos]
+
+    def test_first_pages(self):
+        keys = self._keys(*(f'repo-{i}' for i in range(5)))
+        for key in keys:
+            self.server.add_repository('abc', key[2], 20)
+        metrics = {key: DirectiveMetrics(key[1], key[2]) for key in keys}
+        releases = fetch_releases_batched(keys, self.client, dict.fromkeys(keys, REQUIRED_FIELDS), batch_size=2, metrics=metrics)
+        self.assertEqual([len(releases[key]) for key in keys], [20]*5)
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertTrue(all(m.requests == 1 and m.releases_seen == 20 for m in metrics.values()))
+
+    def test_next_pages(self):
+        keys = self._keys('small', 'large')
+        self.server.add_repository('abc', 'small', 5)
+        self.server.add_repository('abc', 'large', 250)
+        metrics = {key: DirectiveMetrics(key[1], key[2]) for key in keys}
+        releases = fetch_releases_batched(keys, self.client, dict.fromkeys(keys, REQUIRED_FIELDS), metrics=metrics)
+        # Only the large repository is in the queries for the next pages
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(metrics[keys[0]].requests, 1)
+        self.assertEqual(metrics[keys[1]].requests, 3)
+        # The same as from the REST API
+        expected = fetch_releases('abc', 'large', client=self.client, fields=REQUIRED_FIELDS)
+        self.assertEqual([dict(release) for release in releases[keys[1]]], [dict(release) for release in expected])
+
+    def test_body_html(self):
+        keys = self._keys('def')
+        self.server.add_repository('abc', 'def', 5)
+        releases = fetch_releases_batched(keys, self.client, dict.fromkeys(keys, (*SELECTION_FIELDS, 'body_html')))
+        expected = fetch_releases('abc', 'def', client=self.client, fields=(*SELECTION_FIELDS, 'body_html'))
+        self.assertEqual([dict(release) for release in releases[keys[0]]], [dict(release) for release in expected])
+
+    def test_missing_repository(self):
+        keys = self._keys('def', 'missing')
+        self.server.add_repository('abc', 'def', 5)
+        releases = fetch_releases_batched(keys, self.client, dict.fromkeys(keys, REQUIRED_FIELDS))
+        self.assertEqual(len(releases[keys[0]]), 5)
+        self.assertIsInstance(releases[keys[1]], BatchError)
+        self.assertIn('abc/missing', str(releases[keys[1]]))
+
+    def test_failed_query(self):
+        keys = self._keys('def', 'ghi')
+        self.server.add_repository('abc', 'def', 5)
+        self.server.errors = {1: 502}
+        releases = fetch_releases_batched(keys, self.client, dict.fromkeys(keys, REQUIRED_FIELDS))
+        self.assertTrue(all(isinstance(releases[key], Exception) for key in keys))
+
+    def test_deadline(self):
+        keys = self._keys('def', 'ghi')
+        deadline = Deadline(1)
+        deadline.start -= 2
+        releases = fetch_releases_batched(keys, self.client, dict.fromkeys(keys, REQUIRED_FIELDS), batch_size=1, deadline=deadline)
+        self.assertTrue(all(isinstance(releases[key], DeadlineExceeded) for key in keys))
+        self.assertEqual(self.server.requests, [])
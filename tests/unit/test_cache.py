@@ -0,0 +1,340 @@
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+
+from fastcore.net import HTTP404NotFoundError
+from nskit.common.contextmanagers import ChDir
+
+from mkdocs_github_changelog.cache import (
+    cache_key,
+    CacheEntry,
+    ReleaseCache,
+    ReleaseRefresher,
+    ReleasesNotReady,
+)
+from mkdocs_github_changelog.disk_cache import DiskCache
+from mkdocs_github_changelog.testing.corpus import named_releases
+
+
+class CacheKeyTestCase(unittest.TestCase):
+
+    def test_default_host(self):
+        self.assertEqual(cache_key('abc', 'def'), ('https://api.github.com', 'abc', 'def'))
+
+    def test_custom_host(self):
+        self.assertEqual(cache_key('abc', 'def', 'https://github.example.com/api/v3/'), ('https://github.example.com/api/v3', 'abc', 'def'))
+
+
+class CacheEntryTestCase(unittest.TestCase):
+
+    def test_expired(self):
+        entry = CacheEntry(named_releases('0.1.0'), fetched_at=time.monotonic() - 100)
+        self.assertTrue(entry.expired(10))
+        self.assertFalse(entry.expired(1000))
+
+    def test_never_expires_without_ttl(self):
+        entry = CacheEntry(named_releases('0.1.0'), fetched_at=time.monotonic() - 100)
+        self.assertFalse(entry.expired(None))
+        self.assertFalse(entry.expired(0))
+
+
+class ReleaseCacheTestCase(unittest.TestCase):
+
+    def test_get_releases_fetches_once(self):
+        cache = ReleaseCache()
+        fetcher = MagicMock(return_value=named_releases('0.2.0', '0.1.0'))
+        key = cache_key('abc', 'def')
+        first = cache.get_releases(key, fetcher)
+        second = cache.get_releases(key, fetcher)
+        fetcher.assert_called_once_with()
+        self.assertEqual(first, second)
+        self.assertIn(key, cache)
+
+    def test_get_releases_returns_copies(self):
+        cache = ReleaseCache()
+        key = cache_key('abc', 'def')
+        releases = cache.get_releases(key, MagicMock(return_value=named_releases('0.1.0')))
+        releases[0].body = 'Processed'
+        releases[0].processed = True
+        cached = cache.get(key).releases[0]
+        self.assertEqual(cached.body, 'Release 0.1.0')
+        self.assertNotIn('processed', cached)
+
+    def test_set_reports_changes(self):
+        cache = ReleaseCache()
+        key = cache_key('abc', 'def')
+        self.assertTrue(cache.set(key, named_releases('0.1.0')))
+        self.assertFalse(cache.set(key, named_releases('0.1.0')))
+        self.assertTrue(cache.set(key, named_releases('0.2.0', '0.1.0')))
+
+    def test_refresh_without_fetcher(self):
+        cache = ReleaseCache()
+        key = cache_key('abc', 'def')
+        cache.set(key, named_releases('0.1.0'))
+        self.assertFalse(cache.refresh(key))
+
+    def test_update(self):
+        cache = ReleaseCache()
+        key = cache_key('abc', 'def')
+        self.assertFalse(cache.update(key, lambda releases, fields: named_releases('0.2.0')))
+        self.assertIsNone(cache.get(key))
+        cache.set(key, named_releases('0.1.0'), fields=('name', 'body'))
+        fetched_at = cache.get(key).fetched_at
+        updater = MagicMock(side_effect=lambda releases, fields: named_releases('0.2.0') + releases)
+        self.assertTrue(cache.update(key, updater))
+        self.assertEqual(updater.call_args.args[1], ('name', 'body'))
+        self.assertEqual([r.name for r in cache.get(key).releases], ['0.2.0', '0.1.0'])
+        self.assertEqual(cache.get(key).fetched_at, fetched_at)
+        self.assertFalse(cache.update(key, lambda releases, fields: releases))
+
+    def test_get_releases_fields(self):
+        cache = ReleaseCache()
+        key = cache_key('abc', 'def')
+        self.assertEqual(cache.fields_to_fetch(key, ['name']), ('name',))
+        self.assertIsNone(cache.fields_to_fetch(key, None))
+        fetcher = MagicMock(return_value=named_releases('0.1.0'))
+        cache.get_releases(key, fetcher, fields=('name', 'body'))
+        # Already has the fields
+        cache.get_releases(key, fetcher, fields=('name',))
+        fetcher.assert_called_once_with()
+        # Fetched again with the fields it has, and those needed
+        self.assertEqual(cache.fields_to_fetch(key, ['author']), ('name', 'body', 'author'))
+        cache.get_releases(key, fetcher, fields=('name', 'body', 'author'))
+        self.assertEqual(fetcher.call_count, 2)
+        self.assertEqual(cache.get(key).fields, ('name', 'body', 'author'))
+        cache.get_releases(key, fetcher, fields=None)
+        self.assertEqual(fetcher.call_count, 3)
+        self.assertIsNone(cache.fields_to_fetch(key, ['author']))
+
+    def test_expired(self):
+        cache = ReleaseCache(ttl=10)
+        key = cache_key('abc', 'def')
+        cache.get_releases(key, MagicMock(return_value=named_releases('0.1.0')))
+        self.assertEqual(cache.expired(), [])
+        cache.get(key).fetched_at -= 100
+        self.assertEqual(cache.expired(), [key])
+
+
+class DiskCacheIntegrationTestCase(unittest.TestCase):
+
+    def test_fetched_releases_saved(self):
+        with ChDir():
+            cache = ReleaseCache(disk_cache=DiskCache('cache'))
+            key = cache_key('abc', 'def')
+            cache.get_releases(key, MagicMock(return_value=named_releases('0.1.0')))
+            releases, _ = DiskCache('cache').load(key)
+            self.assertEqual(releases[0].name, '0.1.0')
+
+    def test_loaded_from_disk(self):
+        with ChDir():
+            key = cache_key('abc', 'def')
+            DiskCache('cache').save(key, named_releases('0.1.0'), fetched_at=time.time() - 100)
+            cache = ReleaseCache(ttl=1000, disk_cache=DiskCache('cache'))
+            fetcher = MagicMock()
+            releases = cache.get_releases(key, fetcher)
+            fetcher.assert_not_called()
+            self.assertEqual(releases[0].name, '0.1.0')
+            # It keeps its age, so expires when it would on disk
+            cache.ttl = 50
+            self.assertEqual(cache.expired(), [key])
+
+    def test_expired_on_disk(self):
+        with ChDir():
+            key = cache_key('abc', 'def')
+            DiskCache('cache').save(key, named_releases('0.1.0'), fetched_at=time.time() - 100)
+            cache = ReleaseCache(ttl=10, disk_cache=DiskCache('cache'))
+            fetcher = MagicMock(return_value=named_releases('0.2.0', '0.1.0'))
+            releases = cache.get_releases(key, fetcher)
+            fetcher.assert_called_once_with()
+            self.assertEqual(len(releases), 2)
+            self.assertEqual(len(DiskCache('cache').load(key, max_age=10)[0]), 2)
+
+    def test_cached(self):
+        with ChDir():
+            key = cache_key('abc', 'def')
+            cache = ReleaseCache(ttl=10, disk_cache=DiskCache('cache'))
+            self.assertFalse(cache.cached(key))
+            DiskCache('cache').save(key, named_releases('0.1.0'), fields=('name', 'body'))
+            self.assertFalse(cache.cached(key, ('name', 'assets')))
+            self.assertTrue(cache.cached(key, ('name',)))
+            # Loaded from the disk cache
+            self.assertIn(key, cache)
+            other = cache_key('abc', 'ghi')
+            DiskCache('cache').save(other, named_releases('0.1.0'), fetched_at=time.time() - 100)
+            self.assertFalse(cache.cached(other))
+
+    def test_update_saved(self):
+        with ChDir():
+            key = cache_key('abc', 'def')
+            DiskCache('cache').save(key, named_releases('0.1.0'), fetched_at=time.time() - 100, fields=('name', 'body'))
+            cache = ReleaseCache(disk_cache=DiskCache('cache'))
+            cache.get_releases(key, MagicMock(), fields=('name', 'body'))
+            self.assertTrue(cache.update(key, lambda releases, fields: named_releases('0.2.0') + releases))
+            releases, fetched_at = DiskCache('cache').load(key, fields=('name', 'body'))
+            self.assertEqual([r.name for r in releases], ['0.2.0', '0.1.0'])
+            self.assertAlmostEqual(fetched_at, time.time() - 100, delta=5)
+
+    def test_seed(self):
+        with ChDir():
+            key = cache_key('abc', 'def')
+            cache = ReleaseCache(ttl=10, disk_cache=DiskCache('cache'))
+            self.assertFalse(cache.seed(key, MagicMock()))
+            DiskCache('cache').save(key, named_releases('0.1.0'), fetched_at=time.time() - 100, fields=('name', 'body'))
+            updater = MagicMock(side_effect=lambda releases, fields: named_releases('0.2.0') + releases)
+            self.assertTrue(cache.seed(key, updater))
+            self.assertEqual(updater.call_args[0][1], ('name', 'body'))
+            # Stored as if just fetched, so used rather than fetched again
+            fetcher = MagicMock()
+            self.assertEqual([r.name for r in cache.get_releases(key, fetcher, fields=('name',))], ['0.2.0', '0.1.0'])
+            fetcher.assert_not_called()
+            releases, fetched_at = DiskCache('cache').load(key, max_age=10, fields=('name', 'body'))
+            self.assertEqual(len(releases), 2)
+
+    def test_nowait_loaded_from_disk(self):
+        with ChDir():
+            key = cache_key('abc', 'def')
+            DiskCache('cache').save(key, named_releases('0.1.0'))
+            cache = ReleaseCache(disk_cache=DiskCache('cache'))
+            self.assertEqual(cache.get_releases_nowait(key, MagicMock())[0].name, '0.1.0')
+
+
+class BackgroundFetchTestCase(unittest.TestCase):
+
+    def test_get_releases_nowait(self):
+        fetched = threading.Event()
+        on_fetched = MagicMock(side_effect=lambda keys: fetched.set())
+        cache = ReleaseCache(on_fetched=on_fetched)
+        fetcher = MagicMock(return_value=named_releases('0.1.0'))
+        key = cache_key('abc', 'def')
+        with self.assertRaises(ReleasesNotReady):
+            cache.get_releases_nowait(key, fetcher)
+        self.assertTrue(fetched.wait(1))
+        on_fetched.assert_called_once_with([key])
+        self.assertEqual([r.name for r in cache.get_releases_nowait(key, fetcher)], ['0.1.0'])
+        fetcher.assert_called_once_with()
+        cache.shutdown()
+
+    def test_pending_fetch_not_repeated(self):
+        release = threading.Event()
+        fetched = threading.Event()
+        cache = ReleaseCache(on_fetched=lambda keys: fetched.set())
+        fetcher = MagicMock(side_effect=lambda: release.wait(1) and named_releases('0.1.0'))
+        key = cache_key('abc', 'def')
+        for _ in range(3):
+            with self.assertRaises(ReleasesNotReady):
+                cache.get_releases_nowait(key, fetcher)
+        release.set()
+        self.assertTrue(fetched.wait(1))
+        fetcher.assert_called_once_with()
+        cache.shutdown()
+
+    def test_failed_fetch_is_retried(self):
+        cache = ReleaseCache()
+        fetcher = MagicMock(side_effect=[ValueError('Rate limited'), named_releases('0.1.0')])
+        key = cache_key('abc', 'def')
+        cache._background_fetch(key, fetcher)
+        self.assertNotIn(key, cache)
+        cache._background_fetch(key, fetcher)
+        self.assertIn(key, cache)
+
+
+class FailedFetchTestCase(unittest.TestCase):
+
+    def test_stale_if_error(self):
+        with ChDir():
+            key = cache_key('abc', 'def')
+            DiskCache('cache').save(key, named_releases('0.1.0'), fetched_at=time.time() - 100)
+            cache = ReleaseCache(ttl=10, disk_cache=DiskCache('cache'))
+            with self.assertLogs('mkdocs.plugins.mkdocs_github_changelog', level='WARNING') as logs:
+                releases = cache.get_releases(key, MagicMock(side_effect=ValueError('Timed out')))
+            self.assertEqual([r.name for r in releases], ['0.1.0'])
+            self.assertIn('Timed out', logs.output[0])
+            # Still expired, so it is refreshed again later
+            self.assertEqual(cache.expired(), [key])
+
+    def test_error_without_stale_releases(self):
+        with ChDir():
+            cache = ReleaseCache(disk_cache=DiskCache('cache'))
+            with self.assertRaises(ValueError):
+                cache.get_releases(cache_key('abc', 'def'), MagicMock(side_effect=ValueError('Timed out')))
+
+    def test_not_found_remembered(self):
+        cache = ReleaseCache()
+        fetcher = MagicMock(side_effect=HTTP404NotFoundError(None, None, None))
+        key = cache_key('abc', 'def')
+        for _ in range(3):
+            with self.assertRaises(HTTP404NotFoundError):
+                cache.get_releases(key, fetcher)
+        fetcher.assert_called_once_with()
+        self.assertIsInstance(cache.failure(key), HTTP404NotFoundError)
+        with self.assertRaises(HTTP404NotFoundError):
+            cache.get_releases_nowait(key, fetcher)
+        fetcher.assert_called_once_with()
+        # Requested again once the error_ttl has passed
+        cache.error_ttl = 0
+        self.assertIsNone(cache.failure(key))
+        fetcher.side_effect = None
+        fetcher.return_value = named_releases('0.1.0')
+        cache.get_releases(key, fetcher)
+        self.assertEqual(fetcher.call_count, 2)
+
+    def test_other_errors_not_remembered(self):
+        cache = ReleaseCache()
+        fetcher = MagicMock(side_effect=ValueError('Timed out'))
+        key = cache_key('abc', 'def')
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                cache.get_releases(key, fetcher)
+        self.assertEqual(fetcher.call_count, 2)
+        self.assertIsNone(cache.failure(key))
+
+
+class ReleaseRefresherTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = ReleaseCache(ttl=10)
+        self.changed_key = cache_key('abc', 'def')
+        self.unchanged_key = cache_key('abc', 'ghi')
+        self.changed = MagicMock(side_effect=[named_releases('0.1.0'), named_releases('0.2.0', '0.1.0')])
+        self.unchanged = MagicMock(return_value=named_releases('1.0.0'))
+        self.cache.get_releases(self.changed_key, self.changed)
+        self.cache.get_releases(self.unchanged_key, self.unchanged)
+
+    def _expire(self):
+        for key in self.cache.keys():
+            self.cache.get(key).fetched_at -= 100
+
+    def test_refresh_expired_only_reports_changes(self):
+        on_change = MagicMock()
+        refresher = ReleaseRefresher(self.cache, on_change)
+        self._expire()
+        self.assertEqual(refresher.refresh_expired(), [self.changed_key])
+        on_change.assert_called_once_with([self.changed_key])
+        self.assertEqual([r.name for r in self.cache.get(self.changed_key).releases], ['0.2.0', '0.1.0'])
+
+    def test_refresh_not_expired(self):
+        on_change = MagicMock()
+        refresher = ReleaseRefresher(self.cache, on_change)
+        self.assertEqual(refresher.refresh_expired(), [])
+        on_change.assert_not_called()
+        self.changed.assert_called_once_with()
+
+    def test_refresh_error_keeps_releases(self):
+        on_change = MagicMock()
+        self.unchanged.side_effect = ValueError('Rate limited')
+        refresher = ReleaseRefresher(self.cache, on_change)
+        self._expire()
+        self.assertEqual(refresher.refresh_expired(), [self.changed_key])
+        self.assertEqual([r.name for r in self.cache.get(self.unchanged_key).releases], ['1.0.0'])
+
+    def test_thread_start_stop(self):
+        on_change = MagicMock()
+        refresher = ReleaseRefresher(self.cache, on_change, interval=0.01)
+        self._expire()
+        refresher.start()
+        time.sleep(0.1)
+        refresher.stop()
+        refresher.join(1)
+        self.assertFalse(refresher.is_alive())
+        on_change.assert_called_once_with([self.changed_key])
@@ -0,0 +1,167 @@
+from pathlib import Path
+import unittest
+from unittest.mock import patch
+
+from click.testing import CliRunner
+from nskit.common.contextmanagers import ChDir
+
+from mkdocs_github_changelog import planner
+from mkdocs_github_changelog.cli import main
+from mkdocs_github_changelog.disk_cache import DiskCache
+from mkdocs_github_changelog.streaming import REQUIRED_FIELDS
+from mkdocs_github_changelog.testing.server import GithubStandInServer
+
+MKDOCS_YML = """
+site_name: test
+docs_dir: ./source
+plugins:
+  - mkdocs_github_changelog:
+      cache_dir: cache
+"""
+
+
+class PlanCommandTestCase(unittest.TestCase):
+
+    def _setup_docs(self, mkdocs_yml=MKDOCS_YML):
+        Path('mkdocs.yml').write_text(mkdocs_yml)
+        Path('source').mkdir()
+        Path('source', 'index.md').write_text('## ::github-release-changelog abc/def\n\n::github-release-changelog abc/def\n')
+
+    def test_plan_no_check(self):
+        with ChDir():
+            self._setup_docs()
+            result = CliRunner().invoke(main, ['plan', '--no-check'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('https://api.github.com/abc/def: 2 requests (2 directives', result.output)
+
+    @patch.object(planner, 'get_rate_limit')
+    def test_plan_exceeds_quota(self, get_rate_limit):
+        get_rate_limit.return_value = {'remaining': 1, 'limit': 60, 'reset': 0}
+        with ChDir():
+            self._setup_docs()
+            result = CliRunner().invoke(main, ['plan', '-f', 'mkdocs.yml'])
+        self.assertEqual(result.exit_code, 1, result.output)
+        self.assertIn('EXCEEDS', result.output)
+
+    def test_plan_wildcard(self):
+        with GithubStandInServer() as server, ChDir():
+            server.add_repository('abc', 'mkdocs-a', 1)
+            server.add_repository('abc', 'mkdocs-b', 1)
+            self._setup_docs(MKDOCS_YML + f'      github_api_url: {server.url}\n')
+            Path('source', 'all.md').write_text('::github-release-changelog abc/mkdocs-*\n')
+            result = CliRunner().invoke(main, ['plan', '--no-check'])
+            self.assertEqual(result.exit_code, 0, result.output)
+            self.assertIn(f'{server.url}/abc/mkdocs-b: 2 requests (1 directives', result.output)
+            self.assertIn(f'{server.url}/abc/*: 2 requests (listing the repositories)', result.output)
+            # The repositories listed are kept for the build
+            self.assertTrue(Path('cache', 'repositories.json').exists())
+
+    @patch.object(planner, 'get_rate_limit')
+    def test_plan_token_pool(self, get_rate_limit):
+        get_rate_limit.side_effect = lambda token, host: {'remaining': 1 if token else 0, 'limit': 5000, 'reset': 0}
+        with ChDir():
+            self._setup_docs(MKDOCS_YML + '      tokens: [abc, def]\n')
+            result = CliRunner().invoke(main, ['plan', '-f', 'mkdocs.yml'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual({call.args[0] for call in get_rate_limit.call_args_list}, {'abc', 'def'})
+        self.assertIn('(2 tokens): 2 of 2/10000 remaining (fits', result.output)
+
+    def test_plan_without_plugin(self):
+        with ChDir():
+            self._setup_docs('site_name: test\ndocs_dir: ./source\n')
+            result = CliRunner().invoke(main, ['plan', '--no-check'])
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn('not configured as a plugin', result.output)
+
+
+class PrefetchCommandTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.server = GithubStandInServer().start()
+        self.addCleanup(self.server.stop)
+        self.server.add_repository('abc', 'def', 150)
+
+    def _setup_docs(self, *repos):
+        Path('mkdocs.yml').write_text(MKDOCS_YML + f'      github_api_url: {self.server.url}\n')
+        Path('source').mkdir()
+        Path('source', 'index.md').write_text('\n\n'.join(f'## ::github-release-changelog abc/{repo}' for repo in repos))
+
+    def test_prefetch(self):
+        with ChDir():
+            self._setup_docs('def')
+            result = CliRunner().invoke(main, ['prefetch', '-j', '2'])
+            self.assertEqual(result.exit_code, 0, result.output)
+            self.assertIn('/abc/def: 150 releases, 3 requests', result.output)
+            self.assertIn('Fetched 1 of 1 repositories', result.output)
+            releases, _ = DiskCache('cache').load((self.server.url, 'abc', 'def'), fields=REQUIRED_FIELDS)
+            self.assertEqual(len(releases), 150)
+            self.assertEqual(planner.UsageHistory(Path('cache', 'usage.json')).pages((self.server.url, 'abc', 'def')), 2)
+
+    def test_prefetch_batched(self):
+        with ChDir():
+            self._setup_docs('def')
+            Path('mkdocs.yml').write_text(Path('mkdocs.yml').read_text() + '      token: abc\n')
+            result = CliRunner().invoke(main, ['prefetch', '--batch-size', '10'])
+            self.assertEqual(result.exit_code, 0, result.output)
+            self.assertIn('/abc/def: 150 releases, 2 requests', result.output)
+            self.assertEqual({method for method, _, _ in self.server.requests}, {'POST'})
+            self.assertEqual(planner.UsageHistory(Path('cache', 'usage.json')).pages((self.server.url, 'abc', 'def')), 2)
+
+    def test_prefetch_failure(self):
+        with ChDir():
+            self._setup_docs('def', 'missing')
+            result = CliRunner().invoke(main, ['prefetch'])
+        self.assertEqual(result.exit_code, 1, result.output)
+        self.assertIn('FAILED', result.output)
+        self.assertIn('/abc/missing', result.output)
+        self.assertIn('Fetched 1 of 2 repositories', result.output)
+
+
+class RenderCommandTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.server = GithubStandInServer().start()
+        self.addCleanup(self.server.stop)
+        for repo in ('def', 'ghi'):
+            self.server.add_repository('abc', repo, 5)
+
+    def _invoke(self, *args):
+        return CliRunner().invoke(main, ['render', '--github-api-url', self.server.url, '--token', 'abc', *args])
+
+    def test_render_stdout(self):
+        result = self._invoke('abc/def')
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('*Released at', result.stdout)
+        self.assertNotIn('# abc/def', result.stdout)
+        self.assertIn('ok      abc/def', result.stderr)
+
+    def test_render_several(self):
+        result = self._invoke('abc/*', '-m', '.*')
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('# abc/def\n\n## [', result.stdout)
+        self.assertIn('# abc/ghi\n\n## [', result.stdout)
+
+    def test_render_several_template(self):
+        with ChDir():
+            # Every heading in the template goes under the repository's heading, not just the first
+            Path('template.j2').write_text('# {{release.tag_name}}\n\n## Notes')
+            result = self._invoke('abc/def', 'abc/ghi', '-t', 'template.j2')
+            self.assertEqual(result.exit_code, 0, result.output)
+            self.assertRegex(result.stdout, r'# abc/def\n\n## [0-9.]+\n\n### Notes')
+            self.assertNotIn('\n## Notes', result.stdout)
+
+    def test_render_files(self):
+        with ChDir():
+            Path('template.j2').write_text('{{release.tag_name}}')
+            result = self._invoke('abc/def', 'abc/ghi', 'abc/missing', '-o', 'out', '-t', 'template.j2', '--cache-dir', 'cache')
+            self.assertEqual(result.exit_code, 1, result.output)
+            self.assertIn('FAILED  abc/missing', result.stderr)
+            self.assertTrue(Path('out', 'abc', 'def.md').exists())
+            self.assertTrue(Path('out', 'abc', 'ghi.md').exists())
+            self.assertFalse(Path('out', 'abc', 'missing.md').exists())
+            self.assertTrue(Path('cache').exists())
+
+    def test_render_invalid(self):
+        result = self._invoke('abc')
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn('Expected a repository', result.output)
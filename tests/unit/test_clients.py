@@ -0,0 +1,214 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from mkdocs_github_changelog import get_releases
+from mkdocs_github_changelog.clients import accept_encoding, HostClient, HostClients, TokenPool
+from mkdocs_github_changelog.metrics import DirectiveMetrics
+from mkdocs_github_changelog.streaming import projected_fields
+from mkdocs_github_changelog.testing.server import GithubStandInServer
+
+
+class HostClientsTestCase(unittest.TestCase):
+
+    def test_invalid(self):
+        for hosts in (
+            {'https://github.example.com/api/v3': {'tokens': 'abc'}},
+            {'https://github.example.com/api/v3': {'max_concurrency': 0}},
+            {'https://github.example.com/api/v3': {'max_connections': 'x'}},
+        ):
+            with self.subTest(hosts=hosts):
+                with self.assertRaises(ValueError):
+                    HostClients(hosts)
+
+    def test_token(self):
+        clients = HostClients({'https://github.example.com/api/v3/': {'token': 'abc'}})
+        self.assertEqual(clients.token('https://github.example.com/api/v3'), 'abc')
+        self.assertIsNone(clients.token())
+        self.assertEqual(clients.get('https://github.example.com/api/v3').token, 'abc')
+        self.assertEqual(clients.get('https://github.example.com/api/v3', 'xyz').token, 'xyz')
+
+    def test_tokens(self):
+        clients = HostClients(
+            {'https://github.example.com/api/v3': {'token': 'abc', 'tokens': ['def', None, 'abc']}},
+            tokens=['xyz', None],
+        )
+        self.assertEqual(clients.host_tokens('https://github.example.com/api/v3'), ['abc', 'def'])
+        self.assertEqual(clients.host_tokens(), ['xyz'])
+        self.assertEqual(clients.get('https://github.example.com/api/v3').tokens.tokens, ['abc', 'def'])
+        self.assertEqual(clients.get('https://github.example.com/api/v3', 'ghi').tokens.tokens, ['ghi'])
+        self.assertEqual(clients.get().token, 'xyz')
+        with self.assertRaises(ValueError):
+            HostClients({'https://github.example.com/api/v3': {'tokens': 'abc'}})
+
+    def test_get_reuses_client(self):
+        clients = HostClients({'https://github.example.com/api/v3': {'max_concurrency': 2, 'timeout': 5}})
+        client = clients.get('https://github.example.com/api/v3/')
+        self.assertIs(clients.get('https://github.example.com/api/v3'), client)
+        self.assertEqual(client.max_concurrency, 2)
+        self.assertEqual(client.max_connections, 2)
+        self.assertEqual(client.timeout, 5)
+        self.assertIsNot(clients.get('https://github.example.com/api/v3', 'abc'), client)
+        self.assertIsNot(clients.get(), client)
+        self.assertEqual(clients.get().host, 'https://api.github.com')
+        self.assertEqual(clients.get().max_concurrency, 4)
+
+    def test_concurrency_shared_by_tokens(self):
+        clients = HostClients({'https://github.example.com/api/v3': {'max_concurrency': 2}})
+        first = clients.get('https://github.example.com/api/v3', 'abc')
+        second = clients.get('https://github.example.com/api/v3', 'def')
+        self.assertIsNot(first, second)
+        with first.slot(), second.slot():
+            # The host's slots are all in use, whichever token the client has
+            self.assertFalse(clients.get('https://github.example.com/api/v3')._semaphore.acquire(blocking=False))
+        # Other hosts have their own
+        with first.slot(), second.slot():
+            with clients.get('https://api.github.com', 'abc').slot():
+                pass
+
+    def test_default_timeout(self):
+        clients = HostClients({'https://github.example.com/api/v3': {'timeout': 5}}, timeout=20)
+        self.assertEqual(clients.get('https://github.example.com/api/v3').timeout, 5)
+        self.assertEqual(clients.get().timeout, 20)
+
+
+class AcceptEncodingTestCase(unittest.TestCase):
+
+    def test_accept_encoding(self):
+        with patch('importlib.util.find_spec', return_value=None):
+            self.assertEqual(accept_encoding(), 'gzip, deflate')
+        with patch('importlib.util.find_spec', side_effect=lambda name: object() if name == 'brotli' else None):
+            self.assertEqual(accept_encoding(), 'gzip, deflate, br')
+
+
+class TokenPoolTestCase(unittest.TestCase):
+
+    def test_choose(self):
+        pool = TokenPool(['abc', 'def', None, 'abc'])
+        self.assertEqual(pool.tokens, ['abc', 'def'])
+        # Unused tokens are chosen first
+        pool.update('abc', {'X-RateLimit-Remaining': '10', 'X-RateLimit-Reset': '0'})
+        self.assertEqual(pool.choose(), 'def')
+        pool.update('def', {'X-RateLimit-Remaining': '5', 'X-RateLimit-Reset': '0'})
+        self.assertEqual(pool.choose(), 'abc')
+        pool.update('abc', {'X-RateLimit-Remaining': '4', 'X-RateLimit-Reset': '0'})
+        self.assertEqual(pool.choose(), 'def')
+        # Missing headers are ignored
+        pool.update('def', {})
+        self.assertEqual(pool.choose(), 'def')
+
+    def test_exhausted(self):
+        pool = TokenPool(['abc', 'def'])
+        reset = time.time() + 60
+        pool.exhausted('abc', reset)
+        self.assertEqual(pool.choose(), 'def')
+        self.assertTrue(pool.available())
+        pool.exhausted('def', reset + 60)
+        self.assertFalse(pool.available())
+        # The token that resets first
+        self.assertEqual(pool.choose(), 'abc')
+        # Available again once the quota resets
+        pool.exhausted('def', time.time() - 1)
+        self.assertEqual(pool.choose(), 'def')
+
+    def test_empty(self):
+        pool = TokenPool()
+        self.assertEqual(len(pool), 0)
+        self.assertIsNone(pool.choose())
+        pool.update(None, {'X-RateLimit-Remaining': '1'})
+
+
+class HostClientTestCase(unittest.TestCase):
+
+    def test_slot(self):
+        client = HostClient(max_concurrency=2)
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def fetch():
+            with client.slot():
+                with lock:
+                    active.append(1)
+                    peak.append(len(active))
+                time.sleep(0.05)
+                with lock:
+                    active.pop()
+
+        with ThreadPoolExecutor(max_workers=6) as executor:
+            for _ in range(6):
+                executor.submit(fetch)
+        self.assertEqual(max(peak), 2)
+
+    def test_fetch_releases(self):
+        with GithubStandInServer() as server:
+            server.add_repository('abc', 'def', 150)
+            client = HostClient(server.url, max_concurrency=2)
+            self.addCleanup(client.close)
+            releases = get_releases.fetch_releases('abc', 'def', client=client)
+            self.assertEqual(len(releases), 150)
+            self.assertIn('gzip', server.requests[-1][2]['Accept-Encoding'])
+            api = client.api()
+            # The API is built once for each thread, and they share the connection pool
+            self.assertIs(client.api(), api)
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                other = executor.submit(client.api).result()
+            self.assertIsNot(other, api)
+            if hasattr(api.transport, 'client'):
+                self.assertIs(other.transport.client, api.transport.client)
+            self.assertEqual(len(get_releases.fetch_releases('abc', 'def', client=client)), 150)
+
+    def test_fetch_releases_rotates_tokens(self):
+        with GithubStandInServer(rate_limit=2) as server:
+            server.add_repository('abc', 'def', 450)
+            client = HostClient(server.url, tokens=['t1', 't2', 't3'])
+            self.addCleanup(client.close)
+            # 5 pages and the empty page, with 2 requests for each token
+            releases = get_releases.fetch_releases('abc', 'def', client=client)
+            self.assertEqual(len(releases), 450)
+            self.assertEqual([server.remaining(token) for token in ('t1', 't2', 't3')], [0, 0, 0])
+            self.assertFalse(client.tokens.available())
+            with self.assertRaises(Exception) as e:
+                get_releases.fetch_releases('abc', 'def', client=client)
+            self.assertIsNotNone(get_releases._rate_limit_reset(e.exception))
+
+    def test_fetch_releases_spreads_requests(self):
+        with GithubStandInServer(rate_limit=10) as server:
+            server.add_repository('abc', 'def', 350)
+            client = HostClient(server.url, tokens=['t1', 't2'])
+            self.addCleanup(client.close)
+            get_releases.fetch_releases('abc', 'def', client=client)
+            self.assertEqual(sorted(server.remaining(token) for token in ('t1', 't2')), [7, 8])
+
+    def test_fetch_releases_streaming(self):
+        with GithubStandInServer() as server:
+            server.add_repository('abc', 'def', 250)
+            client = HostClient(server.url, token='abc')
+            self.addCleanup(client.close)
+            metrics = DirectiveMetrics('abc', 'def')
+            releases = get_releases.fetch_releases('abc', 'def', client=client, fields=projected_fields(['author']), metrics=metrics)
+            self.assertEqual(len(releases), 250)
+            self.assertEqual(set(releases[0]), {*projected_fields(['author'])})
+            self.assertEqual(releases[0].author.login, server.repositories[('abc', 'def')][0]['author']['login'])
+            # 3 pages and the empty page
+            self.assertEqual(metrics.requests, 4)
+            self.assertGreater(metrics.bytes_received, 0)
+            # The responses are gzipped
+            self.assertGreater(metrics.bytes_decoded, 2*metrics.bytes_received)
+            self.assertIn('gzip', server.requests[-1][2]['Accept-Encoding'])
+            self.assertEqual(metrics.rate_limit_remaining, 4997)
+            self.assertEqual(server.requests[-1][2]['Authorization'], 'token abc')
+            with self.assertRaises(Exception) as e:
+                get_releases.fetch_releases('abc', 'missing', client=client, fields=())
+            self.assertEqual(e.exception.response.status_code, 404)
+
+    def test_fetch_releases_streaming_rotates_tokens(self):
+        with GithubStandInServer(rate_limit=1) as server:
+            server.add_repository('abc', 'def', 150)
+            client = HostClient(server.url, tokens=['t1', 't2', 't3'])
+            self.addCleanup(client.close)
+            releases = get_releases.fetch_releases('abc', 'def', client=client, fields=projected_fields([]))
+            self.assertEqual(len(releases), 150)
+            self.assertEqual([server.remaining(token) for token in ('t1', 't2', 't3')], [0, 0, 0])
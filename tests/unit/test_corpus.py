@@ -0,0 +1,35 @@
+import re
+import unittest
+
+from fastcore.xtras import dict2obj
+
+from mkdocs_github_changelog.get_releases import _process_releases
+from mkdocs_github_changelog.testing.corpus import generate_release, generate_releases
+
+
+class GenerateReleasesTestCase(unittest.TestCase):
+
+    def test_count_and_order(self):
+        releases = generate_releases(50)
+        self.assertEqual(len(releases), 50)
+        ids = [release['id'] for release in releases]
+        self.assertEqual(ids, sorted(ids, reverse=True))
+
+    def test_seeded(self):
+        self.assertEqual(generate_releases(10, seed=1), generate_releases(10, seed=1))
+        self.assertNotEqual(generate_releases(10, seed=1), generate_releases(10, seed=2))
+
+    def test_references(self):
+        release = generate_release(3, 10, issues_per_release=12, users_per_release=4)
+        self.assertEqual(len(re.findall(r'\(#\d+\)', release['body'])), 12)
+        self.assertIn('@user-', release['body'])
+
+    def test_org_repo(self):
+        release = generate_releases(1, org='abc', repo='def')[0]
+        self.assertTrue(release['html_url'].startswith('https://github.com/abc/def/releases/tag/'))
+
+    def test_processable(self):
+        releases = [dict2obj(release) for release in generate_releases(20)]
+        selected = _process_releases(releases, autoprocess=True, include_prereleases=True)
+        self.assertGreater(len(selected), 0)
+        self.assertIn('https://github.com/example-org/example-repo/issues/', selected[-1].body)
@@ -0,0 +1,60 @@
+from pathlib import Path
+import unittest
+
+from nskit.common.contextmanagers import ChDir, Env
+
+from mkdocs_github_changelog.directives import Directive, find_directives, parse_directives
+
+MARKDOWN = """# Changelog
+
+## ::github-release-changelog abc/def
+
+::github-release-changelog abc/ghi
+    token: !ENV TEST_TOKEN
+    github_api_url: https://github.example.com/api/v3
+    match: '1.*'
+
+Some text
+    ::github-release-changelog not/a-directive
+"""
+
+
+class ParseDirectivesTestCase(unittest.TestCase):
+
+    def test_parse_directives(self):
+        with Env(override={'TEST_TOKEN': 'abc123'}):
+            directives = parse_directives(MARKDOWN, page='changelog.md')
+        self.assertEqual([(d.org, d.repo) for d in directives], [('abc', 'def'), ('abc', 'ghi')])
+        self.assertEqual(directives[0].options, {})
+        self.assertEqual(directives[1].options, {'token': 'abc123', 'github_api_url': 'https://github.example.com/api/v3', 'match': '1.*'})
+        self.assertEqual({d.page for d in directives}, {'changelog.md'})
+
+    def test_no_directives(self):
+        self.assertEqual(parse_directives('# Hello\n\nWorld'), [])
+
+
+class DirectiveTestCase(unittest.TestCase):
+
+    def test_option_precedence(self):
+        directive = Directive('abc', 'def', {'token': 'local'})
+        self.assertEqual(directive.option('token', {'token': 'global'}), 'local')
+        self.assertEqual(directive.option('match', {'match': 'x.y'}), 'x.y')
+        self.assertEqual(directive.option('autoprocess', {'autoprocess': None}), True)
+        self.assertIsNone(directive.option('github_api_url'))
+
+    def test_key(self):
+        directive = Directive('abc', 'def')
+        self.assertEqual(directive.key(), ('https://api.github.com', 'abc', 'def'))
+        self.assertEqual(directive.key({'github_api_url': 'https://github.example.com/api/v3/'}), ('https://github.example.com/api/v3', 'abc', 'def'))
+
+
+class FindDirectivesTestCase(unittest.TestCase):
+
+    def test_find_directives(self):
+        with ChDir():
+            Path('docs', 'sub').mkdir(parents=True)
+            Path('docs', 'index.md').write_text('# Hello')
+            Path('docs', 'sub', 'changelog.md').write_text('::github-release-changelog abc/def\n')
+            Path('docs', 'changelog.md').write_text('::github-release-changelog abc/ghi\n')
+            directives = find_directives('docs')
+        self.assertEqual([(d.page, d.repo) for d in directives], [('changelog.md', 'ghi'), ('sub/changelog.md', 'def')])
@@ -0,0 +1,220 @@
+from concurrent.futures import ProcessPoolExecutor
+import gzip
+import importlib.util
+import json
+import multiprocessing
+import os
+from pathlib import Path
+import threading
+import time
+import unittest
+
+from fastcore.xtras import dict2obj
+from nskit.common.contextmanagers import ChDir
+
+from mkdocs_github_changelog.cache import cache_key, ReleaseCache
+from mkdocs_github_changelog.disk_cache import atomic_write_text, DiskCache, FileLock
+from mkdocs_github_changelog.testing.corpus import generate_releases, named_releases
+
+
+def _slow_fetch(directory):
+    # Record each fetch, so the test can check only one process fetched
+    with open(Path(directory, 'fetches.txt'), 'a') as f:
+        f.write(f'{os.getpid()}\n')
+    time.sleep(0.5)
+    return named_releases('0.1.0')
+
+
+def _build(directory):
+    cache = ReleaseCache(ttl=600, disk_cache=DiskCache(Path(directory, 'cache')))
+    return cache.get_releases(cache_key('abc', 'def'), lambda: _slow_fetch(directory))[0].name
+
+
+class AtomicWriteTestCase(unittest.TestCase):
+
+    def test_atomic_write_text(self):
+        with ChDir():
+            atomic_write_text(Path('a', 'b.json'), '{}')
+            atomic_write_text(Path('a', 'b.json'), '[]')
+            self.assertEqual(Path('a', 'b.json').read_text(), '[]')
+            self.assertEqual(os.listdir('a'), ['b.json'])
+
+
+class FileLockTestCase(unittest.TestCase):
+
+    def test_exclusive(self):
+        with ChDir():
+            with FileLock('a.lock') as lock:
+                self.assertTrue(lock.locked)
+                self.assertFalse(FileLock('a.lock').acquire(blocking=False))
+                with self.assertRaises(TimeoutError):
+                    FileLock('a.lock', timeout=0.1).acquire()
+            self.assertFalse(lock.locked)
+            other = FileLock('a.lock')
+            self.assertTrue(other.acquire(blocking=False))
+            other.release()
+
+    def test_waits(self):
+        with ChDir():
+            lock = FileLock('a.lock')
+            lock.acquire()
+            threading.Timer(0.2, lock.release).start()
+            start = time.monotonic()
+            with FileLock('a.lock', timeout=5):
+                self.assertGreater(time.monotonic() - start, 0.1)
+
+
+class DiskCacheTestCase(unittest.TestCase):
+
+    def test_path(self):
+        disk_cache = DiskCache('cache', compression='gzip')
+        self.assertEqual(disk_cache.path(cache_key('abc', 'def')), Path('cache', 'releases', 'api.github.com', 'abc', 'def.json.gz'))
+        self.assertEqual(
+            disk_cache.path(cache_key('abc', 'def', 'http://127.0.0.1:8080/api/v3')),
+            Path('cache', 'releases', '127.0.0.1_8080_api_v3', 'abc', 'def.json.gz')
+        )
+        self.assertEqual(DiskCache('cache', compression='none').path(cache_key('abc', 'def')).name, 'def.json')
+        self.assertEqual(DiskCache('cache', compression='zstd').path(cache_key('abc', 'def')).name, 'def.json.zst')
+
+    def test_default_compression(self):
+        self.assertEqual(DiskCache('cache').compression, 'zstd' if importlib.util.find_spec('zstandard') else 'gzip')
+        with self.assertRaises(ValueError):
+            DiskCache('cache', compression='lzma')
+
+    def test_save_load(self):
+        with ChDir():
+            disk_cache = DiskCache('cache')
+            key = cache_key('abc', 'def')
+            self.assertIsNone(disk_cache.load(key))
+            disk_cache.save(key, named_releases('0.2.0', '0.1.0'))
+            releases, fetched_at = disk_cache.load(key)
+            self.assertEqual([r.name for r in releases], ['0.2.0', '0.1.0'])
+            self.assertEqual(releases[0].assets[0].name, 'a.whl')
+            self.assertAlmostEqual(fetched_at, time.time(), delta=5)
+
+    def test_fields(self):
+        with ChDir():
+            disk_cache = DiskCache('cache')
+            key = cache_key('abc', 'def')
+            disk_cache.save(key, named_releases('0.1.0'), fields=('name', 'body'))
+            self.assertIsNotNone(disk_cache.load(key, fields=('name',)))
+            self.assertIsNotNone(disk_cache.load(key, fields=('name', 'body')))
+            # Releases without all of the fields needed are ignored
+            self.assertIsNone(disk_cache.load(key, fields=('name', 'assets')))
+            self.assertIsNone(disk_cache.load(key))
+            disk_cache.save(key, named_releases('0.1.0'))
+            self.assertIsNotNone(disk_cache.load(key, fields=('name', 'assets')))
+
+    def test_expired(self):
+        with ChDir():
+            disk_cache = DiskCache('cache')
+            key = cache_key('abc', 'def')
+            disk_cache.save(key, named_releases('0.1.0'), fetched_at=time.time() - 100)
+            self.assertIsNone(disk_cache.load(key, max_age=10))
+            self.assertIsNotNone(disk_cache.load(key, max_age=1000))
+            self.assertIsNotNone(disk_cache.load(key))
+
+    def test_unreadable(self):
+        with ChDir():
+            disk_cache = DiskCache('cache')
+            key = cache_key('abc', 'def')
+            disk_cache.path(key).parent.mkdir(parents=True)
+            disk_cache.path(key).write_text('{')
+            with self.assertLogs('mkdocs.plugins.mkdocs_github_changelog', 'WARNING'):
+                self.assertIsNone(disk_cache.load(key))
+
+    def test_format(self):
+        with ChDir():
+            disk_cache = DiskCache('cache', compression='gzip')
+            key = cache_key('abc', 'def')
+            disk_cache.save(key, named_releases('0.1.0'), fetched_at=10)
+            header, releases = gzip.decompress(disk_cache.path(key).read_bytes()).split(b'\n', 1)
+            self.assertEqual(json.loads(header), {'fetched_at': 10, 'fields': None})
+            self.assertEqual(json.loads(releases)[0]['name'], '0.1.0')
+
+    def test_compression(self):
+        compressions = ['gzip', 'none']
+        if importlib.util.find_spec('zstandard'):
+            compressions.append('zstd')
+        releases = [dict2obj(release) for release in generate_releases(50)]
+        for compression in compressions:
+            with self.subTest(compression=compression), ChDir():
+                disk_cache = DiskCache('cache', compression=compression)
+                key = cache_key('abc', 'def')
+                disk_cache.save(key, releases)
+                loaded, _ = disk_cache.load(key)
+                self.assertEqual([r.body for r in loaded], [r.body for r in releases])
+                self.assertEqual(disk_cache.stored_bytes, disk_cache.path(key).stat().st_size)
+                if compression == 'none':
+                    self.assertEqual(disk_cache.bytes_saved, 0)
+                else:
+                    # Release bodies are very compressible
+                    self.assertGreater(disk_cache.bytes_saved, disk_cache.raw_bytes/2)
+
+    def test_truncated(self):
+        with ChDir():
+            disk_cache = DiskCache('cache', compression='gzip')
+            key = cache_key('abc', 'def')
+            disk_cache.save(key, [dict2obj(release) for release in generate_releases(20)])
+            path = disk_cache.path(key)
+            path.write_bytes(path.read_bytes()[:-100])
+            with self.assertLogs('mkdocs.plugins.mkdocs_github_changelog', 'WARNING'):
+                self.assertIsNone(disk_cache.load(key))
+
+    def test_lock_timeout(self):
+        with ChDir():
+            disk_cache = DiskCache('cache', lock_timeout=0.1)
+            key = cache_key('abc', 'def')
+            with disk_cache.lock(key):
+                with self.assertLogs('mkdocs.plugins.mkdocs_github_changelog', 'WARNING'):
+                    with disk_cache.lock(key):
+                        pass
+
+    def test_evict_least_recently_used(self):
+        with ChDir():
+            disk_cache = DiskCache('cache')
+            keys = [cache_key('abc', name) for name in ('a', 'b', 'c')]
+            for index, key in enumerate(keys):
+                disk_cache.save(key, named_releases('0.1.0'))
+                os.utime(disk_cache.path(key), (index, index))
+            # Using a marks it as recently used
+            disk_cache.load(keys[0])
+            size = disk_cache.path(keys[0]).stat().st_size
+            # (The sizes vary slightly with the fetched_at time)
+            disk_cache.max_size = size * 3 + 100
+            with FileLock(disk_cache.path(keys[2]).with_suffix('.lock')):
+                # c is being fetched by another process
+                disk_cache.save(cache_key('abc', 'd'), named_releases('0.1.0'))
+            self.assertIsNotNone(disk_cache.load(keys[0]))
+            self.assertIsNone(disk_cache.load(keys[1]))
+            self.assertIsNotNone(disk_cache.load(keys[2]))
+            self.assertIsNotNone(disk_cache.load(cache_key('abc', 'd')))
+            disk_cache.evict()
+            self.assertLessEqual(disk_cache.size(), disk_cache.max_size)
+
+    def test_unlimited(self):
+        with ChDir():
+            disk_cache = DiskCache('cache', max_size=0)
+            for name in ('a', 'b', 'c'):
+                disk_cache.save(cache_key('abc', name), named_releases('0.1.0'))
+            self.assertEqual(disk_cache.evict(), [])
+            self.assertEqual(len(disk_cache._files()), 3)
+
+
+class SharedCacheTestCase(unittest.TestCase):
+
+    def test_fetched_once_across_threads(self):
+        with ChDir() as directory:
+            threads = [threading.Thread(target=_build, args=(directory,)) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(len(Path('fetches.txt').read_text().splitlines()), 1)
+
+    def test_fetched_once_across_processes(self):
+        with ChDir() as directory:
+            with ProcessPoolExecutor(3, mp_context=multiprocessing.get_context('spawn')) as executor:
+                results = list(executor.map(_build, [directory]*3))
+            self.assertEqual(results, ['0.1.0']*3)
+            self.assertEqual(len(Path('fetches.txt').read_text().splitlines()), 1)
@@ -2,10 +2,12 @@ import unittest
 
 from markdown import Markdown
 
+from mkdocs_github_changelog.clients import HostClients
 from mkdocs_github_changelog.extension import (
     GithubReleaseChangelogExtension,
     GithubReleaseChangelogProcessor,
 )
+from mkdocs_github_changelog.testing.server import GithubStandInServer
 
 
 class GithubReleaseChangelogExtensionTestCase(unittest.TestCase):
@@ -19,3 +21,42 @@ class GithubReleaseChangelogExtensionTestCase(unittest.TestCase):
         ext = GithubReleaseChangelogExtension({'a': 1})
         ext.extendMarkdown(md)
         self.assertTrue(any([isinstance(proc, GithubReleaseChangelogProcessor) for proc in md.parser.blockprocessors]))
+
+
+class BodyHtmlTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.server = GithubStandInServer().start()
+        self.addCleanup(self.server.stop)
+        self.server.add_repository('abc', 'def', [{
+            'id': 1,
+            'name': 'Release 1.0.0',
+            'tag_name': '1.0.0',
+            'html_url': 'https://github.com/abc/def/releases/tag/1.0.0',
+            'published_at': '2024-01-01T00:00:00Z',
+            'draft': False,
+            'prerelease': False,
+            'body': '## Changes\n\n* Fixed *it* in #1 by @someone',
+        }])
+        self.clients = HostClients(tokens=['abc'])
+        self.addCleanup(self.clients.close)
+
+    def _convert(self, text, **config):
+        md = Markdown(extensions=[GithubReleaseChangelogExtension({'github_api_url': self.server.url, **config}, clients=self.clients)])
+        return md.convert(text)
+
+    def test_body_html(self):
+        html = self._convert('## ::github-release-changelog abc/def', body_html=True)
+        self.assertIn('<h3><a href="https://github.com/abc/def/releases/tag/1.0.0">Release 1.0.0</a></h3>', html)
+        # Inserted as github rendered it (with its headings moved down as for markdown), rather than autoprocessed
+        self.assertIn('<h4>Changes</h4>\n<ul>\n<li>Fixed <em>it</em> in #1 by @someone</li>\n</ul>', html)
+        self.assertEqual(self.server.requests[0][2]['Accept'], 'application/vnd.github.html+json')
+
+    def test_body_html_directive(self):
+        html = self._convert('::github-release-changelog abc/def\n    body_html: true')
+        self.assertIn('<h2>Changes</h2>', html)
+        self.assertNotIn('https://github.com/abc/def/issues/1', html)
+
+    def test_markdown(self):
+        html = self._convert('::github-release-changelog abc/def')
+        self.assertIn('<a href="https://github.com/abc/def/issues/1">#1</a>', html)
@@ -0,0 +1,54 @@
+import time
+import unittest
+from unittest.mock import MagicMock
+
+from fastcore.net import HTTP403ForbiddenError, HTTP404NotFoundError
+
+from mkdocs_github_changelog.failures import cacheable_failure, Deadline, DeadlineExceeded, http_status, rate_limited
+
+
+class DeadlineTestCase(unittest.TestCase):
+
+    def test_unlimited(self):
+        deadline = Deadline()
+        self.assertIsNone(deadline.remaining())
+        self.assertFalse(deadline.expired)
+        deadline.check('fetching')
+
+    def test_remaining(self):
+        deadline = Deadline(100)
+        self.assertGreater(deadline.remaining(), 99)
+        self.assertFalse(deadline.expired)
+
+    def test_expired(self):
+        deadline = Deadline(10)
+        deadline.start -= 20
+        self.assertEqual(deadline.remaining(), 0)
+        self.assertTrue(deadline.expired)
+        with self.assertRaises(DeadlineExceeded) as e:
+            deadline.check('fetching abc/def')
+        self.assertIn('fetching abc/def', str(e.exception))
+        self.assertIsInstance(e.exception, TimeoutError)
+
+
+class FailuresTestCase(unittest.TestCase):
+
+    def test_http_status(self):
+        self.assertEqual(http_status(HTTP404NotFoundError(None, None, None)), 404)
+        error = ValueError()
+        error.response = MagicMock(status_code=403)
+        self.assertEqual(http_status(error), 403)
+        self.assertIsNone(http_status(ValueError()))
+
+    def test_cacheable_failure(self):
+        self.assertTrue(cacheable_failure(HTTP404NotFoundError(None, None, None)))
+        self.assertTrue(cacheable_failure(HTTP403ForbiddenError(None, {'X-RateLimit-Remaining': '10'}, None)))
+        self.assertFalse(cacheable_failure(ValueError('Timed out')))
+
+    def test_rate_limited(self):
+        for headers in ({'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': str(time.time())}, {'Retry-After': '60'}):
+            with self.subTest(headers=headers):
+                error = HTTP403ForbiddenError(None, headers, None)
+                self.assertTrue(rate_limited(error))
+                self.assertFalse(cacheable_failure(error))
+        self.assertFalse(rate_limited(HTTP404NotFoundError(None, None, None)))
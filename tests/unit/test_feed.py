@@ -0,0 +1,214 @@
+import json
+from pathlib import Path
+import unittest
+
+from fastcore.xtras import dict2obj
+from nskit.common.contextmanagers import ChDir
+
+from mkdocs_github_changelog.cache import ReleaseCache
+from mkdocs_github_changelog.clients import HostClient
+from mkdocs_github_changelog.disk_cache import DiskCache
+from mkdocs_github_changelog.failures import Deadline, DeadlineExceeded
+from mkdocs_github_changelog.feed import FEED_FIELDS, feed_url, merge_releases, parse_feed, ReleaseFeed, unknown_prereleases
+from mkdocs_github_changelog.get_releases import (
+    get_releases_as_markdown,
+    HTML_RELEASE_TEMPLATE,
+    RELEASE_TEMPLATE,
+    template_fields,
+    template_projection,
+)
+from mkdocs_github_changelog.metrics import DirectiveMetrics
+from mkdocs_github_changelog.testing.server import GithubStandInServer
+
+FEED = """<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom" xmlns:media="http://search.yahoo.com/mrss/" xml:lang="en-US">
+  <id>tag:github.com,2008:https://github.com/abc/def/releases</id>
+  <link type="text/html" rel="alternate" href="https://github.com/abc/def/releases"/>
+  <title>Release notes from def</title>
+  <updated>2024-02-01T10:00:00Z</updated>
+  <entry>
+    <id>tag:github.com,2008:Repository/1/v1.1.0%2Bbuild</id>
+    <updated>2024-02-01T10:00:00Z</updated>
+    <link rel="alternate" type="text/html" href="https://github.com/abc/def/releases/tag/v1.1.0%2Bbuild"/>
+    <title>Version 1.1.0</title>
+    <content type="html">&lt;p&gt;Fixes &lt;a href="https://github.com/abc/def/issues/1"&gt;#1&lt;/a&gt;&lt;/p&gt;</content>
+    <author><name>someone</name></author>
+    <media:thumbnail height="30" width="30" url="https://avatars.githubusercontent.com/u/1?s=60&amp;v=4"/>
+  </entry>
+  <entry>
+    <id>tag:github.com,2008:Repository/1/v1.0.0</id>
+    <updated>2024-01-01T10:00:00Z</updated>
+    <link rel="alternate" type="text/html" href="https://github.com/abc/def/releases/tag/v1.0.0"/>
+    <title>Version 1.0.0</title>
+    <content type="html">&lt;p&gt;First&lt;/p&gt;</content>
+  </entry>
+</feed>
+"""
+
+
+def _release(tag):
+    return dict2obj({'tag_name': tag, 'name': tag, 'html_url': f'https://github.com/abc/def/releases/tag/{tag}', 'prerelease': False})
+
+
+class ParseFeedTestCase(unittest.TestCase):
+
+    def test_feed_url(self):
+        self.assertEqual(feed_url('abc', 'def'), 'https://github.com/abc/def/releases.atom')
+        self.assertEqual(feed_url('abc', 'def', 'https://github.example.com/api/v3/'), 'https://github.example.com/abc/def/releases.atom')
+        self.assertEqual(feed_url('abc', 'def', 'http://127.0.0.1:8000'), 'http://127.0.0.1:8000/abc/def/releases.atom')
+
+    def test_parse_feed(self):
+        releases = parse_feed(FEED)
+        self.assertEqual([release['tag_name'] for release in releases], ['v1.1.0+build', 'v1.0.0'])
+        self.assertTrue(set(FEED_FIELDS).issubset(releases[0]))
+        self.assertNotIn('body', releases[0])
+        self.assertEqual(releases[0]['name'], 'Version 1.1.0')
+        self.assertEqual(releases[0]['published_at'], '2024-02-01T10:00:00Z')
+        self.assertEqual(releases[0]['body_html'], '<p>Fixes <a href="https://github.com/abc/def/issues/1">#1</a></p>')
+        # Not known from the feed
+        self.assertIsNone(releases[0]['prerelease'])
+        self.assertTrue(unknown_prereleases([dict2obj(release) for release in releases]))
+        self.assertFalse(unknown_prereleases([_release('v1')]))
+        with self.assertRaises(ValueError):
+            parse_feed('<html>')
+
+    def test_merge_releases(self):
+        previous = [_release(f'v{i}') for i in range(20, 0, -1)]
+        # The feed has all of them
+        feed = [{'tag_name': 'v2'}, {'tag_name': 'v1'}]
+        self.assertEqual(merge_releases(feed, None), feed)
+        self.assertEqual(merge_releases(feed, previous), [previous[-2], previous[-1]])
+        # Only the latest, overlapping with those fetched before (with v15 deleted)
+        feed = [{'tag_name': f'v{i}'} for i in (22, 21, 20, 19, 18, 17, 16, 14, 13, 12)]
+        merged = merge_releases(feed, previous)
+        self.assertEqual([release['tag_name'] for release in merged], [f'v{i}' for i in (22, 21, *range(20, 15, -1), *range(14, 0, -1))])
+        self.assertIs(merged[2], previous[0])
+        # Not overlapping
+        self.assertIsNone(merge_releases([{'tag_name': f'v{i}'} for i in range(40, 30, -1)], previous))
+        self.assertIsNone(merge_releases(feed, None))
+
+
+class ReleaseFeedTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.server = GithubStandInServer().start()
+        self.addCleanup(self.server.stop)
+        self.client = HostClient(self.server.url)
+        self.addCleanup(self.client.close)
+        self.fields = template_projection(HTML_RELEASE_TEMPLATE)
+
+    def _api_requests(self):
+        return [path for _, path, _ in self.server.requests if not path.endswith('releases.atom')]
+
+    def _get(self, repo, cache, feed, include_prereleases=True, **kwargs):
+        return get_releases_as_markdown(
+            'abc', repo, release_template=HTML_RELEASE_TEMPLATE, client=self.client, cache=cache, fields=self.fields, feed=feed,
+            github_api_url=self.server.url, include_prereleases=include_prereleases, autoprocess=False, raw_html=lambda html: html or '', **kwargs
+        )
+
+    def test_usable(self):
+        used = template_fields(HTML_RELEASE_TEMPLATE)
+        self.assertTrue(ReleaseFeed.usable(self.fields, used))
+        self.assertFalse(ReleaseFeed.usable(None, used))
+        self.assertFalse(ReleaseFeed.usable(self.fields, None))
+        self.assertFalse(ReleaseFeed.usable((*self.fields, 'assets'), used))
+        # Markdown bodies
+        self.assertFalse(ReleaseFeed.usable(template_projection(RELEASE_TEMPLATE), template_fields(RELEASE_TEMPLATE)))
+        # The template shows which are prereleases
+        self.assertFalse(ReleaseFeed.usable(self.fields, {*used, 'prerelease'}))
+
+    def test_small_repository(self):
+        self.server.add_repository('abc', 'def', 5)
+        feed = ReleaseFeed()
+        metrics = DirectiveMetrics('abc', 'def')
+        rendered = self._get('def', ReleaseCache(), feed, metrics=metrics)
+        self.assertEqual(self._api_requests(), [])
+        self.assertEqual(len(rendered), 4)
+        self.assertIn('<h2>', rendered[0])
+        self.assertEqual((feed.requests, feed.fallbacks), (1, 0))
+        # Not counted as API requests
+        self.assertEqual(metrics.requests, 0)
+        self.assertGreater(metrics.bytes_received, 0)
+
+    def test_fixture(self):
+        self.server.add_feed('abc', 'def', FEED)
+        rendered = self._get('def', None, ReleaseFeed())
+        self.assertEqual(len(rendered), 2)
+        self.assertIn('<a href="https://github.com/abc/def/issues/1">#1</a>', rendered[0])
+        self.assertIn('# [Version 1.1.0](https://github.com/abc/def/releases/tag/v1.1.0%2Bbuild)', rendered[0])
+
+    def test_prereleases(self):
+        releases = self.server.add_repository('abc', 'def', 3)
+        releases[1]['prerelease'] = True
+        api = self._get('def', None, None, include_prereleases=False)
+        self.assertEqual(len(api), 1)
+        # Releases only known from the feed could be prereleases, so are fetched from the API
+        feed = ReleaseFeed()
+        cache = ReleaseCache()
+        self.assertEqual(self._get('def', cache, feed, include_prereleases=False), api)
+        self.assertEqual(feed.fallbacks, 1)
+        cache = ReleaseCache()
+        self.assertEqual(len(self._get('def', cache, feed)), 2)
+        # As are those cached from the feed for a changelog with prereleases
+        requests = len(self._api_requests())
+        self.assertEqual(self._get('def', cache, feed, include_prereleases=False), api)
+        self.assertGreater(len(self._api_requests()), requests)
+
+    def test_fallback(self):
+        self.server.add_repository('abc', 'def', 150)
+        feed = ReleaseFeed()
+        expected = self._get('def', None, None)
+        requests = len(self._api_requests())
+        # Too many releases for the feed, with none fetched before
+        self.assertEqual(self._get('def', ReleaseCache(), feed), expected)
+        self.assertEqual(len(self._api_requests()), 2*requests)
+        self.assertEqual(feed.fallbacks, 1)
+
+    def test_deadline(self):
+        self.server.add_repository('abc', 'def', 5)
+        deadline = Deadline(1)
+        deadline.start -= 10
+        with self.assertRaises(DeadlineExceeded):
+            self._get('def', None, ReleaseFeed(), deadline=deadline)
+        self.assertEqual(self.server.requests, [])
+
+    def test_not_found(self):
+        self.server.errors = {1: 404}
+        self.server.add_repository('abc', 'def', 5)
+        feed = ReleaseFeed()
+        self.assertEqual(len(self._get('def', None, feed)), 4)
+        self.assertEqual(feed.fallbacks, 1)
+        self.assertEqual(len(self._api_requests()), 2)
+
+    def _expire(self, cache):
+        stored, fetched_at = cache.disk_cache.load((self.server.url, 'abc', 'def'), fields=self.fields)
+        cache.disk_cache.save((self.server.url, 'abc', 'def'), stored, fetched_at=fetched_at - 100, fields=self.fields)
+
+    def test_not_modified(self):
+        with ChDir():
+            releases = self.server.add_repository('abc', 'def', 150)
+            cache = ReleaseCache(ttl=1, disk_cache=DiskCache('cache'))
+            feed = ReleaseFeed(Path('cache', 'feeds.json'))
+            first = self._get('def', cache, feed, include_prereleases=False)
+            feed.save()
+            self.assertIn(feed_url('abc', 'def', self.server.url), json.loads(Path('cache', 'feeds.json').read_text())['feeds'])
+            requests = len(self._api_requests())
+            # Another build, once the cached releases have expired
+            cache = ReleaseCache(ttl=1, disk_cache=DiskCache('cache'))
+            self._expire(cache)
+            feed = ReleaseFeed(Path('cache', 'feeds.json'))
+            self.assertEqual(self._get('def', cache, feed, include_prereleases=False), first)
+            self.assertEqual(len(self._api_requests()), requests)
+            self.assertEqual(feed.not_modified, 1)
+            # New releases are merged in from the feed, keeping when the releases from the API were published
+            with_prereleases = self._get('def', None, None)
+            requests = len(self._api_requests())
+            releases.insert(0, {**releases[1], 'tag_name': '9.9.9', 'name': 'New', 'html_url': 'https://github.com/abc/def/releases/tag/9.9.9'})
+            releases[1]['published_at'] = '2030-01-01T00:00:00Z'
+            self.server.add_repository('abc', 'def', releases)
+            cache = ReleaseCache(ttl=1, disk_cache=DiskCache('cache'))
+            self._expire(cache)
+            merged = self._get('def', cache, ReleaseFeed(Path('cache', 'feeds.json')))
+            self.assertEqual(len(self._api_requests()), requests)
+            self.assertTrue(merged[0].startswith('# [New]'))
+            self.assertEqual(merged[1:], with_prereleases)
@@ -8,17 +8,31 @@ from unittest.mock import call, DEFAULT, MagicMock, patch
 from fastcore.basics import AttrDict
 from fastcore.net import HTTP404NotFoundError
 from jinja2 import Environment
+import markdown
 from nskit.common.contextmanagers import Env, TestExtension
 
 from mkdocs_github_changelog import get_releases
+from mkdocs_github_changelog.cache import cache_key, ReleaseCache, ReleaseRefresher
+from mkdocs_github_changelog.clients import HostClient
+from mkdocs_github_changelog.failures import Deadline, DeadlineExceeded
+from mkdocs_github_changelog.metrics import DirectiveMetrics
 from mkdocs_github_changelog.get_releases import (
     _coerce_published_at,
     _EnvironmentFactory,
     _process_releases,
+    _response_sizes,
     autoprocess_github_links,
+    fetch_releases,
     get_releases_as_markdown,
+    HTML_RELEASE_TEMPLATE,
+    issue_numbers,
+    media_type,
     RELEASE_TEMPLATE,
+    template_fields,
+    template_projection,
 )
+from mkdocs_github_changelog.streaming import REQUIRED_FIELDS, SELECTION_FIELDS
+from mkdocs_github_changelog.testing.server import GithubStandInServer
 
 RELEASE_1 = '## Features\n Hello World (#2)'
 RELEASE_2 = '## Features\n Hello World (#1)'
@@ -76,6 +90,14 @@ class GetReleasesTestCase(unittest.TestCase):
         GhApi.assert_called_once_with(token=None, gh_host=None)
         paged.assert_called_once_with(GhApi().repos.list_releases, 'x', 'y', per_page=100)
 
+    @mock_gh_api
+    def test_get_releases_as_markdown_deadline(self, paged, GhApi, *args):
+        deadline = Deadline(1)
+        deadline.start -= 10
+        with self.assertRaises(DeadlineExceeded):
+            get_releases_as_markdown('abc', 'def', deadline=deadline)
+        paged.assert_not_called()
+
     @mock_gh_api
     def test_get_releases_as_markdown_ok(self, paged, GhApi, release1, release2):
         response = get_releases_as_markdown('abc', 'def')
@@ -106,8 +128,8 @@ class GetReleasesTestCase(unittest.TestCase):
         self.assertIn('# Features\n Hello World ([#1](https://www.google.com/issues/1))', response[1])
         self.assertNotIn('*Released at 2023-11-01T13:46', response[1])
         self.assertEqual(len(response), 2)
-        self.assertNotEqual(response[0], _EnvironmentFactory().environment.from_string(RELEASE_TEMPLATE).render(release=release1))
-        self.assertNotEqual(response[1], _EnvironmentFactory().environment.from_string(RELEASE_TEMPLATE).render(release=release2))
+        # The template doesn't use the dates, so they are not parsed
+        self.assertIsInstance(release1.published_at, str)
         self.assertEqual(response[0], _EnvironmentFactory().environment.from_string(custom_template).render(release=release1))
         self.assertEqual(response[1], _EnvironmentFactory().environment.from_string(custom_template).render(release=release2))
 
@@ -140,6 +162,114 @@ class GetReleasesTestCase(unittest.TestCase):
         self.assertEqual(response[0], _EnvironmentFactory().environment.from_string(RELEASE_TEMPLATE).render(release=release1))
         self.assertEqual(response[1], _EnvironmentFactory().environment.from_string(RELEASE_TEMPLATE).render(release=release2))
 
+    @mock_gh_api
+    def test_get_releases_as_markdown_cached(self, paged, GhApi, release1, release2):
+        cache = ReleaseCache()
+        response = get_releases_as_markdown('abc', 'def', cache=cache)
+        cached_response = get_releases_as_markdown('abc', 'def', autoprocess=False, cache=cache)
+        paged.assert_called_once_with(GhApi().repos.list_releases, 'abc', 'def', per_page=100)
+        self.assertIn('# Features\n Hello World ([#2](https://www.google.com/issues/2))', response[0])
+        # The cached releases are not modified by the autoprocessing
+        self.assertIn('# Features\n Hello World (#2)', cached_response[0])
+        self.assertEqual(len(cached_response), 2)
+
+    @mock_gh_api
+    def test_get_releases_as_markdown_metrics(self, paged, GhApi, release1, release2):
+        GhApi().recv_hdrs = {'Content-Length': '1234'}
+        metrics = DirectiveMetrics('abc', 'def')
+        response = get_releases_as_markdown('abc', 'def', match='[0-9]+.1.[0-9]+', metrics=metrics)
+        self.assertEqual(len(response), 1)
+        self.assertEqual(metrics.requests, 2)
+        self.assertEqual(metrics.bytes_received, 1234)
+        self.assertEqual(metrics.bytes_decoded, 1234)
+        self.assertEqual(metrics.releases_seen, 2)
+        self.assertEqual(metrics.releases_selected, 1)
+        for stage in ('fetch', 'pagination', 'filter', 'autoprocess', 'render'):
+            with self.subTest(stage=stage):
+                self.assertGreater(metrics.timings[stage], 0)
+
+
+class ServeRefreshTestCase(unittest.TestCase):
+
+    def test_refresh_after_deadline(self):
+        server = GithubStandInServer().start()
+        self.addCleanup(server.stop)
+        releases = server.add_repository('abc', 'def', 5)
+        client = HostClient(server.url)
+        self.addCleanup(client.close)
+        cache = ReleaseCache(ttl=10)
+        deadline = Deadline(60)
+        metrics = DirectiveMetrics('abc', 'def')
+        rendered = get_releases_as_markdown('abc', 'def', cache=cache, client=client, deadline=deadline, metrics=metrics, github_api_url=server.url)
+        requests = metrics.requests
+        # The build's deadline passes, then the TTL expires and there is a new release
+        deadline.start -= 100
+        key = cache_key('abc', 'def', server.url)
+        cache.get(key).fetched_at -= 100
+        releases.insert(0, {**releases[1], 'id': 1000, 'tag_name': '9.9.9', 'name': 'New'})
+        on_change = MagicMock()
+        self.assertEqual(ReleaseRefresher(cache, on_change).refresh_expired(), [key])
+        on_change.assert_called_once_with([key])
+        self.assertEqual(len(get_releases_as_markdown('abc', 'def', cache=cache, client=client, github_api_url=server.url)), len(rendered) + 1)
+        # Not counted against the old build
+        self.assertEqual(metrics.requests, requests)
+
+
+class TemplateFieldsTestCase(unittest.TestCase):
+
+    def test_default(self):
+        self.assertEqual(template_fields(), {'name', 'html_url', 'published_at', 'body'})
+        self.assertEqual(template_projection(), REQUIRED_FIELDS)
+
+    def test_fields(self):
+        for template, expected in (
+            ('{{release.name}}', {'name'}),
+            ("{{release['tag_name']}} {{ release.author.login }}", {'tag_name', 'author'}),
+            ('{% if release.prerelease %}{{release.name}}{% endif %}', {'prerelease', 'name'}),
+            ('Static', set()),
+            # A different release
+            ('{% for release in [1] %}{{release}}{% endfor %}', set()),
+            ('{{release}}', None),
+            ('{{release|tojson}}', None),
+            ('{{release[key]}}', None),
+            ('{% set r = release %}{{r.name}}', None),
+            ('{{release.name', None),
+        ):
+            with self.subTest(template=template):
+                self.assertEqual(template_fields(template), expected)
+
+    def test_projection(self):
+        self.assertEqual(template_projection('{{release.author}}'), (*SELECTION_FIELDS, 'author'))
+        self.assertEqual(template_projection('{{release.author}}', ['assets']), (*SELECTION_FIELDS, 'author', 'assets'))
+        self.assertIsNone(template_projection('{{release|tojson}}'))
+        self.assertEqual(template_projection('{{release|tojson}}', ['assets']), (*REQUIRED_FIELDS, 'assets'))
+
+    @mock_gh_api
+    def test_get_releases_as_markdown_autoprocess_none(self, paged, GhApi, release1, release2):
+        # Unset (None), the releases are autoprocessed
+        response = get_releases_as_markdown('abc', 'def', autoprocess=None)
+        self.assertIn('# Features\n Hello World ([#2](https://www.google.com/issues/2))', response[0])
+        self.assertTrue(release2.processed)
+
+    @mock_gh_api
+    def test_not_autoprocessed_without_body(self, paged, GhApi, release1, release2):
+        response = get_releases_as_markdown('abc', 'def', release_template='{{release.name}}')
+        self.assertEqual(response, ['0.2.0', '0.1.0'])
+        self.assertFalse(release1.processed)
+        self.assertIsInstance(release1.published_at, str)
+
+
+class ResponseSizesTestCase(unittest.TestCase):
+
+    def test_content_length(self):
+        self.assertEqual(_response_sizes({'Content-Length': '10'}, [{'a': 1}]), (10, 10))
+
+    def test_compressed(self):
+        self.assertEqual(_response_sizes({'Content-Length': '10', 'Content-Encoding': 'gzip'}, [{'a': 1}]), (10, 10))
+        self.assertEqual(_response_sizes({'Content-Length': '4', 'Content-Encoding': 'gzip'}, [{'a': 1}]), (4, 10))
+
+    def test_no_headers(self):
+        self.assertEqual(_response_sizes(None, [{'a': 1}]), (10, 10))
 
 
 class DraftAndMissingDateTestCase(unittest.TestCase):
@@ -298,6 +428,50 @@ class AutprocessGithubLinksTestCase(unittest.TestCase):
         self.assertTrue(release.processed)
         self.assertEqual(release.body, 'Fix [#12](https://www.google.com/org/repo/issues/12) [@xyz](https://www.google.com/xyz) [@abc13](https://www.google.com/abc13), (@#as, [#1](https://www.google.com/org/repo/issues/1))')
 
+    def test_titles(self):
+        release = MagicMock()
+        release.body = 'Fix #12, #13'
+        release.html_url = 'https://www.google.com/org/repo/releases/0.2.0'
+        release.processed = False
+        self.assertEqual(issue_numbers(release), {12, 13})
+        autoprocess_github_links(release, {12: 'Fix the "quoted"\nbug'})
+        self.assertEqual(release.body, 'Fix [#12](https://www.google.com/org/repo/issues/12 "Fix the &quot;quoted&quot; bug"), [#13](https://www.google.com/org/repo/issues/13)')
+
+    def test_titles_backslashes(self):
+        release = MagicMock()
+        release.body = 'Fix #12, #13'
+        release.html_url = 'https://www.google.com/org/repo/releases/0.2.0'
+        release.processed = False
+        titles = {12: 'Paths ending C:\\', 13: 'Escape \\"quoted\\" \\*stars\\*'}
+        autoprocess_github_links(release, titles)
+        self.assertEqual(
+            release.body,
+            'Fix [#12](https://www.google.com/org/repo/issues/12 "Paths ending C:\\\\"), '
+            '[#13](https://www.google.com/org/repo/issues/13 "Escape \\\\&quot;quoted\\\\&quot; \\\\*stars\\\\*")'
+        )
+        # Rendered with the titles as they are
+        html = markdown.markdown(release.body)
+        self.assertIn('title="Paths ending C:\\"', html)
+        self.assertIn('title="Escape \\&quot;quoted\\&quot; \\*stars\\*"', html)
+
+    def test_process_releases_titles(self):
+        releases = []
+        for name, body in (('0.2.0', 'Fix #2, #3'), ('0.1.0', 'Fix #1'), ('0.0.1', 'Fix #4')):
+            release = MagicMock()
+            release.body = body
+            release.name = name
+            release.html_url = f'https://www.google.com/org/repo/releases/{name}'
+            release.published_at = '2023-12-01T13:46:00Z'
+            release.draft = release.prerelease = release.processed = False
+            releases.append(release)
+        titles = MagicMock(return_value={1: 'One', 3: 'Three'})
+        selected = _process_releases(releases, match='0.[12].0', titles=titles)
+        # Looked up once, for the selected releases
+        titles.assert_called_once_with({1, 2, 3})
+        self.assertEqual(selected[0].body, 'Fix [#2](https://www.google.com/org/repo/issues/2), [#3](https://www.google.com/org/repo/issues/3 "Three")')
+        self.assertEqual(selected[1].body, 'Fix [#1](https://www.google.com/org/repo/issues/1 "One")')
+        self.assertEqual(releases[2].body, 'Fix #4')
+
 
 class EnvironmentFactoryTestCase(unittest.TestCase):
 
@@ -467,3 +641,44 @@ class PrereleaseTestCase(unittest.TestCase):
             [r.name for r in _process_releases([release], include_prereleases=True)],
             ['2.0.0rc1'],
         )
+
+
+class BodyHtmlTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.server = GithubStandInServer().start()
+        self.addCleanup(self.server.stop)
+        self.server.add_repository('abc', 'def', 3)
+        self.client = HostClient(self.server.url, token='abc')
+        self.addCleanup(self.client.close)
+
+    def test_media_type(self):
+        self.assertEqual(media_type(), 'application/vnd.github.v3+json')
+        self.assertEqual(media_type(REQUIRED_FIELDS), 'application/vnd.github.v3+json')
+        self.assertEqual(media_type((*SELECTION_FIELDS, 'body_html')), 'application/vnd.github.html+json')
+        self.assertEqual(media_type((*REQUIRED_FIELDS, 'body_html')), 'application/vnd.github.full+json')
+
+    def test_template_fields(self):
+        self.assertEqual(template_fields(HTML_RELEASE_TEMPLATE), {'name', 'html_url', 'published_at', 'body_html'})
+
+    def test_fetch_body_html(self):
+        fields = template_projection(HTML_RELEASE_TEMPLATE)
+        for stream in (True, False):
+            with self.subTest(stream=stream):
+                self.server.requests.clear()
+                releases = fetch_releases('abc', 'def', client=self.client, fields=fields, stream=stream)
+                self.assertTrue(releases[0].body_html.startswith('<'))
+                self.assertNotIn('body', releases[0])
+                self.assertEqual(self.server.requests[0][2]['Accept'], 'application/vnd.github.html+json')
+
+    def test_fetch_default(self):
+        releases = fetch_releases('abc', 'def', client=self.client, fields=REQUIRED_FIELDS, stream=False)
+        self.assertNotIn('body_html', releases[0])
+        self.assertEqual(self.server.requests[0][2]['Accept'], 'application/vnd.github.v3+json')
+
+    def test_raw_html_context(self):
+        releases = get_releases_as_markdown(
+            'abc', 'def', client=self.client, release_template=HTML_RELEASE_TEMPLATE, fields=template_projection(HTML_RELEASE_TEMPLATE),
+            raw_html=lambda html: f'RAW:{html[:3]}',
+        )
+        self.assertTrue(all(release.endswith('RAW:<h2') or release.endswith('RAW:<p>') for release in releases))
@@ -0,0 +1,122 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from markdown import Markdown
+from markdown.blockparser import BlockParser
+from mkdocs.exceptions import PluginError
+
+from mkdocs_github_changelog import extension, hooks
+from mkdocs_github_changelog.cache import ReleaseCache
+from mkdocs_github_changelog.clients import HostClient
+from mkdocs_github_changelog.extension import GithubReleaseChangelogProcessor
+from mkdocs_github_changelog.get_releases import get_releases_as_markdown
+from mkdocs_github_changelog.hooks import HOOKS, Hooks, load_hook
+from mkdocs_github_changelog.plugin import MkdocsGithubChangelogPlugin
+from mkdocs_github_changelog.testing.server import GithubStandInServer
+
+
+class Recorder():
+
+    def __init__(self):
+        self.events = []
+
+    def __call__(self, event, data):
+        self.events.append((event, data))
+
+    def names(self):
+        return [event for event, _ in self.events]
+
+
+class HooksTestCase(unittest.TestCase):
+
+    def test_register(self):
+        registry = Hooks()
+        self.assertFalse(registry.active)
+        recorder = registry.register(Recorder())
+        registry.register(recorder)
+        self.assertTrue(registry.active)
+        registry.emit('fetch_start', key=('a', 'b', 'c'))
+        self.assertEqual(recorder.events, [('fetch_start', {'key': ('a', 'b', 'c')})])
+        registry.unregister(recorder)
+        self.assertFalse(registry.active)
+
+    def test_failing_hook(self):
+        registry = Hooks()
+        registry.register(MagicMock(side_effect=ValueError('broken')))
+        recorder = registry.register(Recorder())
+        with self.assertLogs('mkdocs.plugins.mkdocs_github_changelog', level='WARNING'):
+            registry.emit('render_done', releases=1)
+        self.assertEqual(recorder.names(), ['render_done'])
+
+    def test_load(self):
+        hook = MagicMock()
+        entry_point = MagicMock()
+        entry_point.load.return_value = hook
+        registry = Hooks()
+        with patch.object(hooks, 'entry_points') as entry_points:
+            entry_points().select.return_value = [entry_point]
+            registry.load(['json:dumps'])
+            registry.load()
+        entry_points().select.assert_called_once_with(group='mkdocs_github_changelog.hooks')
+        self.assertEqual(registry._hooks, (hook, load_hook('json:dumps')))
+        with self.assertRaises(ModuleNotFoundError):
+            registry.load(['missing_module:hook'])
+
+    def test_plugin_load_hooks(self):
+        plugin = MkdocsGithubChangelogPlugin()
+        plugin.load_config({'hooks': ['missing_module:hook']})
+        with self.assertRaises(PluginError):
+            plugin.load_hooks()
+
+
+class EventsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.recorder = HOOKS.register(Recorder())
+        self.addCleanup(HOOKS.unregister, self.recorder)
+
+    def test_fetch_and_render(self):
+        with GithubStandInServer() as server:
+            server.add_repository('abc', 'def', 150)
+            client = HostClient(server.url, token='abc')
+            self.addCleanup(client.close)
+            cache = ReleaseCache()
+            get_releases_as_markdown('abc', 'def', github_api_url=server.url, client=client, cache=cache)
+        self.assertEqual(self.recorder.names(), [
+            'cache_miss', 'fetch_start', 'page_received', 'page_received', 'fetch_end', 'filter_done', 'render_done',
+        ])
+        key = (server.url, 'abc', 'def')
+        self.assertTrue(all(data['key'] == key for _, data in self.recorder.events))
+        events = dict(self.recorder.events[3:])
+        self.assertEqual(events['page_received']['page'], 2)
+        self.assertEqual(events['page_received']['releases'], 50)
+        self.assertGreater(events['page_received']['bytes_received'], 0)
+        self.assertIn('ETag', events['page_received']['headers'])
+        self.assertEqual(events['fetch_end']['releases'], 150)
+        self.assertEqual(events['fetch_end']['requests'], 3)
+        self.assertIsNone(events['fetch_end']['error'])
+        self.assertEqual(events['filter_done']['releases_seen'], 150)
+        self.assertEqual(events['render_done']['releases'], events['filter_done']['releases_selected'])
+        self.recorder.events.clear()
+        get_releases_as_markdown('abc', 'def', github_api_url=server.url, client=client, cache=cache)
+        self.assertEqual(self.recorder.names(), ['cache_hit', 'filter_done', 'render_done'])
+
+    def test_fetch_failed(self):
+        with GithubStandInServer() as server:
+            client = HostClient(server.url, token='abc')
+            self.addCleanup(client.close)
+            with self.assertRaises(Exception):
+                get_releases_as_markdown('abc', 'missing', github_api_url=server.url, client=client)
+        self.assertEqual(self.recorder.names(), ['fetch_start', 'fetch_end'])
+        self.assertIsNotNone(self.recorder.events[1][1]['error'])
+        self.assertEqual(self.recorder.events[1][1]['requests'], 0)
+
+    @patch.object(extension, 'get_releases_as_markdown')
+    def test_block_inserted(self, get_releases_as_markdown):
+        get_releases_as_markdown.return_value = ['# a', '# b']
+        processor = GithubReleaseChangelogProcessor(BlockParser(Markdown()), {})
+        processor._process_block('abc', 'def', '')
+        event, data = self.recorder.events[-1]
+        self.assertEqual(event, 'block_inserted')
+        self.assertEqual(data['key'], ('https://api.github.com', 'abc', 'def'))
+        self.assertEqual(data['length'], 8)
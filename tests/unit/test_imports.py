@@ -0,0 +1,54 @@
+import json
+from pathlib import Path
+import subprocess  # nosec B404
+import sys
+import unittest
+
+from fastcore.xtras import dict2obj
+from nskit.common.contextmanagers import ChDir
+
+from mkdocs_github_changelog.cache import cache_key
+from mkdocs_github_changelog.disk_cache import DiskCache
+from mkdocs_github_changelog.testing.corpus import generate_releases
+
+LAZY_MODULES = ['ghapi', 'fastcore', 'dateutil', 'setuptools_scm']
+
+
+def _imported(script):
+    """Run a script in a fresh interpreter, and get which of the lazy modules it imported."""
+    script += f'\nimport json, sys\nprint(json.dumps([m for m in {LAZY_MODULES!r} if m in sys.modules]))'
+    output = subprocess.run([sys.executable, '-c', script], check=True, capture_output=True, text=True).stdout  # nosec B603
+    return json.loads(output.strip().splitlines()[-1])
+
+
+class LazyImportTestCase(unittest.TestCase):
+
+    def test_import_plugin(self):
+        self.assertEqual(_imported('import mkdocs_github_changelog.plugin'), [])
+
+    def test_import_get_releases(self):
+        self.assertEqual(_imported('import mkdocs_github_changelog.get_releases'), [])
+        self.assertEqual(_imported('import sys, mkdocs_github_changelog.get_releases\nassert "jinja2" not in sys.modules'), [])
+
+    def test_version(self):
+        self.assertEqual(_imported('import mkdocs_github_changelog'), [])
+        # It is only looked up when used
+        import mkdocs_github_changelog
+        self.assertTrue(mkdocs_github_changelog.__version__)
+        with self.assertRaises(AttributeError):
+            mkdocs_github_changelog.not_an_attribute
+
+    def test_warm_build_skips_ghapi(self):
+        with ChDir():
+            Path('mkdocs.yml').write_text('site_name: test\ndocs_dir: source\nplugins:\n  - mkdocs_github_changelog:\n      cache_dir: cache\n')
+            Path('source').mkdir()
+            Path('source', 'index.md').write_text('## ::github-release-changelog abc/def\n')
+            releases = [dict2obj(release) for release in generate_releases(5, org='abc', repo='def')]
+            DiskCache('cache').save(cache_key('abc', 'def'), releases)
+            imported = _imported(
+                'from mkdocs.commands.build import build\n'
+                'from mkdocs.config import load_config\n'
+                'build(load_config("mkdocs.yml"))'
+            )
+            self.assertNotIn('ghapi', imported)
+            self.assertIn('abc/def/releases/tag/', Path('site', 'index.html').read_text())
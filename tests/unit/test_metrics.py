@@ -0,0 +1,87 @@
+import json
+import unittest
+
+from nskit.common.contextmanagers import ChDir
+
+from mkdocs_github_changelog.metrics import BuildReport, DirectiveMetrics, STAGES
+
+
+class DirectiveMetricsTestCase(unittest.TestCase):
+
+    def test_time(self):
+        metrics = DirectiveMetrics('abc', 'def')
+        with metrics.time('render'):
+            pass
+        self.assertGreater(metrics.timings['render'], 0)
+        self.assertEqual(metrics.total, metrics.timings['render'])
+
+    def test_as_dict(self):
+        metrics = DirectiveMetrics('abc', 'def', page='changelog.md')
+        metrics.add('fetch', 1.5)
+        metrics.requests = 3
+        result = metrics.as_dict()
+        self.assertEqual(result['directive'], 'abc/def')
+        self.assertEqual(result['page'], 'changelog.md')
+        self.assertEqual(result['timings']['fetch'], 1.5)
+        self.assertEqual(set(result['timings']), set(STAGES))
+        self.assertEqual(result['total'], 1.5)
+        self.assertEqual(result['requests'], 3)
+
+
+class BuildReportTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.report = BuildReport()
+        self.report.page = 'changelog.md'
+        first = self.report.directive('abc', 'def')
+        first.add('fetch', 1.0)
+        first.requests = 2
+        first.bytes_received = 2048
+        first.bytes_decoded = 8192
+        first.releases_seen = 150
+        first.releases_selected = 100
+        self.report.page = 'other.md'
+        second = self.report.directive('abc', 'ghi')
+        second.add('render', 0.5)
+        second.requests = 1
+        second.releases_seen = 5
+
+    def test_directive_uses_current_page(self):
+        self.assertEqual([d.page for d in self.report.directives], ['changelog.md', 'other.md'])
+
+    def test_totals(self):
+        totals = self.report.totals()
+        self.assertEqual(totals['directives'], 2)
+        self.assertEqual(totals['total'], 1.5)
+        self.assertEqual(totals['timings']['fetch'], 1.0)
+        self.assertEqual(totals['requests'], 3)
+        self.assertEqual(totals['bytes_received'], 2048)
+        self.assertEqual(totals['bytes_decoded'], 8192)
+        self.assertEqual(totals['releases_seen'], 155)
+        self.assertEqual(totals['releases_selected'], 100)
+
+    def test_summary(self):
+        lines = self.report.summary().splitlines()
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[0].startswith('page'))
+        self.assertIn('abc/def', lines[1])
+        self.assertIn('2.0', lines[1])
+        self.assertTrue(lines[3].startswith('total'))
+
+    def test_log_transfer(self):
+        with self.assertLogs('mkdocs.plugins.mkdocs_github_changelog', level='INFO') as logs:
+            self.report.log_transfer()
+        self.assertIn('Received 2.0 kB from github for 8.0 kB of releases, saved 6.0 kB by compression', logs.output[0])
+
+    def test_log_transfer_nothing_received(self):
+        report = BuildReport()
+        report.directive('abc', 'def')
+        with self.assertNoLogs('mkdocs.plugins.mkdocs_github_changelog', level='INFO'):
+            report.log_transfer()
+
+    def test_write_json(self):
+        with ChDir():
+            self.report.write_json('reports/changelog.json')
+            with open('reports/changelog.json') as f:
+                result = json.load(f)
+        self.assertEqual(result, json.loads(json.dumps(self.report.as_dict())))
@@ -0,0 +1,167 @@
+from pathlib import Path
+import unittest
+from unittest.mock import patch
+
+from fastcore.xtras import dict2obj
+from nskit.common.contextmanagers import ChDir
+
+from mkdocs_github_changelog import planner
+from mkdocs_github_changelog.clients import HostClients
+from mkdocs_github_changelog.directives import Directive
+from mkdocs_github_changelog.planner import (
+    get_rate_limit,
+    plan_requests,
+    UsageHistory,
+)
+from mkdocs_github_changelog.repositories import RepositoryIndex
+from mkdocs_github_changelog.testing.server import GithubStandInServer
+
+GITHUB = 'https://api.github.com'
+GHE = 'https://github.example.com/api/v3'
+
+
+class UsageHistoryTestCase(unittest.TestCase):
+
+    def test_record_and_save(self):
+        with ChDir():
+            history = UsageHistory(Path('cache', 'usage.json'))
+            self.assertIsNone(history.pages((GITHUB, 'abc', 'def')))
+            history.record((GITHUB, 'abc', 'def'), 3)
+            history.save()
+            self.assertEqual(UsageHistory(Path('cache', 'usage.json')).pages((GITHUB, 'abc', 'def')), 3)
+
+    def test_save_merges_concurrent_builds(self):
+        with ChDir():
+            first = UsageHistory('usage.json')
+            second = UsageHistory('usage.json')
+            first.record((GITHUB, 'abc', 'def'), 3)
+            second.record((GITHUB, 'abc', 'ghi'), 2)
+            first.save()
+            second.save()
+            history = UsageHistory('usage.json')
+            self.assertEqual(history.pages((GITHUB, 'abc', 'def')), 3)
+            self.assertEqual(history.pages((GITHUB, 'abc', 'ghi')), 2)
+
+    def test_invalid_file(self):
+        with ChDir():
+            Path('usage.json').write_text('not json')
+            history = UsageHistory('usage.json')
+            self.assertIsNone(history.pages((GITHUB, 'abc', 'def')))
+
+    def test_no_path(self):
+        history = UsageHistory()
+        history.record((GITHUB, 'abc', 'def'), 3)
+        history.save()
+        self.assertEqual(history.pages((GITHUB, 'abc', 'def')), 3)
+
+
+class PlanRequestsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.history = UsageHistory()
+        self.history.record((GITHUB, 'abc', 'def'), 4)
+        self.directives = [
+            Directive('abc', 'def', page='a.md'),
+            Directive('abc', 'def', page='b.md'),
+            Directive('abc', 'ghi', page='b.md'),
+            Directive('abc', 'jkl', {'github_api_url': GHE, 'token': 'ghe'}, page='c.md'),
+        ]
+
+    def test_plan_requests(self):
+        plan = plan_requests(self.directives, {'token': 'xyz'}, self.history)
+        self.assertEqual([(r.key, r.directives, r.pages, r.known, r.requests) for r in plan.repositories], [
+            ((GITHUB, 'abc', 'def'), 2, 4, True, 5),
+            ((GITHUB, 'abc', 'ghi'), 1, 1, False, 2),
+            ((GHE, 'abc', 'jkl'), 1, 1, False, 2),
+        ])
+        self.assertEqual(plan.requests(), 9)
+        self.assertEqual(plan.requests(GITHUB, ('xyz',)), 7)
+        self.assertEqual(plan.requests(GHE, ('ghe',)), 2)
+
+    @patch.object(planner, 'get_rate_limit')
+    def test_check_rate_limits(self, get_rate_limit):
+        limits = {GITHUB: {'remaining': 6, 'limit': 5000, 'reset': 0}, GHE: {'remaining': 100, 'limit': 5000, 'reset': 0}}
+        get_rate_limit.side_effect = lambda token, host: limits[host]
+        plan = plan_requests(self.directives, {'token': 'xyz'}, self.history)
+        plan.check_rate_limits()
+        self.assertFalse(plan.fits)
+        summary = plan.summary()
+        self.assertIn(f'Quota for {GITHUB} (authenticated): 7 of 6/5000 remaining (EXCEEDS', summary)
+        self.assertIn(f'Quota for {GHE} (authenticated): 2 of 100/5000 remaining (fits', summary)
+        limits[GITHUB]['remaining'] = 7
+        plan.check_rate_limits()
+        self.assertTrue(plan.fits)
+
+    @patch.object(planner, 'get_rate_limit')
+    def test_check_rate_limits_token_pool(self, get_rate_limit):
+        limits = {'t1': 4, 't2': 3, 'h1': 1, 'h2': 1, 'ghe': 100}
+        get_rate_limit.side_effect = lambda token, host: {'remaining': limits[token], 'limit': 5000, 'reset': len(token)}
+        # Only the tokens pool, as in the build, rather than unauthenticated
+        plan = plan_requests(self.directives, {'tokens': ['t1', 't2']}, self.history)
+        self.assertEqual([r.tokens for r in plan.repositories], [('t1', 't2'), ('t1', 't2'), ('ghe',)])
+        plan.check_rate_limits()
+        self.assertEqual(plan.rate_limits[(GITHUB, ('t1', 't2'))], {'remaining': 7, 'limit': 10000, 'reset': 2})
+        self.assertTrue(plan.fits)
+        self.assertIn(f'Quota for {GITHUB} (2 tokens): 7 of 7/10000 remaining (fits', plan.summary())
+        # A host's own tokens
+        plan = plan_requests(self.directives, {'tokens': ['t1', 't2'], 'hosts': {GITHUB: {'tokens': ['h1', 'h2']}}}, self.history)
+        plan.check_rate_limits()
+        self.assertEqual(plan.rate_limits[(GITHUB, ('h1', 'h2'))]['remaining'], 2)
+        self.assertFalse(plan.fits)
+
+    @patch.object(planner, 'get_rate_limit')
+    def test_check_rate_limits_error(self, get_rate_limit):
+        get_rate_limit.side_effect = ValueError('Not found')
+        plan = plan_requests(self.directives, {}, self.history)
+        plan.check_rate_limits()
+        self.assertEqual(plan.rate_limits, {})
+        self.assertTrue(plan.fits)
+
+    def test_summary(self):
+        summary = plan_requests(self.directives, {}, self.history).summary()
+        self.assertIn(f'{GITHUB}/abc/def: 5 requests (2 directives, 4 pages)', summary)
+        self.assertIn(f'{GITHUB}/abc/ghi: 2 requests (1 directives, 1 (not fetched before) pages)', summary)
+        self.assertIn('total: 9 requests', summary)
+
+
+class PlanWildcardsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.server = GithubStandInServer().start()
+        self.addCleanup(self.server.stop)
+        for repo in ('mkdocs-a', 'mkdocs-b', 'other'):
+            self.server.add_repository('abc', repo, 1)
+        self.clients = HostClients(tokens=['abc'])
+        self.addCleanup(self.clients.close)
+        self.directives = [Directive('abc', 'mkdocs-*', page='a.md'), Directive('abc', 'mkdocs-a', page='b.md')]
+        self.config = {'github_api_url': self.server.url}
+
+    def test_expanded(self):
+        index = RepositoryIndex()
+        plan = plan_requests(self.directives, self.config, UsageHistory(), clients=self.clients, index=index)
+        self.assertEqual([(r.key[2], r.directives) for r in plan.repositories], [('mkdocs-a', 2), ('mkdocs-b', 1)])
+        # The listing is counted as the requests made for it
+        self.assertEqual([(listing.key, listing.requests) for listing in plan.listings], [((self.server.url, 'abc'), len(self.server.requests))])
+        self.assertEqual(plan.requests(), 4 + len(self.server.requests))
+        self.assertIn(f'{self.server.url}/abc/*: {len(self.server.requests)} requests (listing the repositories)', plan.summary())
+        # Listed within the index's ttl, so the build doesn't list them again
+        plan = plan_requests(self.directives, self.config, UsageHistory(), clients=self.clients, index=index)
+        self.assertEqual(plan.listings, [])
+        self.assertEqual(plan.requests(), 4)
+
+    def test_without_clients(self):
+        plan = plan_requests(self.directives, self.config, UsageHistory())
+        self.assertEqual([r.key[2] for r in plan.repositories], ['mkdocs-a'])
+        self.assertEqual(plan.unestimated, ['abc/mkdocs-*'])
+        self.assertIn('abc/mkdocs-*: not estimated', plan.summary())
+        self.assertEqual(self.server.requests, [])
+
+
+class GetRateLimitTestCase(unittest.TestCase):
+
+    @patch.object(planner, '_make_api')
+    def test_get_rate_limit(self, _make_api):
+        _make_api().rate_limit.get.return_value = dict2obj({'resources': {'core': {'remaining': 10, 'limit': 60, 'reset': 1700000000}}})
+        _make_api.reset_mock()
+        self.assertEqual(get_rate_limit('abc', GHE + '/'), {'remaining': 10, 'limit': 60, 'reset': 1700000000})
+        _make_api.assert_called_once_with('abc', GHE)
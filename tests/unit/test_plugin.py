@@ -1,13 +1,27 @@
+import json
+import os
+from pathlib import Path
+import threading
 import unittest
+from unittest.mock import MagicMock, patch
 
+import markdown
 from mkdocs.config.base import ValidationError
 from mkdocs.config.defaults import MkDocsConfig
+from mkdocs.exceptions import PluginError
 from nskit.common.contextmanagers import ChDir, Env
 
+from mkdocs_github_changelog import plugin as plugin_module
+from mkdocs_github_changelog.disk_cache import DiskCache
+from mkdocs_github_changelog.feed import ReleaseFeed
+from mkdocs_github_changelog.planner import UsageHistory
 from mkdocs_github_changelog.plugin import (
     GithubReleaseChangelogExtension,
     MkdocsGithubChangelogPlugin,
 )
+from mkdocs_github_changelog.release_store import ReleaseStore
+from mkdocs_github_changelog.testing.corpus import generate_releases
+from mkdocs_github_changelog.testing.server import GithubStandInServer
 
 
 class MkdocsGithubChangelogPluginTestCase(unittest.TestCase):
@@ -15,13 +29,13 @@ class MkdocsGithubChangelogPluginTestCase(unittest.TestCase):
     def test_config_defaults(self):
         plugin = MkdocsGithubChangelogPlugin()
         resp = plugin.load_config({})
-        self.assertEqual(plugin.config, {'token': None, 'github_api_url': None, 'release_template': None, 'autoprocess': True, 'include_prereleases': False, 'enabled': True, 'match': None})
+        self.assertEqual(plugin.config, {'token': None, 'tokens': [], 'github_api_url': None, 'release_template': None, 'autoprocess': True, 'include_prereleases': False, 'body_html': False, 'enabled': True, 'match': None, 'cache_ttl': 600, 'non_blocking': False, 'report': False, 'report_file': None, 'cache_dir': '.cache/mkdocs_github_changelog', 'disk_cache': True, 'cache_backend': 'files', 'release_fields': None, 'hosts': {}, 'cache_max_size': 500, 'issue_titles': False, 'webhook_port': None, 'webhook_secret': None, 'request_timeout': 60, 'build_timeout': 0, 'error_ttl': 300, 'discovery_ttl': 3600, 'wildcard_concurrency': 4, 'batch_size': 0, 'hooks': [], 'release_feed': False, 'seed_from_event': False})
         self.assertEqual(resp, ([], []))
 
     def test_config_overriden_ok(self):
         plugin = MkdocsGithubChangelogPlugin()
-        resp = plugin.load_config({'token': 'abc', 'github_api_url': 'https://api.github.com', 'release_template': '123', 'autoprocess': False, 'include_prereleases': False, 'match': 'a.b.c', 'enabled': False})
-        self.assertEqual(plugin.config, {'token': 'abc', 'github_api_url': 'https://api.github.com', 'release_template': '123', 'autoprocess': False, 'include_prereleases': False, 'match': 'a.b.c', 'enabled': False})
+        resp = plugin.load_config({'token': 'abc', 'tokens': ['def', 'ghi'], 'github_api_url': 'https://api.github.com', 'release_template': '123', 'autoprocess': False, 'include_prereleases': False, 'body_html': True, 'match': 'a.b.c', 'enabled': False, 'cache_ttl': 60, 'non_blocking': True, 'report': True, 'report_file': 'report.json', 'cache_dir': 'cache', 'disk_cache': False, 'cache_backend': 'sqlite', 'release_fields': ['author'], 'hosts': {'https://github.example.com/api/v3': {'token': 'xyz'}}, 'cache_max_size': 0, 'issue_titles': True, 'webhook_port': 8765, 'webhook_secret': 'secret', 'request_timeout': 30, 'build_timeout': 120, 'error_ttl': 0, 'discovery_ttl': 60, 'wildcard_concurrency': 8, 'batch_size': 20, 'hooks': ['json:dumps'], 'release_feed': True, 'seed_from_event': True})
+        self.assertEqual(plugin.config, {'token': 'abc', 'tokens': ['def', 'ghi'], 'github_api_url': 'https://api.github.com', 'release_template': '123', 'autoprocess': False, 'include_prereleases': False, 'body_html': True, 'match': 'a.b.c', 'enabled': False, 'cache_ttl': 60, 'non_blocking': True, 'report': True, 'report_file': 'report.json', 'cache_dir': 'cache', 'disk_cache': False, 'cache_backend': 'sqlite', 'release_fields': ['author'], 'hosts': {'https://github.example.com/api/v3': {'token': 'xyz'}}, 'cache_max_size': 0, 'issue_titles': True, 'webhook_port': 8765, 'webhook_secret': 'secret', 'request_timeout': 30, 'build_timeout': 120, 'error_ttl': 0, 'discovery_ttl': 60, 'wildcard_concurrency': 8, 'batch_size': 20, 'hooks': ['json:dumps'], 'release_feed': True, 'seed_from_event': True})
         self.assertEqual(resp, ([], []))
 
     def test_config_overriden_bad(self):
@@ -44,7 +58,30 @@ class MkdocsGithubChangelogPluginTestCase(unittest.TestCase):
             ('match', ['x', 'y']),
             ('autoprocess', 'a'),
             ('include_prereleases', 'a'),
+            ('body_html', 'a'),
             ('enabled', 'x'),
+            ('cache_ttl', 'x'),
+            ('non_blocking', 'x'),
+            ('report', 'x'),
+            ('report_file', ['x']),
+            ('cache_dir', ['x']),
+            ('disk_cache', 'x'),
+            ('cache_max_size', 'x'),
+            ('cache_backend', 'x'),
+            ('hosts', ['x']),
+            ('tokens', 'x'),
+            ('release_fields', 'x'),
+            ('issue_titles', 'x'),
+            ('webhook_port', 'x'),
+            ('webhook_secret', ['x']),
+            ('request_timeout', 'x'),
+            ('build_timeout', 'x'),
+            ('error_ttl', 'x'),
+            ('discovery_ttl', 'x'),
+            ('wildcard_concurrency', 'x'),
+            ('batch_size', 'x'),
+            ('release_feed', 'x'),
+            ('seed_from_event', 'x'),
         ):
             with self.subTest(key=key):
                 resp = MkdocsGithubChangelogPlugin().load_config({key: value})
@@ -58,7 +95,32 @@ class MkdocsGithubChangelogPluginTestCase(unittest.TestCase):
         plugin.on_config(config)
         self.assertIsInstance(config.markdown_extensions[-1], GithubReleaseChangelogExtension)
         ext = config.markdown_extensions[-1]
-        self.assertEqual(ext._config, {'token': None, 'github_api_url': None, 'release_template': None, 'autoprocess': True, 'include_prereleases': False, 'match': None, 'enabled': True})
+        self.assertEqual(ext._config, {'token': None, 'tokens': [], 'github_api_url': None, 'release_template': None, 'autoprocess': True, 'include_prereleases': False, 'body_html': False, 'match': None, 'enabled': True, 'cache_ttl': 600, 'non_blocking': False, 'report': False, 'report_file': None, 'cache_dir': '.cache/mkdocs_github_changelog', 'disk_cache': True, 'cache_backend': 'files', 'release_fields': None, 'hosts': {}, 'cache_max_size': 500, 'issue_titles': False, 'webhook_port': None, 'webhook_secret': None, 'request_timeout': 60, 'build_timeout': 0, 'error_ttl': 300, 'discovery_ttl': 3600, 'wildcard_concurrency': 4, 'batch_size': 0, 'hooks': [], 'release_feed': False, 'seed_from_event': False})
+
+    def test_on_config_release_feed(self):
+        with ChDir():
+            plugin = MkdocsGithubChangelogPlugin()
+            config = MkDocsConfig()
+            plugin.load_config({'release_feed': True})
+            plugin.on_config(config)
+        self.assertIsInstance(config.markdown_extensions[-1]._feed, ReleaseFeed)
+
+    def test_on_config_seed_from_event(self):
+        with ChDir():
+            key = ('https://api.github.com', 'abc', 'def')
+            DiskCache('cache').save(key, [{'id': 1, 'tag_name': 'v0.1.0'}], fetched_at=0, fields=('id', 'tag_name'))
+            event = {'action': 'published', 'release': {'id': 2, 'tag_name': 'v0.2.0'}, 'repository': {'full_name': 'abc/def', 'url': 'https://api.github.com/repos/abc/def'}}
+            Path('event.json').write_text(json.dumps(event))
+            with Env(override={'GITHUB_EVENT_PATH': 'event.json'}):
+                plugin = MkdocsGithubChangelogPlugin()
+                plugin.load_config({'cache_dir': 'cache', 'seed_from_event': True})
+                plugin.on_config(MkDocsConfig())
+                self.assertEqual([r.tag_name for r in plugin._cache.get(key).releases], ['v0.2.0', 'v0.1.0'])
+                self.assertFalse(plugin._cache.get(key).expired(600))
+                # Not added again on rebuilds
+                with patch('mkdocs_github_changelog.webhooks.seed_from_event') as seed:
+                    plugin.on_config(MkDocsConfig())
+                seed.assert_not_called()
 
     def test_on_config_from_env(self):
         with Env(override={'GITHUB_TEST_TOKEN': 'abc'}):
@@ -75,4 +137,318 @@ class MkdocsGithubChangelogPluginTestCase(unittest.TestCase):
                 plugin.on_config(config)
                 self.assertIsInstance(config.markdown_extensions[-1], GithubReleaseChangelogExtension)
                 ext = config.markdown_extensions[-1]
-                self.assertEqual(ext._config, {'token': 'abc', 'github_api_url': None, 'release_template': None, 'autoprocess': True, 'include_prereleases': False, 'match': None, 'enabled': True})
+                self.assertEqual(ext._config, {'token': 'abc', 'tokens': [], 'github_api_url': None, 'release_template': None, 'autoprocess': True, 'include_prereleases': False, 'body_html': False, 'match': None, 'enabled': True, 'cache_ttl': 600, 'non_blocking': False, 'report': False, 'report_file': None, 'cache_dir': '.cache/mkdocs_github_changelog', 'disk_cache': True, 'cache_backend': 'files', 'release_fields': None, 'hosts': {}, 'cache_max_size': 500, 'issue_titles': False, 'webhook_port': None, 'webhook_secret': None, 'request_timeout': 60, 'build_timeout': 0, 'error_ttl': 300, 'discovery_ttl': 3600, 'wildcard_concurrency': 4, 'batch_size': 0, 'hooks': [], 'release_feed': False, 'seed_from_event': False})
+
+    def test_on_config_tokens(self):
+        plugin = MkdocsGithubChangelogPlugin()
+        # Unset environment variables are None
+        plugin.load_config({'token': 'abc', 'tokens': ['def', None, 'ghi']})
+        self.assertEqual(plugin.tokens(), ['abc', 'def', 'ghi'])
+        plugin.on_config(MkDocsConfig())
+        self.assertEqual(plugin._clients.get().tokens.tokens, ['abc', 'def', 'ghi'])
+
+    def test_on_config_invalid_hosts(self):
+        plugin = MkdocsGithubChangelogPlugin()
+        plugin.load_config({'hosts': {'https://github.example.com/api/v3': {'max_concurrency': 0}}})
+        with self.assertRaises(PluginError):
+            plugin.on_config(MkDocsConfig())
+
+    def test_on_config_reuses_clients(self):
+        plugin = MkdocsGithubChangelogPlugin()
+        plugin.load_config({'hosts': {'https://github.example.com/api/v3': {'token': 'abc'}}})
+        config = MkDocsConfig()
+        plugin.on_config(config)
+        clients = plugin._clients
+        self.assertIs(config.markdown_extensions[-1]._clients, clients)
+        plugin.on_config(MkDocsConfig())
+        self.assertIs(plugin._clients, clients)
+        plugin.config.hosts = {}
+        plugin.on_config(MkDocsConfig())
+        self.assertIsNot(plugin._clients, clients)
+
+    def test_on_config_build_timeout(self):
+        plugin = MkdocsGithubChangelogPlugin()
+        plugin.load_config({'build_timeout': 120, 'error_ttl': 60, 'request_timeout': 10})
+        config = MkDocsConfig()
+        plugin.on_config(config)
+        ext = config.markdown_extensions[-1]
+        self.assertEqual(ext._deadline.seconds, 120)
+        self.assertEqual(plugin._cache.error_ttl, 60)
+        self.assertEqual(plugin._clients.get().timeout, 10)
+        # Each build has its own deadline
+        plugin.on_config(config)
+        self.assertIsNot(config.markdown_extensions[-1]._deadline, ext._deadline)
+        plugin.load_config({})
+        plugin.on_config(config)
+        self.assertIsNone(config.markdown_extensions[-1]._deadline)
+
+    def test_on_config_shares_cache(self):
+        plugin = MkdocsGithubChangelogPlugin()
+        plugin.load_config({'cache_ttl': 30})
+        config = MkDocsConfig()
+        plugin.on_config(config)
+        ext = config.markdown_extensions[-1]
+        self.assertIs(ext._cache, plugin._cache)
+        self.assertEqual(plugin._cache.ttl, 30)
+
+    def test_on_page_markdown_records_pages(self):
+        plugin = MkdocsGithubChangelogPlugin()
+        plugin.load_config({})
+        page = MagicMock()
+        page.file.abs_src_path = '/docs/changelog.md'
+        markdown = '# Changelog\n\n## ::github-release-changelog abc/def\n\n::github-release-changelog abc/ghi\n'
+        self.assertEqual(plugin.on_page_markdown(markdown, page=page, config=MkDocsConfig(), files=[]), markdown)
+        self.assertEqual(plugin._pages, {('abc', 'def'): {'/docs/changelog.md'}, ('abc', 'ghi'): {'/docs/changelog.md'}})
+
+    def test_invalidate_touches_pages(self):
+        with ChDir():
+            changed = Path('changed.md')
+            unchanged = Path('unchanged.md')
+            for path in (changed, unchanged):
+                path.write_text('')
+                os.utime(path, (0, 0))
+            plugin = MkdocsGithubChangelogPlugin()
+            plugin._pages = {('abc', 'def'): {str(changed)}, ('abc', 'ghi'): {str(unchanged)}}
+            plugin._invalidate([('https://api.github.com', 'abc', 'def')])
+            self.assertGreater(changed.stat().st_mtime, 0)
+            self.assertEqual(unchanged.stat().st_mtime, 0)
+
+    def test_invalidate_touches_wildcard_pages(self):
+        with ChDir():
+            changed = Path('changed.md')
+            unchanged = Path('unchanged.md')
+            for path in (changed, unchanged):
+                path.write_text('')
+                os.utime(path, (0, 0))
+            plugin = MkdocsGithubChangelogPlugin()
+            plugin._pages = {('abc', 'mkdocs-*'): {str(changed)}, ('abc', 'other-*'): {str(unchanged)}}
+            plugin._invalidate([('https://api.github.com', 'abc', 'mkdocs-a')])
+            self.assertGreater(changed.stat().st_mtime, 0)
+            self.assertEqual(unchanged.stat().st_mtime, 0)
+
+    def test_refresher_only_under_serve(self):
+        for command, started in (('build', False), ('serve', True)):
+            with self.subTest(command=command):
+                plugin = MkdocsGithubChangelogPlugin()
+                plugin.load_config({})
+                plugin.on_startup(command=command, dirty=False)
+                server = MagicMock()
+                with patch.object(plugin_module, 'ReleaseRefresher') as ReleaseRefresher:
+                    self.assertIs(plugin.on_serve(server, config=MkDocsConfig(), builder=None), server)
+                    self.assertEqual(ReleaseRefresher.called, started)
+                    plugin.on_shutdown()
+                    self.assertEqual(ReleaseRefresher().stop.called, started)
+                    self.assertIsNone(plugin._refresher)
+
+    def test_refresher_disabled_without_ttl(self):
+        plugin = MkdocsGithubChangelogPlugin()
+        plugin.load_config({'cache_ttl': 0})
+        plugin.on_startup(command='serve', dirty=False)
+        with patch.object(plugin_module, 'ReleaseRefresher') as ReleaseRefresher:
+            plugin.on_serve(MagicMock(), config=MkDocsConfig(), builder=None)
+            ReleaseRefresher.assert_not_called()
+
+    def test_webhooks_only_under_serve(self):
+        for command, started in (('build', False), ('serve', True)):
+            with self.subTest(command=command):
+                plugin = MkdocsGithubChangelogPlugin()
+                plugin.load_config({'webhook_port': 0})
+                plugin.on_startup(command=command, dirty=False)
+                plugin.on_serve(MagicMock(), config=MkDocsConfig(), builder=None)
+                self.assertEqual(plugin._webhooks is not None, started)
+                plugin.on_shutdown()
+                self.assertIsNone(plugin._webhooks)
+
+    def test_webhooks_disabled_without_port(self):
+        plugin = MkdocsGithubChangelogPlugin()
+        plugin.load_config({})
+        plugin.on_startup(command='serve', dirty=False)
+        plugin.on_serve(MagicMock(), config=MkDocsConfig(), builder=None)
+        self.assertIsNone(plugin._webhooks)
+        plugin.on_shutdown()
+
+    def test_on_release_event(self):
+        key = ('https://api.github.com', 'abc', 'def')
+        payload = {'action': 'published', 'release': generate_releases(1, org='abc', repo='def')[0]}
+        payload['release'].update(id=99, tag_name='v99.0.0')
+        plugin = MkdocsGithubChangelogPlugin()
+        with patch.object(plugin, '_invalidate') as invalidate:
+            # Not fetched yet, so left to be fetched in full
+            plugin._on_release_event(key, payload)
+            invalidate.assert_not_called()
+            plugin._cache.set(key, generate_releases(5, org='abc', repo='def'))
+            plugin._on_release_event(key, payload)
+            invalidate.assert_called_once_with([key])
+            self.assertEqual(plugin._cache.get(key).releases[0]['tag_name'], 'v99.0.0')
+            # Delivered again, so nothing changed
+            plugin._on_release_event(key, payload)
+            invalidate.assert_called_once_with([key])
+
+    def test_on_release_event_body_html(self):
+        key = ('https://api.github.com', 'abc', 'def')
+        payload = {'action': 'published', 'release': generate_releases(1, org='abc', repo='def')[0]}
+        payload['release'].update(id=99, tag_name='v99.0.0')
+        fetched = generate_releases(5, org='abc', repo='def')
+        fetcher = MagicMock(side_effect=lambda: list(fetched))
+        plugin = MkdocsGithubChangelogPlugin()
+        plugin._cache.get_releases(key, fetcher, fields=('tag_name', 'body_html'))
+        with patch.object(plugin, '_invalidate') as invalidate:
+            # The payload has no body_html, so the releases are refetched rather than updated from it
+            fetched.insert(0, dict(payload['release'], body_html='<p>Released</p>'))
+            plugin._on_release_event(key, payload)
+            self.assertEqual(fetcher.call_count, 2)
+            invalidate.assert_called_once_with([key])
+            self.assertEqual(plugin._cache.get(key).releases[0]['body_html'], '<p>Released</p>')
+            # The releases are kept if they can't be refetched
+            fetcher.side_effect = RuntimeError('Unavailable')
+            plugin._on_release_event(key, payload)
+            invalidate.assert_called_once_with([key])
+
+    def test_non_blocking_only_under_serve(self):
+        for command, non_blocking in (('build', False), ('serve', True)):
+            with self.subTest(command=command):
+                plugin = MkdocsGithubChangelogPlugin()
+                plugin.load_config({'non_blocking': True, 'report': True, 'report_file': 'report.json', 'cache_dir': 'cache', 'disk_cache': False, 'release_fields': ['author'], 'hosts': {'https://github.example.com/api/v3': {'token': 'xyz'}}, 'cache_max_size': 0})
+                plugin.on_startup(command=command, dirty=False)
+                config = MkDocsConfig()
+                plugin.on_config(config)
+                self.assertEqual(config.markdown_extensions[-1]._non_blocking, non_blocking)
+                self.assertEqual(plugin._cache.on_fetched is not None, non_blocking)
+
+    def test_report(self):
+        plugin = MkdocsGithubChangelogPlugin()
+        plugin.load_config({})
+        config = MkDocsConfig()
+        plugin.on_config(config)
+        self.assertIsNotNone(plugin._report)
+        self.assertIs(config.markdown_extensions[-1]._report, plugin._report)
+
+    def test_on_post_build_writes_report(self):
+        with ChDir():
+            Path('docs').mkdir()
+            plugin = MkdocsGithubChangelogPlugin()
+            plugin.load_config({'report_file': 'reports/changelog.json'})
+            config = MkDocsConfig(config_file_path=str(Path('docs', 'mkdocs.yml').absolute()))
+            plugin.on_config(config)
+            page = MagicMock()
+            page.file.src_uri = 'changelog.md'
+            plugin.on_page_markdown('', page=page, config=config, files=[])
+            plugin._report.directive('abc', 'def').requests = 2
+            plugin.on_post_build(config=config)
+            report = json.loads(Path('docs', 'reports', 'changelog.json').read_text())
+            self.assertEqual(report['directives'][0]['directive'], 'abc/def')
+            self.assertEqual(report['directives'][0]['page'], 'changelog.md')
+            self.assertEqual(report['totals']['requests'], 2)
+
+    def test_on_post_build_records_usage(self):
+        with ChDir():
+            plugin = MkdocsGithubChangelogPlugin()
+            plugin.load_config({'cache_dir': 'cache'})
+            config = MkDocsConfig(config_file_path=str(Path('mkdocs.yml').absolute()))
+            plugin.on_config(config)
+            plugin._report.directive('abc', 'def').requests = 3
+            # Served from the cache, so not recorded
+            plugin._report.directive('abc', 'def')
+            plugin._report.directive('abc', 'ghi', 'https://github.example.com/api/v3').requests = 2
+            plugin.on_post_build(config=config)
+            history = UsageHistory(Path('cache', 'usage.json'))
+            self.assertEqual(history.pages(('https://api.github.com', 'abc', 'def')), 2)
+            self.assertEqual(history.pages(('https://github.example.com/api/v3', 'abc', 'ghi')), 1)
+            self.assertFalse(Path('report.json').exists())
+
+    def test_on_post_build_logs_cache_compression(self):
+        with ChDir():
+            plugin = MkdocsGithubChangelogPlugin()
+            plugin.load_config({'cache_dir': 'cache'})
+            config = MkDocsConfig(config_file_path=str(Path('mkdocs.yml').absolute()))
+            plugin.on_config(config)
+            plugin._cache.disk_cache.save(('https://api.github.com', 'abc', 'def'), generate_releases(50))
+            with self.assertLogs('mkdocs.plugins.mkdocs_github_changelog', level='INFO') as logs:
+                plugin.on_post_build(config=config)
+            self.assertTrue(any('of releases in the cache as' in line for line in logs.output))
+
+    def test_on_pre_build_batches(self):
+        with GithubStandInServer() as server, ChDir():
+            for repo in ('def', 'ghi'):
+                server.add_repository('abc', repo, 10)
+            Path('docs').mkdir()
+            Path('docs', 'index.md').write_text('## ::github-release-changelog abc/def\n\n## ::github-release-changelog abc/ghi\n')
+            plugin = MkdocsGithubChangelogPlugin()
+            plugin.load_config({'cache_dir': 'cache', 'github_api_url': server.url, 'token': 'abc', 'batch_size': 10})
+            config = MkDocsConfig(config_file_path=str(Path('mkdocs.yml').absolute()))
+            config['docs_dir'] = str(Path('docs').absolute())
+            plugin.on_config(config)
+            plugin.on_pre_build(config=config)
+            self.assertEqual([method for method, _, _ in server.requests], ['POST'])
+            # The changelogs use the batched releases
+            html = markdown.Markdown(extensions=[config.markdown_extensions[-1]]).convert(Path('docs', 'index.md').read_text())
+            self.assertIn(server.repositories[('abc', 'ghi')][0]['name'], html)
+            self.assertEqual(len(server.requests), 1)
+            plugin.on_post_build(config=config)
+            self.assertEqual(UsageHistory(Path('cache', 'usage.json')).pages((server.url, 'abc', 'def')), 1)
+
+    def test_on_pre_build_without_batch_size(self):
+        plugin = MkdocsGithubChangelogPlugin()
+        plugin.load_config({})
+        plugin.on_config(MkDocsConfig())
+        with patch.object(plugin_module, 'prefetch') as prefetch:
+            plugin.on_pre_build(config=MkDocsConfig())
+        prefetch.assert_not_called()
+
+    def test_cache_path(self):
+        plugin = MkdocsGithubChangelogPlugin()
+        plugin.load_config({})
+        config = MkDocsConfig(config_file_path=str(Path('/docs', 'mkdocs.yml')))
+        self.assertEqual(plugin.cache_path(config, 'usage.json'), Path('/docs', '.cache', 'mkdocs_github_changelog', 'usage.json'))
+
+    def test_disk_cache(self):
+        for disk_cache in (True, False):
+            with self.subTest(disk_cache=disk_cache):
+                plugin = MkdocsGithubChangelogPlugin()
+                plugin.load_config({'disk_cache': disk_cache})
+                config = MkDocsConfig(config_file_path=str(Path('/docs', 'mkdocs.yml')))
+                plugin.on_config(config)
+                if disk_cache:
+                    self.assertEqual(plugin._cache.disk_cache.directory, Path('/docs', '.cache', 'mkdocs_github_changelog'))
+                else:
+                    self.assertIsNone(plugin._cache.disk_cache)
+
+    def test_cache_backend_sqlite(self):
+        with ChDir():
+            plugin = MkdocsGithubChangelogPlugin()
+            plugin.load_config({'cache_backend': 'sqlite', 'cache_dir': 'cache'})
+            config = MkDocsConfig(config_file_path=str(Path('mkdocs.yml').absolute()))
+            plugin.on_config(config)
+            self.assertIsInstance(plugin._cache.disk_cache, ReleaseStore)
+            self.assertEqual(plugin._cache.disk_cache.path, Path('cache', 'releases.sqlite3').absolute())
+
+    def test_cache_backend_sqlite_rebuild(self):
+        with ChDir():
+            plugin = MkdocsGithubChangelogPlugin()
+            plugin.load_config({'cache_backend': 'sqlite', 'cache_dir': 'cache'})
+            config = MkDocsConfig(config_file_path=str(Path('mkdocs.yml').absolute()))
+            plugin.on_config(config)
+            store = plugin._cache.disk_cache
+            store.raw_bytes = 10
+            plugin.on_config(config)
+            self.assertIs(plugin._cache.disk_cache, store)
+            self.assertEqual(store.raw_bytes, 0)
+            plugin.config.cache_max_size = 1
+            plugin.on_config(config)
+            self.assertIsNot(plugin._cache.disk_cache, store)
+            self.assertEqual(store._idle, [])
+
+    def test_on_shutdown_closes_store(self):
+        with ChDir():
+            plugin = MkdocsGithubChangelogPlugin()
+            plugin.load_config({'cache_backend': 'sqlite', 'cache_dir': 'cache'})
+            config = MkDocsConfig(config_file_path=str(Path('mkdocs.yml').absolute()))
+            plugin.on_config(config)
+            store = plugin._cache.disk_cache
+            thread = threading.Thread(target=store.size)
+            thread.start()
+            thread.join()
+            # The thread used the connection left by the plugin, and left it for later
+            self.assertEqual(len(store._idle), 1)
+            plugin.on_shutdown()
+            self.assertEqual(store._idle, [])
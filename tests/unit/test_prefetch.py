@@ -0,0 +1,161 @@
+import unittest
+from unittest.mock import patch
+
+from fastcore.xtras import dict2obj
+from nskit.common.contextmanagers import ChDir
+
+from mkdocs_github_changelog import get_releases
+from mkdocs_github_changelog.cache import ReleaseCache
+from mkdocs_github_changelog.clients import HostClients
+from mkdocs_github_changelog.directives import Directive
+from mkdocs_github_changelog.disk_cache import DiskCache
+from mkdocs_github_changelog.prefetch import prefetch
+from mkdocs_github_changelog.repositories import RepositoryIndex
+from mkdocs_github_changelog.streaming import REQUIRED_FIELDS, SELECTION_FIELDS
+from mkdocs_github_changelog.testing.server import GithubStandInServer
+
+
+def fake_fetch_releases(org, repo, token=None, github_api_url=None, metrics=None, client=None, fields=None, stream=True):
+    if repo == 'missing':
+        raise ValueError('Not Found')
+    metrics.requests = 2
+    return [dict2obj({'name': f'{org}/{repo}', 'token': token})]
+
+
+class PrefetchTestCase(unittest.TestCase):
+
+    @patch.object(get_releases, 'fetch_releases', side_effect=fake_fetch_releases)
+    def test_prefetch(self, fetch_releases):
+        directives = [
+            Directive('abc', 'def', page='a.md'),
+            Directive('abc', 'def', {'token': 'xyz'}, page='b.md'),
+            Directive('abc', 'ghi', {'token': 'xyz'}, page='b.md'),
+        ]
+        with ChDir():
+            disk_cache = DiskCache('cache')
+            results = prefetch(directives, {'token': 'abc'}, disk_cache)
+            # Each repository is only fetched once
+            self.assertEqual(fetch_releases.call_count, 2)
+            self.assertTrue(all(result.ok for result in results))
+            self.assertEqual([result.key for result in results], [d.key({}) for d in directives[1:]])
+            releases, _ = disk_cache.load(results[0].key, fields=REQUIRED_FIELDS)
+            self.assertEqual(releases[0].name, 'abc/def')
+            self.assertEqual(releases[0].token, 'abc')
+            self.assertEqual(disk_cache.load(results[1].key, fields=REQUIRED_FIELDS)[0][0].token, 'xyz')
+            self.assertEqual(results[0].metrics.releases_seen, 1)
+            self.assertIn('ok      https://api.github.com/abc/def: 1 releases, 2 requests', str(results[0]))
+
+    @patch.object(get_releases, 'fetch_releases', side_effect=fake_fetch_releases)
+    def test_prefetch_failure(self, fetch_releases):
+        with ChDir():
+            disk_cache = DiskCache('cache')
+            results = prefetch([Directive('abc', 'def'), Directive('abc', 'missing')], {}, disk_cache)
+            self.assertTrue(results[0].ok)
+            self.assertFalse(results[1].ok)
+            self.assertEqual(str(results[1]), 'FAILED  https://api.github.com/abc/missing: ValueError: Not Found')
+            self.assertIsNone(disk_cache.load(results[1].key))
+
+    @patch.object(get_releases, 'fetch_releases', side_effect=fake_fetch_releases)
+    def test_prefetch_host_token(self, fetch_releases):
+        directives = [
+            Directive('abc', 'def', {'github_api_url': 'https://github.example.com/api/v3'}),
+            Directive('abc', 'ghi', {'github_api_url': 'https://github.example.com/api/v3', 'token': 'xyz'}),
+            Directive('abc', 'jkl'),
+        ]
+        plugin_config = {'token': 'abc', 'hosts': {'https://github.example.com/api/v3': {'token': 'ghe'}}}
+        with ChDir():
+            disk_cache = DiskCache('cache')
+            results = prefetch(directives, plugin_config, disk_cache)
+            self.assertEqual([disk_cache.load(result.key, fields=REQUIRED_FIELDS)[0][0].token for result in results], ['ghe', 'xyz', 'abc'])
+        clients = {call.kwargs['client'] for call in fetch_releases.call_args_list}
+        self.assertEqual({client.host for client in clients}, {'https://github.example.com/api/v3', 'https://api.github.com'})
+
+    @patch.object(get_releases, 'fetch_releases', side_effect=fake_fetch_releases)
+    def test_prefetch_template_fields(self, fetch_releases):
+        directives = [
+            Directive('abc', 'def', {'release_template': '{{release.name}} {{release.author.login}}'}),
+            Directive('abc', 'def', {'release_template': '{{release.name}} {{release.assets}}'}),
+            Directive('abc', 'ghi', {'release_template': '{{release|tojson}}'}),
+        ]
+        with ChDir():
+            prefetch(directives, {}, DiskCache('cache'))
+        fields = {call.args[1]: call.kwargs['fields'] for call in fetch_releases.call_args_list}
+        # The fields used by every template for the repository
+        self.assertEqual(fields['def'], (*SELECTION_FIELDS, 'author', 'assets'))
+        # Could use any field
+        self.assertIsNone(fields['ghi'])
+
+    def test_no_directives(self):
+        self.assertEqual(prefetch([], {}, DiskCache('cache')), [])
+
+
+class BatchedPrefetchTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.server = GithubStandInServer().start()
+        self.addCleanup(self.server.stop)
+        for i in range(5):
+            self.server.add_repository('abc', f'repo-{i}', 120 if i == 0 else 10)
+        self.clients = HostClients(tokens=['abc'])
+        self.addCleanup(self.clients.close)
+        self.plugin_config = {'github_api_url': self.server.url}
+
+    def _directives(self, *repos, **options):
+        return [Directive('abc', repo, options) for repo in repos]
+
+    def test_batched(self):
+        directives = self._directives(*(f'repo-{i}' for i in range(5)))
+        with ChDir():
+            disk_cache = DiskCache('cache')
+            results = prefetch(directives, self.plugin_config, disk_cache, clients=self.clients, batch_size=3)
+            self.assertTrue(all(result.ok for result in results))
+            self.assertEqual([result.key[2] for result in results], [f'repo-{i}' for i in range(5)])
+            # Two batches, and the next page of repo-0
+            self.assertEqual(len(self.server.requests), 3)
+            self.assertTrue(all(method == 'POST' for method, _, _ in self.server.requests))
+            self.assertEqual([result.pages for result in results], [2, 1, 1, 1, 1])
+            releases, _ = disk_cache.load(results[0].key, fields=REQUIRED_FIELDS)
+            self.assertEqual(len(releases), 120)
+
+    def test_not_batchable(self):
+        directives = [*self._directives('repo-0'), *self._directives('repo-1', release_template='{{release.assets}}')]
+        with ChDir():
+            results = prefetch(directives, self.plugin_config, DiskCache('cache'), clients=self.clients, batch_size=3)
+        self.assertTrue(all(result.ok for result in results))
+        self.assertEqual([method for method, _, _ in self.server.requests], ['POST', 'POST', 'GET', 'GET'])
+        # Without fallback, it is left for its changelog
+        self.server.requests.clear()
+        results = prefetch(directives, self.plugin_config, None, clients=self.clients, batch_size=3, fallback=False)
+        self.assertEqual([result.key[2] for result in results], ['repo-0'])
+
+    def test_fallback(self):
+        with ChDir():
+            results = prefetch(self._directives('repo-1', 'missing'), self.plugin_config, DiskCache('cache'), clients=self.clients, batch_size=3)
+        self.assertTrue(results[0].ok)
+        self.assertFalse(results[1].ok)
+        # The missing repository is requested again with the REST API
+        self.assertEqual([method for method, _, _ in self.server.requests], ['POST', 'GET'])
+
+    def test_cache(self):
+        cache = ReleaseCache()
+        directives = self._directives('repo-1', 'repo-2')
+        results = prefetch(directives[:1], self.plugin_config, None, clients=self.clients, batch_size=3, cache=cache)
+        self.assertEqual(len(cache.get(results[0].key).releases), 10)
+        # Those already in the cache are skipped
+        results = prefetch(directives, self.plugin_config, None, clients=self.clients, batch_size=3, cache=cache)
+        self.assertEqual([result.key[2] for result in results], ['repo-2'])
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_wildcard(self):
+        directives = [Directive('abc', 'repo-*', {'exclude': 'repo-0'}), *self._directives('repo-1')]
+        index = RepositoryIndex()
+        results = prefetch(directives, self.plugin_config, None, clients=self.clients, batch_size=10, cache=ReleaseCache(), index=index)
+        self.assertEqual([result.key[2] for result in results], ['repo-1', 'repo-2', 'repo-3', 'repo-4'])
+        self.assertEqual(index.requests, 1)
+
+    def test_body_html(self):
+        cache = ReleaseCache()
+        results = prefetch(self._directives('repo-1', body_html=True), self.plugin_config, None, clients=self.clients, cache=cache)
+        self.assertTrue(results[0].ok)
+        self.assertEqual(self.server.requests[0][2]['Accept'], 'application/vnd.github.html+json')
+        self.assertIn('body_html', cache.get(results[0].key).releases[0])
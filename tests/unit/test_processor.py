@@ -1,3 +1,5 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
 import unittest
 from unittest.mock import patch
 
@@ -6,7 +8,15 @@ from markdown.blockparser import BlockParser
 from nskit.common.contextmanagers import Env
 
 from mkdocs_github_changelog import extension
-from mkdocs_github_changelog.extension import GithubReleaseChangelogProcessor
+from mkdocs_github_changelog.cache import ReleaseCache, ReleasesNotReady
+from mkdocs_github_changelog.clients import HostClients
+from mkdocs_github_changelog.extension import GithubReleaseChangelogProcessor, PLACEHOLDER, UNAVAILABLE
+from mkdocs_github_changelog.failures import Deadline, DeadlineExceeded
+from mkdocs_github_changelog.hooks import HOOKS, RENDER_DONE
+from mkdocs_github_changelog.repositories import RepositoryIndex
+from mkdocs_github_changelog.streaming import projected_fields, REQUIRED_FIELDS, SELECTION_FIELDS
+from mkdocs_github_changelog.testing.server import GithubStandInServer
+from mkdocs_github_changelog.titles import IssueTitles
 
 
 class ProccesorTestCase(unittest.TestCase):
@@ -53,7 +63,10 @@ class ProccesorTestCase(unittest.TestCase):
             github_api_url=None,
             match=None,
             autoprocess=True,
-            include_prereleases=False
+            include_prereleases=False,
+            cache=None,
+            fields=REQUIRED_FIELDS,
+            stream=False
         )
 
     # Patch get_releases_as_markdown to return the release info
@@ -72,7 +85,10 @@ class ProccesorTestCase(unittest.TestCase):
             github_api_url=None,
             match='*.*.*',
             autoprocess=False,
-            include_prereleases=False
+            include_prereleases=False,
+            cache=None,
+            fields=SELECTION_FIELDS,
+            stream=False
         )
 
     # Patch get_releases_as_markdown to return the release info
@@ -90,7 +106,10 @@ class ProccesorTestCase(unittest.TestCase):
             github_api_url='https://microsoft.com',
             match='a.b.c',
             autoprocess=False,
-            include_prereleases=False
+            include_prereleases=False,
+            cache=None,
+            fields=SELECTION_FIELDS,
+            stream=False
         )
         self.assertEqual(result, '#### 0.1.0\n\n##### Features\n Hello World ([#1](https://www.google.com))')
 
@@ -110,7 +129,10 @@ class ProccesorTestCase(unittest.TestCase):
                 github_api_url='https://microsoft.com',
                 match='a.b.c',
                 autoprocess=True,
-                include_prereleases=False
+                include_prereleases=False,
+                cache=None,
+                fields=SELECTION_FIELDS,
+                stream=False
             )
             self.assertEqual(result, '#### 0.1.0\n\n##### Features\n Hello World ([#1](https://www.google.com))')
 
@@ -130,7 +152,10 @@ class ProccesorTestCase(unittest.TestCase):
             github_api_url=None,
             match=None,
             autoprocess=True,
-            include_prereleases=False
+            include_prereleases=False,
+            cache=None,
+            fields=REQUIRED_FIELDS,
+            stream=False
         )
         self.assertEqual(result, '#### 0.1.0\n\n##### Features\n Hello World ([#1](https://www.google.com))')
 
@@ -165,7 +190,8 @@ class ProccesorTestCase(unittest.TestCase):
         blocks = ['::github-release-changelog abc/def', 'b']
         processor = GithubReleaseChangelogProcessor(BlockParser(Markdown()), {})
         processor.run(None, blocks)
-        self.assertEqual(blocks, [releases, 'b'])
+        # The releases are split into blocks as markdown would for a document
+        self.assertEqual(blocks, [*releases.split('\n\n'), 'b'])
 
     def test_run_no_matching_block(self):
         blocks = ['a', 'b']
@@ -173,3 +199,161 @@ class ProccesorTestCase(unittest.TestCase):
         processor.run(None, blocks)
         self.assertEqual(blocks, ['a', 'b'])
 
+    @patch.object(extension, 'get_releases_as_markdown')
+    def test_process_block_non_blocking_placeholder(self, get_releases_as_markdown):
+        get_releases_as_markdown.side_effect = ReleasesNotReady(('https://api.github.com', 'abc', 'def'))
+        cache = ReleaseCache()
+        processor = GithubReleaseChangelogProcessor(BlockParser(Markdown()), {}, cache=cache, non_blocking=True)
+        result = processor._process_block('abc', 'def', '')
+        self.assertEqual(result, PLACEHOLDER.format(org='abc', repo='def'))
+        self.assertEqual(get_releases_as_markdown.call_args.kwargs['wait'], False)
+        self.assertIs(get_releases_as_markdown.call_args.kwargs['cache'], cache)
+
+    @patch.object(extension, 'get_releases_as_markdown')
+    def test_process_block_deadline_exceeded(self, get_releases_as_markdown):
+        get_releases_as_markdown.side_effect = DeadlineExceeded('The build_timeout of 1s ran out')
+        deadline = Deadline(1)
+        processor = GithubReleaseChangelogProcessor(BlockParser(Markdown()), {}, deadline=deadline)
+        with self.assertLogs('mkdocs.plugins.mkdocs_github_changelog', level='WARNING'):
+            result = processor._process_block('abc', 'def', '')
+        self.assertEqual(result, UNAVAILABLE.format(org='abc', repo='def'))
+        self.assertIs(get_releases_as_markdown.call_args.kwargs['deadline'], deadline)
+
+    @patch.object(extension, 'get_releases_as_markdown')
+    def test_process_block_with_clients(self, get_releases_as_markdown):
+        get_releases_as_markdown.return_value = ['']
+        clients = HostClients({'https://github.example.com/api/v3': {'token': 'ghe'}}, tokens=['789', '012'])
+        processor = GithubReleaseChangelogProcessor(BlockParser(Markdown()), {'token': '789'}, clients=clients)
+        processor._process_block('abc', 'def', 'github_api_url: https://github.example.com/api/v3')
+        kwargs = get_releases_as_markdown.call_args.kwargs
+        # The host's token takes precedence over the plugin's
+        self.assertEqual(kwargs['token'], 'ghe')
+        self.assertIs(kwargs['client'], clients.get('https://github.example.com/api/v3'))
+        processor._process_block('abc', 'def', '')
+        kwargs = get_releases_as_markdown.call_args.kwargs
+        self.assertEqual(kwargs['token'], '789')
+        self.assertEqual(kwargs['client'].host, 'https://api.github.com')
+        self.assertEqual(kwargs['client'].tokens.tokens, ['789', '012'])
+        processor._process_block('abc', 'def', 'github_api_url: https://github.example.com/api/v3\ntoken: xyz')
+        kwargs = get_releases_as_markdown.call_args.kwargs
+        self.assertEqual(kwargs['token'], 'xyz')
+        self.assertEqual(kwargs['client'].token, 'xyz')
+
+    @patch.object(extension, 'get_releases_as_markdown')
+    def test_process_block_with_release_fields(self, get_releases_as_markdown):
+        get_releases_as_markdown.return_value = ['']
+        processor = GithubReleaseChangelogProcessor(BlockParser(Markdown()), {'release_fields': ['author']})
+        processor._process_block('abc', 'def', '')
+        self.assertEqual(get_releases_as_markdown.call_args.kwargs['fields'], projected_fields(['author']))
+
+    @patch.object(extension, 'get_releases_as_markdown')
+    def test_process_block_with_issue_titles(self, get_releases_as_markdown):
+        get_releases_as_markdown.return_value = ['']
+        issue_titles = IssueTitles()
+        processor = GithubReleaseChangelogProcessor(BlockParser(Markdown()), {}, issue_titles=issue_titles)
+        processor._process_block('abc', 'def', '')
+        self.assertIs(get_releases_as_markdown.call_args.kwargs['issue_titles'], issue_titles)
+        processor._process_block('abc', 'def', 'issue_titles: false')
+        self.assertNotIn('issue_titles', get_releases_as_markdown.call_args.kwargs)
+
+    def test_process_block_not_found(self):
+        with GithubStandInServer() as server:
+            cache = ReleaseCache()
+            # A mistyped repository on two pages is only requested once
+            for _ in range(2):
+                processor = GithubReleaseChangelogProcessor(BlockParser(Markdown()), {'github_api_url': server.url}, cache=cache)
+                with self.assertLogs('mkdocs.plugins.mkdocs_github_changelog', level='WARNING'):
+                    result = processor._process_block('abc', 'missing', '')
+                self.assertEqual(result, UNAVAILABLE.format(org='abc', repo='missing'))
+            self.assertEqual(len(server.requests), 1)
+
+    def test_non_blocking_requires_cache(self):
+        processor = GithubReleaseChangelogProcessor(BlockParser(Markdown()), {}, non_blocking=True)
+        self.assertFalse(processor._non_blocking)
+
+
+class WildcardProcessorTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.server = GithubStandInServer().start()
+        self.addCleanup(self.server.stop)
+        self.server.add_repository('abc', 'mkdocs-a', 2)
+        self.server.add_repository('abc', 'mkdocs-b', 3, seed=1)
+        self.server.add_repository('abc', 'mkdocs-empty', [])
+        self.server.add_repository('abc', 'other', 1)
+        self.server.describe_repository('abc', 'mkdocs-b', topics=['docs'])
+        self.clients = HostClients(tokens=['abc'])
+        self.addCleanup(self.clients.close)
+        self.processor = GithubReleaseChangelogProcessor(
+            BlockParser(Markdown()),
+            {'github_api_url': self.server.url},
+            clients=self.clients,
+            repositories=RepositoryIndex(),
+        )
+
+    def test_process_block_wildcard(self):
+        result = self.processor._process_block('abc', 'mkdocs-*', '', heading_level=1)
+        # Repositories without releases are left out
+        self.assertEqual(result.count('\n## ['), 1)
+        self.assertTrue(result.startswith('## [mkdocs-a](https://github.com/abc/mkdocs-a)\n\n### '))
+        self.assertIn('## [mkdocs-b](https://github.com/abc/mkdocs-b)\n\n### ', result)
+        self.assertNotIn('other', result)
+
+    def test_process_block_wildcard_filters(self):
+        result = self.processor._process_block('abc', '*', 'topics: [docs]\nmax_concurrency: 1')
+        self.assertTrue(result.startswith('# [mkdocs-b]'))
+        self.assertNotIn('mkdocs-a', result)
+
+    def test_process_block_wildcard_merge(self):
+        result = self.processor._process_block('abc', 'mkdocs-*', 'merge: true\nrelease_template: "{{repository}} {{release.published_at.isoformat()}}"')
+        lines = result.split('\n\n')
+        # Without the drafts and prereleases
+        self.assertEqual(len(lines), 3)
+        self.assertEqual({line.split(' ')[0] for line in lines}, {'abc/mkdocs-a', 'abc/mkdocs-b'})
+        published = [line.split(' ')[1] for line in lines]
+        self.assertEqual(published, sorted(published, reverse=True))
+        # Single repositories keep the default template
+        result = self.processor._process_block('abc', 'mkdocs-a', '')
+        self.assertTrue(result.startswith('# [Release 0.0.1]'))
+        result = self.processor._process_block('abc', 'mkdocs-*', 'merge: true')
+        self.assertTrue(result.startswith('# abc/mkdocs-'))
+
+    def test_process_block_wildcard_merge_ordering(self):
+        releases = {
+            # Listed by when they were created, so not by when they were published
+            'mkdocs-a': [
+                SimpleNamespace(name='a-jan', published_at=datetime(2024, 1, 1, tzinfo=timezone.utc)),
+                SimpleNamespace(name='a-mar', published_at='2024-03-01T00:00:00Z'),
+            ],
+            'mkdocs-b': [
+                SimpleNamespace(name='b-feb', published_at='2024-02-01T00:00:00Z'),
+                SimpleNamespace(name='b-apr', published_at='2024-04-01T00:00:00Z'),
+            ],
+        }
+        events = []
+        hook = HOOKS.register(lambda event, data: events.append((event, data)))
+        self.addCleanup(HOOKS.unregister, hook)
+        with patch.object(extension, 'select_releases', side_effect=lambda repository, **kwargs: releases.get(repository, [])):
+            result = self.processor._process_block('abc', 'mkdocs-*', 'merge: true\nrelease_template: "{{repository}} {{release.name}}"')
+        self.assertEqual(result.split('\n\n'), ['abc/mkdocs-b b-apr', 'abc/mkdocs-a a-mar', 'abc/mkdocs-b b-feb', 'abc/mkdocs-a a-jan'])
+        # Each repository's releases are rendered (and hooked) together
+        rendered = [data for event, data in events if event == RENDER_DONE]
+        self.assertEqual(
+            sorted((data['key'], data['releases']) for data in rendered),
+            [((self.server.url, 'abc', 'mkdocs-a'), 2), ((self.server.url, 'abc', 'mkdocs-b'), 2), ((self.server.url, 'abc', 'mkdocs-empty'), 0)]
+        )
+
+    def test_process_block_wildcard_deadline_exceeded(self):
+        deadline = Deadline(1)
+        deadline.start -= 2
+        processor = GithubReleaseChangelogProcessor(BlockParser(Markdown()), {'github_api_url': self.server.url}, deadline=deadline)
+        with self.assertLogs('mkdocs.plugins.mkdocs_github_changelog', level='WARNING'):
+            result = processor._process_block('abc', 'mkdocs-*', '')
+        self.assertEqual(result, UNAVAILABLE.format(org='abc', repo='mkdocs-*'))
+
+    def test_process_block_wildcard_merge_body_html(self):
+        result = self.processor._process_block('abc', 'mkdocs-*', 'merge: true\nbody_html: true')
+        self.assertTrue(result.startswith('# abc/mkdocs-'))
+        # The bodies are stashed as raw HTML
+        self.assertEqual(len(self.processor.parser.md.htmlStash.rawHtmlBlocks), 3)
+        self.assertTrue(all(html.startswith('<') for html in self.processor.parser.md.htmlStash.rawHtmlBlocks))
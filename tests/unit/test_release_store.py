@@ -0,0 +1,267 @@
+import copy
+from pathlib import Path
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from fastcore.xtras import dict2obj
+from nskit.common.contextmanagers import ChDir
+
+from mkdocs_github_changelog import release_store
+from mkdocs_github_changelog.cache import cache_key, copy_releases, ReleaseCache, releases_digest
+from mkdocs_github_changelog.disk_cache import FileLock
+from mkdocs_github_changelog.get_releases import _process_releases, get_releases_as_markdown
+from mkdocs_github_changelog.release_store import _literal_prefix, ReleaseStore, StoredRelease
+from mkdocs_github_changelog.testing.corpus import generate_releases, named_releases
+
+
+class StoredReleaseTestCase(unittest.TestCase):
+
+    def test_lazy_body(self):
+        loads = []
+
+        def load_body():
+            loads.append(1)
+            return 'The body'
+
+        release = StoredRelease({'name': 'abc'}, load_body)
+        self.assertEqual(release.name, 'abc')
+        self.assertNotIn('body', release)
+        self.assertEqual(release.body, 'The body')
+        self.assertEqual(release['body'], 'The body')
+        self.assertEqual(len(loads), 1)
+        release.body = 'Changed'
+        self.assertEqual(release['body'], 'Changed')
+        self.assertFalse(hasattr(release, 'processed'))
+        with self.assertRaises(KeyError):
+            release['missing']
+
+    def test_no_body(self):
+        release = StoredRelease({'name': 'abc'})
+        self.assertIsNone(getattr(release, 'body', None))
+
+    def test_copy(self):
+        release = StoredRelease({'name': 'abc'}, lambda: 'The body', generation=3)
+        copied = copy.copy(release)
+        copied.name = 'def'
+        self.assertEqual(release.name, 'abc')
+        self.assertEqual(copied.body, 'The body')
+        self.assertEqual(copied.generation, 3)
+
+
+class ReleaseStoreTestCase(unittest.TestCase):
+
+    def test_save_load(self):
+        with ChDir():
+            store = ReleaseStore(Path('cache', 'releases.sqlite3'))
+            key = cache_key('abc', 'def')
+            self.assertIsNone(store.load(key))
+            store.save(key, named_releases('0.2.0', '0.1.0'))
+            releases, fetched_at = store.load(key)
+            self.assertEqual([r.name for r in releases], ['0.2.0', '0.1.0'])
+            self.assertEqual(releases[0].assets[0].name, 'a.whl')
+            # The bodies are only loaded when they are used
+            self.assertNotIn('body', releases[0])
+            self.assertEqual(releases[0].body, 'Release 0.2.0')
+            self.assertAlmostEqual(fetched_at, time.time(), delta=5)
+            self.assertGreater(store.raw_bytes, 0)
+            store.close()
+
+    def test_without_body(self):
+        with ChDir():
+            store = ReleaseStore('releases.sqlite3')
+            key = cache_key('abc', 'def')
+            store.save(key, [dict2obj({'name': '0.1.0'}), dict2obj({'name': '0.0.1', 'body': None})], fields=('name',))
+            releases, _ = store.load(key, fields=('name',))
+            self.assertFalse(hasattr(releases[0], 'body'))
+            self.assertIsNone(releases[1].body)
+            store.close()
+
+    def test_fields(self):
+        with ChDir():
+            store = ReleaseStore('releases.sqlite3')
+            key = cache_key('abc', 'def')
+            store.save(key, named_releases('0.1.0'), fields=('name', 'body'))
+            self.assertIsNotNone(store.load(key, fields=('name',)))
+            self.assertIsNone(store.load(key, fields=('name', 'assets')))
+            self.assertIsNone(store.load(key))
+            store.close()
+
+    def test_expired(self):
+        with ChDir():
+            store = ReleaseStore('releases.sqlite3')
+            key = cache_key('abc', 'def')
+            store.save(key, named_releases('0.1.0'), fetched_at=time.time() - 100)
+            self.assertIsNone(store.load(key, max_age=10))
+            self.assertIsNotNone(store.load(key, max_age=1000))
+            store.close()
+
+    def test_resave_loaded(self):
+        with ChDir():
+            store = ReleaseStore('releases.sqlite3')
+            key = cache_key('abc', 'def')
+            store.save(key, named_releases('0.2.0', '0.1.0'))
+            releases, _ = store.load(key)
+            # e.g. after a webhook, with bodies that were never loaded
+            store.save(key, [*named_releases('0.3.0'), *releases])
+            releases, _ = store.load(key)
+            self.assertEqual([r.body for r in releases], ['Release 0.3.0', 'Release 0.2.0', 'Release 0.1.0'])
+            store.close()
+
+    def test_body_after_resave(self):
+        with ChDir():
+            store = ReleaseStore('releases.sqlite3')
+            key = cache_key('abc', 'def')
+            store.save(key, named_releases('0.1.0'))
+            releases, _ = store.load(key)
+            store.save(key, named_releases('0.2.0', '0.1.0'))
+            # Found by its tag
+            self.assertEqual(releases[0].body, 'Release 0.1.0')
+            store.close()
+
+    def test_select(self):
+        with ChDir():
+            store = ReleaseStore('releases.sqlite3')
+            key = cache_key('example-org', 'example-repo')
+            generated = generate_releases(50, seed=1)
+            store.save(key, generated)
+            releases, _ = store.load(key)
+            for match in (None, r'Release 0\.1', 'x', r'Release 0\.[12]', 'Releases?', r'Release \d', 'R|x'):
+                for include_prereleases in (False, True):
+                    with self.subTest(match=match, include_prereleases=include_prereleases):
+                        selected = store.select(key, releases, match=match, include_prereleases=include_prereleases)
+                        expected = _process_releases(copy.deepcopy([dict2obj(r) for r in generated]), match=match, autoprocess=False, include_prereleases=include_prereleases)
+                        self.assertEqual([r.tag_name for r in selected], [r.tag_name for r in expected])
+            store.close()
+
+    def test_select_literal_match(self):
+        with ChDir():
+            with patch.object(release_store, '_matches', wraps=release_store._matches) as matches:
+                store = ReleaseStore('releases.sqlite3')
+                key = cache_key('example-org', 'example-repo')
+                store.save(key, generate_releases(20, seed=1))
+                releases, _ = store.load(key)
+                # Only matched by the GLOB on the (indexed) names
+                self.assertTrue(store.select(key, releases, match=r'Release 0\.1'))
+                matches.assert_not_called()
+                self.assertTrue(store.select(key, releases, match=r'Release 0\.\d'))
+                matches.assert_called()
+                store.close()
+
+    def test_literal_prefix(self):
+        self.assertEqual(_literal_prefix(r'v1\.2\.'), ('v1.2.', True))
+        self.assertEqual(_literal_prefix('v1.*rc'), ('v1', False))
+        self.assertEqual(_literal_prefix('ab?'), ('a', False))
+        self.assertEqual(_literal_prefix(r'a\*b'), ('a', False))
+        self.assertEqual(_literal_prefix('a|b'), ('', False))
+        self.assertEqual(_literal_prefix('(?i)v'), ('', False))
+
+    def test_select_stale(self):
+        with ChDir():
+            store = ReleaseStore('releases.sqlite3')
+            key = cache_key('abc', 'def')
+            store.save(key, named_releases('0.1.0'))
+            releases, _ = store.load(key)
+            self.assertIsNotNone(store.select(key, releases))
+            # Not loaded from the store
+            self.assertIsNone(store.select(key, named_releases('0.1.0')))
+            # Stored again since they were loaded
+            store.save(key, named_releases('0.2.0'))
+            self.assertIsNone(store.select(key, releases))
+            store.close()
+
+    def test_evict_least_recently_used(self):
+        with ChDir():
+            store = ReleaseStore('releases.sqlite3')
+            keys = [cache_key('abc', name) for name in ('a', 'b', 'c')]
+            for key in keys:
+                store.save(key, named_releases('0.1.0'))
+                time.sleep(0.01)
+            # Using a marks it as recently used
+            store.load(keys[0])
+            size = store.size() // 3
+            store.max_size = size * 3
+            with FileLock(store._lock_path(keys[2])):
+                # c is being fetched by another process
+                store.save(cache_key('abc', 'd'), named_releases('0.1.0'))
+            self.assertIsNotNone(store.load(keys[0]))
+            self.assertIsNone(store.load(keys[1]))
+            self.assertIsNotNone(store.load(keys[2]))
+            self.assertIsNotNone(store.load(cache_key('abc', 'd')))
+            store.close()
+
+    def test_connections_not_kept_per_thread(self):
+        with ChDir():
+            store = ReleaseStore('releases.sqlite3')
+            key = cache_key('abc', 'def')
+            store.save(key, named_releases('0.1.0'))
+            barrier = threading.Barrier(8)
+
+            def load():
+                with store._connect():
+                    # All of the threads use a connection at once
+                    barrier.wait()
+                    store.load(key)
+
+            threads = [threading.Thread(target=load) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(len(store._idle), release_store.MAX_IDLE_CONNECTIONS)
+            store.close()
+            self.assertEqual(store._idle, [])
+
+    def test_release_cache(self):
+        with ChDir():
+            store = ReleaseStore('releases.sqlite3')
+            key = cache_key('example-org', 'example-repo')
+            store.save(key, [dict2obj(r) for r in generate_releases(20)])
+            cache = ReleaseCache(ttl=600, disk_cache=store)
+            markdown = get_releases_as_markdown('example-org', 'example-repo', cache=cache)
+            releases = cache.get(key).releases
+            self.assertTrue(all(isinstance(release, StoredRelease) for release in releases))
+            self.assertEqual(len(markdown), len(_process_releases(copy_releases(releases), autoprocess=False)))
+            # Only the rendered bodies were loaded, and only in the selected copies
+            self.assertFalse(any('body' in release for release in releases))
+            self.assertIn('[#', markdown[0])
+            store.close()
+
+    def test_refresh_unchanged(self):
+        with ChDir():
+            store = ReleaseStore('releases.sqlite3')
+            key = cache_key('example-org', 'example-repo')
+            generated = generate_releases(20, seed=1)
+            store.save(key, [dict2obj(r) for r in generated])
+            fetches = []
+
+            def fetcher():
+                fetches.append(1)
+                return [dict2obj(r) for r in generated]
+
+            cache = ReleaseCache(ttl=600, disk_cache=store)
+            cache.get_releases(key, fetcher)
+            self.assertEqual(fetches, [])
+            # Refreshing with the same releases isn't a change (so doesn't reload the pages), without loading the bodies
+            self.assertFalse(cache.refresh(key))
+            self.assertEqual(len(fetches), 1)
+            self.assertEqual(releases_digest(store.load(key)[0]), releases_digest(fetcher()))
+            self.assertFalse(any('body' in release for release in store.load(key)[0]))
+            generated[0]['body'] = 'Changed'
+            self.assertTrue(cache.refresh(key))
+            store.close()
+
+    def test_stored_without_digests(self):
+        with ChDir():
+            store = ReleaseStore('releases.sqlite3')
+            key = cache_key('abc', 'def')
+            store.save(key, named_releases('0.2.0', '0.1.0'))
+            with store._connect() as connection:
+                connection.execute('ALTER TABLE releases DROP COLUMN body_digest')
+            store.close()
+            # Stored by an earlier version, so the bodies are loaded for the digest
+            store = ReleaseStore('releases.sqlite3')
+            releases, _ = store.load(key)
+            self.assertEqual(releases_digest(releases), releases_digest(named_releases('0.2.0', '0.1.0')))
+            store.close()
@@ -0,0 +1,94 @@
+import io
+from pathlib import Path
+import unittest
+
+from nskit.common.contextmanagers import ChDir
+
+from mkdocs_github_changelog.get_releases import get_releases_as_markdown
+from mkdocs_github_changelog.release_store import ReleaseStore
+from mkdocs_github_changelog.renderer import _raw_html, ChangelogRenderer, RenderResult, split_repository
+from mkdocs_github_changelog.testing.server import GithubStandInServer
+
+
+class SplitRepositoryTestCase(unittest.TestCase):
+
+    def test_split_repository(self):
+        self.assertEqual(split_repository('abc/def'), ('abc', 'def'))
+        self.assertEqual(split_repository(' abc/def.io/ '), ('abc', 'def.io'))
+        for repository in ('abc', 'abc/', '/def', 'abc/def/ghi'):
+            with self.assertRaises(ValueError):
+                split_repository(repository)
+
+
+class ChangelogRendererTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.server = GithubStandInServer().start()
+        self.addCleanup(self.server.stop)
+        for repo in ('def', 'mkdocs-a', 'mkdocs-b'):
+            self.server.add_repository('abc', repo, 20)
+        self.renderer = ChangelogRenderer(tokens=['abc'], github_api_url=self.server.url)
+        self.addCleanup(self.renderer.close)
+
+    def test_unknown_option(self):
+        with self.assertRaises(ValueError):
+            ChangelogRenderer(template='x')
+        with self.assertRaises(ValueError):
+            self.renderer.render('abc/def', template='x')
+
+    def test_unknown_cache_backend(self):
+        with ChDir():
+            with self.assertRaises(ValueError):
+                ChangelogRenderer(cache_dir='cache', cache_backend='sqlite3')
+            with ChangelogRenderer(cache_dir='cache', cache_backend='sqlite') as renderer:
+                self.assertIsInstance(renderer.cache.disk_cache, ReleaseStore)
+
+    def test_render(self):
+        expected = get_releases_as_markdown('abc', 'def', token='abc', github_api_url=self.server.url)
+        self.assertEqual(self.renderer.render('abc/def'), '\n\n'.join(expected))
+        requests = len(self.server.requests)
+        # Rendered again from the cache, with other options
+        rendered = self.renderer.render('abc/def', release_template='{{release.tag_name}}', include_prereleases=True)
+        self.assertEqual(len(self.server.requests), requests)
+        self.assertGreater(len(rendered.split('\n\n')), len(expected))
+
+    def test_body_html(self):
+        rendered = self.renderer.render('abc/def', body_html=True)
+        self.assertIn('<p>', rendered)
+        self.assertNotIn('{{', rendered)
+
+    def test_heading_offset(self):
+        rendered = self.renderer.render('abc/def', release_template='# {{release.tag_name}}\n\n## Notes\n\n{{release.body}}', heading_offset=1)
+        self.assertIn('## 0.1.9\n\n### Notes', rendered)
+        self.assertNotIn('\n# ', '\n' + rendered)
+        self.assertEqual(_raw_html('<h1>a</h1><H6>b</H6>', heading_offset=2), '<h3>a</h3><h6>b</h6>')
+        self.assertEqual(_raw_html(None, heading_offset=1), '')
+
+    def test_repositories(self):
+        self.assertEqual(self.renderer.repositories(['abc/mkdocs-*', 'abc/def', 'abc/mkdocs-a']), ['abc/mkdocs-a', 'abc/mkdocs-b', 'abc/def'])
+
+    def test_render_many(self):
+        results = self.renderer.render_many(['abc/*', 'abc/missing'], release_template='{{release.tag_name}}')
+        self.assertEqual([result.repository for result in results], ['abc/def', 'abc/mkdocs-a', 'abc/mkdocs-b', 'abc/missing'])
+        self.assertEqual([result.ok for result in results], [True, True, True, False])
+        self.assertIn('FAILED  abc/missing', str(results[-1]))
+
+    def test_cache_dir(self):
+        with ChDir():
+            with ChangelogRenderer(tokens=['abc'], github_api_url=self.server.url, cache_dir='cache') as renderer:
+                rendered = renderer.render('abc/def')
+            requests = len(self.server.requests)
+            # Another run uses the stored releases
+            with ChangelogRenderer(tokens=['abc'], github_api_url=self.server.url, cache_dir='cache') as renderer:
+                self.assertEqual(renderer.render('abc/def'), rendered)
+            self.assertEqual(len(self.server.requests), requests)
+
+    def test_write(self):
+        results = [RenderResult('abc/def', '# a'), RenderResult('abc/ghi.io', '# b'), RenderResult('abc/jkl', error=ValueError())]
+        stream = io.StringIO()
+        ChangelogRenderer.write(results, stream=stream, headings=True)
+        self.assertEqual(stream.getvalue(), '# abc/def\n\n# a\n\n# abc/ghi.io\n\n# b\n')
+        with ChDir():
+            written = ChangelogRenderer.write(results, 'out')
+            self.assertEqual(written, [Path('out', 'abc', 'def.md'), Path('out', 'abc', 'ghi.io.md')])
+            self.assertEqual(Path('out', 'abc', 'ghi.io.md').read_text(), '# b\n')
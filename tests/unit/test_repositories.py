@@ -0,0 +1,133 @@
+import json
+from pathlib import Path
+import time
+import unittest
+
+from nskit.common.contextmanagers import ChDir
+
+from mkdocs_github_changelog.clients import HostClient, HostClients
+from mkdocs_github_changelog.directives import Directive
+from mkdocs_github_changelog.repositories import (
+    expand_directives,
+    is_wildcard,
+    matches,
+    MERGED_RELEASE_TEMPLATE,
+    RepositoryIndex,
+    select_repositories,
+)
+from mkdocs_github_changelog.testing.server import GithubStandInServer
+
+
+def _repository(name, topics=(), archived=False, fork=False):
+    return {'name': name, 'html_url': f'https://github.com/abc/{name}', 'topics': list(topics), 'archived': archived, 'fork': fork}
+
+
+class SelectRepositoriesTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.repositories = [
+            _repository('mkdocs-b', topics=('docs',)),
+            _repository('mkdocs-a', topics=('docs', 'python')),
+            _repository('Other'),
+            _repository('mkdocs-old', archived=True),
+            _repository('mkdocs-fork', fork=True),
+        ]
+
+    def _names(self, *args, **kwargs):
+        return [repository['name'] for repository in select_repositories(self.repositories, *args, **kwargs)]
+
+    def test_is_wildcard(self):
+        self.assertTrue(is_wildcard('*'))
+        self.assertTrue(is_wildcard('mkdocs-?'))
+        self.assertFalse(is_wildcard('mkdocs_github_changelog'))
+        self.assertTrue(matches('Other', 'oth*'))
+
+    def test_pattern(self):
+        self.assertEqual(self._names(), ['mkdocs-a', 'mkdocs-b', 'Other'])
+        self.assertEqual(self._names('mkdocs-*'), ['mkdocs-a', 'mkdocs-b'])
+
+    def test_include_exclude(self):
+        self.assertEqual(self._names(include=['mkdocs-*', 'other']), ['mkdocs-a', 'mkdocs-b', 'Other'])
+        self.assertEqual(self._names(include='other'), ['Other'])
+        self.assertEqual(self._names(exclude=['*-b']), ['mkdocs-a', 'Other'])
+
+    def test_topics(self):
+        self.assertEqual(self._names(topics=['docs']), ['mkdocs-a', 'mkdocs-b'])
+        self.assertEqual(self._names(topics=['docs', 'Python']), ['mkdocs-a'])
+
+    def test_archived_forks(self):
+        self.assertEqual(self._names('mkdocs-*', archived=True, forks=True), ['mkdocs-a', 'mkdocs-b', 'mkdocs-fork', 'mkdocs-old'])
+
+
+class RepositoryIndexTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.server = GithubStandInServer().start()
+        self.addCleanup(self.server.stop)
+        for i in range(150):
+            self.server.add_repository('abc', f'repo-{i}', 1)
+        self.server.describe_repository('abc', 'repo-1', topics=['docs'], archived=True)
+        self.client = HostClient(self.server.url, token='abc')
+        self.addCleanup(self.client.close)
+
+    def test_get(self):
+        index = RepositoryIndex()
+        repositories = index.get('abc', self.client)
+        self.assertEqual(len(repositories), 150)
+        self.assertEqual(repositories[1], _repository('repo-1', topics=['docs'], archived=True))
+        self.assertEqual(index.requests, 2)
+        # Kept for the ttl
+        index.get('abc', self.client)
+        self.assertEqual(index.requests, 2)
+
+    def test_expired(self):
+        index = RepositoryIndex(ttl=10)
+        index.get('abc', self.client)
+        index._organisations[f'{self.server.url}/abc']['fetched_at'] -= 100
+        index.get('abc', self.client)
+        self.assertEqual(index.requests, 4)
+
+    def test_stale_if_error(self):
+        index = RepositoryIndex(ttl=10)
+        index.get('abc', self.client)
+        index._organisations[f'{self.server.url}/abc']['fetched_at'] -= 100
+        self.server.error_rate = 1.0
+        with self.assertLogs('mkdocs.plugins.mkdocs_github_changelog', level='WARNING'):
+            self.assertEqual(len(index.get('abc', self.client)), 150)
+        with self.assertRaises(Exception):
+            index.get('def', self.client)
+
+    def test_saved(self):
+        with ChDir():
+            index = RepositoryIndex(Path('cache', 'repositories.json'))
+            Path('cache').mkdir()
+            index.get('abc', self.client)
+            saved = json.loads(Path('cache', 'repositories.json').read_text())['organisations'][f'{self.server.url}/abc']
+            self.assertAlmostEqual(saved['fetched_at'], time.time(), delta=5)
+            # Another build uses them
+            other = RepositoryIndex(Path('cache', 'repositories.json'))
+            self.assertEqual(len(other.get('abc', self.client)), 150)
+            self.assertEqual(other.requests, 0)
+
+
+class ExpandDirectivesTestCase(unittest.TestCase):
+
+    def test_expand(self):
+        with GithubStandInServer() as server:
+            for repo in ('mkdocs-a', 'mkdocs-b', 'other'):
+                server.add_repository('abc', repo, 1)
+            clients = HostClients(tokens=['abc'])
+            self.addCleanup(clients.close)
+            directives = [
+                Directive('abc', 'mkdocs-*', {'exclude': ['*-b'], 'match': 'x'}, page='a.md'),
+                Directive('abc', 'other', page='b.md'),
+                Directive('abc', '*', {'merge': True}, page='c.md'),
+                Directive('missing', '*', page='d.md'),
+            ]
+            with self.assertLogs('mkdocs.plugins.mkdocs_github_changelog', level='WARNING'):
+                expanded = expand_directives(directives, {'github_api_url': server.url}, clients)
+        self.assertEqual([(d.repo, d.page) for d in expanded], [
+            ('mkdocs-a', 'a.md'), ('other', 'b.md'), ('mkdocs-a', 'c.md'), ('mkdocs-b', 'c.md'), ('other', 'c.md'),
+        ])
+        self.assertEqual(expanded[0].options, {'match': 'x'})
+        self.assertEqual(expanded[2].options, {'release_template': MERGED_RELEASE_TEMPLATE})
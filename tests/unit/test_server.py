@@ -0,0 +1,161 @@
+import gzip
+import json
+import unittest
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+from mkdocs_github_changelog.feed import parse_feed
+from mkdocs_github_changelog.testing.server import GithubStandInServer
+
+
+class GithubStandInServerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.server = GithubStandInServer(compress=False).start()
+        self.addCleanup(self.server.stop)
+        self.server.add_repository('abc', 'def', 25)
+
+    def get(self, path, **headers):
+        with urlopen(Request(self.server.url + path, headers=headers)) as response:  # nosec B310
+            return response.status, dict(response.headers), response.read()
+
+    def test_pages(self):
+        status, headers, content = self.get('/repos/abc/def/releases?per_page=10&page=1')
+        self.assertEqual(status, 200)
+        self.assertEqual(len(json.loads(content)), 10)
+        self.assertIn('page=2>; rel="next"', headers['Link'])
+        self.assertIn('page=3>; rel="last"', headers['Link'])
+        _, headers, content = self.get('/repos/abc/def/releases?per_page=10&page=3')
+        self.assertEqual(len(json.loads(content)), 5)
+        self.assertNotIn('rel="next"', headers['Link'])
+        _, _, content = self.get('/repos/abc/def/releases?per_page=10&page=4')
+        self.assertEqual(json.loads(content), [])
+
+    def test_max_per_page(self):
+        self.server.max_per_page = 5
+        _, _, content = self.get('/repos/abc/def/releases?per_page=100')
+        self.assertEqual(len(json.loads(content)), 5)
+
+    def test_latest(self):
+        _, _, content = self.get('/repos/abc/def/releases/latest')
+        release = json.loads(content)
+        self.assertFalse(release['draft'])
+        self.assertFalse(release['prerelease'])
+
+    def test_not_found(self):
+        with self.assertRaises(HTTPError) as e:
+            self.get('/repos/abc/xyz/releases')
+        self.assertEqual(e.exception.code, 404)
+
+    def test_etag(self):
+        _, headers, _ = self.get('/repos/abc/def/releases')
+        self.assertEqual(self.server.remaining(), 4999)
+        with self.assertRaises(HTTPError) as e:
+            self.get('/repos/abc/def/releases', **{'If-None-Match': headers['ETag']})
+        self.assertEqual(e.exception.code, 304)
+        # Not modified responses are free
+        self.assertEqual(self.server.remaining(), 4999)
+
+    def test_gzip(self):
+        self.server.compress = True
+        _, headers, content = self.get('/repos/abc/def/releases', **{'Accept-Encoding': 'gzip'})
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        self.assertEqual(len(json.loads(gzip.decompress(content))), 25)
+        _, headers, _ = self.get('/repos/abc/def/releases')
+        self.assertNotIn('Content-Encoding', headers)
+
+    def test_rate_limit(self):
+        self.server.rate_limit = 2
+        _, headers, _ = self.get('/repos/abc/def/releases')
+        self.assertEqual(headers['X-RateLimit-Remaining'], '1')
+        self.get('/repos/abc/def/releases')
+        with self.assertRaises(HTTPError) as e:
+            self.get('/repos/abc/def/releases')
+        self.assertEqual(e.exception.code, 403)
+        self.assertEqual(e.exception.headers['X-RateLimit-Remaining'], '0')
+        # Tokens have separate quotas
+        status, _, _ = self.get('/repos/abc/def/releases', Authorization='token abc')
+        self.assertEqual(status, 200)
+        _, _, content = self.get('/rate_limit')
+        self.assertEqual(json.loads(content)['resources']['core']['remaining'], 0)
+
+    def test_errors(self):
+        self.server.errors = {2: 500}
+        self.get('/repos/abc/def/releases')
+        with self.assertRaises(HTTPError) as e:
+            self.get('/repos/abc/def/releases')
+        self.assertEqual(e.exception.code, 500)
+        self.get('/repos/abc/def/releases')
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_error_rate(self):
+        self.server.error_rate = 1.0
+        with self.assertRaises(HTTPError) as e:
+            self.get('/repos/abc/def/releases')
+        self.assertEqual(e.exception.code, 502)
+
+    def post(self, path, body):
+        request = Request(self.server.url + path, data=json.dumps(body).encode(), method='POST')
+        with urlopen(request) as response:  # nosec B310
+            return response.status, json.loads(response.read())
+
+    def test_graphql(self):
+        self.server.add_issues('abc', 'def', {1: 'One'}, state='OPEN')
+        query = 'query { repository(owner: "abc", name: "def") { n1: issueOrPullRequest(number: 1) { title } n2: issueOrPullRequest(number: 2) { title } } }'
+        status, result = self.post('/graphql', {'query': query})
+        self.assertEqual(status, 200)
+        self.assertEqual(result['data']['repository'], {'n1': {'title': 'One', 'state': 'OPEN'}, 'n2': None})
+        self.assertEqual(result['errors'][0]['path'], ['repository', 'n2'])
+        _, result = self.post('/api/graphql', {'query': query.replace('"def"', '"missing"')})
+        self.assertIsNone(result['data']['repository'])
+        self.assertEqual(self.server.remaining(), 4998)
+
+    def test_graphql_releases(self):
+        query = (
+            'query { r0: repository(owner: "abc", name: "def") { releases(first: 10, after: "20", orderBy: {field: CREATED_AT, direction: DESC}) '
+            '{ pageInfo { hasNextPage endCursor } nodes { tag_name: tagName isDraft } } } '
+            'r1: repository(owner: "abc", name: "missing") { releases(first: 10) { pageInfo { hasNextPage endCursor } nodes { name } } } }'
+        )
+        status, result = self.post('/graphql', {'query': query})
+        self.assertEqual(status, 200)
+        releases = result['data']['r0']['releases']
+        self.assertEqual(releases['pageInfo'], {'hasNextPage': False, 'endCursor': '25'})
+        self.assertEqual([node['tag_name'] for node in releases['nodes']], [r['tag_name'] for r in self.server.repositories[('abc', 'def')][20:]])
+        self.assertEqual(set(releases['nodes'][0]), {'tag_name', 'isDraft'})
+        self.assertIsNone(result['data']['r1'])
+        self.assertEqual(result['errors'][0]['path'], ['r1'])
+
+    def test_organisation_repositories(self):
+        self.server.add_repository('abc', 'ghi', 1)
+        self.server.describe_repository('abc', 'ghi', topics=['docs'], fork=True)
+        status, headers, content = self.get('/orgs/abc/repos?per_page=1&page=2')
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(content), [{'name': 'ghi', 'full_name': 'abc/ghi', 'html_url': 'https://github.com/abc/ghi', 'topics': ['docs'], 'archived': False, 'fork': True}])
+        self.assertIn('page=1>; rel="prev"', headers['Link'])
+        _, _, content = self.get('/users/abc/repos')
+        self.assertEqual([repository['name'] for repository in json.loads(content)], ['def', 'ghi'])
+        with self.assertRaises(HTTPError) as e:
+            self.get('/orgs/missing/repos')
+        self.assertEqual(e.exception.code, 404)
+
+    def test_media_types(self):
+        _, _, content = self.get('/repos/abc/def/releases?per_page=1', Accept='application/vnd.github.html+json')
+        release = json.loads(content)[0]
+        self.assertNotIn('body', release)
+        self.assertTrue(release['body_html'].startswith('<'))
+        _, _, content = self.get('/repos/abc/def/releases/latest', Accept='application/vnd.github.full+json')
+        self.assertEqual(set(json.loads(content)) & {'body', 'body_html'}, {'body', 'body_html'})
+
+    def test_release_feed(self):
+        status, headers, content = self.get('/abc/def/releases.atom')
+        self.assertEqual(status, 200)
+        self.assertTrue(headers['Content-Type'].startswith('application/atom+xml'))
+        self.assertEqual(len(parse_feed(content)), 10)
+        with self.assertRaises(HTTPError) as e:
+            self.get('/abc/def/releases.atom', **{'If-None-Match': headers['ETag']})
+        self.assertEqual(e.exception.code, 304)
+        self.server.add_feed('abc', 'def', '<feed xmlns="http://www.w3.org/2005/Atom"/>')
+        _, _, content = self.get('/abc/def/releases.atom')
+        self.assertEqual(parse_feed(content), [])
+        # Not counted against the rate limit
+        self.assertEqual(self.server.remaining(), self.server.rate_limit)
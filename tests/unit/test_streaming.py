@@ -0,0 +1,55 @@
+import json
+import unittest
+
+from mkdocs_github_changelog.streaming import iter_json_array, project, projected_fields, REQUIRED_FIELDS
+from mkdocs_github_changelog.testing.corpus import generate_releases
+
+
+class IterJsonArrayTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.releases = generate_releases(20, assets_per_release=2)
+        # Escaped quotes and backslashes, brackets in strings, and multi-byte characters
+        self.releases[3]['body'] += ' "quoted" \\ back\\slash {[}] ü 🚀'
+        self.encoded = json.dumps(self.releases, ensure_ascii=False, indent=1).encode()
+
+    def test_chunks(self):
+        for size in (1, 2, 3, 7, 64, 4096, len(self.encoded)):
+            with self.subTest(size=size):
+                chunks = [self.encoded[i:i+size] for i in range(0, len(self.encoded), size)]
+                self.assertEqual(list(iter_json_array(chunks)), self.releases)
+
+    def test_str_chunks(self):
+        self.assertEqual(list(iter_json_array([json.dumps(self.releases)])), self.releases)
+
+    def test_fields(self):
+        releases = list(iter_json_array([self.encoded], ('name', 'body', 'missing')))
+        self.assertEqual(releases, [{'name': r['name'], 'body': r['body']} for r in self.releases])
+
+    def test_empty(self):
+        self.assertEqual(list(iter_json_array([b' [ ', b' ] '])), [])
+
+    def test_invalid(self):
+        for content in (b'', b'[{"a": 1}', b'{"a": 1}', b'["a"]', b'[{"a": 1}] [', b'[{"a": 1}]]'):
+            with self.subTest(content=content):
+                with self.assertRaises(ValueError):
+                    list(iter_json_array([content]))
+
+    def test_lazy(self):
+        # Each object is available as soon as it is complete
+        objects = iter_json_array(iter([b'[{"a": 1}, ', b'{"a"', b': 2}]']))
+        self.assertEqual(next(objects), {'a': 1})
+        self.assertEqual(next(objects), {'a': 2})
+
+
+class ProjectionTestCase(unittest.TestCase):
+
+    def test_project(self):
+        self.assertEqual(project({'a': 1, 'b': 2}, ('a', 'c')), {'a': 1})
+        item = {'a': 1}
+        self.assertIs(project(item), item)
+
+    def test_projected_fields(self):
+        self.assertIsNone(projected_fields(None))
+        self.assertEqual(projected_fields([]), REQUIRED_FIELDS)
+        self.assertEqual(projected_fields(['author', 'name']), (*REQUIRED_FIELDS, 'author'))
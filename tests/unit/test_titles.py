@@ -0,0 +1,77 @@
+import json
+from pathlib import Path
+import time
+import unittest
+
+from nskit.common.contextmanagers import ChDir
+
+from mkdocs_github_changelog.clients import HostClient
+from mkdocs_github_changelog.graphql import graphql_url
+from mkdocs_github_changelog.testing.server import GithubStandInServer
+from mkdocs_github_changelog.titles import issues_query, IssueTitles
+
+
+class GraphqlTestCase(unittest.TestCase):
+
+    def test_graphql_url(self):
+        self.assertEqual(graphql_url(), 'https://api.github.com/graphql')
+        self.assertEqual(graphql_url('https://api.github.com/'), 'https://api.github.com/graphql')
+        self.assertEqual(graphql_url('https://github.example.com/api/v3'), 'https://github.example.com/api/graphql')
+
+    def test_issues_query(self):
+        query = issues_query('abc', 'd"ef', [1, 23])
+        self.assertIn('repository(owner: "abc", name: "d\\"ef")', query)
+        self.assertIn('n1: issueOrPullRequest(number: 1)', query)
+        self.assertIn('n23: issueOrPullRequest(number: 23)', query)
+
+
+class IssueTitlesTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.server = GithubStandInServer().start()
+        self.addCleanup(self.server.stop)
+        self.server.add_repository('abc', 'def', 1)
+        self.server.add_issues('abc', 'def', {number: f'Issue {number}' for number in range(1, 250)})
+        self.client = HostClient(self.server.url, token='abc')
+        self.addCleanup(self.client.close)
+        self.key = (self.server.url, 'abc', 'def')
+
+    def test_batches(self):
+        titles = IssueTitles()
+        result = titles.get(self.key, range(1, 260), self.client)
+        self.assertEqual(len(result), 249)
+        self.assertEqual(result[42], 'Issue 42')
+        # 259 numbers in batches of 100
+        self.assertEqual(titles.requests, 3)
+        self.assertEqual(self.server.requests[-1][0], 'POST')
+        self.assertEqual(self.server.requests[-1][2]['Authorization'], 'token abc')
+        # Known now, including those that aren't issues
+        self.assertEqual(titles.get(self.key, [1, 255], self.client), {1: 'Issue 1'})
+        self.assertEqual(titles.requests, 3)
+
+    def test_persistent(self):
+        with ChDir():
+            titles = IssueTitles('titles.json')
+            titles.get(self.key, [1, 2], self.client)
+            titles.save()
+            stored = json.loads(Path('titles.json').read_text())['titles']
+            self.assertEqual(stored['/'.join(self.key)]['1']['title'], 'Issue 1')
+            titles = IssueTitles('titles.json')
+            self.assertEqual(titles.get(self.key, [1, 2], self.client), {1: 'Issue 1', 2: 'Issue 2'})
+            self.assertEqual(titles.requests, 0)
+
+    def test_open_expire(self):
+        self.server.add_issues('abc', 'def', {1: 'Open'}, state='OPEN')
+        titles = IssueTitles(ttl=100)
+        titles.get(self.key, [1, 2], self.client)
+        self.server.add_issues('abc', 'def', {1: 'Renamed', 2: 'Renamed'}, state='OPEN')
+        for entry in titles._titles['/'.join(self.key)].values():
+            entry['fetched_at'] = time.time() - 200
+        # Only the open issue is looked up again
+        self.assertEqual(titles.get(self.key, [1, 2], self.client), {1: 'Renamed', 2: 'Issue 2'})
+
+    def test_error(self):
+        titles = IssueTitles()
+        self.assertEqual(titles.get((self.server.url, 'abc', 'missing'), [1], self.client), {})
+        self.server.errors = {len(self.server.requests) + 1: 502}
+        self.assertEqual(titles.get(self.key, [1], self.client), {})
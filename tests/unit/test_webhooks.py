@@ -0,0 +1,211 @@
+import hashlib
+import hmac
+import json
+from pathlib import Path
+import time
+import unittest
+from unittest.mock import MagicMock
+import urllib.request
+
+from fastcore.basics import AttrDict
+from nskit.common.contextmanagers import ChDir, Env
+
+from mkdocs_github_changelog.cache import cache_key, ReleaseCache
+from mkdocs_github_changelog.disk_cache import DiskCache
+from mkdocs_github_changelog.release_store import ReleaseStore
+from mkdocs_github_changelog.webhooks import (
+    apply_release_event,
+    event_covers_fields,
+    event_key,
+    load_event,
+    seed_from_event,
+    verify_signature,
+    WebhookReceiver,
+)
+
+
+def _release(id, tag_name, **kwargs):
+    return AttrDict({'id': id, 'tag_name': tag_name, 'name': tag_name, 'body': f'Release {tag_name}', **kwargs})
+
+
+def _payload(action, release, **kwargs):
+    return {
+        'action': action,
+        'release': dict(release),
+        'repository': {'full_name': 'abc/def', 'url': 'https://api.github.com/repos/abc/def'},
+        **kwargs
+    }
+
+
+class VerifySignatureTestCase(unittest.TestCase):
+
+    def test_verify_signature(self):
+        signature = 'sha256=' + hmac.new(b'secret', b'body', hashlib.sha256).hexdigest()
+        self.assertTrue(verify_signature('secret', b'body', signature))
+        self.assertFalse(verify_signature('other', b'body', signature))
+        self.assertFalse(verify_signature('secret', b'body', None))
+
+
+class EventKeyTestCase(unittest.TestCase):
+
+    def test_github(self):
+        self.assertEqual(event_key(_payload('published', {})), ('https://api.github.com', 'abc', 'def'))
+
+    def test_enterprise(self):
+        payload = {'repository': {'full_name': 'abc/def', 'url': 'https://github.example.com/api/v3/repos/abc/def'}}
+        self.assertEqual(event_key(payload), ('https://github.example.com/api/v3', 'abc', 'def'))
+
+    def test_no_repository(self):
+        with self.assertRaises(KeyError):
+            event_key({})
+
+
+class ApplyReleaseEventTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.releases = [_release(2, 'v0.2.0'), _release(1, 'v0.1.0')]
+
+    def test_published(self):
+        releases = apply_release_event(self.releases, _payload('published', _release(3, 'v0.3.0')))
+        self.assertEqual([r.tag_name for r in releases], ['v0.3.0', 'v0.2.0', 'v0.1.0'])
+        self.assertEqual(releases[0].body, 'Release v0.3.0')
+
+    def test_edited(self):
+        releases = apply_release_event(self.releases, _payload('edited', _release(1, 'v0.1.0', body='Edited')))
+        self.assertEqual([r.body for r in releases], ['Release v0.2.0', 'Edited'])
+
+    def test_deleted(self):
+        releases = apply_release_event(self.releases, _payload('deleted', _release(2, 'v0.2.0')))
+        self.assertEqual([r.tag_name for r in releases], ['v0.1.0'])
+        # The releases passed in are not changed
+        self.assertEqual(len(self.releases), 2)
+
+    def test_renamed_tag_without_ids(self):
+        releases = [AttrDict({'tag_name': 'v0.2.0'}), AttrDict({'tag_name': 'v0.1.0'})]
+        payload = _payload('edited', _release(2, 'v0.2.1'), changes={'tag_name': {'from': 'v0.2.0'}})
+        releases = apply_release_event(releases, payload, fields=('tag_name',))
+        self.assertEqual(releases, [{'tag_name': 'v0.2.1'}, {'tag_name': 'v0.1.0'}])
+
+
+class EventCoversFieldsTestCase(unittest.TestCase):
+
+    def test_event_covers_fields(self):
+        payload = _payload('published', _release(3, 'v0.3.0'))
+        self.assertTrue(event_covers_fields(payload, None))
+        self.assertTrue(event_covers_fields(payload, ('tag_name', 'body')))
+        # Github doesn't render the body in the webhook payloads
+        self.assertFalse(event_covers_fields(payload, ('tag_name', 'body_html')))
+        self.assertTrue(event_covers_fields(_payload('published', _release(3, 'v0.3.0', body_html='<p>3</p>')), ('body_html',)))
+        self.assertTrue(event_covers_fields(_payload('deleted', _release(3, 'v0.3.0')), ('body_html',)))
+
+
+class LoadEventTestCase(unittest.TestCase):
+
+    def test_load_event(self):
+        with ChDir():
+            payload = _payload('published', _release(3, 'v0.3.0'))
+            Path('event.json').write_text(json.dumps(payload))
+            self.assertEqual(load_event('event.json'), payload)
+            with Env(override={'GITHUB_EVENT_PATH': 'event.json'}):
+                self.assertEqual(load_event(), payload)
+            with Env(remove=['GITHUB_EVENT_PATH']):
+                self.assertIsNone(load_event())
+
+    def test_not_a_release(self):
+        with ChDir():
+            self.assertIsNone(load_event('missing.json'))
+            Path('push.json').write_text(json.dumps({'ref': 'refs/heads/main', 'repository': {'full_name': 'abc/def'}}))
+            self.assertIsNone(load_event('push.json'))
+            Path('invalid.json').write_text('{')
+            self.assertIsNone(load_event('invalid.json'))
+
+
+class SeedFromEventTestCase(unittest.TestCase):
+
+    fields = ('id', 'tag_name', 'name', 'body')
+
+    def _seed(self, disk_cache):
+        key = cache_key('abc', 'def')
+        # Releases stored by an earlier run (e.g. restored in CI), which have expired
+        disk_cache.save(key, [_release(2, 'v0.2.0'), _release(1, 'v0.1.0')], fetched_at=time.time() - 1000, fields=self.fields)
+        cache = ReleaseCache(ttl=10, disk_cache=disk_cache)
+        Path('event.json').write_text(json.dumps(_payload('published', _release(3, 'v0.3.0', draft=False))))
+        self.assertEqual(seed_from_event(cache, 'event.json'), key)
+        fetcher = MagicMock()
+        releases = cache.get_releases(key, fetcher, fields=('tag_name', 'body'))
+        fetcher.assert_not_called()
+        self.assertEqual([r.tag_name for r in releases], ['v0.3.0', 'v0.2.0', 'v0.1.0'])
+        self.assertEqual(releases[0].body, 'Release v0.3.0')
+        return key
+
+    def test_disk_cache(self):
+        with ChDir():
+            key = self._seed(DiskCache('cache'))
+            self.assertEqual(len(DiskCache('cache').load(key, max_age=10, fields=self.fields)[0]), 3)
+
+    def test_release_store(self):
+        with ChDir():
+            key = self._seed(ReleaseStore('releases.sqlite3'))
+            self.assertEqual(len(ReleaseStore('releases.sqlite3').load(key, max_age=10, fields=self.fields)[0]), 3)
+
+    def test_without_body_html(self):
+        with ChDir():
+            key = cache_key('abc', 'def')
+            fields = ('id', 'tag_name', 'body_html')
+            DiskCache('cache').save(key, [_release(2, 'v0.2.0', body_html='<p>2</p>')], fetched_at=time.time() - 1000, fields=fields)
+            Path('event.json').write_text(json.dumps(_payload('published', _release(3, 'v0.3.0'))))
+            cache = ReleaseCache(ttl=10, disk_cache=DiskCache('cache'))
+            self.assertIsNone(seed_from_event(cache, 'event.json'))
+            # Left expired, so they are fetched with the rendered bodies
+            fetcher = MagicMock(return_value=[_release(3, 'v0.3.0', body_html='<p>3</p>'), _release(2, 'v0.2.0', body_html='<p>2</p>')])
+            releases = cache.get_releases(key, fetcher, fields=fields)
+            fetcher.assert_called_once_with()
+            self.assertEqual(releases[0].body_html, '<p>3</p>')
+
+    def test_not_cached(self):
+        with ChDir():
+            Path('event.json').write_text(json.dumps(_payload('published', _release(3, 'v0.3.0'))))
+            cache = ReleaseCache(disk_cache=DiskCache('cache'))
+            self.assertIsNone(seed_from_event(cache, 'event.json'))
+            self.assertNotIn(cache_key('abc', 'def'), cache)
+            self.assertIsNone(seed_from_event(cache, 'missing.json'))
+
+
+class WebhookReceiverTestCase(unittest.TestCase):
+
+    def _post(self, receiver, event, payload, headers=None):
+        request = urllib.request.Request(
+            receiver.url, data=json.dumps(payload).encode(), method='POST',
+            headers={'X-GitHub-Event': event, 'Content-Type': 'application/json', **(headers or {})}
+        )
+        try:
+            with urllib.request.urlopen(request) as response:  # nosec B310
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+    def test_receive(self):
+        on_release = MagicMock()
+        receiver = WebhookReceiver(on_release).start()
+        self.addCleanup(receiver.stop)
+        payload = _payload('published', _release(3, 'v0.3.0'))
+        self.assertEqual(self._post(receiver, 'ping', {'zen': 'hello'}), 204)
+        on_release.assert_not_called()
+        self.assertEqual(self._post(receiver, 'release', payload), 204)
+        on_release.assert_called_once_with(('https://api.github.com', 'abc', 'def'), payload)
+        self.assertEqual(self._post(receiver, 'release', {'action': 'published'}), 400)
+
+    def test_receive_error(self):
+        receiver = WebhookReceiver(MagicMock(side_effect=ValueError('bad')))
+        self.assertEqual(receiver.receive('release', json.dumps(_payload('published', _release(3, 'v0.3.0'))).encode()), 500)
+
+    def test_receive_signed(self):
+        on_release = MagicMock()
+        receiver = WebhookReceiver(on_release, secret='secret')
+        body = json.dumps(_payload('published', _release(3, 'v0.3.0'))).encode()
+        self.assertEqual(receiver.receive('release', body, 'sha256=bad'), 401)
+        on_release.assert_not_called()
+        signature = 'sha256=' + hmac.new(b'secret', body, hashlib.sha256).hexdigest()
+        self.assertEqual(receiver.receive('release', body, signature), 204)
+        on_release.assert_called_once()
+        receiver.stop()